@@ -3,26 +3,49 @@ YouTube Transcript Extractor - Cloud Run版
 ポート干渉を避け、固定URLで動作するバージョン
 """
 
-import json
+import io
 import logging
 import os
 import random
 import socket
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from functools import wraps
-from urllib.parse import parse_qs, urlparse
 
 import google.generativeai as genai
 import googleapiclient.discovery
 import googleapiclient.errors
 import requests
 from dotenv import load_dotenv
-from flask import Flask, jsonify, render_template, request
+from flask import Flask, Response, jsonify, render_template, request
 from flask_cors import CORS
 from youtube_transcript_api import (NoTranscriptFound, TranscriptsDisabled,
                                     YouTubeTranscriptApi)
 
+import cache
+import deadline
+import extractive_summarizer
+import gemini_retry
+import job_queue
+import local_formatter
+import map_reduce
+import model_router
+import response_layer
+import segment_index
+import token_planner
+import transcript_archive
+import transcript_codec
+import transcript_common
+import transcript_search
+from transcript_common import (FORMAT_GENERATION_CONFIG,
+                               SUMMARY_GENERATION_CONFIG,
+                               build_consolidation_prompt, build_format_prompt,
+                               build_merge_prompt, build_partial_summary_prompt,
+                               build_summary_prompt, format_transcript)
+from transcript_cleaner import clean_text
+
 # ロギング設定
 logging.basicConfig(
     level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
@@ -35,7 +58,14 @@ app = Flask(__name__, template_folder="templates", static_folder="static")
 # CORS設定（環境変数から許可オリジンを取得）
 cors_origins = os.environ.get("CORS_ORIGINS", "https://*.run.app").split(",")
 cors_origins = [origin.strip() for origin in cors_origins]
-CORS(app, origins=cors_origins, allow_headers=["Content-Type", "Authorization"])
+CORS(
+    app,
+    origins=cors_origins,
+    allow_headers=["Content-Type", "Authorization", "Content-Encoding", deadline.HEADER],
+)
+
+# JSON高速化・レスポンス圧縮・圧縮リクエストの展開
+response_layer.init_flask(app)
 
 # 環境変数読み込み
 load_dotenv()
@@ -43,6 +73,153 @@ load_dotenv()
 # Cloud Run用ポート設定（環境変数PORTを優先）
 PORT = int(os.environ.get("PORT", 8080))
 
+# Gemini送信前のプリクリーニングレベル（off / light / standard / aggressive）
+PRECLEAN_LEVEL = os.environ.get("PRECLEAN_LEVEL", "standard")
+
+# Gemini呼び出し1回のタイムアウト（リクエストの残り時間の方が短ければそちら）
+GEMINI_TIMEOUT = float(os.environ.get("GEMINI_TIMEOUT", 120))
+
+# Gemini結果のキャッシュ（同じプロンプトの結果を再利用。分割要約のチャンク単位でも効く）
+gemini_cache = cache.get_cache(
+    "gemini",
+    maxsize=int(os.environ.get("GEMINI_CACHE_SIZE", 2048)),
+    ttl=int(os.environ.get("GEMINI_CACHE_TTL", 86400)),
+)
+
+# 取得した字幕のキャッシュ（動画ID・言語ごとのセグメント。範囲の切り出しにも使う）
+# 既定では transcript_codec で圧縮して保持する（TRANSCRIPT_CACHE_COMPRESS=0 で無効）
+# TRANSCRIPT_CACHE_STALE 秒を指定すると期限切れの字幕を返しながらバックグラウンドで取り直す
+transcript_cache = cache.get_cache(
+    "transcripts",
+    maxsize=int(os.environ.get("TRANSCRIPT_CACHE_SIZE", 256)),
+    ttl=int(os.environ.get("TRANSCRIPT_CACHE_TTL", 3600)),
+    stale=int(os.environ.get("TRANSCRIPT_CACHE_STALE", 0)),
+    codec=(
+        transcript_codec.default_codec()
+        if os.environ.get("TRANSCRIPT_CACHE_COMPRESS", "1") != "0"
+        else None
+    ),
+)
+
+# 動画タイトルのキャッシュ（YouTube Data API の呼び出しを減らす）
+# 期限切れから TITLE_CACHE_STALE 秒までは古いタイトルを返しながらバックグラウンドで取り直す
+title_cache = cache.get_cache(
+    "video_titles",
+    maxsize=int(os.environ.get("TITLE_CACHE_SIZE", 4096)),
+    ttl=int(os.environ.get("TITLE_CACHE_TTL", 86400)),
+    stale=int(os.environ.get("TITLE_CACHE_STALE", 604800)),
+)
+
+# 動画ごとの字幕の言語一覧のキャッシュ（タイトルと同じく古い値を返しながら取り直す）
+languages_cache = cache.get_cache(
+    "supported_languages",
+    maxsize=int(os.environ.get("LANGUAGES_CACHE_SIZE", 4096)),
+    ttl=int(os.environ.get("LANGUAGES_CACHE_TTL", 21600)),
+    stale=int(os.environ.get("LANGUAGES_CACHE_STALE", 86400)),
+)
+
+# キャッシュのスナップショット（空文字で無効。マウントしたボリュームを指定すれば
+# 新しいインスタンスが起動時に他のインスタンスの結果で暖まる）
+CACHE_SNAPSHOT_PATH = os.environ.get("CACHE_SNAPSHOT_PATH", "")
+
+# スナップショットを書く間隔（秒。0なら書かない）
+CACHE_SNAPSHOT_INTERVAL = float(os.environ.get("CACHE_SNAPSHOT_INTERVAL", 0))
+
+# スナップショットに含める名前空間
+CACHE_SNAPSHOT_NAMESPACES = [
+    ns.strip()
+    for ns in os.environ.get("CACHE_SNAPSHOT_NAMESPACES", "transcripts,video_titles,supported_languages,gemini").split(",")
+    if ns.strip()
+]
+
+if CACHE_SNAPSHOT_PATH:
+    # 読み込みはバックグラウンド（/health は読み込みを待たずに応答する）
+    cache.load_snapshot_async(CACHE_SNAPSHOT_PATH, CACHE_SNAPSHOT_NAMESPACES)
+    cache.start_snapshot_writer(
+        CACHE_SNAPSHOT_PATH, CACHE_SNAPSHOT_INTERVAL, CACHE_SNAPSHOT_NAMESPACES
+    )
+
+# 字幕の全文検索インデックス（既定の空文字で無効。URLから取得した字幕を索引する）
+SEARCH_INDEX_PATH = os.environ.get("SEARCH_INDEX_PATH", "")
+
+# 起動時に差分を取り込む字幕アーカイブ（local_transcript_extractor batch の出力）
+SEARCH_ARCHIVE_PATH = os.environ.get("SEARCH_ARCHIVE_PATH")
+
+
+def open_search_index():
+    """検索インデックスを開き、アーカイブが指定されていれば追記分を取り込む"""
+    if not SEARCH_INDEX_PATH:
+        return None
+    try:
+        index = transcript_search.TranscriptIndex(SEARCH_INDEX_PATH)
+    except Exception as e:
+        logger.warning(f"Search index unavailable: {e}")
+        return None
+    if SEARCH_ARCHIVE_PATH and os.path.exists(SEARCH_ARCHIVE_PATH):
+        try:
+            with transcript_archive.TranscriptArchive(SEARCH_ARCHIVE_PATH) as archive:
+                count = index.sync_archive(archive)
+            logger.info(f"Indexed {count} archived transcripts from {SEARCH_ARCHIVE_PATH}")
+        except Exception as e:
+            logger.warning(f"Failed to sync search index from archive: {e}")
+    return index
+
+
+search_index = open_search_index()
+
+# 索引の書き込みはリクエストの外で1本のスレッドにまとめる（登録待ちの動画は重ねて登録しない）
+_search_index_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="search-index")
+_search_index_pending = set()
+_search_index_lock = threading.Lock()
+
+
+def _index_transcript(video_id, transcript, title, lang):
+    try:
+        if video_id not in search_index:
+            search_index.index_video(video_id, transcript, title=title, language=lang)
+    except Exception as e:
+        logger.warning(f"Failed to index transcript for {video_id}: {e}")
+    finally:
+        with _search_index_lock:
+            _search_index_pending.discard(video_id)
+
+
+def index_transcript_async(video_id, transcript, title, lang):
+    """まだ索引していない動画の字幕をバックグラウンドで検索インデックスに登録する"""
+    if search_index is None:
+        return
+    with _search_index_lock:
+        if video_id in _search_index_pending:
+            return
+        _search_index_pending.add(video_id)
+    _search_index_executor.submit(_index_transcript, video_id, transcript, title, lang)
+
+# 抽出ジョブのキュー（SQLiteのファイル、または redis:// のURL。既定の空文字で無効）
+# インスタンスが止まっても実行中のジョブは可視性タイムアウト後に他のワーカーが実行し直す
+JOB_QUEUE_URL = os.environ.get("JOB_QUEUE_URL", "")
+
+# このプロセスの中で動かすワーカーの数（既定の 0 なら job_worker.py など別プロセスのワーカーに任せる）
+# import では起動しない。start_job_workers() を gunicorn.conf.py のフックか __main__ から呼ぶ
+JOB_WORKERS = int(os.environ.get("JOB_WORKERS", 0))
+
+# 1つの抽出ジョブの期限（秒）。リクエストと違って待つ人がいないので長めにとる
+JOB_DEADLINE = float(os.environ.get("JOB_DEADLINE", 900))
+
+
+def open_job_queue():
+    """抽出ジョブのキューを開く（開けなければ None。/jobs は 503 を返す）"""
+    if not JOB_QUEUE_URL:
+        return None
+    try:
+        return job_queue.open_queue(JOB_QUEUE_URL, name="extract")
+    except Exception as e:
+        logger.warning(f"Job queue unavailable: {e}")
+        return None
+
+
+job_queue_backend = open_job_queue()
+job_workers = []
+
 
 # APIキー取得（環境変数を優先）
 def get_youtube_api_key():
@@ -211,51 +388,47 @@ def create_transcript_session_with_proxy():
 def get_video_id(url):
     """YouTube URLから動画IDを抽出"""
     try:
-        parsed_url = urlparse(url)
-
-        # youtu.be形式
-        if parsed_url.hostname == "youtu.be":
-            return parsed_url.path[1:]
-
-        # youtube.com形式
-        if parsed_url.hostname in ("www.youtube.com", "youtube.com"):
-            if parsed_url.path == "/watch":
-                params = parse_qs(parsed_url.query)
-                return params.get("v", [None])[0]
-            if parsed_url.path.startswith("/embed/"):
-                return parsed_url.path.split("/")[2]
-            if parsed_url.path.startswith("/v/"):
-                return parsed_url.path.split("/")[2]
-
-        raise ValueError(f"無効なYouTube URLです: {url}")
+        return transcript_common.get_video_id(url)
     except Exception as e:
         logger.error(f"Error extracting video ID from URL {url}: {e}")
         raise
 
 
+def fetch_video_title(video_id):
+    """YouTube Data API から動画タイトルを取得（見つからなければ None）"""
+    request = youtube.videos().list(part="snippet", id=video_id)
+    response = request.execute()
+
+    if "items" in response and len(response["items"]) > 0:
+        title = response["items"][0]["snippet"]["title"]
+        logger.info(f"Retrieved title for video {video_id}: {title}")
+        return title
+    return None
+
+
 def get_video_title(video_id):
-    """動画タイトルを取得"""
+    """動画タイトルを取得（取得できたタイトルはキャッシュする）"""
     if not youtube:
         return "YouTube API未設定"
 
     try:
-        request = youtube.videos().list(part="snippet", id=video_id)
-        response = request.execute()
-
-        if "items" in response and len(response["items"]) > 0:
-            title = response["items"][0]["snippet"]["title"]
-            logger.info(f"Retrieved title for video {video_id}: {title}")
-            return title
-        else:
-            logger.warning(f"No title found for video {video_id}")
-            return "タイトルを取得できませんでした"
+        title = title_cache.get_or_load(video_id, lambda: fetch_video_title(video_id))
     except Exception as e:
         logger.error(f"Error getting video title for {video_id}: {e}")
         return "タイトル取得エラー"
+    if title is None:
+        logger.warning(f"No title found for video {video_id}")
+        return "タイトルを取得できませんでした"
+    return title
+
 
+def get_transcript(video_id, lang="ja", budget=None):
+    """字幕を取得（プロキシ付きで試行）
 
-def get_transcript(video_id, lang="ja"):
-    """字幕を取得（プロキシ付きで試行）"""
+    budget（リクエストの期限）の残り時間に合わせて待機を縮め、
+    期限を過ぎたら残りの戦略を試さずに DeadlineExceeded を送出する
+    """
+    budget = budget or deadline.Deadline()
     try:
         logger.info(
             f"Attempting to get transcript for video {video_id} in language {lang}"
@@ -269,6 +442,7 @@ def get_transcript(video_id, lang="ja"):
         ]
 
         for strategy, description in strategies:
+            budget.check(description)
             try:
                 logger.info(f"Trying {description} for video {video_id}")
 
@@ -291,7 +465,7 @@ def get_transcript(video_id, lang="ja"):
                     )
 
                 # レート制限対策
-                delay = random.uniform(3, 8)
+                delay = budget.sleep_for(random.uniform(3, 8))
                 logger.info(f"Waiting {delay:.1f} seconds before request...")
                 time.sleep(delay)
 
@@ -318,6 +492,7 @@ def get_transcript(video_id, lang="ja"):
 
         # 英語でも同じ戦略を試行
         for strategy, description in strategies:
+            budget.check(f"English {description}")
             try:
                 logger.info(f"Trying {description} for English transcript")
 
@@ -335,7 +510,7 @@ def get_transcript(video_id, lang="ja"):
                 else:  # minimal_session
                     session = requests.Session()
 
-                time.sleep(random.uniform(4, 9))
+                budget.sleep(random.uniform(4, 9))
                 api = YouTubeTranscriptApi(http_client=session)
                 fetched_transcript = api.fetch(video_id, languages=["en"])
                 transcript = fetched_transcript.to_raw_data()
@@ -350,9 +525,10 @@ def get_transcript(video_id, lang="ja"):
                 continue
 
         # 最後の試行：auto言語検出
+        budget.check("auto language detection")
         try:
             logger.info("Final attempt with auto language detection...")
-            time.sleep(random.uniform(5, 12))
+            budget.sleep(random.uniform(5, 12))
 
             session = requests.Session()
             session.headers.update({"User-Agent": "youtube-transcript-extractor/1.0"})
@@ -367,6 +543,9 @@ def get_transcript(video_id, lang="ja"):
         except Exception as auto_error:
             logger.error(f"All methods failed for video {video_id}: {auto_error}")
 
+    except deadline.DeadlineExceeded:
+        logger.warning(f"Request deadline exceeded while fetching transcript for {video_id}")
+        raise
     except NoTranscriptFound:
         error_msg = "この動画には字幕が存在しないか、利用できません。"
         logger.warning(f"No transcript available for video {video_id}")
@@ -381,120 +560,396 @@ def get_transcript(video_id, lang="ja"):
         raise ValueError(error_msg)
 
 
-def format_transcript(transcript, format_type="txt"):
-    """字幕をフォーマット"""
-    if format_type == "json":
-        return json.dumps(transcript, ensure_ascii=False, indent=2)
-    elif format_type == "srt":
-        # SRT形式（タイムスタンプ付き）
-        srt_content = []
-        for i, item in enumerate(transcript, 1):
-            start = format_timestamp(item["start"])
-            end = format_timestamp(item["start"] + item["duration"])
-            srt_content.append(f"{i}\n{start} --> {end}\n{item['text']}\n")
-        return "\n".join(srt_content)
+# 作成済みの時間インデックス（プロセス内。キー → (字幕キャッシュの期限, SegmentIndex)）
+# 期限は字幕を入れ直すと変わるので、違っていれば作り直す
+segment_index_cache = cache.TTLCache(
+    "segment_indexes",
+    maxsize=int(os.environ.get("SEGMENT_INDEX_CACHE_SIZE", 32)),
+    ttl=transcript_cache.ttl,
+)
+
+
+def get_segment_index(video_id, lang="ja", budget=None):
+    """字幕の時間インデックス（字幕はキャッシュから。なければ取得してキャッシュする）
+
+    同じ字幕から作ったインデックスは使い回す（リクエストごとに展開・並べ替えをしない）
+    """
+    key = cache.make_key(video_id, lang)
+    version = transcript_cache.expires_at(key)
+    if version is not None:
+        memo = segment_index_cache.get(key)
+        if memo is not None and memo[0] == version:
+            return memo[1]
+
+    transcript = transcript_cache.get_or_load(
+        key,
+        lambda: get_transcript(video_id, lang, budget),
+        # バックグラウンドの取り直しはリクエストの期限に縛られない
+        refresh=lambda: get_transcript(video_id, lang),
+    )
+    index = segment_index.SegmentIndex(transcript)
+    # 取得して入れたばかりなら、その値の期限を版にする
+    version = version if version is not None else transcript_cache.expires_at(key)
+    if version is not None:
+        segment_index_cache.set(key, (version, index))
+    return index
+
+
+def preclean_for_gemini(text):
+    """Gemini送信前にノイズタグ・フィラー・重複を除去"""
+    result = clean_text(text, PRECLEAN_LEVEL)
+    if result.bytes_saved:
+        logger.info(
+            f"Precleaned text ({result.level}): {result.bytes_saved} bytes, "
+            f"~{result.tokens_saved} tokens saved"
+        )
+    return result.text
+
+
+def gemini_cache_key(prompt, generation_config, model):
+    """Gemini結果のキャッシュキー（呼び出すモデル・生成設定・プロンプトで決まる）"""
+    return cache.make_key(model, sorted(generation_config.items()), prompt)
+
+
+def generate_with_gemini(
+    prompt, generation_config, stage, models=None, budget=None, prefetched=None, route=None
+):
+    """Geminiで1回生成してテキストを返す（同じプロンプト・設定の結果はキャッシュから返す）
+
+    モデルは処理段階（stage）ごとに model_router が選ぶ。models はリクエストごとの上書き。
+    429 / 503 などの一時的なエラーは gemini_retry がバックオフして再試行する。
+    budget（リクエストの期限）の残り時間をタイムアウトにし、過ぎたら DeadlineExceeded を送出する。
+    prefetched は gemini_cache.get_many でまとめて引いた結果（ここにないキーはキャッシュを引き直さない）。
+    route は選び済みのモデル（prefetched のキーを作ったときのもの）。モデルの選択は1回の呼び出しで1回だけ
+    """
+    budget = budget or deadline.Deadline()
+    route = route or model_router.router.route(stage, models)
+    key = gemini_cache_key(prompt, generation_config, route.model)
+    if prefetched is not None:
+        cached = prefetched.get(key)
     else:
-        # デフォルト: プレーンテキスト（スペースで結合して自然な文章に）
-        return " ".join([item["text"] for item in transcript])
+        cached = gemini_cache.get(key)
+    if cached is not None:
+        logger.info("Gemini result served from cache")
+        return cached
+
+    budget.check(f"Gemini {stage}")
 
+    def call():
+        model = gemini_client.GenerativeModel(route.model)
+        response = model.generate_content(
+            prompt,
+            generation_config=genai.GenerationConfig(**generation_config),
+            request_options={"timeout": budget.timeout(GEMINI_TIMEOUT)},
+        )
+        return response.text.strip()
 
-def format_timestamp(seconds):
-    """秒数をSRTタイムスタンプ形式に変換"""
-    hours = int(seconds // 3600)
-    minutes = int((seconds % 3600) // 60)
-    seconds = seconds % 60
-    return f"{hours:02d}:{minutes:02d}:{seconds:06.3f}".replace(".", ",")
+    try:
+        text = gemini_retry.call_with_retry(
+            lambda: model_router.router.call(route, prompt, call), deadline=budget.at
+        )
+    except Exception as e:
+        if budget.expired():
+            raise deadline.DeadlineExceeded(f"Gemini {stage} timed out: {e}") from e
+        raise
+    if text:
+        gemini_cache.set(key, text)
+    return text
 
 
-def format_text_with_gemini(text):
+def format_text_with_gemini(text, models=None, budget=None):
     """Gemini AIを使用してテキストを可読性良く整形"""
     if not gemini_client:
         logger.warning("Gemini client not initialized, returning original text")
         return text
 
     try:
-        prompt = f"""以下のYouTube字幕テキストを読みやすく整形してください。
-
-【重要な制約】:
-- 文字や単語を一切変更・追加・削除しないでください
-- 内容の要約や意訳は絶対に行わないでください
-- 元のテキストの文字をそのまま保持してください
-
-【整形作業】:
-1. 各文（。で終わる文）の後には必ず空行を入れてください（改行2回）
-2. つまり、句点の後は必ず空行で区切ってください
-3. 話題が変わる箇所ではさらに空行を追加してください
-4. 「で、」「それで、」「そして、」などの接続詞の前でも空行を入れてください
-5. 長い文は読点（、）の位置で改行してください
-6. 読みやすさを最優先に、空行を多めに使ってください
-
-元のテキスト:
-{text}
-
-整形されたテキスト:"""
-
-        model = gemini_client.GenerativeModel("gemini-2.0-flash-001")
-        response = model.generate_content(
-            prompt,
-            generation_config=genai.GenerationConfig(
-                temperature=0.1,
-                max_output_tokens=2000,
-            ),
+        prompt = build_format_prompt(preclean_for_gemini(text))
+        formatted_text = generate_with_gemini(
+            prompt, FORMAT_GENERATION_CONFIG, "format", models, budget
         )
-
-        formatted_text = response.text.strip()
         logger.info("Text formatted successfully using Gemini")
         return formatted_text
 
+    except deadline.DeadlineExceeded:
+        raise
     except Exception as e:
         logger.error(f"Error formatting text with Gemini: {e}")
         return text
 
 
-def summarize_with_gemini(text):
-    """Gemini AIを使用してテキストを要約"""
-    if not gemini_client:
-        logger.warning("Gemini client not initialized, returning empty summary")
-        return ""
+def format_for_display(text, mode=None, segments=None, models=None, budget=None):
+    """整形方式（local / gemini / auto）を選んでテキストを整形
+
+    Returns:
+        (整形済みテキスト, 実際に使った整形方式)
+    """
+    selected = local_formatter.resolve_mode(mode, text, gemini_client is not None)
+    if selected == "local":
+        if segments:
+            return local_formatter.format_segments(segments), "local"
+        return local_formatter.format_text(text), "local"
+    return format_text_with_gemini(text, models, budget), "gemini"
 
+
+def extractive_summary(text):
+    """Geminiが使えないときの抽出型要約（NumPy、API呼び出しなし）"""
     try:
-        summary_prompt = f"""以下のYouTube動画の字幕テキストを詳細に要約してください。
+        summary = extractive_summarizer.summarize(text)
+        logger.info("Text summarized with local extractive summarizer")
+        return summary
+    except Exception as e:
+        logger.error(f"Error in extractive summarizer: {e}")
+        return ""
 
-【要約の要求】:
-1. 重要な情報は全て残してください
-2. 主要なトピックを5〜10個の要点に整理してください
-3. 固有名詞、数値、専門用語は必ず含めてください
-4. 具体的な例や説明も重要なものは残してください
-5. 500〜800文字程度でまとめてください
 
-【整形ルール】:
-1. 各要点は「・」や「◆」で始めてください
-2. 関連する内容は段落でグループ化してください
-3. 重要なキーワードは【】で囲んでください
-4. 各段落の間には空行を入れてください
-5. 読みやすさを重視して改行を使ってください
+def plan_summary(text, models=None):
+    """要約の実行計画（1回で要約するか分割するか）を作成してログに残す"""
+    selected = model_router.router.models(models)
+    plan = token_planner.plan_summary(
+        text,
+        selected["map"],
+        SUMMARY_GENERATION_CONFIG["max_output_tokens"],
+        reduce_model=selected["reduce"],
+    )
+    logger.info(f"Summary plan: {plan.describe()}")
+    return plan
 
-字幕テキスト:
-{text}
 
-詳細な要約:"""
+def summarize_with_gemini(text, plan=None, models=None, budget=None):
+    """Gemini AIを使用してテキストを要約（使えない場合は抽出型要約）
 
-        model = gemini_client.GenerativeModel("gemini-2.0-flash-001")
-        response = model.generate_content(
-            summary_prompt,
-            generation_config=genai.GenerationConfig(
-                temperature=0.3,
-                max_output_tokens=1200,
-            ),
-        )
+    plan が分割要約なら、チャンクごとの部分要約を並列に作り、fan_in 個ずつ段階的に統合する
+    （部分要約・中間統合は速いモデル、最終統合は強いモデル。models で段階ごとに上書きできる）
+    budget（リクエストの期限）を過ぎたら DeadlineExceeded を送出する
+    """
+    if not gemini_client:
+        logger.warning("Gemini client not initialized, using extractive summary")
+        return extractive_summary(text)
+
+    try:
+        plan = plan or plan_summary(text, models)
+        cleaned = preclean_for_gemini(text)
+
+        if plan.strategy == "single":
+            summary = generate_with_gemini(
+                build_summary_prompt(cleaned),
+                SUMMARY_GENERATION_CONFIG,
+                "summary",
+                models,
+                budget,
+            )
+        else:
+            chunks = token_planner.split_by_tokens(cleaned, plan.chunk_tokens)
+            partial_config = {
+                **SUMMARY_GENERATION_CONFIG,
+                "max_output_tokens": plan.partial_output_tokens,
+            }
+
+            prompts = [
+                build_partial_summary_prompt(chunk, index)
+                for index, chunk in enumerate(chunks, 1)
+            ]
+            # キャッシュ済みの部分要約はまとめて1回で引く（共有キャッシュならチャンクごとに往復しない）
+            # モデルは map 段階で1回だけ選び、キーと呼び出しの両方に使う
+            map_route = model_router.router.route("map", models)
+            prefetched = gemini_cache.get_many(
+                [gemini_cache_key(prompt, partial_config, map_route.model) for prompt in prompts]
+            )
+
+            def summarize_chunk(prompt):
+                return generate_with_gemini(
+                    prompt, partial_config, "map", models, budget, prefetched, map_route
+                )
+
+            with ThreadPoolExecutor(max_workers=plan.parallelism) as executor:
+                partial_summaries = list(executor.map(summarize_chunk, prompts))
+            logger.info(
+                f"Summarized {len(chunks)} chunks, consolidating "
+                f"(fan-in {plan.fan_in}, {plan.reduce_levels} intermediate levels)"
+            )
+            summary = map_reduce.tree_reduce(
+                partial_summaries,
+                merge=lambda group, start, total: generate_with_gemini(
+                    build_merge_prompt(group, start), partial_config, "merge", models, budget
+                ),
+                finalize=lambda group: generate_with_gemini(
+                    build_consolidation_prompt(group),
+                    SUMMARY_GENERATION_CONFIG,
+                    "reduce",
+                    models,
+                    budget,
+                ),
+                fan_in=plan.fan_in,
+                parallelism=plan.parallelism,
+            )
 
-        summary = response.text.strip()
         logger.info("Text summarized successfully using Gemini")
         return summary
 
+    except deadline.DeadlineExceeded:
+        raise
     except Exception as e:
         logger.error(f"Error summarizing text with Gemini: {e}")
-        return ""
+        return extractive_summary(text)
+
+
+# Cloud Run環境でURLから直接取得しようとしたときのエラー
+CLOUD_RUN_URL_ERROR = "Cloud環境ではURLからの直接取得は無効です。字幕テキストかSRTファイルを送信してください。"
+
+
+def process_transcript_text(transcript_text, lang, format_type, formatter_mode, models, budget):
+    """ローカル抽出された字幕テキストを整形・要約して /extract の応答（辞書）を返す"""
+    partial = False
+    # ローカル抽出されたテキストを処理
+    logger.info(
+        f"Processing locally extracted transcript ({len(transcript_text)} chars)"
+    )
+
+    # プレーンテキストの場合は自動で整形し、Gemini AIで要約
+    formatted_transcript = transcript_text
+    summary_text = ""
+    formatter_used = None
+    summary_plan = None
+
+    if format_type == "txt":
+        try:
+            logger.info(f"Auto-formatting transcript (formatter={formatter_mode})")
+            formatted_transcript, formatter_used = format_for_display(
+                transcript_text, formatter_mode, models=models, budget=budget
+            )
+
+            logger.info("Auto-summarizing transcript")
+            if gemini_client:
+                summary_plan = plan_summary(formatted_transcript, models)
+            summary_text = summarize_with_gemini(
+                formatted_transcript, summary_plan, models, budget
+            )
+        except deadline.DeadlineExceeded as e:
+            logger.warning(f"Returning partial result: {e}")
+            partial = True
+        except Exception as e:
+            logger.warning(
+                f"Auto-formatting/summarizing failed, using original text: {e}"
+            )
+
+    response_data = {
+        "success": True,
+        "video_id": "locally_extracted",
+        "title": "ローカル抽出字幕",
+        "formatted_transcript": formatted_transcript,
+        "summary": summary_text,
+        "formatter": formatter_used,
+        "plan": summary_plan.to_dict() if summary_plan else None,
+        "partial": partial,
+        "deadline": budget.to_dict(),
+        "stats": {
+            "total_characters": len(transcript_text),
+            "language": lang,
+        },
+    }
+
+    logger.info("Successfully processed locally extracted transcript")
+    return response_data
+
+
+def process_video_url(url, lang, format_type, formatter_mode, models, budget):
+    """URLの動画の字幕を取得・整形・要約して /extract の応答（辞書）を返す"""
+    partial = False
+    logger.info(f"Processing URL: {url}, Lang: {lang}, Format: {format_type}")
+
+    # 動画ID取得
+    video_id = get_video_id(url)
+    logger.info(f"Processing video: {video_id}")
+
+    # タイトル取得
+    title = get_video_title(video_id)
+
+    # 字幕取得
+    transcript = get_segment_index(video_id, lang, budget).segments
+
+    # 検索インデックスに登録（バックグラウンド。索引済みの動画は書き直さない）
+    index_transcript_async(video_id, transcript, title, lang)
+
+    # フォーマット
+    formatted_transcript = format_transcript(transcript, format_type)
+
+    # プレーンテキストの場合は自動で整形し、Gemini AIで要約
+    summary_text = ""
+    formatter_used = None
+    summary_plan = None
+    if format_type == "txt":
+        try:
+            logger.info(f"Auto-formatting transcript (formatter={formatter_mode})")
+            formatted_transcript, formatter_used = format_for_display(
+                formatted_transcript,
+                formatter_mode,
+                segments=transcript,
+                models=models,
+                budget=budget,
+            )
+
+            logger.info("Auto-summarizing transcript")
+            if gemini_client:
+                summary_plan = plan_summary(formatted_transcript, models)
+            summary_text = summarize_with_gemini(
+                formatted_transcript, summary_plan, models, budget
+            )
+        except deadline.DeadlineExceeded as e:
+            logger.warning(f"Returning partial result: {e}")
+            partial = True
+        except Exception as e:
+            logger.warning(
+                f"Auto-formatting/summarizing failed, using original text: {e}"
+            )
+
+    # 統計情報
+    stats = {
+        "total_segments": len(transcript),
+        "total_duration": sum(item["duration"] for item in transcript),
+        "language": lang,
+    }
+
+    response_data = {
+        "success": True,
+        "video_id": video_id,
+        "title": title,
+        "formatted_transcript": formatted_transcript,
+        "summary": summary_text,
+        "formatter": formatter_used,
+        "plan": summary_plan.to_dict() if summary_plan else None,
+        "partial": partial,
+        "deadline": budget.to_dict(),
+        "stats": stats,
+    }
+
+    logger.info(f"Successfully processed video {video_id}")
+    return response_data
+
+
+def run_extract_job(payload):
+    """キューの抽出ジョブを実行する（入力の誤りは ValueError で、再試行せずデッドレターになる）"""
+    transcript_text = payload.get("transcript_text")
+    url = payload.get("url")
+    lang = payload.get("lang", "ja")
+    format_type = payload.get("format", "txt")
+    formatter_mode = local_formatter.check_mode(payload.get("formatter"))
+    models = model_router.router.check_overrides(payload.get("models"))
+    budget = deadline.Deadline(JOB_DEADLINE)
+
+    if transcript_text:
+        return process_transcript_text(
+            transcript_text, lang, format_type, formatter_mode, models, budget
+        )
+    if url:
+        if os.environ.get("K_SERVICE") is not None:
+            raise ValueError(CLOUD_RUN_URL_ERROR)
+        return process_video_url(url, lang, format_type, formatter_mode, models, budget)
+    raise ValueError("URLまたはtranscript_textが必要です")
+
+
+# ジョブの種類ごとのハンドラー（job_worker.py も使う）
+JOB_HANDLERS = {"extract": run_extract_job}
 
 
 @app.route("/")
@@ -516,6 +971,39 @@ def health():
     )
 
 
+@app.route("/metrics")
+def metrics():
+    """モデル階層ごとのレイテンシ・利用状況とキャッシュの統計"""
+    return jsonify(
+        {
+            "models": model_router.router.stats(),
+            "retries": gemini_retry.stats(),
+            "caches": cache.stats(),
+            "cache_snapshot": cache.snapshot_status(),
+            "jobs": {
+                "queue": job_queue_backend.stats() if job_queue_backend is not None else None,
+                "workers": [worker.stats() for worker in job_workers],
+            },
+        }
+    )
+
+
+@app.route("/cache/snapshot")
+@require_auth
+def cache_snapshot():
+    """キャッシュのスナップショットを返す（他のインスタンスの CACHE_SNAPSHOT_PATH に置ける形式）"""
+    buffer = io.BytesIO()
+    count = cache.dump_snapshot(buffer, CACHE_SNAPSHOT_NAMESPACES)
+    return Response(
+        buffer.getvalue(),
+        mimetype="application/gzip",
+        headers={
+            "Content-Disposition": "attachment; filename=cache_snapshot.jsonl.gz",
+            "X-Cache-Snapshot-Entries": str(count),
+        },
+    )
+
+
 @app.route("/extract", methods=["POST"])
 @require_auth
 def extract():
@@ -530,111 +1018,52 @@ def extract():
         url = data.get("url")
         lang = data.get("lang", "ja")
         format_type = data.get("format", "txt")
+        formatter_mode = local_formatter.check_mode(data.get("formatter"))
+        # 処理段階ごとのモデルの上書き（例: {"reduce": "fast"}）
+        models = model_router.router.check_overrides(data.get("models"))
+        # リクエストの期限。過ぎたら整形・要約を打ち切り、そこまでの結果を partial として返す
+        budget = deadline.from_header(request.headers.get(deadline.HEADER))
 
         # Cloud Run環境でURL直接取得を禁止
         is_cloud_run = os.environ.get("K_SERVICE") is not None
 
         if transcript_text:
-            # ローカル抽出されたテキストを処理
-            logger.info(
-                f"Processing locally extracted transcript ({len(transcript_text)} chars)"
+            return jsonify(
+                process_transcript_text(
+                    transcript_text, lang, format_type, formatter_mode, models, budget
+                )
             )
 
-            # プレーンテキストの場合は自動でGemini AIで整形と要約
-            formatted_transcript = transcript_text
-            summary_text = ""
-
-            if format_type == "txt" and gemini_client:
-                try:
-                    logger.info("Auto-formatting transcript with Gemini AI")
-                    formatted_transcript = format_text_with_gemini(transcript_text)
-
-                    logger.info("Auto-summarizing transcript with Gemini AI")
-                    summary_text = summarize_with_gemini(formatted_transcript)
-                except Exception as e:
-                    logger.warning(
-                        f"Auto-formatting/summarizing failed, using original text: {e}"
-                    )
-
-            response_data = {
-                "success": True,
-                "video_id": "locally_extracted",
-                "title": "ローカル抽出字幕",
-                "formatted_transcript": formatted_transcript,
-                "summary": summary_text,
-                "stats": {
-                    "total_characters": len(transcript_text),
-                    "language": lang,
-                },
-            }
-
-            logger.info("Successfully processed locally extracted transcript")
-            return jsonify(response_data)
-
         elif url:
             # URL直接取得（Cloud Run環境では禁止）
             if is_cloud_run:
                 return (
                     jsonify(
                         {
-                            "error": "Cloud環境ではURLからの直接取得は無効です。字幕テキストかSRTファイルを送信してください。",
+                            "error": CLOUD_RUN_URL_ERROR,
                             "suggestion": "ローカルPCで字幕を抽出し、transcript_textパラメータで送信してください。",
                         }
                     ),
                     400,
                 )
-
-            logger.info(f"Processing URL: {url}, Lang: {lang}, Format: {format_type}")
-
-            # 動画ID取得
-            video_id = get_video_id(url)
-            logger.info(f"Processing video: {video_id}")
-
-            # タイトル取得
-            title = get_video_title(video_id)
-
-            # 字幕取得
-            transcript = get_transcript(video_id, lang)
-
-            # フォーマット
-            formatted_transcript = format_transcript(transcript, format_type)
-
-            # プレーンテキストの場合は自動でGemini AIで整形と要約
-            summary_text = ""
-            if format_type == "txt" and gemini_client:
-                try:
-                    logger.info("Auto-formatting transcript with Gemini AI")
-                    formatted_transcript = format_text_with_gemini(formatted_transcript)
-
-                    logger.info("Auto-summarizing transcript with Gemini AI")
-                    summary_text = summarize_with_gemini(formatted_transcript)
-                except Exception as e:
-                    logger.warning(
-                        f"Auto-formatting/summarizing failed, using original text: {e}"
-                    )
-
-            # 統計情報
-            stats = {
-                "total_segments": len(transcript),
-                "total_duration": sum(item["duration"] for item in transcript),
-                "language": lang,
-            }
-
-            response_data = {
-                "success": True,
-                "video_id": video_id,
-                "title": title,
-                "formatted_transcript": formatted_transcript,
-                "summary": summary_text,
-                "stats": stats,
-            }
-
-            logger.info(f"Successfully processed video {video_id}")
-            return jsonify(response_data)
+            return jsonify(process_video_url(url, lang, format_type, formatter_mode, models, budget))
 
         else:
             return jsonify({"error": "URLまたはtranscript_textが必要です"}), 400
 
+    except deadline.DeadlineExceeded as e:
+        # 字幕の取得中に期限を過ぎた（返せる結果がない）
+        logger.warning(f"Request deadline exceeded: {e}")
+        return (
+            jsonify(
+                {
+                    "success": False,
+                    "partial": True,
+                    "error": "処理が期限内に完了しませんでした。時間をおいて再試行してください。",
+                }
+            ),
+            504,
+        )
     except ValueError as e:
         logger.warning(f"User error: {e}")
         return jsonify({"success": False, "error": str(e)}), 400
@@ -652,29 +1081,173 @@ def extract():
         )
 
 
-@app.route("/supported_languages/<video_id>")
-def supported_languages(video_id):
-    """利用可能な言語のリストを取得"""
+@app.route("/search")
+@require_auth
+def search():
+    """保存済み字幕の全文検索（q・page・per_page。ヒットは動画ID・開始時刻・スニペット）"""
+    if search_index is None:
+        return jsonify({"success": False, "error": "検索インデックスが利用できません"}), 503
     try:
-        # 新しいAPIと古いAPIの両方を試す
-        try:
-            api = YouTubeTranscriptApi()
-            transcript_list = api.list(video_id)
-        except AttributeError:
-            # 古いAPIを使用
-            transcript_list = YouTubeTranscriptApi.list_transcripts(video_id)
-
-        languages = []
-        for transcript in transcript_list:
-            languages.append(
-                {
-                    "code": transcript.language_code,
-                    "name": transcript.language,
-                    "is_generated": transcript.is_generated,
-                    "is_translatable": transcript.is_translatable,
-                }
+        result = search_index.search(
+            request.args.get("q"),
+            page=request.args.get("page", 1),
+            per_page=request.args.get("per_page", transcript_search.DEFAULT_PER_PAGE),
+        )
+        return jsonify(dict(result, success=True))
+    except ValueError as e:
+        return jsonify({"success": False, "error": str(e)}), 400
+    except Exception as e:
+        logger.error(f"Search failed: {e}")
+        return jsonify({"success": False, "error": "検索に失敗しました"}), 500
+
+
+@app.route("/jobs", methods=["POST"])
+@require_auth
+def submit_job():
+    """抽出ジョブを登録して 202 を返す（/extract と同じ入力。結果は /jobs/<job_id> で取得）"""
+    if job_queue_backend is None:
+        return jsonify({"success": False, "error": "ジョブキューが利用できません"}), 503
+    data = request.json or {}
+    try:
+        if not (data.get("transcript_text") or data.get("url")):
+            raise ValueError("URLまたはtranscript_textが必要です")
+        if not data.get("transcript_text") and os.environ.get("K_SERVICE") is not None:
+            raise ValueError(CLOUD_RUN_URL_ERROR)
+        local_formatter.check_mode(data.get("formatter"))
+        model_router.router.check_overrides(data.get("models"))
+        payload = {
+            key: data[key]
+            for key in ("transcript_text", "url", "lang", "format", "formatter", "models")
+            if data.get(key) is not None
+        }
+        job_id = job_queue_backend.enqueue("extract", payload)
+    except ValueError as e:
+        return jsonify({"success": False, "error": str(e)}), 400
+    except Exception as e:
+        logger.error(f"Failed to enqueue job: {e}")
+        return jsonify({"success": False, "error": "ジョブの登録に失敗しました"}), 500
+
+    logger.info(f"Enqueued extract job {job_id}")
+    return (
+        jsonify(
+            {
+                "success": True,
+                "job_id": job_id,
+                "status": job_queue.QUEUED,
+                "status_url": f"/jobs/{job_id}",
+            }
+        ),
+        202,
+    )
+
+
+@app.route("/jobs/<job_id>")
+@require_auth
+def job_status(job_id):
+    """抽出ジョブの状態（queued / running / done / dead）と、完了していれば結果を返す"""
+    if job_queue_backend is None:
+        return jsonify({"success": False, "error": "ジョブキューが利用できません"}), 503
+    job = job_queue_backend.get(job_id)
+    if job is None:
+        return jsonify({"success": False, "error": "ジョブが見つかりません"}), 404
+    result = job.to_dict()
+    # 入力（字幕テキスト全体など）は返さない
+    del result["payload"]
+    return jsonify(dict(result, success=True))
+
+
+@app.route("/transcript/<video_id>/range")
+@require_auth
+def transcript_range(video_id):
+    """字幕の時間範囲（from 〜 to）に重なるセグメントだけを指定形式で返す"""
+    try:
+        start = segment_index.parse_time(request.args.get("from", 0))
+        end = request.args.get("to")
+        end = segment_index.parse_time(end) if end not in (None, "") else float("inf")
+        if end <= start:
+            raise ValueError("to は from より後の時刻を指定してください")
+        lang = request.args.get("lang", "ja")
+        format_type = request.args.get("format", "txt")
+        if format_type not in segment_index.FORMATS:
+            raise ValueError(
+                f"形式は {', '.join(segment_index.FORMATS)} のいずれかで指定してください"
             )
 
+        cached = cache.make_key(video_id, lang) in transcript_cache
+        if not cached and os.environ.get("K_SERVICE") is not None:
+            # Cloud Run環境ではURL直接取得と同じく字幕を取りに行かない（キャッシュ済みのみ）
+            return (
+                jsonify(
+                    {
+                        "success": False,
+                        "error": "Cloud環境では字幕を取得できません。先にローカルで抽出してください。",
+                    }
+                ),
+                404,
+            )
+
+        budget = deadline.from_header(request.headers.get(deadline.HEADER))
+        index = get_segment_index(video_id, lang, budget)
+        segments = index.range(start, end)
+        content = segments if format_type == "json" else format_transcript(segments, format_type)
+
+        return jsonify(
+            {
+                "success": True,
+                "video_id": video_id,
+                "from": start,
+                "to": end if end != float("inf") else None,
+                "format": format_type,
+                "content": content,
+                "stats": {
+                    "segments": len(segments),
+                    "total_segments": len(index),
+                    "duration": index.duration,
+                    "language": lang,
+                    "cached": cached,
+                },
+            }
+        )
+    except ValueError as e:
+        return jsonify({"success": False, "error": str(e)}), 400
+    except deadline.DeadlineExceeded as e:
+        logger.warning(f"Request deadline exceeded: {e}")
+        return jsonify({"success": False, "error": "字幕の取得が期限内に完了しませんでした"}), 504
+    except Exception as e:
+        logger.error(f"Error getting transcript range for {video_id}: {e}")
+        return jsonify({"success": False, "error": str(e)}), 400
+
+
+def fetch_supported_languages(video_id):
+    """YouTube から動画の字幕の言語一覧を取得"""
+    # 新しいAPIと古いAPIの両方を試す
+    try:
+        api = YouTubeTranscriptApi()
+        transcript_list = api.list(video_id)
+    except AttributeError:
+        # 古いAPIを使用
+        transcript_list = YouTubeTranscriptApi.list_transcripts(video_id)
+
+    languages = []
+    for transcript in transcript_list:
+        languages.append(
+            {
+                "code": transcript.language_code,
+                "name": transcript.language,
+                "is_generated": transcript.is_generated,
+                "is_translatable": transcript.is_translatable,
+            }
+        )
+    return languages
+
+
+@app.route("/supported_languages/<video_id>")
+def supported_languages(video_id):
+    """利用可能な言語のリストを取得（キャッシュから。期限切れなら古い一覧を返して取り直す）"""
+    try:
+        languages = languages_cache.get_or_load(
+            video_id, lambda: fetch_supported_languages(video_id)
+        )
         return jsonify({"success": True, "languages": languages})
     except Exception as e:
         logger.error(f"Error getting supported languages for {video_id}: {e}")
@@ -691,16 +1264,24 @@ def format_text():
         if not text:
             return jsonify({"error": "テキストが指定されていません"}), 400
 
-        if not gemini_client:
+        formatter_mode = local_formatter.check_mode(data.get("formatter"))
+        if formatter_mode == "gemini" and not gemini_client:
             return jsonify({"error": "Gemini APIが利用できません"}), 503
-
-        # Gemini AIでテキストを整形
-        formatted_text = format_text_with_gemini(text)
+        models = model_router.router.check_overrides(data.get("models"))
+
+        # ローカル整形またはGemini AIでテキストを整形
+        formatted_text, formatter_used = format_for_display(
+            text,
+            formatter_mode,
+            segments=local_formatter.check_segments(data.get("segments")),
+            models=models,
+        )
 
         response_data = {
             "success": True,
             "original_text": text,
             "formatted_text": formatted_text,
+            "formatter": formatter_used,
         }
 
         logger.info("Text formatting completed successfully")
@@ -730,7 +1311,19 @@ def server_error(e):
     return jsonify({"error": "サーバーエラーが発生しました"}), 500
 
 
+def start_job_workers():
+    """このプロセスで JOB_WORKERS 個のワーカーを起動する（キューが無効・起動済みなら何もしない）"""
+    global job_workers
+    if job_queue_backend is None or JOB_WORKERS <= 0 or job_workers:
+        return job_workers
+    job_workers = job_queue.start_workers(job_queue_backend, JOB_HANDLERS, JOB_WORKERS)
+    logger.info(f"Started {JOB_WORKERS} job workers ({job_queue_backend.backend} queue)")
+    return job_workers
+
+
 if __name__ == "__main__":
+    start_job_workers()
+
     # Cloud Run環境かローカル環境かを判定
     is_cloud_run = os.environ.get("K_SERVICE") is not None
 
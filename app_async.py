@@ -0,0 +1,907 @@
+"""
+YouTube Transcript Extractor - ASGI版
+app.py（Flask/WSGI）と同じエンドポイント・レスポンス形式を非同期で提供する
+
+字幕取得・タイトル取得・Gemini呼び出しをすべて非同期HTTPクライアント（httpx）で行い、
+レート制限待機やリトライ待機も asyncio.sleep で行うため、待機中にスレッドを占有しない。
+
+起動:
+    uvicorn app_async:app --host 0.0.0.0 --port 8080
+"""
+
+import asyncio
+import html
+import logging
+import os
+import random
+import re
+from contextlib import asynccontextmanager
+from datetime import datetime
+
+import httpx
+from dotenv import load_dotenv
+from fastapi import FastAPI, Request
+from fastapi.middleware.cors import CORSMiddleware
+from starlette.exceptions import HTTPException as StarletteHTTPException
+
+import cache
+import deadline
+import extractive_summarizer
+import gemini_retry
+import local_formatter
+import map_reduce
+import model_router
+import token_planner
+from response_layer import CompressionMiddleware, FastJSONResponse
+from transcript_common import (FORMAT_GENERATION_CONFIG,
+                               SUMMARY_GENERATION_CONFIG,
+                               build_consolidation_prompt, build_format_prompt,
+                               build_merge_prompt, build_partial_summary_prompt,
+                               build_summary_prompt, format_transcript,
+                               get_video_id)
+from transcript_cleaner import clean_text
+
+try:
+    from defusedxml import ElementTree
+except ImportError:
+    from xml.etree import ElementTree
+
+# ロギング設定
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+)
+logger = logging.getLogger(__name__)
+
+# 環境変数読み込み
+load_dotenv()
+
+PORT = int(os.environ.get("PORT", 8080))
+
+YOUTUBE_API_KEY = os.environ.get("YOUTUBE_API_KEY")
+GEMINI_API_KEY = os.environ.get("GEMINI_API_KEY")
+TRANSCRIPT_API_TOKEN = os.environ.get("TRANSCRIPT_API_TOKEN")
+
+# 接続先（ベンチマーク時は代替サーバーに向ける）
+YOUTUBE_BASE_URL = os.environ.get("YOUTUBE_BASE_URL", "https://www.youtube.com").rstrip("/")
+YOUTUBE_DATA_API_URL = os.environ.get(
+    "YOUTUBE_DATA_API_URL", "https://www.googleapis.com/youtube/v3"
+).rstrip("/")
+GEMINI_API_BASE = os.environ.get(
+    "GEMINI_API_BASE", "https://generativelanguage.googleapis.com"
+).rstrip("/")
+
+# タイムアウトと再試行
+HTTP_TIMEOUT = float(os.environ.get("HTTP_TIMEOUT", 30))
+GEMINI_TIMEOUT = float(os.environ.get("GEMINI_TIMEOUT", 120))
+MAX_HTTP_RETRIES = 3
+
+# Retry-After で待つ秒数の上限（期限がなくても長いRetry-Afterで止まらないように）
+MAX_RETRY_AFTER = float(os.environ.get("HTTP_MAX_RETRY_AFTER", 10))
+
+# Gemini送信前のプリクリーニングレベル（off / light / standard / aggressive）
+PRECLEAN_LEVEL = os.environ.get("PRECLEAN_LEVEL", "standard")
+
+# Gemini結果のキャッシュ（同じプロンプトの結果を再利用。分割要約のチャンク単位でも効く）
+gemini_cache = cache.get_cache(
+    "gemini",
+    maxsize=int(os.environ.get("GEMINI_CACHE_SIZE", 2048)),
+    ttl=int(os.environ.get("GEMINI_CACHE_TTL", 86400)),
+)
+
+INNERTUBE_CONTEXT = {"client": {"clientName": "ANDROID", "clientVersion": "20.10.38"}}
+_INNERTUBE_KEY_PATTERN = re.compile(r'"INNERTUBE_API_KEY":\s*"([a-zA-Z0-9_-]+)"')
+_HTML_TAG_PATTERN = re.compile(r"<[^>]*>", re.IGNORECASE)
+
+USER_AGENTS = [
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
+    "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
+    "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:109.0) Gecko/20100101 Firefox/121.0",
+    "Mozilla/5.0 (Macintosh; Intel Mac OS X 10.15; rv:109.0) Gecko/20100101 Firefox/121.0",
+]
+
+# app.py の get_transcript と同じ3戦略（名前, 説明, 待機秒の範囲）
+STRATEGIES = [
+    ("proxy_session", "プロキシ付きセッション", (3, 8)),
+    ("stealth_session", "ステルスセッション", (4, 9)),
+    ("minimal_session", "ミニマルセッション", (5, 12)),
+]
+
+
+class TranscriptUnavailable(Exception):
+    """字幕が存在しない・無効化されている（再試行しても結果が変わらない）"""
+
+
+def strategy_headers(strategy):
+    """戦略ごとのリクエストヘッダー"""
+    if strategy == "proxy_session":
+        return {
+            "User-Agent": random.choice(USER_AGENTS),
+            "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8",
+            "Accept-Language": "ja,en-US;q=0.7,en;q=0.3",
+            "DNT": "1",
+            "Upgrade-Insecure-Requests": "1",
+        }
+    if strategy == "stealth_session":
+        return {
+            "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36",
+            "Accept": "*/*",
+            "Accept-Language": "en-US,en;q=0.5",
+        }
+    return {"User-Agent": "YouTube Transcript API 1.2.2"}
+
+
+async def request_with_backoff(client, method, url, budget=None, **kwargs):
+    """429/5xxと接続エラーを指数バックオフ（ジッター付き）で再試行
+
+    budget（リクエストの期限）の残り時間を1回のタイムアウトにし、待機も残り時間に合わせて縮める。
+    待てる時間が残っていなければ再試行せずに最後のエラーを送出する
+    """
+    budget = budget or deadline.Deadline()
+    for attempt in range(MAX_HTTP_RETRIES + 1):
+        budget.check(f"{method} {url}")
+        try:
+            response = await client.request(
+                method, url, timeout=budget.timeout(HTTP_TIMEOUT), **kwargs
+            )
+        except httpx.TransportError as e:
+            if attempt == MAX_HTTP_RETRIES:
+                raise
+            delay = budget.sleep_for(random.uniform(0, 0.5 * 2**attempt))
+            if delay <= 0 and budget.at is not None:
+                raise
+            logger.warning(f"{method} {url} failed ({e}), retrying in {delay:.2f}s")
+            await asyncio.sleep(delay)
+            continue
+
+        if response.status_code == 429 or response.status_code >= 500:
+            if attempt == MAX_HTTP_RETRIES:
+                response.raise_for_status()
+            retry_after = gemini_retry.parse_retry_after(response.headers.get("Retry-After"))
+            delay = (
+                min(retry_after, MAX_RETRY_AFTER)
+                if retry_after is not None
+                else random.uniform(0, 0.5 * 2**attempt)
+            )
+            delay = budget.sleep_for(delay)
+            if delay <= 0 and budget.at is not None:
+                response.raise_for_status()
+            logger.warning(
+                f"{method} {url} returned {response.status_code}, retrying in {delay:.2f}s"
+            )
+            await asyncio.sleep(delay)
+            continue
+
+        response.raise_for_status()
+        return response
+
+
+# ==== YouTube字幕（youtube-transcript-api と同じ取得経路） ====
+
+
+def _rebase_youtube_url(url):
+    if YOUTUBE_BASE_URL != "https://www.youtube.com":
+        return re.sub(r"^https://(www\.|m\.)?youtube\.com", YOUTUBE_BASE_URL, url)
+    return url
+
+
+async def fetch_caption_tracks(client, video_id, headers, budget=None):
+    """watchページ → innertube player から字幕トラック一覧を取得"""
+    response = await request_with_backoff(
+        client, "GET", f"{YOUTUBE_BASE_URL}/watch", budget,
+        params={"v": video_id}, headers=headers,
+    )
+    page = html.unescape(response.text)
+
+    if 'action="https://consent.youtube.com/s"' in page:
+        consent = re.search('name="v" value="(.*?)"', page)
+        if consent:
+            client.cookies.set("CONSENT", "YES+" + consent.group(1), domain=".youtube.com")
+            response = await request_with_backoff(
+                client, "GET", f"{YOUTUBE_BASE_URL}/watch", budget,
+                params={"v": video_id}, headers=headers,
+            )
+            page = html.unescape(response.text)
+
+    match = _INNERTUBE_KEY_PATTERN.search(page)
+    if not match:
+        if 'class="g-recaptcha"' in page:
+            raise RuntimeError("YouTube is blocking requests from this IP")
+        raise RuntimeError("Could not parse the YouTube watch page")
+
+    response = await request_with_backoff(
+        client,
+        "POST",
+        f"{YOUTUBE_BASE_URL}/youtubei/v1/player",
+        budget,
+        params={"key": match.group(1)},
+        json={"context": INNERTUBE_CONTEXT, "videoId": video_id},
+        headers=headers,
+    )
+    data = response.json()
+
+    status = data.get("playabilityStatus", {}).get("status")
+    if status not in (None, "OK"):
+        reason = data.get("playabilityStatus", {}).get("reason", status)
+        raise TranscriptUnavailable(f"動画を再生できません: {reason}")
+
+    captions = data.get("captions", {}).get("playerCaptionsTracklistRenderer")
+    if captions is None or "captionTracks" not in captions:
+        raise TranscriptUnavailable("この動画の字幕は無効化されています。")
+
+    tracks = []
+    for caption in captions["captionTracks"]:
+        name = caption.get("name", {})
+        tracks.append(
+            {
+                "code": caption["languageCode"],
+                "name": name.get("runs", [{}])[0].get("text") or name.get("simpleText", ""),
+                "is_generated": caption.get("kind", "") == "asr",
+                "is_translatable": caption.get("isTranslatable", False),
+                "url": _rebase_youtube_url(caption["baseUrl"].replace("&fmt=srv3", "")),
+            }
+        )
+    return tracks
+
+
+def find_track(tracks, languages):
+    """言語の優先順に、手動作成 → 自動生成の順でトラックを選ぶ"""
+    for code in languages:
+        for is_generated in (False, True):
+            for track in tracks:
+                if track["code"] == code and track["is_generated"] == is_generated:
+                    return track
+    return None
+
+
+async def fetch_track(client, track, headers, budget=None):
+    """timedtext XMLを取得してセグメントのリストに変換"""
+    if "&exp=xpe" in track["url"]:
+        raise RuntimeError("This transcript requires a PO token")
+    response = await request_with_backoff(client, "GET", track["url"], budget, headers=headers)
+    segments = []
+    for element in ElementTree.fromstring(response.text):
+        if element.text is None:
+            continue
+        segments.append(
+            {
+                "text": _HTML_TAG_PATTERN.sub("", html.unescape(element.text)),
+                "start": float(element.attrib["start"]),
+                "duration": float(element.attrib.get("dur", "0.0")),
+            }
+        )
+    return segments
+
+
+async def get_transcript(client, video_id, lang="ja", budget=None):
+    """字幕を取得（戦略を切り替えながら非同期で再試行）
+
+    budget（リクエストの期限）の残り時間に合わせて待機を縮め、
+    期限を過ぎたら残りの戦略を試さずに DeadlineExceeded を送出する
+    """
+    budget = budget or deadline.Deadline()
+    logger.info(f"Attempting to get transcript for video {video_id} in language {lang}")
+    last_error = None
+
+    for strategy, description, (low, high) in STRATEGIES:
+        budget.check(description)
+        headers = strategy_headers(strategy)
+        delay = budget.sleep_for(random.uniform(low, high))
+        logger.info(f"Trying {description} for video {video_id} after {delay:.1f}s")
+        await asyncio.sleep(delay)
+
+        try:
+            tracks = await fetch_caption_tracks(client, video_id, headers, budget)
+            # app.py と同じく 指定言語 → 英語 → 自動 の順で探す
+            track = find_track(tracks, [lang]) or find_track(tracks, ["en"]) or (
+                tracks[0] if tracks else None
+            )
+            if track is None:
+                raise TranscriptUnavailable("この動画には字幕が存在しないか、利用できません。")
+            transcript = await fetch_track(client, track, headers, budget)
+            logger.info(
+                f"Success with {description}! Found {len(transcript)} segments ({track['code']})"
+            )
+            return transcript
+        except TranscriptUnavailable as e:
+            logger.warning(f"No transcript available for video {video_id}: {e}")
+            raise ValueError(str(e))
+        except deadline.DeadlineExceeded:
+            raise
+        except Exception as e:
+            if budget.expired():
+                # 期限切れで打ち切ったリクエストは字幕の取得失敗（400）ではなく期限切れにする
+                raise deadline.DeadlineExceeded(f"{description} timed out: {e}") from e
+            logger.warning(f"{description} failed: {e}")
+            last_error = e
+
+    raise ValueError(f"字幕の取得に失敗しました: {last_error}")
+
+
+async def list_languages(client, video_id):
+    """利用可能な字幕言語を取得"""
+    tracks = await fetch_caption_tracks(client, video_id, strategy_headers("minimal_session"))
+    return [
+        {
+            "code": track["code"],
+            "name": track["name"],
+            "is_generated": track["is_generated"],
+            "is_translatable": track["is_translatable"],
+        }
+        for track in tracks
+    ]
+
+
+# ==== YouTube Data API / Gemini ====
+
+
+async def get_video_title(client, video_id, budget=None):
+    """動画タイトルを取得"""
+    if not YOUTUBE_API_KEY:
+        return "YouTube API未設定"
+
+    try:
+        response = await request_with_backoff(
+            client,
+            "GET",
+            f"{YOUTUBE_DATA_API_URL}/videos",
+            budget,
+            params={"part": "snippet", "id": video_id, "key": YOUTUBE_API_KEY},
+        )
+        items = response.json().get("items", [])
+        if items:
+            title = items[0]["snippet"]["title"]
+            logger.info(f"Retrieved title for video {video_id}: {title}")
+            return title
+        logger.warning(f"No title found for video {video_id}")
+        return "タイトルを取得できませんでした"
+    except Exception as e:
+        logger.error(f"Error getting video title for {video_id}: {e}")
+        return "タイトル取得エラー"
+
+
+async def generate_content(client, prompt, generation_config, stage, models=None, budget=None):
+    """Gemini generateContent（REST）を呼び出してテキストを返す
+
+    モデルは処理段階（stage）ごとに model_router が選ぶ。models はリクエストごとの上書き。
+    同じモデル・プロンプト・設定の結果はキャッシュから返す。
+    429 / 503 などの一時的なエラーは gemini_retry がバックオフして再試行する。
+    budget（リクエストの期限）の残り時間をタイムアウトにし、過ぎたら DeadlineExceeded を送出する
+    """
+    budget = budget or deadline.Deadline()
+    route = model_router.router.route(stage, models)
+    key = cache.make_key(route.model, sorted(generation_config.items()), prompt)
+    # 共有キャッシュ（SQLite / Redis）の読み書きはI/Oで待つので、イベントループの外で行う
+    cached = await asyncio.to_thread(gemini_cache.get, key)
+    if cached is not None:
+        logger.info("Gemini result served from cache")
+        return cached
+
+    budget.check(f"Gemini {stage}")
+
+    async def call():
+        response = await client.post(
+            f"{GEMINI_API_BASE}/v1beta/models/{route.model}:generateContent",
+            params={"key": GEMINI_API_KEY},
+            json={
+                "contents": [{"role": "user", "parts": [{"text": prompt}]}],
+                "generationConfig": {
+                    "temperature": generation_config["temperature"],
+                    "maxOutputTokens": generation_config["max_output_tokens"],
+                },
+            },
+            timeout=budget.timeout(GEMINI_TIMEOUT),
+        )
+        response.raise_for_status()
+        candidates = response.json().get("candidates", [])
+        parts = candidates[0].get("content", {}).get("parts", []) if candidates else []
+        return "".join(part.get("text", "") for part in parts).strip()
+
+    try:
+        text = await gemini_retry.call_with_retry_async(
+            lambda: model_router.router.call_async(route, prompt, call), deadline=budget.at
+        )
+    except Exception as e:
+        if budget.expired():
+            raise deadline.DeadlineExceeded(f"Gemini {stage} timed out: {e}") from e
+        raise
+    if text:
+        await asyncio.to_thread(gemini_cache.set, key, text)
+    return text
+
+
+def preclean_for_gemini(text):
+    """Gemini送信前にノイズタグ・フィラー・重複を除去"""
+    result = clean_text(text, PRECLEAN_LEVEL)
+    if result.bytes_saved:
+        logger.info(
+            f"Precleaned text ({result.level}): {result.bytes_saved} bytes, "
+            f"~{result.tokens_saved} tokens saved"
+        )
+    return result.text
+
+
+async def format_text_with_gemini(client, text, models=None, budget=None):
+    """Gemini AIを使用してテキストを可読性良く整形"""
+    if not GEMINI_API_KEY:
+        logger.warning("Gemini API key not configured, returning original text")
+        return text
+
+    try:
+        cleaned = await asyncio.to_thread(preclean_for_gemini, text)
+        formatted_text = await generate_content(
+            client,
+            build_format_prompt(cleaned),
+            FORMAT_GENERATION_CONFIG,
+            "format",
+            models,
+            budget,
+        )
+        logger.info("Text formatted successfully using Gemini")
+        return formatted_text
+    except deadline.DeadlineExceeded:
+        raise
+    except Exception as e:
+        logger.error(f"Error formatting text with Gemini: {e}")
+        return text
+
+
+async def format_for_display(
+    client, text, mode=None, segments=None, models=None, budget=None
+):
+    """整形方式（local / gemini / auto）を選んでテキストを整形し、(テキスト, 方式)を返す"""
+    selected = local_formatter.resolve_mode(mode, text, bool(GEMINI_API_KEY))
+    if selected == "local":
+        # CPUを使う処理なのでイベントループを塞がないようスレッドで実行する
+        if segments:
+            return await asyncio.to_thread(local_formatter.format_segments, segments), "local"
+        return await asyncio.to_thread(local_formatter.format_text, text), "local"
+    return await format_text_with_gemini(client, text, models, budget), "gemini"
+
+
+def extractive_summary(text):
+    """Geminiが使えないときの抽出型要約（NumPy、API呼び出しなし）"""
+    try:
+        summary = extractive_summarizer.summarize(text)
+        logger.info("Text summarized with local extractive summarizer")
+        return summary
+    except Exception as e:
+        logger.error(f"Error in extractive summarizer: {e}")
+        return ""
+
+
+def plan_summary(text, models=None):
+    """要約の実行計画（1回で要約するか分割するか）を作成してログに残す"""
+    selected = model_router.router.models(models)
+    plan = token_planner.plan_summary(
+        text,
+        selected["map"],
+        SUMMARY_GENERATION_CONFIG["max_output_tokens"],
+        reduce_model=selected["reduce"],
+    )
+    logger.info(f"Summary plan: {plan.describe()}")
+    return plan
+
+
+async def summarize_with_gemini(client, text, plan=None, models=None, budget=None):
+    """Gemini AIを使用してテキストを要約（使えない場合は抽出型要約）
+
+    plan が分割要約なら、チャンクごとの部分要約を並列に作り、fan_in 個ずつ段階的に統合する
+    （部分要約・中間統合は速いモデル、最終統合は強いモデル。models で段階ごとに上書きできる）
+    budget（リクエストの期限）を過ぎたら DeadlineExceeded を送出する
+    """
+    if not GEMINI_API_KEY:
+        logger.warning("Gemini API key not configured, using extractive summary")
+        # CPUを使う処理なのでイベントループを塞がないようスレッドで実行する
+        return await asyncio.to_thread(extractive_summary, text)
+
+    try:
+        # 計画（トークン数の見積もり）と前処理はCPUを使うのでスレッドで実行する
+        plan = plan or await asyncio.to_thread(plan_summary, text, models)
+        cleaned = await asyncio.to_thread(preclean_for_gemini, text)
+
+        if plan.strategy == "single":
+            summary = await generate_content(
+                client,
+                build_summary_prompt(cleaned),
+                SUMMARY_GENERATION_CONFIG,
+                "summary",
+                models,
+                budget,
+            )
+        else:
+            chunks = await asyncio.to_thread(
+                token_planner.split_by_tokens, cleaned, plan.chunk_tokens
+            )
+            partial_config = {
+                **SUMMARY_GENERATION_CONFIG,
+                "max_output_tokens": plan.partial_output_tokens,
+            }
+            semaphore = asyncio.Semaphore(plan.parallelism)
+
+            async def summarize_chunk(index, chunk):
+                async with semaphore:
+                    return await generate_content(
+                        client,
+                        build_partial_summary_prompt(chunk, index),
+                        partial_config,
+                        "map",
+                        models,
+                        budget,
+                    )
+
+            partial_summaries = await asyncio.gather(
+                *(summarize_chunk(i, chunk) for i, chunk in enumerate(chunks, 1))
+            )
+            logger.info(
+                f"Summarized {len(chunks)} chunks, consolidating "
+                f"(fan-in {plan.fan_in}, {plan.reduce_levels} intermediate levels)"
+            )
+
+            async def merge(group, start, total):
+                return await generate_content(
+                    client,
+                    build_merge_prompt(group, start),
+                    partial_config,
+                    "merge",
+                    models,
+                    budget,
+                )
+
+            async def finalize(group):
+                return await generate_content(
+                    client,
+                    build_consolidation_prompt(group),
+                    SUMMARY_GENERATION_CONFIG,
+                    "reduce",
+                    models,
+                    budget,
+                )
+
+            summary = await map_reduce.tree_reduce_async(
+                partial_summaries, merge, finalize, plan.fan_in, plan.parallelism
+            )
+
+        logger.info("Text summarized successfully using Gemini")
+        return summary
+    except deadline.DeadlineExceeded:
+        raise
+    except Exception as e:
+        logger.error(f"Error summarizing text with Gemini: {e}")
+        return await asyncio.to_thread(extractive_summary, text)
+
+
+async def format_and_summarize(client, text, formatter_mode, models, budget, segments=None):
+    """整形と要約を行い (整形済みテキスト, 整形方式, 要約, 計画, partial) を返す
+
+    期限を過ぎたらそこまでの結果（整形前のテキスト・空の要約）を partial として返す
+    """
+    formatted_text, formatter_used, summary_text, summary_plan = text, None, "", None
+    try:
+        formatted_text, formatter_used = await format_for_display(
+            client, text, formatter_mode, segments=segments, models=models, budget=budget
+        )
+        if GEMINI_API_KEY:
+            summary_plan = await asyncio.to_thread(plan_summary, formatted_text, models)
+        summary_text = await summarize_with_gemini(
+            client, formatted_text, summary_plan, models, budget
+        )
+    except deadline.DeadlineExceeded as e:
+        logger.warning(f"Returning partial result: {e}")
+        return formatted_text, formatter_used, summary_text, summary_plan, True
+    return formatted_text, formatter_used, summary_text, summary_plan, False
+
+
+# ==== アプリケーション ====
+
+
+@asynccontextmanager
+async def lifespan(app):
+    # 接続プールを全リクエストで共有する
+    app.state.http = httpx.AsyncClient(
+        timeout=HTTP_TIMEOUT,
+        limits=httpx.Limits(max_connections=200, max_keepalive_connections=50),
+        follow_redirects=True,
+    )
+    try:
+        yield
+    finally:
+        await app.state.http.aclose()
+
+
+app = FastAPI(
+    title="YouTube Transcript Extractor (ASGI)",
+    default_response_class=FastJSONResponse,
+    lifespan=lifespan,
+)
+
+app.add_middleware(CompressionMiddleware)
+
+
+def cors_origin_regex(origins):
+    """ワイルドカードを含むオリジン（https://*.run.app など）を CORSMiddleware 用の正規表現にする
+
+    allow_origins は完全一致でしか比較しないため、* はここでサブドメインの1ラベル以上に展開する
+    """
+    patterns = [
+        re.escape(origin).replace(r"\*", r"[A-Za-z0-9.-]+")
+        for origin in origins
+        if "*" in origin and origin != "*"
+    ]
+    return "|".join(patterns) or None
+
+
+cors_origins = [o.strip() for o in os.environ.get("CORS_ORIGINS", "https://*.run.app").split(",")]
+app.add_middleware(
+    CORSMiddleware,
+    allow_origins=[o for o in cors_origins if "*" not in o or o == "*"],
+    allow_origin_regex=cors_origin_regex(cors_origins),
+    allow_methods=["*"],
+    allow_headers=["Content-Type", "Authorization", "Content-Encoding", deadline.HEADER],
+)
+
+
+def json_error(body, status_code):
+    return FastJSONResponse(body, status_code=status_code)
+
+
+def check_auth(request):
+    """Bearerトークンを検証（app.py の require_auth と同じレスポンス）"""
+    auth_header = request.headers.get("Authorization")
+    if not auth_header:
+        logger.warning("No authorization header provided")
+        return json_error({"error": "Authorization header required"}, 401)
+
+    parts = auth_header.split(" ", 1)
+    if len(parts) != 2:
+        return json_error({"error": "Invalid Authorization header format"}, 401)
+
+    scheme, token = parts
+    if scheme.lower() != "bearer":
+        return json_error({"error": "Bearer token required"}, 401)
+
+    if not TRANSCRIPT_API_TOKEN:
+        logger.error("Transcript API token not found in environment variables")
+        return json_error({"error": "Authentication failed"}, 401)
+
+    if token != TRANSCRIPT_API_TOKEN:
+        logger.warning("Token mismatch")
+        return json_error({"error": "Invalid token"}, 401)
+
+    return None
+
+
+async def read_json(request):
+    try:
+        return await request.json()
+    except ValueError:
+        return None
+
+
+@app.exception_handler(StarletteHTTPException)
+async def http_exception_handler(request, exc):
+    if exc.status_code == 404:
+        return json_error({"error": "エンドポイントが見つかりません"}, 404)
+    return json_error({"error": str(exc.detail)}, exc.status_code)
+
+
+@app.exception_handler(Exception)
+async def server_error(request, exc):
+    logger.error(f"Server error: {exc}")
+    return json_error({"error": "サーバーエラーが発生しました"}, 500)
+
+
+@app.get("/health")
+async def health():
+    """ヘルスチェックエンドポイント（Cloud Run用）"""
+    return {
+        "status": "healthy",
+        "timestamp": datetime.now().isoformat(),
+        "youtube_api": "configured" if YOUTUBE_API_KEY else "not configured",
+        "gemini_api": "configured" if GEMINI_API_KEY else "not configured",
+    }
+
+
+@app.get("/metrics")
+async def metrics():
+    """モデル階層ごとのレイテンシ・利用状況とキャッシュの統計"""
+    return {
+        "models": model_router.router.stats(),
+        "retries": gemini_retry.stats(),
+        "caches": cache.stats(),
+    }
+
+
+@app.post("/extract")
+async def extract(request: Request):
+    """字幕抽出エンドポイント"""
+    auth_error = check_auth(request)
+    if auth_error is not None:
+        return auth_error
+
+    client = request.app.state.http
+    try:
+        data = await read_json(request) or {}
+        transcript_text = data.get("transcript_text")
+        url = data.get("url")
+        lang = data.get("lang", "ja")
+        format_type = data.get("format", "txt")
+        formatter_mode = local_formatter.check_mode(data.get("formatter"))
+        # 処理段階ごとのモデルの上書き（例: {"reduce": "fast"}）
+        models = model_router.router.check_overrides(data.get("models"))
+        # リクエストの期限。過ぎたら整形・要約を打ち切り、そこまでの結果を partial として返す
+        budget = deadline.from_header(request.headers.get(deadline.HEADER))
+
+        is_cloud_run = os.environ.get("K_SERVICE") is not None
+
+        if transcript_text:
+            logger.info(
+                f"Processing locally extracted transcript ({len(transcript_text)} chars)"
+            )
+            formatted_transcript = transcript_text
+            summary_text = ""
+            formatter_used = None
+            summary_plan = None
+            partial = False
+
+            if format_type == "txt":
+                (
+                    formatted_transcript,
+                    formatter_used,
+                    summary_text,
+                    summary_plan,
+                    partial,
+                ) = await format_and_summarize(
+                    client, transcript_text, formatter_mode, models, budget
+                )
+
+            return {
+                "success": True,
+                "video_id": "locally_extracted",
+                "title": "ローカル抽出字幕",
+                "formatted_transcript": formatted_transcript,
+                "summary": summary_text,
+                "formatter": formatter_used,
+                "plan": summary_plan.to_dict() if summary_plan else None,
+                "partial": partial,
+                "deadline": budget.to_dict(),
+                "stats": {
+                    "total_characters": len(transcript_text),
+                    "language": lang,
+                },
+            }
+
+        if not url:
+            return json_error({"error": "URLまたはtranscript_textが必要です"}, 400)
+
+        if is_cloud_run:
+            return json_error(
+                {
+                    "error": "Cloud環境ではURLからの直接取得は無効です。字幕テキストかSRTファイルを送信してください。",
+                    "suggestion": "ローカルPCで字幕を抽出し、transcript_textパラメータで送信してください。",
+                },
+                400,
+            )
+
+        logger.info(f"Processing URL: {url}, Lang: {lang}, Format: {format_type}")
+        video_id = get_video_id(url)
+
+        # タイトルと字幕は独立しているので並行して取得する
+        title, transcript = await asyncio.gather(
+            get_video_title(client, video_id, budget),
+            get_transcript(client, video_id, lang, budget),
+        )
+
+        formatted_transcript = await asyncio.to_thread(format_transcript, transcript, format_type)
+
+        summary_text = ""
+        formatter_used = None
+        summary_plan = None
+        partial = False
+        if format_type == "txt":
+            (
+                formatted_transcript,
+                formatter_used,
+                summary_text,
+                summary_plan,
+                partial,
+            ) = await format_and_summarize(
+                client, formatted_transcript, formatter_mode, models, budget, segments=transcript
+            )
+
+        logger.info(f"Successfully processed video {video_id}")
+        return {
+            "success": True,
+            "video_id": video_id,
+            "title": title,
+            "formatted_transcript": formatted_transcript,
+            "summary": summary_text,
+            "formatter": formatter_used,
+            "plan": summary_plan.to_dict() if summary_plan else None,
+            "partial": partial,
+            "deadline": budget.to_dict(),
+            "stats": {
+                "total_segments": len(transcript),
+                "total_duration": sum(item["duration"] for item in transcript),
+                "language": lang,
+            },
+        }
+
+    except deadline.DeadlineExceeded as e:
+        # 字幕の取得中に期限を過ぎた（返せる結果がない）
+        logger.warning(f"Request deadline exceeded: {e}")
+        return json_error(
+            {
+                "success": False,
+                "partial": True,
+                "error": "処理が期限内に完了しませんでした。時間をおいて再試行してください。",
+            },
+            504,
+        )
+    except ValueError as e:
+        logger.warning(f"User error: {e}")
+        return json_error({"success": False, "error": str(e)}, 400)
+    except Exception as e:
+        logger.exception(f"Unexpected error in extract endpoint: {e}")
+        return json_error(
+            {"success": False, "error": f"予期しないエラーが発生しました: {str(e)}"}, 500
+        )
+
+
+@app.get("/supported_languages/{video_id}")
+async def supported_languages(video_id: str, request: Request):
+    """利用可能な言語のリストを取得"""
+    try:
+        languages = await list_languages(request.app.state.http, video_id)
+        return {"success": True, "languages": languages}
+    except Exception as e:
+        logger.error(f"Error getting supported languages for {video_id}: {e}")
+        return json_error({"success": False, "error": str(e)}, 400)
+
+
+@app.post("/format_text")
+async def format_text(request: Request):
+    """テキスト整形エンドポイント"""
+    try:
+        data = await read_json(request) or {}
+        text = data.get("text")
+
+        if not text:
+            return json_error({"error": "テキストが指定されていません"}, 400)
+
+        formatter_mode = local_formatter.check_mode(data.get("formatter"))
+        if formatter_mode == "gemini" and not GEMINI_API_KEY:
+            return json_error({"error": "Gemini APIが利用できません"}, 503)
+
+        models = model_router.router.check_overrides(data.get("models"))
+        formatted_text, formatter_used = await format_for_display(
+            request.app.state.http,
+            text,
+            formatter_mode,
+            segments=local_formatter.check_segments(data.get("segments")),
+            models=models,
+        )
+
+        logger.info("Text formatting completed successfully")
+        return {
+            "success": True,
+            "original_text": text,
+            "formatted_text": formatted_text,
+            "formatter": formatter_used,
+        }
+
+    except ValueError as e:
+        logger.warning(f"User error: {e}")
+        return json_error({"success": False, "error": str(e)}, 400)
+    except Exception as e:
+        logger.error(f"Unexpected error in format_text: {e}")
+        return json_error({"success": False, "error": "予期しないエラーが発生しました"}, 500)
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    is_cloud_run = os.environ.get("K_SERVICE") is not None
+    host = "0.0.0.0" if is_cloud_run else "127.0.0.1"
+    logger.info(f"Starting ASGI server on {host}:{PORT}")
+    uvicorn.run("app_async:app", host=host, port=PORT, log_level="info")
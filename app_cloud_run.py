@@ -3,7 +3,6 @@ YouTube Transcript Extractor - Cloud Run版
 ポート干渉を避け、固定URLで動作するバージョン
 """
 
-import json
 import logging
 import os
 from datetime import datetime
@@ -17,6 +16,8 @@ from flask_cors import CORS
 from youtube_transcript_api import (NoTranscriptFound, TranscriptsDisabled,
                                     YouTubeTranscriptApi)
 
+import response_layer
+
 # ロギング設定
 logging.basicConfig(
     level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
@@ -26,6 +27,7 @@ logger = logging.getLogger(__name__)
 # Flask アプリケーション設定
 app = Flask(__name__, template_folder="templates", static_folder="static")
 CORS(app)  # Cloud Runでのクロスオリジン対応
+response_layer.init_flask(app)  # JSON高速化・レスポンス圧縮
 
 # 環境変数読み込み
 load_dotenv()
@@ -150,7 +152,7 @@ def get_transcript(video_id, lang="ja"):
 def format_transcript(transcript, format_type="txt"):
     """字幕をフォーマット"""
     if format_type == "json":
-        return json.dumps(transcript, ensure_ascii=False, indent=2)
+        return response_layer.dumps(transcript, indent=2)
     elif format_type == "srt":
         # SRT形式（タイムスタンプ付き）
         srt_content = []
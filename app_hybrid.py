@@ -5,6 +5,7 @@ import json
 import logging
 import os
 import time
+from concurrent.futures import ThreadPoolExecutor
 from typing import Any, Dict, List, Optional
 
 from dotenv import load_dotenv
@@ -18,6 +19,16 @@ load_dotenv()
 # Gemini AI
 import google.generativeai as genai
 
+import cache
+import deadline
+import extractive_summarizer
+import gemini_retry
+import map_reduce
+import model_router
+import token_planner
+from response_layer import CompressionMiddleware, FastJSONResponse
+from transcript_cleaner import clean_text
+
 # Setup logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -30,6 +41,13 @@ ALLOWED_ORIGINS = os.getenv(
     "https://www.youtube.com,https://m.youtube.com,https://music.youtube.com",
 )
 PORT = int(os.getenv("PORT", 8766))
+# Local pre-cleaning before Gemini calls (off / light / standard / aggressive)
+PRECLEAN_LEVEL = os.getenv("PRECLEAN_LEVEL", "standard")
+# Per-prompt summary cache (chunk / merge / final results keyed by prompt hash)
+SUMMARY_CACHE_SIZE = int(os.getenv("SUMMARY_CACHE_SIZE", 2048))
+SUMMARY_CACHE_TTL = int(os.getenv("SUMMARY_CACHE_TTL", 86400))
+# Per-call Gemini timeout (capped by the request's remaining deadline)
+GEMINI_TIMEOUT = float(os.getenv("GEMINI_TIMEOUT", 120))
 
 if not GEMINI_API_KEY:
     raise RuntimeError("GEMINI_API_KEY is not set in environment variables")
@@ -41,8 +59,12 @@ app = FastAPI(
     title="YouTube Transcript Hybrid Summarizer",
     description="Client-side transcript extraction + Server-side AI summarization",
     version="1.0.0",
+    default_response_class=FastJSONResponse,
 )
 
+# Response compression + compressed request bodies (gzip/br/zstd)
+app.add_middleware(CompressionMiddleware)
+
 # CORS middleware
 origins = [o.strip() for o in ALLOWED_ORIGINS.split(",")] if ALLOWED_ORIGINS else ["*"]
 app.add_middleware(
@@ -69,6 +91,11 @@ class SummarizeRequest(BaseModel):
     max_words: Optional[int] = Field(
         300, description="Target word count for summary (guideline)"
     )
+    models: Optional[Dict[str, str]] = Field(
+        None,
+        description="Per-stage model overrides, e.g. {'reduce': 'fast'} "
+        "(stages: map, merge, reduce, summary, default; values: tier or model name)",
+    )
 
 
 class SummarizeResponse(BaseModel):
@@ -80,6 +107,11 @@ class SummarizeResponse(BaseModel):
     transcript_length: int
     chunks: int
     summary: str
+    engine: str = "gemini"
+    plan: Optional[Dict[str, Any]] = None
+    models: Optional[Dict[str, str]] = None
+    cache_hits: int = 0
+    partial: bool = False
     processing_time: float
 
 
@@ -89,73 +121,136 @@ class HealthResponse(BaseModel):
     service: str
 
 
-# Utility functions
-def chunk_text(text: str, max_chars: int = 8000) -> List[str]:
-    """Split text into manageable chunks for AI processing"""
-    text = text.strip()
-    if len(text) <= max_chars:
-        return [text]
-
-    # Split by lines for safety
-    lines = text.splitlines()
-    chunks = []
-    current_chunk = []
-    current_length = 0
-
-    for line in lines:
-        line_length = len(line) + 1  # +1 for newline
-        if current_length + line_length > max_chars and current_chunk:
-            chunks.append("\n".join(current_chunk))
-            current_chunk = [line]
-            current_length = line_length
-        else:
-            current_chunk.append(line)
-            current_length += line_length
+summary_cache = cache.get_cache(
+    "summaries", maxsize=SUMMARY_CACHE_SIZE, ttl=SUMMARY_CACHE_TTL
+)
+
 
-    if current_chunk:
-        chunks.append("\n".join(current_chunk))
+# Utility functions
+def chunk_text(text: str, max_tokens: int = token_planner.MAX_CHUNK_TOKENS) -> List[str]:
+    """Split text into manageable chunks for AI processing
+
+    Splits at sentence ends / newlines / whitespace by estimated tokens.
+    Boundaries only depend on the text before them, so when a transcript
+    grows (e.g. a live stream) the earlier chunks - and their cached
+    summaries - stay the same.
+    """
+    return token_planner.split_by_tokens(text, max_tokens) or [text.strip()]
+
+
+def summary_cache_key(prompt: str, model: str) -> str:
+    """Cache key of a prompt's result (the model that runs it plus the prompt)"""
+    return cache.make_key(model, prompt)
+
+
+def generate_cached(
+    prompt: str,
+    stage: str,
+    models: Optional[Dict[str, str]] = None,
+    cache_hits: Optional[List[str]] = None,
+    budget: Optional[deadline.Deadline] = None,
+    prefetched: Optional[Dict[str, str]] = None,
+    route: Optional[model_router.Route] = None,
+) -> str:
+    """Run a Gemini prompt, reusing the cached result for an identical prompt
+
+    The model is picked per stage by model_router (fast tier for chunk maps,
+    strong tier for the final reduce); `models` holds per-request overrides.
+    Transient errors (429/5xx/timeouts) are retried with backoff by gemini_retry.
+    Calls get the request's remaining time as their timeout; once the
+    deadline has passed, DeadlineExceeded is raised instead of calling Gemini.
+    `prefetched` holds results already read with summary_cache.get_many; keys
+    missing from it are treated as misses without another cache lookup.
+    `route` is a model already picked for this stage (the one the prefetched
+    keys were built with); otherwise the stage is routed once here.
+    """
+    budget = budget or deadline.Deadline()
+    route = route or model_router.router.route(stage, models)
+    key = summary_cache_key(prompt, route.model)
+    cached = prefetched.get(key) if prefetched is not None else summary_cache.get(key)
+    if cached is not None:
+        if cache_hits is not None:
+            cache_hits.append(key)
+        return cached
+
+    budget.check(f"Gemini {stage}")
+    model = genai.GenerativeModel(route.model)
+
+    def call() -> str:
+        response = model.generate_content(
+            prompt, request_options={"timeout": budget.timeout(GEMINI_TIMEOUT)}
+        )
+        return response.text.strip()
 
-    return chunks
+    try:
+        text = gemini_retry.call_with_retry(
+            lambda: model_router.router.call(route, prompt, call), deadline=budget.at
+        )
+    except Exception as e:
+        if budget.expired():
+            raise deadline.DeadlineExceeded(f"Gemini {stage} timed out: {e}") from e
+        raise
+    if text:
+        summary_cache.set(key, text)
+    return text
+
+
+def summary_output_tokens(max_words: int) -> int:
+    """Output token budget for a summary of about max_words words"""
+    # Japanese "words" are closer to characters (~1 token each), English words ~1.3 tokens
+    return max(256, max_words * 2)
+
+
+def summary_prompt(text: str, target_lang: str = "ja", max_words: int = 300) -> str:
+    """Build the summary prompt for one transcript (or one chunk of it)"""
+    # Language-specific prompts
+    if target_lang == "ja":
+        return (
+            f"以下はYouTube動画の字幕です。重要なポイントを失わず、"
+            f"日本語で約{max_words}語以内で要約してください。\n"
+            f"構造: 見出し → 箇条書き → 結論の形式でまとめてください。\n\n"
+            f"--- 字幕内容 ---\n{text}\n\n"
+            f"--- 出力フォーマット ---\n"
+            f"# 要約タイトル\n"
+            f"## 主要ポイント\n"
+            f"- 重要なポイント1\n"
+            f"- 重要なポイント2\n"
+            f"- 重要なポイント3\n\n"
+            f"## 結論\n"
+            f"要約の結論...\n"
+        )
+    return (
+        f"Please summarize the following YouTube video transcript in approximately {max_words} words.\n"
+        f"Structure: Title → Key Points → Conclusion\n\n"
+        f"--- Transcript ---\n{text}\n\n"
+        f"--- Output Format ---\n"
+        f"# Summary Title\n"
+        f"## Key Points\n"
+        f"- Key point 1\n"
+        f"- Key point 2\n"
+        f"- Key point 3\n\n"
+        f"## Conclusion\n"
+        f"Summary conclusion...\n"
+    )
 
 
-def gemini_summarize(text: str, target_lang: str = "ja", max_words: int = 300) -> str:
+def gemini_summarize(
+    text: str,
+    target_lang: str = "ja",
+    max_words: int = 300,
+    cache_hits: Optional[List[str]] = None,
+    stage: str = "summary",
+    models: Optional[Dict[str, str]] = None,
+    budget: Optional[deadline.Deadline] = None,
+    prefetched: Optional[Dict[str, str]] = None,
+    route: Optional[model_router.Route] = None,
+) -> str:
     """Summarize text using Gemini AI"""
     try:
-        model = genai.GenerativeModel("gemini-1.5-pro")
-
-        # Language-specific prompts
-        if target_lang == "ja":
-            prompt = (
-                f"以下はYouTube動画の字幕です。重要なポイントを失わず、"
-                f"日本語で約{max_words}語以内で要約してください。\n"
-                f"構造: 見出し → 箇条書き → 結論の形式でまとめてください。\n\n"
-                f"--- 字幕内容 ---\n{text}\n\n"
-                f"--- 出力フォーマット ---\n"
-                f"# 要約タイトル\n"
-                f"## 主要ポイント\n"
-                f"- 重要なポイント1\n"
-                f"- 重要なポイント2\n"
-                f"- 重要なポイント3\n\n"
-                f"## 結論\n"
-                f"要約の結論...\n"
-            )
-        else:
-            prompt = (
-                f"Please summarize the following YouTube video transcript in approximately {max_words} words.\n"
-                f"Structure: Title → Key Points → Conclusion\n\n"
-                f"--- Transcript ---\n{text}\n\n"
-                f"--- Output Format ---\n"
-                f"# Summary Title\n"
-                f"## Key Points\n"
-                f"- Key point 1\n"
-                f"- Key point 2\n"
-                f"- Key point 3\n\n"
-                f"## Conclusion\n"
-                f"Summary conclusion...\n"
-            )
-
-        response = model.generate_content(prompt)
-        return response.text.strip()
+        prompt = summary_prompt(text, target_lang, max_words)
+        return generate_cached(prompt, stage, models, cache_hits, budget, prefetched, route)
+    except deadline.DeadlineExceeded:
+        raise
     except Exception as e:
         logger.error(f"Gemini summarization error: {e}")
         raise HTTPException(
@@ -163,35 +258,114 @@ def gemini_summarize(text: str, target_lang: str = "ja", max_words: int = 300) -
         )
 
 
-def gemini_summarize_multi(chunks: List[str], target_lang: str, max_words: int) -> str:
-    """Multi-stage summarization for long transcripts"""
+def gemini_consolidate(
+    summaries: List[str],
+    target_lang: str,
+    max_words: int,
+    cache_hits: Optional[List[str]] = None,
+    stage: str = "reduce",
+    models: Optional[Dict[str, str]] = None,
+    budget: Optional[deadline.Deadline] = None,
+) -> str:
+    """Consolidate a group of partial summaries into one (final) summary"""
+    if target_lang == "ja":
+        consolidation_prompt = (
+            f"以下は動画の部分要約の一覧です。"
+            f"重複を除き、重要な情報を統合して、"
+            f"日本語で約{max_words}語の最終要約を作成してください。\n\n"
+            + "\n\n".join(summaries)
+        )
+    else:
+        consolidation_prompt = (
+            f"The following are partial summaries of a video. "
+            f"Please consolidate them into a final summary of approximately {max_words} words.\n\n"
+            + "\n\n".join(summaries)
+        )
+
+    return generate_cached(consolidation_prompt, stage, models, cache_hits, budget)
+
+
+def gemini_summarize_multi(
+    chunks: List[str],
+    target_lang: str,
+    max_words: int,
+    parallelism: int = 1,
+    fan_in: int = token_planner.FAN_IN,
+    cache_hits: Optional[List[str]] = None,
+    models: Optional[Dict[str, str]] = None,
+    budget: Optional[deadline.Deadline] = None,
+) -> str:
+    """Multi-stage summarization for long transcripts
+
+    Partial summaries are merged in parallel groups of at most `fan_in`,
+    level by level, so no consolidation prompt grows with the chunk count.
+    Chunk and merge results are cached by prompt, and labels don't include
+    the chunk total, so re-summarizing a grown transcript only sends the new
+    chunks (and the merges above them) to Gemini.
+    """
     try:
-        # Stage 1: Summarize each chunk
-        partial_summaries = []
-        for i, chunk in enumerate(chunks, 1):
+        # Read every cached chunk summary in one round trip (one MGET on a shared cache).
+        # The map stage is routed once, so the keys match the model the chunks run on
+        map_route = model_router.router.route("map", models)
+        prefetched = summary_cache.get_many(
+            [
+                summary_cache_key(summary_prompt(chunk, target_lang, max_words // 2), map_route.model)
+                for chunk in chunks
+            ]
+        )
+
+        # Stage 1: Summarize each chunk (up to `parallelism` Gemini calls at once)
+        def summarize_chunk(item):
+            i, chunk = item
             logger.info(f"Processing chunk {i}/{len(chunks)}")
-            partial = gemini_summarize(chunk, target_lang, max_words=max_words // 2)
-            partial_summaries.append(f"[Part {i}/{len(chunks)}]\n{partial}")
-
-        # Stage 2: Consolidate summaries
-        model = genai.GenerativeModel("gemini-1.5-pro")
-
-        if target_lang == "ja":
-            consolidation_prompt = (
-                f"以下は動画の部分要約の一覧です。"
-                f"重複を除き、重要な情報を統合して、"
-                f"日本語で約{max_words}語の最終要約を作成してください。\n\n"
-                + "\n\n".join(partial_summaries)
+            partial = gemini_summarize(
+                chunk,
+                target_lang,
+                max_words=max_words // 2,
+                cache_hits=cache_hits,
+                stage="map",
+                models=models,
+                budget=budget,
+                prefetched=prefetched,
+                route=map_route,
             )
-        else:
-            consolidation_prompt = (
-                f"The following are partial summaries of a video. "
-                f"Please consolidate them into a final summary of approximately {max_words} words.\n\n"
-                + "\n\n".join(partial_summaries)
+            return f"[Part {i}]\n{partial}"
+
+        with ThreadPoolExecutor(max_workers=max(1, parallelism)) as executor:
+            partial_summaries = list(executor.map(summarize_chunk, enumerate(chunks, 1)))
+
+        # Stage 2..n: Tree-reduce the partial summaries, then consolidate the last group
+        def merge(group: List[str], start: int, total: int) -> str:
+            end = start + len(group)
+            logger.info(f"Merging partial summaries {start + 1}-{end}/{total}")
+            merged = gemini_consolidate(
+                group,
+                target_lang,
+                max_words // 2,
+                cache_hits,
+                stage="merge",
+                models=models,
+                budget=budget,
             )
-
-        final_response = model.generate_content(consolidation_prompt)
-        return final_response.text.strip()
+            return f"[Parts {start + 1}-{end}]\n{merged}"
+
+        return map_reduce.tree_reduce(
+            partial_summaries,
+            merge=merge,
+            finalize=lambda group: gemini_consolidate(
+                group,
+                target_lang,
+                max_words,
+                cache_hits,
+                stage="reduce",
+                models=models,
+                budget=budget,
+            ),
+            fan_in=fan_in,
+            parallelism=parallelism,
+        )
+    except deadline.DeadlineExceeded:
+        raise
     except Exception as e:
         logger.error(f"Multi-stage summarization error: {e}")
         raise HTTPException(
@@ -210,12 +384,28 @@ def healthcheck():
     )
 
 
+@app.get("/metrics")
+def metrics():
+    """Per-tier model latency/usage and cache statistics"""
+    return {
+        "models": model_router.router.stats(),
+        "retries": gemini_retry.stats(),
+        "caches": cache.stats(),
+    }
+
+
 @app.post("/summarize", response_model=SummarizeResponse)
 def summarize(
     body: SummarizeRequest,
     authorization: Optional[str] = Header(None),
+    x_request_deadline: Optional[str] = Header(None),
 ):
-    """Summarize transcript text using Gemini AI"""
+    """Summarize transcript text using Gemini AI
+
+    The X-Request-Deadline header (seconds, default REQUEST_DEADLINE_SECONDS)
+    bounds the Gemini stages; when it runs out the extractive summary is
+    returned with partial=true.
+    """
     import time
 
     start_time = time.time()
@@ -236,28 +426,81 @@ def summarize(
             status_code=413, detail="Transcript too large (maximum 2MB)"
         )
 
+    try:
+        models = model_router.router.check_overrides(body.models)
+        budget = deadline.from_header(x_request_deadline)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
     logger.info(f"Processing transcript: {len(body.transcript)} chars, URL: {body.url}")
 
     try:
-        # Split text into chunks if needed
-        chunks = chunk_text(body.transcript, max_chars=8000)
-
-        if len(chunks) == 1:
-            summary = gemini_summarize(
-                chunks[0],
-                target_lang=body.target_lang or "ja",
-                max_words=body.max_words or 300,
+        # Strip noise tags, fillers and rolling duplicates before chunking
+        cleaned = clean_text(body.transcript, PRECLEAN_LEVEL)
+        if cleaned.bytes_saved:
+            logger.info(
+                f"Precleaned transcript ({cleaned.level}): {cleaned.bytes_saved} bytes, "
+                f"~{cleaned.tokens_saved} tokens saved"
             )
+
+        # Plan single vs. multi-stage from the token budget, then chunk accordingly
+        max_words = body.max_words or 300
+        selected = model_router.router.models(models)
+        plan = token_planner.plan_summary(
+            cleaned.text,
+            selected["map"],
+            summary_output_tokens(max_words),
+            reduce_model=selected["reduce"],
+        )
+        logger.info(f"Summary plan: {plan.describe()}")
+        if plan.strategy == "single":
+            chunks = [cleaned.text]
         else:
-            logger.info(f"Processing {len(chunks)} chunks for long transcript")
-            summary = gemini_summarize_multi(
-                chunks,
-                target_lang=body.target_lang or "ja",
-                max_words=body.max_words or 300,
-            )
+            chunks = chunk_text(cleaned.text, max_tokens=plan.chunk_tokens)
+
+        engine = "gemini"
+        partial = False
+        cache_hits: List[str] = []
+        try:
+            if len(chunks) == 1:
+                summary = gemini_summarize(
+                    chunks[0],
+                    target_lang=body.target_lang or "ja",
+                    max_words=max_words,
+                    cache_hits=cache_hits,
+                    models=models,
+                    budget=budget,
+                )
+            else:
+                logger.info(f"Processing {len(chunks)} chunks for long transcript")
+                summary = gemini_summarize_multi(
+                    chunks,
+                    target_lang=body.target_lang or "ja",
+                    max_words=max_words,
+                    parallelism=plan.parallelism,
+                    fan_in=plan.fan_in or token_planner.FAN_IN,
+                    cache_hits=cache_hits,
+                    models=models,
+                    budget=budget,
+                )
+        except HTTPException as e:
+            # Gemini unavailable: fall back to the local extractive summarizer
+            # (sentences stay in the transcript's original language)
+            logger.warning(f"Gemini failed, using extractive summary: {e.detail}")
+            summary = extractive_summarizer.summarize(cleaned.text)
+            engine = "extractive"
+        except deadline.DeadlineExceeded as e:
+            # Out of time: return the (instant) extractive summary instead of waiting
+            logger.warning(f"Returning partial result: {e}")
+            summary = extractive_summarizer.summarize(cleaned.text)
+            engine = "extractive"
+            partial = True
 
         processing_time = time.time() - start_time
-        logger.info(f"Successfully processed in {processing_time:.2f}s")
+        logger.info(
+            f"Successfully processed in {processing_time:.2f}s "
+            f"({len(cache_hits)} Gemini calls served from cache)"
+        )
 
         return SummarizeResponse(
             url=body.url,
@@ -268,6 +511,11 @@ def summarize(
             transcript_length=len(body.transcript),
             chunks=len(chunks),
             summary=summary,
+            engine=engine,
+            plan=plan.to_dict(),
+            models=selected,
+            cache_hits=len(cache_hits),
+            partial=partial,
             processing_time=processing_time,
         )
 
@@ -285,6 +533,7 @@ def root():
         "description": "Client-side transcript extraction + Server-side AI summarization",
         "endpoints": {
             "healthz": "GET /healthz - Health check",
+            "metrics": "GET /metrics - Model tier and cache statistics",
             "summarize": "POST /summarize - Summarize transcript text",
         },
         "usage": "Use with Tampermonkey script or bookmarklet for seamless YouTube integration",
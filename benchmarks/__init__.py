@@ -0,0 +1,5 @@
+"""
+オフラインベンチマークスイート
+YouTube / YouTube Data API / Gemini のローカル代替サーバーを使って
+app.py・app_cloud_run.py・app_hybrid.py の性能を計測する
+"""
@@ -0,0 +1,181 @@
+"""
+ベンチマーク対象アプリを代替サーバーに接続して読み込む
+
+アプリ本体のコードは変更せず、読み込み時に外部通信の宛先だけを差し替える:
+- youtube.com への requests 通信 → 代替サーバー（Sessionにアダプターをマウント）
+- YouTube Data API クライアント → client_options.api_endpoint
+- Gemini（google-generativeai）→ RESTトランスポート + api_endpoint
+- app_async → 接続先の環境変数（YOUTUBE_BASE_URL など）
+
+環境変数:
+    BENCH_TARGET_APP     app / app_cloud_run / app_hybrid / app_async
+    BENCH_UPSTREAM_URL   代替サーバーのURL（例: http://127.0.0.1:9100）
+    BENCH_SLEEP_SCALE    get_transcript内のレート制限待機の倍率（0で待機なし）
+
+gunicorn / uvicorn からは `benchmarks.bench_app:app` として読み込める。
+"""
+
+import argparse
+import importlib
+import logging
+import os
+import sys
+import time
+from pathlib import Path
+from urllib.parse import urlsplit, urlunsplit
+
+# リポジトリ直下のアプリをimportできるようにする
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+logger = logging.getLogger(__name__)
+
+TARGET_APPS = ("app", "app_cloud_run", "app_hybrid", "app_async")
+
+YOUTUBE_HOSTS = ("www.youtube.com", "youtube.com", "m.youtube.com")
+
+BENCH_TOKEN = "bench-token"
+
+
+class _ScaledTime:
+    """time モジュールの代わりに差し込み、sleepだけを倍率で縮める"""
+
+    def __init__(self, scale):
+        self._scale = scale
+
+    def sleep(self, seconds):
+        if self._scale > 0:
+            time.sleep(seconds * self._scale)
+
+    def __getattr__(self, name):
+        return getattr(time, name)
+
+
+def _patch_requests(upstream_url):
+    """youtube.com 宛ての requests 通信を代替サーバーへ向ける"""
+    import requests
+    from requests.adapters import HTTPAdapter
+
+    target = urlsplit(upstream_url)
+
+    class RedirectAdapter(HTTPAdapter):
+        def send(self, request, **kwargs):
+            parts = urlsplit(request.url)
+            request.url = urlunsplit(
+                (target.scheme, target.netloc, parts.path, parts.query, parts.fragment)
+            )
+            return super().send(request, **kwargs)
+
+    original_init = requests.Session.__init__
+
+    def patched_init(self, *args, **kwargs):
+        original_init(self, *args, **kwargs)
+        adapter = RedirectAdapter()
+        for host in YOUTUBE_HOSTS:
+            self.mount(f"https://{host}/", adapter)
+
+    requests.Session.__init__ = patched_init
+
+
+def _configure_environment(upstream_url):
+    os.environ.setdefault("YOUTUBE_API_KEY", "bench-youtube-key")
+    os.environ.setdefault("GEMINI_API_KEY", "bench-gemini-key")
+    os.environ.setdefault("TRANSCRIPT_API_TOKEN", BENCH_TOKEN)
+    os.environ.setdefault("API_AUTH_TOKEN", BENCH_TOKEN)
+    # URL直接取得を許可するためローカル扱いにする
+    os.environ.pop("K_SERVICE", None)
+    # 同じ字幕を繰り返し送るので、Gemini結果のキャッシュは既定で無効にして毎回の処理を計測する
+    os.environ.setdefault("GEMINI_CACHE_SIZE", "0")
+    os.environ.setdefault("SUMMARY_CACHE_SIZE", "0")
+    # app_async は環境変数で接続先を切り替える
+    os.environ["YOUTUBE_BASE_URL"] = upstream_url
+    os.environ["YOUTUBE_DATA_API_URL"] = f"{upstream_url}/youtube/v3"
+    os.environ["GEMINI_API_BASE"] = upstream_url
+
+
+def _rewire_module(module, upstream_url, sleep_scale):
+    """読み込み済みアプリモジュールのクライアントを代替サーバーに向け直す"""
+    if hasattr(module, "genai"):
+        module.genai.configure(
+            api_key=os.environ["GEMINI_API_KEY"],
+            transport="rest",
+            client_options={"api_endpoint": upstream_url},
+        )
+
+    if getattr(module, "youtube", None) is not None:
+        import googleapiclient.discovery
+
+        module.youtube = googleapiclient.discovery.build(
+            "youtube",
+            "v3",
+            developerKey=os.environ["YOUTUBE_API_KEY"],
+            client_options={"api_endpoint": f"{upstream_url}/"},
+            static_discovery=True,
+        )
+
+    if hasattr(module, "time") and sleep_scale != 1.0:
+        module.time = _ScaledTime(sleep_scale)
+
+    if hasattr(module, "STRATEGIES") and sleep_scale != 1.0:
+        # app_async の待機はasyncio.sleepなので範囲そのものを縮める
+        module.STRATEGIES = [
+            (name, description, (low * sleep_scale, high * sleep_scale))
+            for name, description, (low, high) in module.STRATEGIES
+        ]
+
+
+def load_app(target=None, upstream_url=None, sleep_scale=None):
+    """代替サーバーに接続した状態でアプリを読み込み、WSGI/ASGIアプリを返す"""
+    target = target or os.environ.get("BENCH_TARGET_APP", "app")
+    upstream_url = (upstream_url or os.environ.get("BENCH_UPSTREAM_URL", "")).rstrip("/")
+    if sleep_scale is None:
+        sleep_scale = float(os.environ.get("BENCH_SLEEP_SCALE", "1.0"))
+
+    if target not in TARGET_APPS:
+        raise ValueError(f"Unknown target app: {target}")
+    if not upstream_url:
+        raise ValueError("BENCH_UPSTREAM_URL is not set")
+
+    _configure_environment(upstream_url)
+    _patch_requests(upstream_url)
+
+    module = importlib.import_module(target)
+    _rewire_module(module, upstream_url, sleep_scale)
+    logger.info(f"Loaded {target} against fake upstreams at {upstream_url}")
+    return module.app
+
+
+_app = None
+
+
+def __getattr__(name):
+    # gunicorn/uvicorn が "benchmarks.bench_app:app" を参照した時点で読み込む
+    global _app
+    if name == "app":
+        if _app is None:
+            _app = load_app()
+        return _app
+    raise AttributeError(name)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="代替サーバー接続済みのアプリを起動")
+    parser.add_argument("--app", choices=TARGET_APPS, default="app")
+    parser.add_argument("--upstream", required=True, help="代替サーバーのURL")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8090)
+    parser.add_argument("--sleep-scale", type=float, default=1.0)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    application = load_app(args.app, args.upstream, args.sleep_scale)
+
+    if args.app in ("app_hybrid", "app_async"):
+        import uvicorn
+
+        uvicorn.run(application, host=args.host, port=args.port, log_level="warning")
+    else:
+        application.run(host=args.host, port=args.port, debug=False, threaded=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+"""
+字幕アーカイブ（transcript_archive）のベンチマーク
+
+合成字幕のレコードを、動画ごとの .txt + .json（save_results）と
+SQLiteアーカイブ（1件ずつ / まとめて）に書き込み、書き込みスループット・
+動画IDでの参照レイテンシ・JSONLエクスポートの速度を比較する。
+
+例:
+    python -m benchmarks.bench_archive --videos 1000 5000 --segments 300
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import local_transcript_extractor as extractor  # noqa: E402
+import transcript_archive  # noqa: E402
+from benchmarks.fake_upstreams import generate_caption_dump  # noqa: E402
+
+
+def synthetic_records(rng, videos, segments):
+    """合成字幕のレコード（字幕の生成は計測に含めないよう事前に作る）"""
+    dumps = [generate_caption_dump(rng, segments) for _ in range(min(videos, 50))]
+    records = []
+    for i in range(videos):
+        transcript = dumps[i % len(dumps)]
+        content = extractor.format_transcript(transcript, "text")
+        records.append(
+            transcript_archive.make_record(
+                f"v{i:010d}", f"https://youtu.be/v{i:010d}", "ja", "text", content, transcript,
+                summary=content[:200],
+            )
+        )
+    return records
+
+
+def _percentile(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def _lookups(rng, records, lookup, count):
+    """ランダムな動画IDの参照レイテンシ（p50/p99、ミリ秒）"""
+    latencies = []
+    for _ in range(count):
+        video_id = rng.choice(records)["video_id"]
+        t0 = time.perf_counter()
+        lookup(video_id)
+        latencies.append(time.perf_counter() - t0)
+    return {
+        "p50": round(_percentile(latencies, 0.5) * 1000, 3),
+        "p99": round(_percentile(latencies, 0.99) * 1000, 3),
+    }
+
+
+def _legacy_lookup(output_dir):
+    """動画ごとのファイルから最新のJSONを探す（ディレクトリを走査する）"""
+
+    def lookup(video_id):
+        prefix = f"transcript_{video_id}_"
+        names = sorted(n for n in os.listdir(output_dir) if n.startswith(prefix) and n.endswith(".json"))
+        with open(os.path.join(output_dir, names[-1]), encoding="utf-8") as f:
+            return json.load(f)
+
+    return lookup
+
+
+def bench_legacy(records, rng, lookups):
+    with tempfile.TemporaryDirectory() as tmp:
+        t0 = time.perf_counter()
+        for r in records:
+            extractor.save_results(
+                r["video_id"], r["source_url"], r["language"], r["format"], r["content"],
+                r["segments"], output_dir=tmp,
+            )
+        elapsed = time.perf_counter() - t0
+        size = sum(p.stat().st_size for p in Path(tmp).iterdir())
+        return {
+            "writer": "legacy txt+json",
+            "records_per_s": round(len(records) / elapsed, 1),
+            "files": len(os.listdir(tmp)),
+            "mb": round(size / 1e6, 2),
+            "lookup_ms": _lookups(rng, records, _legacy_lookup(tmp), lookups),
+            "export_s": None,
+        }
+
+
+def bench_archive(records, rng, lookups, batch):
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "transcripts.sqlite3")
+        with transcript_archive.TranscriptArchive(path) as archive:
+            t0 = time.perf_counter()
+            if batch:
+                for start in range(0, len(records), batch):
+                    archive.append_many(records[start:start + batch])
+            else:
+                for record in records:
+                    archive.append(record)
+            elapsed = time.perf_counter() - t0
+            lookup = _lookups(rng, records, archive.get, lookups)
+
+            t0 = time.perf_counter()
+            archive.export_jsonl(os.path.join(tmp, "export.jsonl"))
+            export = time.perf_counter() - t0
+        size = sum(p.stat().st_size for p in Path(tmp).iterdir() if p.name.startswith("transcripts"))
+        return {
+            "writer": f"sqlite append_many({batch})" if batch else "sqlite append",
+            "records_per_s": round(len(records) / elapsed, 1),
+            "files": 1,
+            "mb": round(size / 1e6, 2),
+            "lookup_ms": lookup,
+            "export_s": round(export, 3),
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="字幕アーカイブのベンチマーク")
+    parser.add_argument("--videos", nargs="+", type=int, default=[1000, 5000])
+    parser.add_argument("--segments", type=int, default=300, help="1本あたりのセグメント数")
+    parser.add_argument("--batch", type=int, default=200, help="append_many の件数")
+    parser.add_argument("--lookups", type=int, default=500)
+    parser.add_argument("--skip-legacy", action="store_true", help="動画ごとのファイル書き込みを省く")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="結果JSONの出力先")
+    args = parser.parse_args()
+
+    rows = []
+    for videos in args.videos:
+        rng = random.Random(args.seed)
+        records = synthetic_records(rng, videos, args.segments)
+        results = [
+            bench_archive(records, rng, args.lookups, 0),
+            bench_archive(records, rng, args.lookups, args.batch),
+        ]
+        if not args.skip_legacy:
+            results.insert(0, bench_legacy(records, rng, args.lookups))
+        for result in results:
+            rows.append(dict(result, videos=videos))
+
+    print(f"{'videos':>7} {'writer':<24} {'rec/s':>9} {'files':>7} {'MB':>8} "
+          f"{'get p50':>8} {'get p99':>8} {'export s':>9}")
+    for row in rows:
+        export = "-" if row["export_s"] is None else row["export_s"]
+        print(
+            f"{row['videos']:>7} {row['writer']:<24} {row['records_per_s']:>9} {row['files']:>7} "
+            f"{row['mb']:>8} {row['lookup_ms']['p50']:>8} {row['lookup_ms']['p99']:>8} {export:>9}"
+        )
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(rows, ensure_ascii=False, indent=2), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
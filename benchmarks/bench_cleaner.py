@@ -0,0 +1,93 @@
+"""
+プリクリーニング（transcript_cleaner）のベンチマーク
+
+自動生成字幕風のダンプ（ノイズタグ・フィラー・ローリング重複入り）を生成し、
+レベルごとの処理速度と削減バイト数・推定トークン数を計測する。
+
+例:
+    python -m benchmarks.bench_cleaner --segments 500 5000 20000 --lang ja en
+    python -m benchmarks.bench_cleaner --input transcript_xxx.json
+"""
+
+import argparse
+import json
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from benchmarks.fake_upstreams import generate_caption_dump  # noqa: E402
+from transcript_cleaner import LEVELS, clean_text  # noqa: E402
+
+
+def load_dump(path):
+    """local_transcript_extractor.py の出力JSON、またはセグメントのリストを読み込む"""
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    segments = data.get("raw_transcript", []) if isinstance(data, dict) else data
+    return " ".join(seg["text"] for seg in segments)
+
+
+def bench_text(name, text, repeat):
+    rows = []
+    for level in LEVELS[1:]:
+        timings = []
+        for _ in range(repeat):
+            t0 = time.perf_counter()
+            result = clean_text(text, level)
+            timings.append(time.perf_counter() - t0)
+        best = min(timings)
+        rows.append(
+            {
+                "input": name,
+                "level": level,
+                "chars": len(text),
+                "best_ms": round(best * 1000, 3),
+                "mb_per_s": round(result.original_bytes / best / 1e6, 2) if best else None,
+                **result.to_dict(),
+                "bytes_saved_pct": round(100.0 * result.bytes_saved / result.original_bytes, 1)
+                if result.original_bytes
+                else 0.0,
+            }
+        )
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="プリクリーニングのベンチマーク")
+    parser.add_argument("--segments", nargs="+", type=int, default=[500, 5000, 20000])
+    parser.add_argument("--lang", nargs="+", default=["ja", "en"], choices=["ja", "en"])
+    parser.add_argument("--input", nargs="*", default=[], help="実際の字幕ダンプ（JSON）")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="結果JSONの出力先")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    inputs = []
+    for lang in args.lang:
+        for count in args.segments:
+            segments = generate_caption_dump(rng, count, lang)
+            inputs.append((f"synthetic-{lang}-{count}", " ".join(s["text"] for s in segments)))
+    for path in args.input:
+        inputs.append((Path(path).name, load_dump(path)))
+
+    rows = []
+    for name, text in inputs:
+        rows.extend(bench_text(name, text, args.repeat))
+
+    print(f"{'input':<24} {'level':<11} {'chars':>8} {'ms':>9} {'MB/s':>7} {'saved%':>7} {'tok saved':>10}")
+    for row in rows:
+        print(
+            f"{row['input']:<24} {row['level']:<11} {row['chars']:>8} {row['best_ms']:>9} "
+            f"{row['mb_per_s']!s:>7} {row['bytes_saved_pct']:>7} {row['tokens_saved']:>10}"
+        )
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(rows, ensure_ascii=False, indent=2), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""
+字幕の保存形式（transcript_codec）のベンチマーク
+
+合成字幕（または実際の字幕ダンプ）を学習用と評価用に分け、学習用で辞書を作ってから
+評価用の字幕を各形式で保存したときのサイズ（save_results と同じ indent=2 のJSONとの比）と
+エンコード・デコードの速度（元のJSONの MB/s）を計測する。
+
+例:
+    python -m benchmarks.bench_codec --videos 200 --segments 50 1500
+    python -m benchmarks.bench_codec --input transcript_xxx.json
+"""
+
+import argparse
+import json
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import transcript_codec as tc  # noqa: E402
+from benchmarks.fake_upstreams import generate_caption_dump  # noqa: E402
+
+
+def load_segments(path):
+    """字幕ダンプ（セグメントのリスト、または raw_transcript を持つJSON）"""
+    data = json.loads(Path(path).read_text(encoding="utf-8"))
+    return data.get("raw_transcript", data) if isinstance(data, dict) else data
+
+
+def _json_pair(indent):
+    def encode(segments):
+        return json.dumps(segments, ensure_ascii=False, indent=indent).encode("utf-8")
+
+    def decode(data):
+        return json.loads(data)
+
+    return encode, decode
+
+
+def writers(dictionary):
+    """形式名 → (エンコード, デコード)"""
+    rows = {
+        "json indent=2": _json_pair(2),
+        "json compact": _json_pair(None),
+        "binary": (tc.encode_segments, tc.decode_segments),
+    }
+    methods = [("zlib", tc.ZLIB)]
+    if tc.zstandard is not None:
+        methods.append(("zstd", tc.ZSTD))
+    for name, method in methods:
+        plain = tc.Codec(method=method)
+        rows[f"binary+{name}"] = (plain.encode, plain.decode)
+        with_dict = tc.Codec([dictionary], method=method)
+        rows[f"binary+{name}+dict"] = (with_dict.encode, with_dict.decode)
+    return rows
+
+
+def bench(name, encode, decode, transcripts, baseline_bytes, json_bytes, repeat):
+    encode_times, decode_times = [], []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        blobs = [encode(segments) for segments in transcripts]
+        encode_times.append(time.perf_counter() - t0)
+        t0 = time.perf_counter()
+        for blob in blobs:
+            decode(blob)
+        decode_times.append(time.perf_counter() - t0)
+    size = sum(len(blob) for blob in blobs)
+    return {
+        "format": name,
+        "bytes": size,
+        "ratio": round(baseline_bytes / size, 2),
+        "encode_mb_s": round(json_bytes / min(encode_times) / 1e6, 1),
+        "decode_mb_s": round(json_bytes / min(decode_times) / 1e6, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="字幕の保存形式のベンチマーク")
+    parser.add_argument("--videos", type=int, default=200, help="合成字幕の本数（半分を辞書の学習に使う）")
+    parser.add_argument("--segments", nargs="+", type=int, default=[50, 1500],
+                        help="1本あたりのセグメント数（短い動画と長い動画）")
+    parser.add_argument("--input", nargs="*", default=[], help="実際の字幕ダンプ（JSON）")
+    parser.add_argument("--dict-size", type=int, default=tc.DICT_SIZE)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="結果JSONの出力先")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    rows = []
+    for count in args.segments:
+        transcripts = [generate_caption_dump(rng, count) for _ in range(args.videos)]
+        transcripts += [load_segments(path)[:count] for path in args.input]
+        train, test = transcripts[::2], transcripts[1::2]
+        t0 = time.perf_counter()
+        dictionary = tc.train_dictionary([tc.encode_segments(s) for s in train], args.dict_size)
+        train_s = time.perf_counter() - t0
+
+        baseline = sum(len(_json_pair(2)[0](s)) for s in test)
+        json_bytes = sum(len(_json_pair(None)[0](s)) for s in test)
+        for name, (encode, decode) in writers(dictionary).items():
+            row = bench(name, encode, decode, test, baseline, json_bytes, args.repeat)
+            rows.append(dict(row, segments=count, videos=len(test), train_s=round(train_s, 3)))
+
+    print(f"{'segs':>5} {'format':<22} {'bytes':>11} {'ratio':>7} {'enc MB/s':>9} {'dec MB/s':>9}")
+    for row in rows:
+        print(
+            f"{row['segments']:>5} {row['format']:<22} {row['bytes']:>11} {row['ratio']:>7} "
+            f"{row['encode_mb_s']:>9} {row['decode_mb_s']:>9}"
+        )
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(rows, ensure_ascii=False, indent=2), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""
+字幕の列指向ストア（transcript_columns）のベンチマーク
+
+合成字幕を save_results と同じ形式の .json（indent=2）と列指向ストアの両方に書き、
+コーパス全体のキーワード頻度と動画ごとの話速の集計にかかる時間を比較する。
+
+例:
+    python -m benchmarks.bench_columns --videos 1000 5000 --segments 300
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from collections import Counter
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import transcript_columns  # noqa: E402
+from benchmarks.fake_upstreams import generate_caption_dump  # noqa: E402
+
+KEYWORDS = ("こんにちは", "ポイント", "実際に")
+
+
+def write_json_outputs(directory, transcripts):
+    """save_results と同じ構造の .json を動画ごとに書く"""
+    for video_id, segments in transcripts:
+        data = {"video_id": video_id, "language": "ja", "raw_transcript": segments}
+        path = os.path.join(directory, f"transcript_{video_id}_0.json")
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+
+
+def scan_json(directory):
+    """.json を全部読み込んでPythonで集計する（これまでの方法）"""
+    keywords = Counter()
+    rates = {}
+    for name in os.listdir(directory):
+        with open(os.path.join(directory, name), encoding="utf-8") as f:
+            data = json.load(f)
+        chars = spoken = 0
+        for item in data["raw_transcript"]:
+            chars += len(item["text"])
+            spoken += item["duration"]
+            for keyword in KEYWORDS:
+                keywords[keyword] += item["text"].count(keyword)
+        rates[data["video_id"]] = chars / spoken * 60 if spoken else 0.0
+    return keywords, rates
+
+
+def scan_columns(directory):
+    """列指向ストアを memmap で開いて集計する"""
+    with transcript_columns.ColumnarStore(directory) as store:
+        keywords = Counter(
+            {keyword: sum(store.keyword_counts(keyword).values()) for keyword in KEYWORDS}
+        )
+        rates = store.video_stats()["chars_per_minute"]
+        return keywords, len(rates)
+
+
+def _dir_bytes(directory):
+    return sum(p.stat().st_size for p in Path(directory).iterdir())
+
+
+def _best(func, repeat):
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result = func()
+        times.append(time.perf_counter() - t0)
+    return result, min(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="列指向ストアのベンチマーク")
+    parser.add_argument("--videos", nargs="+", type=int, default=[1000, 5000])
+    parser.add_argument("--segments", type=int, default=300, help="1本あたりのセグメント数")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="結果JSONの出力先")
+    args = parser.parse_args()
+
+    rows = []
+    for videos in args.videos:
+        rng = random.Random(args.seed)
+        dumps = [generate_caption_dump(rng, args.segments) for _ in range(min(videos, 50))]
+        transcripts = [(f"v{i:010d}", dumps[i % len(dumps)]) for i in range(videos)]
+        with tempfile.TemporaryDirectory() as tmp:
+            json_dir = os.path.join(tmp, "json")
+            columns_dir = os.path.join(tmp, "columns")
+            os.makedirs(json_dir)
+            write_json_outputs(json_dir, transcripts)
+
+            t0 = time.perf_counter()
+            transcript_columns.export_json_files([json_dir], columns_dir)
+            export_s = time.perf_counter() - t0
+
+            (json_keywords, _), json_s = _best(lambda: scan_json(json_dir), args.repeat)
+            (column_keywords, _), columns_s = _best(lambda: scan_columns(columns_dir), args.repeat)
+            assert json_keywords == column_keywords, (json_keywords, column_keywords)
+
+            rows.append(
+                {
+                    "videos": videos,
+                    "segments": videos * args.segments,
+                    "json_mb": round(_dir_bytes(json_dir) / 1e6, 1),
+                    "columns_mb": round(_dir_bytes(columns_dir) / 1e6, 1),
+                    "export_s": round(export_s, 3),
+                    "json_scan_s": round(json_s, 3),
+                    "columns_scan_s": round(columns_s, 3),
+                    "speedup": round(json_s / columns_s, 1),
+                }
+            )
+
+    print(f"{'videos':>7} {'segments':>9} {'json MB':>8} {'cols MB':>8} {'export s':>9} "
+          f"{'json scan':>10} {'cols scan':>10} {'speedup':>8}")
+    for row in rows:
+        print(
+            f"{row['videos']:>7} {row['segments']:>9} {row['json_mb']:>8} {row['columns_mb']:>8} "
+            f"{row['export_s']:>9} {row['json_scan_s']:>10} {row['columns_scan_s']:>10} "
+            f"{row['speedup']:>8}"
+        )
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(rows, ensure_ascii=False, indent=2), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""
+字幕の全文検索（transcript_search）のベンチマーク
+
+合成字幕を指定本数だけ索引し、索引の構築速度と検索のレイテンシ（p50/p99）を
+検索語の種類ごとに計測する。合成字幕の語彙は数十語しかないので、term / two_terms は
+全セグメントの数割にヒットする最悪に近いケース、rare は1本の動画にだけ出てくる語。
+
+例:
+    python -m benchmarks.bench_search --videos 1000 20000 --segments 200
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import transcript_search  # noqa: E402
+from benchmarks.fake_upstreams import _CAPTION_WORDS_JA, generate_caption_dump  # noqa: E402
+
+
+def build_index(path, rng, videos, segments):
+    """合成字幕を索引して (インデックス, 構築秒数) を返す
+
+    字幕は数十本を使い回し、動画ごとに固有の語を含むセグメントを1つ足す
+    """
+    dumps = [generate_caption_dump(rng, segments) for _ in range(min(videos, 50))]
+    index = transcript_search.TranscriptIndex(path)
+    t0 = time.perf_counter()
+    for i in range(videos):
+        marker = {"text": f"話題番号{i}について", "start": 0.0}
+        index.index_video(f"v{i:010d}", dumps[i % len(dumps)] + [marker], language="ja")
+    return index, time.perf_counter() - t0
+
+
+def query_set(rng, count, videos):
+    """検索語の種類ごとのクエリ（合成字幕の語彙から選ぶ）"""
+    words = [w for w in _CAPTION_WORDS_JA if len(w) >= 3] or list(_CAPTION_WORDS_JA)
+    short = [w[:2] for w in _CAPTION_WORDS_JA if len(w) >= 2]
+    return {
+        "term": [rng.choice(words) for _ in range(count)],
+        "two_terms": [f"{rng.choice(words)} {rng.choice(words)}" for _ in range(count)],
+        "rare": [f"話題番号{rng.randrange(videos)}について" for _ in range(count)],
+        "like_short": [rng.choice(short) for _ in range(count)],
+        "no_hit": [f"存在しない語{i}" for i in range(count)],
+    }
+
+
+def _percentile(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def bench_queries(index, queries, per_page, page):
+    rows = {}
+    for kind, items in queries.items():
+        latencies, hits = [], 0
+        for query in items:
+            t0 = time.perf_counter()
+            result = index.search(query, page=page, per_page=per_page)
+            latencies.append(time.perf_counter() - t0)
+            hits += len(result["results"])
+        rows[kind] = {
+            "p50_ms": round(_percentile(latencies, 0.5) * 1000, 3),
+            "p99_ms": round(_percentile(latencies, 0.99) * 1000, 3),
+            "avg_hits": round(hits / len(items), 1),
+        }
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="字幕の全文検索のベンチマーク")
+    parser.add_argument("--videos", nargs="+", type=int, default=[1000, 20000])
+    parser.add_argument("--segments", type=int, default=200, help="1本あたりのセグメント数")
+    parser.add_argument("--queries", type=int, default=200, help="種類ごとのクエリ数")
+    parser.add_argument("--per-page", type=int, default=transcript_search.DEFAULT_PER_PAGE)
+    parser.add_argument("--page", type=int, default=1)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="結果JSONの出力先")
+    args = parser.parse_args()
+
+    rows = []
+    for videos in args.videos:
+        rng = random.Random(args.seed)
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "search.sqlite3")
+            index, elapsed = build_index(path, rng, videos, args.segments)
+            size = sum(p.stat().st_size for p in Path(tmp).iterdir())
+            queries = bench_queries(index, query_set(rng, args.queries, videos), args.per_page, args.page)
+            index.close()
+        rows.append(
+            {
+                "videos": videos,
+                "segments": videos * args.segments,
+                "index_videos_per_s": round(videos / elapsed, 1),
+                "mb": round(size / 1e6, 1),
+                "queries": queries,
+            }
+        )
+
+    print(f"{'videos':>7} {'segments':>9} {'idx/s':>8} {'MB':>7}  "
+          f"{'query':<11} {'p50 ms':>8} {'p99 ms':>8} {'hits':>6}")
+    for row in rows:
+        for kind, q in row["queries"].items():
+            print(
+                f"{row['videos']:>7} {row['segments']:>9} {row['index_videos_per_s']:>8} "
+                f"{row['mb']:>7}  {kind:<11} {q['p50_ms']:>8} {q['p99_ms']:>8} {q['avg_hits']:>6}"
+            )
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(rows, ensure_ascii=False, indent=2), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
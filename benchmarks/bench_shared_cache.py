@@ -0,0 +1,120 @@
+"""
+プロセス間の共有キャッシュ（cache_sqlite）のベンチマーク
+
+gunicorn のワーカーを模した複数プロセスが、人気に偏り（Zipf分布）のある動画IDを
+get_or_load で引く。プロセス内キャッシュ（memory）と共有キャッシュ（sqlite）で、
+ワーカー数ごとのヒット率・1回の取得のレイテンシ（p50/p99）・上流（loader）の呼び出し回数を比べる。
+
+例:
+    python -m benchmarks.bench_shared_cache --workers 1 2 4 8 --requests 2000
+    python -m benchmarks.bench_shared_cache --keys 5000 --loader-ms 5 --output shared_cache.json
+"""
+
+import argparse
+import json
+import multiprocessing
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import cache  # noqa: E402
+import cache_sqlite  # noqa: E402
+
+
+def _zipf_keys(count, keys, seed):
+    rng = random.Random(seed)
+    weights = [1 / (rank + 1) for rank in range(keys)]
+    return [f"video-{k}" for k in rng.choices(range(keys), weights=weights, k=count)]
+
+
+def _worker(backend, path, requests, keys, loader_ms, seed, results):
+    if backend == "sqlite":
+        c = cache_sqlite.SQLiteCache("bench", maxsize=keys, ttl=3600, path=path)
+    else:
+        c = cache.TTLCache("bench", maxsize=keys, ttl=3600)
+    loads = 0
+
+    def loader(key):
+        nonlocal loads
+        loads += 1
+        time.sleep(loader_ms / 1000)
+        return {"title": f"タイトル {key}", "languages": ["ja", "en"]}
+
+    latencies = []
+    for key in _zipf_keys(requests, keys, seed):
+        t0 = time.perf_counter()
+        c.get_or_load(key, lambda: loader(key))
+        latencies.append(time.perf_counter() - t0)
+    results.put({"hits": c.hits, "misses": c.misses, "loads": loads, "latencies": latencies})
+
+
+def percentile(values, p):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))]
+
+
+def run(backend, workers, requests, keys, loader_ms):
+    with tempfile.TemporaryDirectory() as tmp:
+        path = str(Path(tmp) / "cache.sqlite3")
+        results = multiprocessing.Queue()
+        processes = [
+            multiprocessing.Process(
+                target=_worker, args=(backend, path, requests, keys, loader_ms, seed, results)
+            )
+            for seed in range(workers)
+        ]
+        started = time.perf_counter()
+        for process in processes:
+            process.start()
+        collected = [results.get() for _ in processes]
+        for process in processes:
+            process.join()
+        elapsed = time.perf_counter() - started
+
+    hits = sum(r["hits"] for r in collected)
+    total = hits + sum(r["misses"] for r in collected)
+    latencies = [value for r in collected for value in r["latencies"]]
+    return {
+        "backend": backend,
+        "workers": workers,
+        "hit_rate": round(hits / total, 3),
+        "upstream_calls": sum(r["loads"] for r in collected),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 3),
+        "requests_per_s": round(total / elapsed),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="プロセス内キャッシュと共有キャッシュのベンチマーク")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8], help="ワーカー（プロセス）数")
+    parser.add_argument("--requests", type=int, default=2000, help="1ワーカーあたりのリクエスト数")
+    parser.add_argument("--keys", type=int, default=2000, help="動画IDの種類数（キャッシュの上限も同じ）")
+    parser.add_argument("--loader-ms", type=float, default=2.0, help="上流の取得にかかる時間（ミリ秒）")
+    parser.add_argument("--backends", nargs="+", default=["memory", "sqlite"])
+    parser.add_argument("--output", help="結果JSONの出力先")
+    args = parser.parse_args()
+
+    rows = []
+    for workers in args.workers:
+        for backend in args.backends:
+            rows.append(run(backend, workers, args.requests, args.keys, args.loader_ms))
+
+    print(f"{'backend':<8} {'workers':>7} {'hit rate':>9} {'upstream':>9} {'p50 ms':>8} {'p99 ms':>8} {'req/s':>8}")
+    for row in rows:
+        print(
+            f"{row['backend']:<8} {row['workers']:>7} {row['hit_rate']:>9.3f} "
+            f"{row['upstream_calls']:>9} {row['p50_ms']:>8.3f} {row['p99_ms']:>8.3f} "
+            f"{row['requests_per_s']:>8}"
+        )
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(rows, ensure_ascii=False, indent=2), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""
+抽出型要約（extractive_summarizer）のベンチマーク
+
+合成字幕（または実際の字幕ダンプ）を指定文字数に切り出し、
+文分割・TF-IDF・類似度行列・TextRank・MMR の各段階と全体の処理時間を計測する。
+
+例:
+    python -m benchmarks.bench_summarizer --chars 10000 100000 --lang ja en
+    python -m benchmarks.bench_summarizer --input transcript_xxx.json --chars 100000
+"""
+
+import argparse
+import json
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import numpy as np  # noqa: E402
+
+import extractive_summarizer as es  # noqa: E402
+from benchmarks.bench_cleaner import load_dump  # noqa: E402
+from benchmarks.fake_upstreams import generate_caption_dump  # noqa: E402
+
+
+def synthetic_text(rng, lang, chars):
+    """指定文字数以上の合成字幕テキスト"""
+    parts, total = [], 0
+    while total < chars:
+        segments = generate_caption_dump(rng, 2000, lang)
+        text = " ".join(s["text"] for s in segments)
+        parts.append(text)
+        total += len(text)
+    return " ".join(parts)[:chars]
+
+
+def _timed(func, *args):
+    t0 = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - t0
+
+
+def bench_text(name, text, repeat):
+    """段階ごとの最良時間（ミリ秒）を計測"""
+    stages = {"split": [], "tfidf": [], "similarity": [], "textrank": [], "mmr": [], "total": []}
+    for _ in range(repeat):
+        sentences, elapsed = _timed(es.split_sentences, text)
+        stages["split"].append(elapsed)
+        matrix, elapsed = _timed(es.tfidf_matrix, sentences)
+        stages["tfidf"].append(elapsed)
+        similarity, elapsed = _timed(np.matmul, matrix, matrix.T)
+        stages["similarity"].append(elapsed)
+        scores, elapsed = _timed(es.textrank, similarity)
+        stages["textrank"].append(elapsed)
+        lengths = np.array([len(s) for s in sentences])
+        _, elapsed = _timed(
+            es.mmr_select, scores, similarity, es.DEFAULT_MAX_SENTENCES, lengths,
+            es.DEFAULT_MAX_CHARS,
+        )
+        stages["mmr"].append(elapsed)
+        summary, elapsed = _timed(es.summarize, text)
+        stages["total"].append(elapsed)
+
+    return {
+        "input": name,
+        "chars": len(text),
+        "sentences": len(sentences),
+        "features": matrix.shape[1],
+        "summary_chars": len(summary),
+        "best_ms": {stage: round(min(t) * 1000, 2) for stage, t in stages.items()},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="抽出型要約のベンチマーク")
+    parser.add_argument("--chars", nargs="+", type=int, default=[10_000, 100_000])
+    parser.add_argument("--lang", nargs="+", default=["ja", "en"], choices=["ja", "en"])
+    parser.add_argument("--input", nargs="*", default=[], help="実際の字幕ダンプ（JSON）")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="結果JSONの出力先")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    inputs = []
+    for lang in args.lang:
+        for chars in args.chars:
+            inputs.append((f"synthetic-{lang}-{chars}", synthetic_text(rng, lang, chars)))
+    for path in args.input:
+        text = load_dump(path)
+        for chars in args.chars:
+            inputs.append((f"{Path(path).name}-{chars}", text[:chars]))
+
+    rows = [bench_text(name, text, args.repeat) for name, text in inputs]
+
+    print(f"{'input':<24} {'chars':>8} {'sents':>6} {'feats':>6} "
+          f"{'split':>7} {'tfidf':>7} {'sim':>7} {'rank':>7} {'mmr':>7} {'total':>8}")
+    for row in rows:
+        ms = row["best_ms"]
+        print(
+            f"{row['input']:<24} {row['chars']:>8} {row['sentences']:>6} {row['features']:>6} "
+            f"{ms['split']:>7} {ms['tfidf']:>7} {ms['similarity']:>7} {ms['textrank']:>7} "
+            f"{ms['mmr']:>7} {ms['total']:>8}"
+        )
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(rows, ensure_ascii=False, indent=2), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,440 @@
+"""
+YouTube・YouTube Data API・Gemini のローカル代替サーバー
+
+エンドポイントごとにレイテンシ・エラー率・ペイロードサイズの分布を設定できる。
+youtube-transcript-api が叩く watch ページ → innertube player → timedtext の流れと、
+videos.list / generateContent のレスポンス形式を再現する。
+
+単体起動:
+    python -m benchmarks.fake_upstreams --port 9100 --latency gemini=lognormal:800,0.5
+"""
+
+import argparse
+import json
+import logging
+import math
+import random
+import re
+import threading
+import time
+from html import escape
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+logger = logging.getLogger(__name__)
+
+# エンドポイントグループ
+ENDPOINTS = ("watch", "player", "timedtext", "videos", "gemini")
+
+DEFAULT_CONFIG = {
+    "latency": {
+        "watch": "lognormal:150,0.4",
+        "player": "lognormal:120,0.4",
+        "timedtext": "lognormal:200,0.5",
+        "videos": "lognormal:80,0.3",
+        "gemini": "lognormal:1500,0.6",
+    },
+    "error_rate": {endpoint: 0.0 for endpoint in ENDPOINTS},
+    "error_status": {
+        "watch": 429,
+        "player": 429,
+        "timedtext": 429,
+        "videos": 403,
+        "gemini": 503,
+    },
+    # 字幕セグメント数（動画の長さに相当）
+    "segments": "lognormal:600,0.7",
+    # 1セグメントあたりの文字数
+    "segment_chars": "uniform:8,40",
+    # Geminiの出力文字数
+    "gemini_output_chars": "lognormal:800,0.4",
+    "seed": None,
+}
+
+# 自動生成字幕らしい語彙（ノイズタグ・フィラー・重複を含む）
+_CAPTION_WORDS_JA = [
+    "今日は", "皆さん", "こんにちは", "えー", "あの", "まあ", "ですね", "という",
+    "ことで", "やっていきたい", "と思います", "それで、", "で、", "そして、",
+    "これが", "ポイントで", "実際に", "見てみると", "なんですけど", "はい",
+    "次に", "こちらの", "設定を", "変更して", "確認します", "。", "。", "、",
+]
+_CAPTION_WORDS_EN = [
+    "so", "um", "uh", "today", "we're", "going", "to", "talk", "about", "the",
+    "new", "feature", "and", "you", "know", "basically", "this", "is", "how",
+    "it", "works", "right", "okay", "let's", "look", "at", "example", ".",
+]
+_NOISE_TAGS = ["[音楽]", "[拍手]", "[笑い]", "[Music]", "[Applause]"]
+
+
+class Distribution:
+    """"kind:param,param" 形式の文字列で表した確率分布
+
+    fixed:V / uniform:LO,HI / normal:MEAN,SD / lognormal:MEDIAN,SIGMA / exp:MEAN
+    """
+
+    def __init__(self, spec):
+        self.spec = str(spec)
+        kind, _, params = self.spec.partition(":")
+        self.kind = kind.strip().lower()
+        self.params = [float(p) for p in params.split(",") if p.strip()]
+        if self.kind not in ("fixed", "uniform", "normal", "lognormal", "exp"):
+            raise ValueError(f"Unknown distribution: {spec}")
+
+    def sample(self, rng):
+        p = self.params
+        if self.kind == "fixed":
+            value = p[0]
+        elif self.kind == "uniform":
+            value = rng.uniform(p[0], p[1])
+        elif self.kind == "normal":
+            value = rng.gauss(p[0], p[1])
+        elif self.kind == "lognormal":
+            value = rng.lognormvariate(math.log(p[0]), p[1])
+        else:
+            value = rng.expovariate(1.0 / p[0])
+        return max(0.0, value)
+
+    def __repr__(self):
+        return f"Distribution({self.spec!r})"
+
+
+def build_config(overrides=None):
+    """デフォルト設定に上書き設定をマージ"""
+    config = json.loads(json.dumps(DEFAULT_CONFIG))
+    for key, value in (overrides or {}).items():
+        if isinstance(value, dict) and isinstance(config.get(key), dict):
+            config[key].update(value)
+        else:
+            config[key] = value
+    return config
+
+
+def generate_caption_segments(rng, count, chars_dist, lang="ja"):
+    """自動生成字幕風のセグメントを生成"""
+    words = _CAPTION_WORDS_JA if lang == "ja" else _CAPTION_WORDS_EN
+    separator = "" if lang == "ja" else " "
+    segments = []
+    start = 0.0
+    previous_tail = []
+    for _ in range(int(count)):
+        target = max(1, int(chars_dist.sample(rng)))
+        tokens = []
+        # 自動字幕では前のセグメント末尾が次の先頭に重複することがある
+        if previous_tail and rng.random() < 0.2:
+            tokens.extend(previous_tail)
+        if rng.random() < 0.05:
+            tokens.append(rng.choice(_NOISE_TAGS))
+        while len(separator.join(tokens)) < target:
+            tokens.append(rng.choice(words))
+        duration = round(rng.uniform(1.2, 4.5), 3)
+        segments.append(
+            {"text": separator.join(tokens), "start": round(start, 3), "duration": duration}
+        )
+        previous_tail = tokens[-2:]
+        # 発話の間（段落の切れ目に相当する長めの間も時々入る）
+        start += duration + (rng.uniform(2.0, 6.0) if rng.random() < 0.03 else 0.0)
+    return segments
+
+
+def generate_caption_dump(rng, count, lang="ja"):
+    """ベンチマーク用の字幕ダンプ（セグメントのリスト）を生成"""
+    return generate_caption_segments(
+        rng, count, Distribution(DEFAULT_CONFIG["segment_chars"]), lang
+    )
+
+
+class FakeUpstreamServer:
+    """YouTube/Data API/Geminiの代替HTTPサーバー（スレッドで起動）"""
+
+    def __init__(self, host="127.0.0.1", port=0, config=None):
+        self.config = build_config(config)
+        seed = self.config.get("seed")
+        self._rng = random.Random(seed)
+        self._rng_lock = threading.Lock()
+        self._counter_lock = threading.Lock()
+        self._latency = {
+            name: Distribution(spec) for name, spec in self.config["latency"].items()
+        }
+        self._segments = Distribution(self.config["segments"])
+        self._segment_chars = Distribution(self.config["segment_chars"])
+        self._gemini_chars = Distribution(self.config["gemini_output_chars"])
+        self.counters = {endpoint: 0 for endpoint in ENDPOINTS}
+        self.errors = {endpoint: 0 for endpoint in ENDPOINTS}
+        self._httpd = ThreadingHTTPServer((host, port), self._make_handler())
+        self._httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        logger.info(f"Fake upstreams listening on {self.url}")
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def stats(self):
+        return {"requests": dict(self.counters), "injected_errors": dict(self.errors)}
+
+    def _sample(self, dist):
+        with self._rng_lock:
+            return dist.sample(self._rng)
+
+    def _should_fail(self, endpoint):
+        rate = float(self.config["error_rate"].get(endpoint, 0.0))
+        if rate <= 0:
+            return False
+        with self._rng_lock:
+            return self._rng.random() < rate
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            # ヘッダーとボディの分割送信でDelayed ACK待ちが発生しないようにする
+            disable_nagle_algorithm = True
+
+            def log_message(self, format, *args):
+                logger.debug(format % args)
+
+            def do_GET(self):
+                self._dispatch("GET")
+
+            def do_POST(self):
+                self._dispatch("POST")
+
+            def _dispatch(self, method):
+                parsed = urlparse(self.path)
+                length = int(self.headers.get("Content-Length") or 0)
+                body = self.rfile.read(length) if length else b""
+
+                if parsed.path == "/watch":
+                    endpoint, handler = "watch", server._watch_page
+                elif parsed.path.startswith("/youtubei/v1/player"):
+                    endpoint, handler = "player", server._player
+                elif parsed.path == "/api/timedtext":
+                    endpoint, handler = "timedtext", server._timedtext
+                elif parsed.path.endswith("/videos"):
+                    endpoint, handler = "videos", server._videos
+                elif re.search(r"/models/[^/:]+:generateContent$", parsed.path):
+                    endpoint, handler = "gemini", server._generate_content
+                else:
+                    self._send(404, b"not found", "text/plain")
+                    return
+
+                with server._counter_lock:
+                    server.counters[endpoint] += 1
+                time.sleep(server._sample(server._latency[endpoint]) / 1000.0)
+
+                if server._should_fail(endpoint):
+                    with server._counter_lock:
+                        server.errors[endpoint] += 1
+                    status = int(server.config["error_status"].get(endpoint, 503))
+                    payload = json.dumps(
+                        {"error": {"code": status, "message": "injected error"}}
+                    ).encode()
+                    self._send(status, payload, "application/json", {"Retry-After": "1"})
+                    return
+
+                status, payload, content_type = handler(parsed, body)
+                self._send(status, payload, content_type)
+
+            def _send(self, status, payload, content_type, extra_headers=None):
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(payload)))
+                for name, value in (extra_headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(payload)
+
+        return Handler
+
+    # ==== YouTube（youtube-transcript-api が参照する経路） ====
+
+    def _watch_page(self, parsed, body):
+        video_id = parse_qs(parsed.query).get("v", [""])[0]
+        html = (
+            "<!DOCTYPE html><html><head><title>fake</title></head><body>"
+            f'<script>var ytcfg={{"INNERTUBE_API_KEY":"fake-innertube-key",'
+            f'"VIDEO_ID":"{escape(video_id)}"}};</script>'
+            "</body></html>"
+        )
+        return 200, html.encode("utf-8"), "text/html; charset=utf-8"
+
+    def _player(self, parsed, body):
+        try:
+            video_id = json.loads(body or b"{}").get("videoId", "")
+        except ValueError:
+            video_id = ""
+        tracks = []
+        for lang, name, kind in (("ja", "日本語", "asr"), ("en", "English", "")):
+            track = {
+                "baseUrl": f"https://www.youtube.com/api/timedtext?v={video_id}&lang={lang}",
+                "name": {"runs": [{"text": name}], "simpleText": name},
+                "languageCode": lang,
+                "isTranslatable": True,
+            }
+            if kind:
+                track["kind"] = kind
+            tracks.append(track)
+        data = {
+            "playabilityStatus": {"status": "OK"},
+            "captions": {
+                "playerCaptionsTracklistRenderer": {
+                    "captionTracks": tracks,
+                    "translationLanguages": [
+                        {"languageCode": "en", "languageName": {"runs": [{"text": "English"}]}}
+                    ],
+                }
+            },
+        }
+        return 200, json.dumps(data).encode(), "application/json"
+
+    def _timedtext(self, parsed, body):
+        params = parse_qs(parsed.query)
+        lang = params.get("lang", ["ja"])[0]
+        with self._rng_lock:
+            count = self._segments.sample(self._rng)
+            segments = generate_caption_segments(
+                self._rng, max(1, count), self._segment_chars, lang
+            )
+        lines = ['<?xml version="1.0" encoding="utf-8" ?><transcript>']
+        for seg in segments:
+            lines.append(
+                f'<text start="{seg["start"]}" dur="{seg["duration"]}">'
+                f"{escape(seg['text'])}</text>"
+            )
+        lines.append("</transcript>")
+        return 200, "".join(lines).encode("utf-8"), "text/xml; charset=utf-8"
+
+    # ==== YouTube Data API v3 ====
+
+    def _videos(self, parsed, body):
+        video_id = parse_qs(parsed.query).get("id", [""])[0]
+        data = {
+            "kind": "youtube#videoListResponse",
+            "items": [
+                {
+                    "kind": "youtube#video",
+                    "id": video_id,
+                    "snippet": {
+                        "title": f"Fake video {video_id}",
+                        "channelTitle": "Fake channel",
+                    },
+                }
+            ],
+        }
+        return 200, json.dumps(data).encode(), "application/json"
+
+    # ==== Gemini generateContent ====
+
+    def _generate_content(self, parsed, body):
+        try:
+            request = json.loads(body or b"{}")
+            prompt_chars = sum(
+                len(part.get("text", ""))
+                for content in request.get("contents", [])
+                for part in content.get("parts", [])
+            )
+        except ValueError:
+            prompt_chars = 0
+        output_chars = max(1, int(self._sample(self._gemini_chars)))
+        text = ("・要点のサンプル出力です。" * (output_chars // 12 + 1))[:output_chars]
+        data = {
+            "candidates": [
+                {
+                    "content": {"parts": [{"text": text}], "role": "model"},
+                    "finishReason": "STOP",
+                    "index": 0,
+                }
+            ],
+            "usageMetadata": {
+                "promptTokenCount": prompt_chars,
+                "candidatesTokenCount": output_chars,
+                "totalTokenCount": prompt_chars + output_chars,
+            },
+        }
+        return 200, json.dumps(data, ensure_ascii=False).encode("utf-8"), "application/json"
+
+
+def parse_endpoint_options(values, cast=str):
+    """["gemini=lognormal:800,0.5", ...] を {"gemini": ...} に変換"""
+    result = {}
+    for value in values or []:
+        name, _, spec = value.partition("=")
+        if name not in ENDPOINTS:
+            raise ValueError(f"Unknown endpoint '{name}' (choose from {', '.join(ENDPOINTS)})")
+        result[name] = cast(spec)
+    return result
+
+
+def add_upstream_arguments(parser):
+    """代替サーバー設定用の共通CLI引数を追加"""
+    parser.add_argument("--upstream-config", help="JSON設定ファイル")
+    parser.add_argument(
+        "--latency", action="append", metavar="ENDPOINT=DIST",
+        help="例: gemini=lognormal:800,0.5 / videos=fixed:50",
+    )
+    parser.add_argument(
+        "--error-rate", action="append", metavar="ENDPOINT=RATE",
+        help="例: gemini=0.05",
+    )
+    parser.add_argument("--segments", help="字幕セグメント数の分布（例: lognormal:600,0.7）")
+    parser.add_argument("--gemini-output-chars", help="Gemini出力文字数の分布")
+    parser.add_argument("--seed", type=int, help="乱数シード")
+
+
+def config_from_args(args):
+    """CLI引数から代替サーバー設定を構築"""
+    overrides = {}
+    if args.upstream_config:
+        with open(args.upstream_config, encoding="utf-8") as f:
+            overrides.update(json.load(f))
+    if args.latency:
+        overrides.setdefault("latency", {}).update(parse_endpoint_options(args.latency))
+    if args.error_rate:
+        overrides.setdefault("error_rate", {}).update(
+            parse_endpoint_options(args.error_rate, float)
+        )
+    if args.segments:
+        overrides["segments"] = args.segments
+    if args.gemini_output_chars:
+        overrides["gemini_output_chars"] = args.gemini_output_chars
+    if args.seed is not None:
+        overrides["seed"] = args.seed
+    return build_config(overrides)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="YouTube/Gemini代替サーバー")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9100)
+    add_upstream_arguments(parser)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    server = FakeUpstreamServer(args.host, args.port, config_from_args(args)).start()
+    print(f"Fake upstreams: {server.url}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
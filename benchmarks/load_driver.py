@@ -0,0 +1,165 @@
+"""
+HTTP負荷生成とレイテンシ集計
+
+ワーカースレッドごとにkeep-alive接続を保持し、指定並列度でリクエストを送り続ける。
+"""
+
+import http.client
+import json
+import threading
+import time
+from urllib.parse import urlsplit
+
+
+def percentile(sorted_values, pct):
+    """ソート済みリストのパーセンタイル（線形補間）"""
+    if not sorted_values:
+        return None
+    if len(sorted_values) == 1:
+        return sorted_values[0]
+    rank = (len(sorted_values) - 1) * pct / 100.0
+    lower = int(rank)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    weight = rank - lower
+    return sorted_values[lower] * (1 - weight) + sorted_values[upper] * weight
+
+
+def summarize_latencies(latencies_ms):
+    """レイテンシ（ミリ秒）のリストから統計値を計算"""
+    values = sorted(latencies_ms)
+    if not values:
+        return {"count": 0}
+    return {
+        "count": len(values),
+        "mean": round(sum(values) / len(values), 3),
+        "min": round(values[0], 3),
+        "p50": round(percentile(values, 50), 3),
+        "p95": round(percentile(values, 95), 3),
+        "p99": round(percentile(values, 99), 3),
+        "max": round(values[-1], 3),
+    }
+
+
+class LoadResult:
+    """1シナリオ分の計測結果"""
+
+    def __init__(self):
+        self.latencies_ms = []
+        self.status_counts = {}
+        self.errors = 0
+        self.bytes_received = 0
+        self.elapsed = 0.0
+        self._lock = threading.Lock()
+
+    def record(self, latency_ms, status, size):
+        with self._lock:
+            self.latencies_ms.append(latency_ms)
+            self.status_counts[status] = self.status_counts.get(status, 0) + 1
+            self.bytes_received += size
+            if status == "error" or not 200 <= int(status) < 300:
+                self.errors += 1
+
+    def to_dict(self):
+        completed = len(self.latencies_ms)
+        return {
+            "requests": completed,
+            "errors": self.errors,
+            "error_rate": round(self.errors / completed, 4) if completed else 0.0,
+            "elapsed_seconds": round(self.elapsed, 3),
+            "throughput_rps": round(completed / self.elapsed, 3) if self.elapsed else 0.0,
+            "bytes_received": self.bytes_received,
+            "status_counts": {str(k): v for k, v in self.status_counts.items()},
+            "latency_ms": summarize_latencies(self.latencies_ms),
+        }
+
+
+def run_load(
+    base_url,
+    path,
+    payload_factory=None,
+    method="POST",
+    headers=None,
+    concurrency=4,
+    total_requests=None,
+    duration=None,
+    timeout=300,
+):
+    """指定並列度で負荷をかけ、LoadResultを返す
+
+    total_requests と duration のどちらか（両方なら先に達した方）で終了する。
+    payload_factory(i) は i 番目のリクエストボディ（dict）を返す。
+    """
+    if total_requests is None and duration is None:
+        raise ValueError("total_requests or duration is required")
+
+    target = urlsplit(base_url)
+    request_headers = {"Content-Type": "application/json", "Accept-Encoding": "gzip"}
+    request_headers.update(headers or {})
+
+    result = LoadResult()
+    counter_lock = threading.Lock()
+    issued = [0]
+    started = time.perf_counter()
+    deadline = started + duration if duration else None
+
+    def next_index():
+        with counter_lock:
+            if total_requests is not None and issued[0] >= total_requests:
+                return None
+            if deadline is not None and time.perf_counter() >= deadline:
+                return None
+            issued[0] += 1
+            return issued[0] - 1
+
+    def worker():
+        conn = None
+        while True:
+            index = next_index()
+            if index is None:
+                break
+            body = None
+            if payload_factory is not None:
+                body = json.dumps(payload_factory(index), ensure_ascii=False).encode("utf-8")
+            if conn is None:
+                conn = http.client.HTTPConnection(target.hostname, target.port, timeout=timeout)
+            t0 = time.perf_counter()
+            try:
+                conn.request(method, path, body=body, headers=request_headers)
+                response = conn.getresponse()
+                data = response.read()
+                status = response.status
+                if response.getheader("Connection", "").lower() == "close":
+                    conn.close()
+                    conn = None
+            except (OSError, http.client.HTTPException):
+                data, status = b"", "error"
+                if conn is not None:
+                    conn.close()
+                conn = None
+            result.record((time.perf_counter() - t0) * 1000.0, status, len(data))
+        if conn is not None:
+            conn.close()
+
+    threads = [threading.Thread(target=worker, daemon=True) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    result.elapsed = time.perf_counter() - started
+    return result
+
+
+def wait_until_ready(base_url, path="/", timeout=60.0):
+    """サーバーが応答するまで待機"""
+    target = urlsplit(base_url)
+    end = time.time() + timeout
+    while time.time() < end:
+        try:
+            conn = http.client.HTTPConnection(target.hostname, target.port, timeout=2)
+            conn.request("GET", path)
+            conn.getresponse().read()
+            conn.close()
+            return True
+        except (OSError, http.client.HTTPException):
+            time.sleep(0.2)
+    return False
@@ -0,0 +1,319 @@
+"""
+ワーカー構成比較用の負荷試験ハーネス
+
+app:app を sync / gthread / gevent / ASGI（uvicorn WSGIインターフェース）で、
+ASGI版の app_async:app と app_hybrid:app を uvicorn の N ワーカーで起動し、代替サーバーを相手に
+並列度を段階的に上げながら飽和スループット・テールレイテンシ・メモリを計測する。
+
+例:
+    python -m benchmarks.load_test --sleep-scale 0.1 --steps 1 2 4 8 16 32 64 \\
+        --output load_test.json
+    python -m benchmarks.load_test --configs gthread-1x8 gthread-2x8 hybrid-uvicorn-2
+"""
+
+import argparse
+import importlib.util
+import json
+import logging
+import os
+import subprocess
+import sys
+import threading
+import time
+from pathlib import Path
+
+from benchmarks.fake_upstreams import (FakeUpstreamServer, add_upstream_arguments,
+                                       config_from_args)
+from benchmarks.load_driver import run_load, wait_until_ready
+from benchmarks.run_benchmarks import (HEALTH_PATHS, REPO_ROOT, build_scenarios,
+                                       free_port, git_revision)
+
+logger = logging.getLogger(__name__)
+
+BENCH_APP = "benchmarks.bench_app:app"
+
+# 名前 → (対象アプリ, 必要モジュール, 起動コマンド生成関数)
+SERVER_CONFIGS = {
+    "sync-4": (
+        "app", "gunicorn",
+        lambda port: ["gunicorn", "-k", "sync", "--workers", "4", "--bind", f"127.0.0.1:{port}",
+                      "--timeout", "0", BENCH_APP],
+    ),
+    "gthread-1x8": (
+        "app", "gunicorn",
+        # 現行Dockerfileと同じ構成
+        lambda port: ["gunicorn", "-k", "gthread", "--workers", "1", "--threads", "8",
+                      "--bind", f"127.0.0.1:{port}", "--timeout", "0", BENCH_APP],
+    ),
+    "gthread-2x8": (
+        "app", "gunicorn",
+        lambda port: ["gunicorn", "-k", "gthread", "--workers", "2", "--threads", "8",
+                      "--bind", f"127.0.0.1:{port}", "--timeout", "0", BENCH_APP],
+    ),
+    "gthread-1x32": (
+        "app", "gunicorn",
+        lambda port: ["gunicorn", "-k", "gthread", "--workers", "1", "--threads", "32",
+                      "--bind", f"127.0.0.1:{port}", "--timeout", "0", BENCH_APP],
+    ),
+    "gevent-1": (
+        "app", "gevent",
+        lambda port: ["gunicorn", "-k", "gevent", "--workers", "1", "--worker-connections",
+                      "1000", "--bind", f"127.0.0.1:{port}", "--timeout", "0", BENCH_APP],
+    ),
+    "asgi-wsgi-1": (
+        "app", "uvicorn",
+        lambda port: ["uvicorn", "--interface", "wsgi", "--workers", "1", "--host",
+                      "127.0.0.1", "--port", str(port), "--log-level", "warning", BENCH_APP],
+    ),
+    "async-uvicorn-1": (
+        "app_async", "uvicorn",
+        lambda port: ["uvicorn", "--workers", "1", "--host", "127.0.0.1", "--port", str(port),
+                      "--log-level", "warning", BENCH_APP],
+    ),
+    "hybrid-uvicorn-1": (
+        "app_hybrid", "uvicorn",
+        lambda port: ["uvicorn", "--workers", "1", "--host", "127.0.0.1", "--port", str(port),
+                      "--log-level", "warning", BENCH_APP],
+    ),
+    "hybrid-uvicorn-2": (
+        "app_hybrid", "uvicorn",
+        lambda port: ["uvicorn", "--workers", "2", "--host", "127.0.0.1", "--port", str(port),
+                      "--log-level", "warning", BENCH_APP],
+    ),
+    "hybrid-uvicorn-4": (
+        "app_hybrid", "uvicorn",
+        lambda port: ["uvicorn", "--workers", "4", "--host", "127.0.0.1", "--port", str(port),
+                      "--log-level", "warning", BENCH_APP],
+    ),
+}
+
+# アプリごとに負荷をかけるシナリオ
+DEFAULT_SCENARIOS = {"app": "extract_url", "app_async": "extract_url", "app_hybrid": "summarize"}
+
+
+def _rss_kb(pid):
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return 0
+
+
+def _process_tree(root_pid):
+    """/proc を走査して root_pid 配下の全プロセスIDを返す（Linuxのみ）"""
+    children = {}
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                # comm に空白や括弧が含まれても良いよう最後の ')' 以降を解析する
+                fields = f.read().rsplit(")", 1)[1].split()
+            children.setdefault(int(fields[1]), []).append(int(entry))
+        except (OSError, IndexError, ValueError):
+            continue
+    pids, stack = [], [root_pid]
+    while stack:
+        pid = stack.pop()
+        pids.append(pid)
+        stack.extend(children.get(pid, []))
+    return pids
+
+
+def tree_rss_mb(root_pid):
+    """プロセスツリー全体のRSS（MB）"""
+    if not os.path.isdir("/proc"):
+        return None
+    return round(sum(_rss_kb(pid) for pid in _process_tree(root_pid)) / 1024.0, 1)
+
+
+class MemorySampler:
+    """計測中のプロセスツリーRSSのピークを記録"""
+
+    def __init__(self, pid, interval=0.5):
+        self.pid = pid
+        self.interval = interval
+        self.peak_mb = 0.0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.is_set():
+            rss = tree_rss_mb(self.pid)
+            if rss is not None:
+                self.peak_mb = max(self.peak_mb, rss)
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+
+def start_server(name, upstream_url, sleep_scale):
+    target, _, command = SERVER_CONFIGS[name]
+    port = free_port()
+    env = dict(os.environ)
+    env.update(
+        {
+            "BENCH_TARGET_APP": target,
+            "BENCH_UPSTREAM_URL": upstream_url,
+            "BENCH_SLEEP_SCALE": str(sleep_scale),
+            "PYTHONPATH": str(REPO_ROOT),
+        }
+    )
+    process = subprocess.Popen(command(port), cwd=REPO_ROOT, env=env)
+    base_url = f"http://127.0.0.1:{port}"
+    if not wait_until_ready(base_url, HEALTH_PATHS[target], timeout=90):
+        process.terminate()
+        raise RuntimeError(f"{name} did not become ready on {base_url}")
+    return process, base_url
+
+
+def run_config(name, args, upstream, scenarios):
+    """1構成について並列度を段階的に上げて計測"""
+    target = SERVER_CONFIGS[name][0]
+    scenario_name = DEFAULT_SCENARIOS[target]
+    _, path, payload_factory, headers = next(
+        s for s in scenarios[target] if s[0] == scenario_name
+    )
+
+    process, base_url = start_server(name, upstream.url, args.sleep_scale)
+    steps = []
+    try:
+        idle_mb = tree_rss_mb(process.pid)
+        best = 0.0
+        flat_steps = 0
+        for concurrency in args.steps:
+            with MemorySampler(process.pid) as sampler:
+                load = run_load(
+                    base_url, path, payload_factory,
+                    headers=headers,
+                    concurrency=concurrency,
+                    total_requests=max(args.min_requests, concurrency * args.requests_per_worker),
+                    duration=args.step_duration,
+                )
+            step = {"concurrency": concurrency, "peak_rss_mb": sampler.peak_mb}
+            step.update(load.to_dict())
+            steps.append(step)
+            latency = step["latency_ms"]
+            print(
+                f"  [{name}] c={concurrency:<4} {step['throughput_rps']:>8} req/s  "
+                f"p95={latency.get('p95')}ms p99={latency.get('p99')}ms "
+                f"err={step['error_rate']} rss={sampler.peak_mb}MB",
+                file=sys.stderr,
+            )
+
+            if step["error_rate"] > args.max_error_rate:
+                break
+            # スループットが伸びなくなったら飽和とみなす
+            if step["throughput_rps"] > best * (1 + args.saturation_gain):
+                best = step["throughput_rps"]
+                flat_steps = 0
+            else:
+                flat_steps += 1
+                if flat_steps >= 2:
+                    break
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=15)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+    ok_steps = [s for s in steps if s["error_rate"] <= args.max_error_rate] or steps
+    saturation = max(ok_steps, key=lambda s: s["throughput_rps"])
+    return {
+        "config": name,
+        "app": target,
+        "scenario": scenario_name,
+        "idle_rss_mb": idle_mb,
+        "saturation": {
+            "concurrency": saturation["concurrency"],
+            "throughput_rps": saturation["throughput_rps"],
+            "p95_ms": saturation["latency_ms"].get("p95"),
+            "p99_ms": saturation["latency_ms"].get("p99"),
+            "peak_rss_mb": saturation["peak_rss_mb"],
+        },
+        "steps": steps,
+    }
+
+
+def available(module):
+    return importlib.util.find_spec(module) is not None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="gunicorn/uvicornワーカー構成の負荷試験")
+    parser.add_argument(
+        "--configs", nargs="+", choices=sorted(SERVER_CONFIGS), default=list(SERVER_CONFIGS)
+    )
+    parser.add_argument("--steps", nargs="+", type=int, default=[1, 2, 4, 8, 16, 32, 64])
+    parser.add_argument("--requests-per-worker", type=int, default=5)
+    parser.add_argument("--min-requests", type=int, default=20)
+    parser.add_argument("--step-duration", type=float, default=60.0, help="1段階の最大秒数")
+    parser.add_argument("--max-error-rate", type=float, default=0.05)
+    parser.add_argument(
+        "--saturation-gain", type=float, default=0.05,
+        help="この割合以上スループットが伸びない段階が2回続いたら打ち切る",
+    )
+    parser.add_argument("--sleep-scale", type=float, default=1.0)
+    parser.add_argument("--output", help="結果JSONの出力先（省略時は標準出力）")
+    add_upstream_arguments(parser)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    upstream_config = config_from_args(args)
+    scenarios = build_scenarios(400, upstream_config.get("seed"))
+
+    results, skipped = [], []
+    with FakeUpstreamServer(config=upstream_config) as upstream:
+        for name in args.configs:
+            requirement = SERVER_CONFIGS[name][1]
+            if not available(requirement):
+                print(f"[SKIP] {name}: {requirement} is not installed", file=sys.stderr)
+                skipped.append({"config": name, "reason": f"{requirement} not installed"})
+                continue
+            print(f"[LOAD] {name}", file=sys.stderr)
+            try:
+                results.append(run_config(name, args, upstream, scenarios))
+            except RuntimeError as e:
+                print(f"[FAIL] {e}", file=sys.stderr)
+                skipped.append({"config": name, "reason": str(e)})
+
+    print("\n config              app         sat.req/s  p95(ms)   p99(ms)   RSS(MB)",
+          file=sys.stderr)
+    for r in results:
+        s = r["saturation"]
+        print(
+            f" {r['config']:<19} {r['app']:<11} {s['throughput_rps']:>9}  "
+            f"{s['p95_ms']!s:>8}  {s['p99_ms']!s:>8}  {s['peak_rss_mb']!s:>7}",
+            file=sys.stderr,
+        )
+
+    report = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "git_revision": git_revision(),
+            "steps": args.steps,
+            "sleep_scale": args.sleep_scale,
+            "upstream_config": upstream_config,
+        },
+        "results": results,
+        "skipped": skipped,
+    }
+    output = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        Path(args.output).write_text(output, encoding="utf-8")
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
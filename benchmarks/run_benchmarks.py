@@ -0,0 +1,208 @@
+"""
+オフラインベンチマーク実行スクリプト
+
+代替サーバーを起動し、各アプリをサブプロセスで立ち上げて
+/extract・/format_text・/summarize のp50/p95/p99レイテンシとスループットを計測する。
+結果は回帰追跡用のJSONとして出力する。
+
+例:
+    python -m benchmarks.run_benchmarks --apps app app_hybrid --requests 200 \\
+        --concurrency 8 --sleep-scale 0 --output bench_output.json
+"""
+
+import argparse
+import json
+import logging
+import os
+import platform
+import random
+import socket
+import subprocess
+import sys
+from datetime import datetime, timezone
+from pathlib import Path
+
+from benchmarks.bench_app import BENCH_TOKEN, TARGET_APPS
+from benchmarks.fake_upstreams import (FakeUpstreamServer, add_upstream_arguments,
+                                       config_from_args, generate_caption_dump)
+from benchmarks.load_driver import run_load, wait_until_ready
+
+logger = logging.getLogger(__name__)
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+
+HEALTH_PATHS = {
+    "app": "/health",
+    "app_cloud_run": "/health",
+    "app_hybrid": "/healthz",
+    "app_async": "/health",
+}
+
+
+def _video_url(index):
+    return f"https://www.youtube.com/watch?v=bv{index:09d}"
+
+
+def _caption_text(rng, segments):
+    return " ".join(seg["text"] for seg in generate_caption_dump(rng, segments))
+
+
+def build_scenarios(text_segments, seed):
+    """アプリごとの計測シナリオ（名前, パス, ペイロード生成関数）"""
+    rng = random.Random(seed)
+    sample_text = _caption_text(rng, text_segments)
+    auth = {"Authorization": f"Bearer {BENCH_TOKEN}"}
+
+    flask_scenarios = [
+        ("extract_url", "/extract", lambda i: {"url": _video_url(i), "lang": "ja"}, auth),
+        ("extract_text", "/extract", lambda i: {"transcript_text": sample_text}, auth),
+        ("format_text", "/format_text", lambda i: {"text": sample_text}, {}),
+    ]
+
+    return {
+        "app": flask_scenarios,
+        # ASGI版は app.py と同じ契約なので同じシナリオで比較する
+        "app_async": flask_scenarios,
+        "app_cloud_run": [
+            ("extract_url", "/extract", lambda i: {"url": _video_url(i), "lang": "ja"}, {}),
+        ],
+        "app_hybrid": [
+            (
+                "summarize",
+                "/summarize",
+                lambda i: {"url": _video_url(i), "transcript": sample_text, "lang": "ja"},
+                auth,
+            ),
+        ],
+    }
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_app(target, upstream_url, sleep_scale):
+    """ベンチマーク対象アプリをサブプロセスで起動"""
+    port = free_port()
+    process = subprocess.Popen(
+        [
+            sys.executable, "-m", "benchmarks.bench_app",
+            "--app", target,
+            "--upstream", upstream_url,
+            "--port", str(port),
+            "--sleep-scale", str(sleep_scale),
+        ],
+        cwd=REPO_ROOT,
+        env=dict(os.environ),
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    if not wait_until_ready(base_url, HEALTH_PATHS[target]):
+        process.terminate()
+        raise RuntimeError(f"{target} did not become ready on {base_url}")
+    return process, base_url
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "HEAD"], cwd=REPO_ROOT, text=True
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_suite(args, upstream_config):
+    results = []
+    with FakeUpstreamServer(config=upstream_config) as upstream:
+        scenarios = build_scenarios(args.text_segments, upstream_config.get("seed"))
+        for target in args.apps:
+            process, base_url = start_app(target, upstream.url, args.sleep_scale)
+            try:
+                for name, path, payload_factory, headers in scenarios[target]:
+                    if args.only and name not in args.only:
+                        continue
+                    if args.warmup:
+                        run_load(base_url, path, payload_factory, headers=headers,
+                                 concurrency=args.concurrency, total_requests=args.warmup)
+                    print(f"[BENCH] {target} {name} (concurrency={args.concurrency})",
+                          file=sys.stderr)
+                    load = run_load(
+                        base_url, path, payload_factory,
+                        headers=headers,
+                        concurrency=args.concurrency,
+                        total_requests=args.requests,
+                        duration=args.duration,
+                    )
+                    entry = {"app": target, "scenario": name, "path": path,
+                             "concurrency": args.concurrency}
+                    entry.update(load.to_dict())
+                    results.append(entry)
+                    latency = entry["latency_ms"]
+                    print(
+                        f"  {entry['throughput_rps']} req/s  p50={latency.get('p50')}ms "
+                        f"p95={latency.get('p95')}ms p99={latency.get('p99')}ms "
+                        f"errors={entry['errors']}",
+                        file=sys.stderr,
+                    )
+            finally:
+                process.terminate()
+                process.wait(timeout=10)
+        upstream_stats = upstream.stats()
+
+    return {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "git_revision": git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "parameters": {
+                "requests": args.requests,
+                "duration": args.duration,
+                "concurrency": args.concurrency,
+                "warmup": args.warmup,
+                "sleep_scale": args.sleep_scale,
+                "text_segments": args.text_segments,
+            },
+            "upstream_config": upstream_config,
+        },
+        "upstream": upstream_stats,
+        "results": results,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="オフラインベンチマーク")
+    parser.add_argument("--apps", nargs="+", choices=TARGET_APPS, default=list(TARGET_APPS))
+    parser.add_argument("--only", nargs="+", help="実行するシナリオ名（例: extract_url summarize）")
+    parser.add_argument("--requests", type=int, default=100, help="シナリオごとのリクエスト数")
+    parser.add_argument("--duration", type=float, help="シナリオごとの最大秒数")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--warmup", type=int, default=5)
+    parser.add_argument(
+        "--sleep-scale", type=float, default=1.0,
+        help="get_transcriptのレート制限待機の倍率（0で待機なし）",
+    )
+    parser.add_argument(
+        "--text-segments", type=int, default=400,
+        help="transcript_text / text で送る字幕のセグメント数",
+    )
+    parser.add_argument("--output", help="結果JSONの出力先（省略時は標準出力）")
+    add_upstream_arguments(parser)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    report = run_suite(args, config_from_args(args))
+
+    output = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output)
+        print(f"[BENCH] Results written to {args.output}", file=sys.stderr)
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
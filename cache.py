@@ -0,0 +1,498 @@
+"""
+プロセス内キャッシュ
+名前空間ごとのTTL付きLRUキャッシュ。字幕・メタデータ・Geminiの結果をリクエスト間で再利用する
+
+    summaries = cache.get_cache("chunk_summaries", maxsize=2048, ttl=86400)
+    key = cache.make_key(model, prompt_version, chunk_text)
+    value = summaries.get(key)
+
+codec（encode / decode を持つオブジェクト）を渡すと値を圧縮したバイト列で保持する。
+字幕のように大きく繰り返しの多い値はメモリが数分の一になる（取り出すたびに展開する）
+
+    transcripts = cache.get_cache("transcripts", codec=transcript_codec.default_codec())
+
+stale（秒）を指定すると、期限切れから stale 秒までは get_or_load が古い値をすぐ返し、
+バックグラウンドで取り直す（同じキーの取り直しは同時に1つだけ）
+
+    titles = cache.get_cache("video_titles", ttl=86400, stale=604800)
+    title = titles.get_or_load(video_id, lambda: fetch_title(video_id))
+
+CACHE_BACKEND=sqlite にすると get_cache は同じホストの全プロセスで共有するキャッシュ
+（cache_sqlite.SQLiteCache、CACHE_SQLITE_PATH のファイル）を返す。gunicorn のワーカーを
+増やしてもヒット率が下がらず、同じ値をワーカーの数だけ持たない。
+CACHE_BACKEND=redis なら REDIS_URL のサーバーを全インスタンスで共有する（cache_redis.RedisCache）
+
+スナップショット: 期限内のエントリをファイル（gzip圧縮のJSON Lines）に書き出し、
+新しいインスタンスの起動時にバックグラウンドで読み込んで暖める。残りTTLも引き継ぐ
+
+    cache.load_snapshot_async("/mnt/cache/snapshot.jsonl.gz")
+    cache.start_snapshot_writer("/mnt/cache/snapshot.jsonl.gz", interval=300)
+"""
+
+import base64
+import gzip
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+# スナップショットの形式のバージョン
+SNAPSHOT_VERSION = 1
+
+# キャッシュの保持先（memory: プロセス内、sqlite: 同じホストのプロセス間で共有、
+# redis: REDIS_URL のサーバーで全インスタンスが共有）
+BACKEND = os.environ.get("CACHE_BACKEND", "memory")
+BACKENDS = ("memory", "sqlite", "redis")
+
+_MISSING = object()
+
+
+def make_key(*parts):
+    """キーの各要素からSHA-256ハッシュのキーを作る（長い字幕テキストもそのまま渡せる）"""
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(str(part).encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+class TTLCache:
+    """スレッドセーフなTTL付きLRUキャッシュ（codec があれば値を圧縮して保持）
+
+    stale > 0 なら期限切れのエントリを stale 秒だけ残し、get_or_load で古い値を返しながら取り直す
+    """
+
+    backend = "memory"
+
+    def __init__(self, namespace, maxsize=1024, ttl=3600, codec=None, stale=0):
+        self.namespace = namespace
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.codec = codec
+        self.stale = stale
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self._refreshing = set()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.bytes = 0
+        self.stale_hits = 0
+        self.refreshes = 0
+        self.refresh_errors = 0
+
+    def _size(self, entry):
+        return len(entry[1]) if self.codec is not None else 0
+
+    def _lookup_locked(self, key, now):
+        """エントリを引く（ロックは呼び出し元）。猶予も過ぎたエントリは消して _MISSING を返す"""
+        entry = self._data.get(key, _MISSING)
+        if entry is not _MISSING and entry[0] + self.stale <= now:
+            del self._data[key]
+            self.bytes -= self._size(entry)
+            return _MISSING
+        return entry
+
+    def _decode(self, key, value, default):
+        if self.codec is None:
+            return value
+        # 展開はロックの外で行う（圧縮データは変更しないので共有してよい）
+        try:
+            return self.codec.decode(value)
+        except ValueError as e:
+            # 読めない値（辞書の異なるスナップショットなど）は捨ててミス扱いにする
+            logger.warning(f"Dropping undecodable cache entry in '{self.namespace}': {e}")
+            self.delete(key)
+            return default
+
+    def _now(self):
+        return time.monotonic()
+
+    def _read(self, key, now):
+        """(期限, 保持している値) を返して最近使ったことにする（猶予も過ぎていれば _MISSING）"""
+        with self._lock:
+            entry = self._lookup_locked(key, now)
+            if entry is not _MISSING:
+                self._data.move_to_end(key)
+            return entry
+
+    def _claim_refresh(self, key, now):
+        """取り直しを引き受けてよいか（共有バックエンドは他のプロセスとの重複をここで防ぐ）"""
+        return True
+
+    def get(self, key, default=None):
+        """期限内の値を返す（猶予期間中の古い値は返さない）"""
+        now = self._now()
+        entry = self._read(key, now)
+        with self._lock:
+            if entry is _MISSING or entry[0] <= now:
+                self.misses += 1
+                return default
+            self.hits += 1
+        return self._decode(key, entry[1], default)
+
+    def get_or_load(self, key, loader, ttl=None, refresh=None):
+        """値を返す。なければ loader() を呼んでキャッシュする（None はキャッシュしない）
+
+        期限切れでも猶予期間中なら古い値をすぐ返し、refresh()（省略時は loader）を
+        バックグラウンドで呼んで取り直す。同じキーの取り直しは同時に1つだけ走らせる
+        """
+        now = self._now()
+        entry = self._read(key, now)
+        refresh_now = False
+        with self._lock:
+            if entry is _MISSING:
+                self.misses += 1
+            elif entry[0] > now:
+                self.hits += 1
+            else:
+                self.stale_hits += 1
+                if key not in self._refreshing:
+                    self._refreshing.add(key)
+                    refresh_now = True
+        if refresh_now:
+            if self._claim_refresh(key, now):
+                with self._lock:
+                    self.refreshes += 1
+                threading.Thread(
+                    target=self._refresh,
+                    args=(key, refresh or loader, ttl),
+                    name=f"cache-refresh-{self.namespace}",
+                    daemon=True,
+                ).start()
+            else:
+                with self._lock:
+                    self._refreshing.discard(key)
+        if entry is not _MISSING:
+            value = self._decode(key, entry[1], _MISSING)
+            if value is not _MISSING:
+                return value
+
+        value = loader()
+        if value is not None:
+            self.set(key, value, ttl)
+        return value
+
+    def get_many(self, keys):
+        """期限内の値を {キー: 値} で返す（ないキーは含めない。共有バックエンドは1回の往復で読む）"""
+        values = {}
+        for key in keys:
+            value = self.get(key, _MISSING)
+            if value is not _MISSING:
+                values[key] = value
+        return values
+
+    def set_many(self, items, ttl=None):
+        """{キー: 値} をまとめて入れる"""
+        for key, value in items.items():
+            self.set(key, value, ttl)
+
+    def _refresh(self, key, loader, ttl):
+        try:
+            value = loader()
+            if value is not None:
+                self.set(key, value, ttl)
+        except Exception as e:
+            # 取り直せなければ猶予期間が終わるまで古い値を返し続ける
+            with self._lock:
+                self.refresh_errors += 1
+            logger.warning(f"Background refresh failed in '{self.namespace}': {e}")
+        finally:
+            with self._lock:
+                self._refreshing.discard(key)
+
+    def set(self, key, value, ttl=None):
+        expires = self._now() + (self.ttl if ttl is None else ttl)
+        if self.codec is not None:
+            value = self.codec.encode(value)
+        with self._lock:
+            previous = self._data.pop(key, _MISSING)
+            if previous is not _MISSING:
+                self.bytes -= self._size(previous)
+            entry = self._data[key] = (expires, value)
+            self.bytes += self._size(entry)
+            while len(self._data) > self.maxsize:
+                _, evicted = self._data.popitem(last=False)
+                self.bytes -= self._size(evicted)
+                self.evictions += 1
+
+    def delete(self, key):
+        with self._lock:
+            entry = self._data.pop(key, _MISSING)
+            if entry is not _MISSING:
+                self.bytes -= self._size(entry)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.bytes = 0
+
+    def __len__(self):
+        return len(self._data)
+
+    def _stored_bytes(self):
+        return self.bytes
+
+    def __contains__(self, key):
+        """期限内の値があるか（ヒット・ミスには数えない）"""
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            return entry is not _MISSING and entry[0] > self._now()
+
+    def expires_at(self, key):
+        """期限内の値の期限（なければ None。ヒット・ミスには数えない）
+
+        値を入れ直すと変わるので、値から作ったもの（字幕の時間インデックスなど）の版として使える
+        """
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is _MISSING or entry[0] <= self._now():
+                return None
+            return entry[0]
+
+    def snapshot(self):
+        """期限内のエントリを (キー, 残り秒数, 保持している値) のリストで返す（古い順）"""
+        now = self._now()
+        with self._lock:
+            return [
+                (key, expires - now, value)
+                for key, (expires, value) in self._data.items()
+                if expires > now
+            ]
+
+    def restore(self, entries):
+        """snapshot() のエントリを読み込み、入れた件数を返す
+
+        読み込み中に入った新しい値は上書きせず、読み込んだエントリは最も古い側に置く
+        （上限を超えたら読み込んだ方から追い出す）
+        """
+        now = self._now()
+        restored = 0
+        with self._lock:
+            for key, remaining, value in reversed(list(entries)):
+                if remaining <= 0 or key in self._data:
+                    continue
+                entry = self._data[key] = (now + remaining, value)
+                self._data.move_to_end(key, last=False)
+                self.bytes += self._size(entry)
+                restored += 1
+            while len(self._data) > self.maxsize:
+                _, evicted = self._data.popitem(last=False)
+                self.bytes -= self._size(evicted)
+                restored -= 1
+        return max(0, restored)
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "backend": self.backend,
+            "size": len(self),
+            "maxsize": self.maxsize,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / total, 3) if total else 0.0,
+            "bytes": self._stored_bytes() if self.codec is not None else None,
+            "stale": self.stale,
+            "stale_hits": self.stale_hits,
+            "refreshes": self.refreshes,
+            "refresh_errors": self.refresh_errors,
+        }
+
+
+_registry = {}
+_registry_lock = threading.Lock()
+
+
+def _create_cache(namespace, maxsize, ttl, codec, stale):
+    """BACKEND に応じたキャッシュを作る（共有キャッシュを開けなければプロセス内にする）"""
+    if BACKEND not in BACKENDS:
+        raise ValueError(f"CACHE_BACKEND は {', '.join(BACKENDS)} のいずれかを指定してください")
+    if BACKEND == "sqlite":
+        import cache_sqlite  # cache_sqlite が cache を import するのでここで読む
+
+        try:
+            return cache_sqlite.SQLiteCache(namespace, maxsize, ttl, codec, stale)
+        except (OSError, sqlite3.Error) as e:
+            logger.warning(f"Shared cache unavailable for '{namespace}', using memory: {e}")
+    elif BACKEND == "redis":
+        import cache_redis
+
+        if cache_redis.redis is not None:
+            return cache_redis.RedisCache(namespace, maxsize, ttl, codec, stale)
+        logger.warning(f"redis is not installed, using memory for '{namespace}'")
+    return TTLCache(namespace, maxsize, ttl, codec, stale)
+
+
+def get_cache(namespace, maxsize=1024, ttl=3600, codec=None, stale=0):
+    """名前空間のキャッシュを取得（初回呼び出し時に作成）"""
+    with _registry_lock:
+        cache = _registry.get(namespace)
+        if cache is None:
+            cache = _registry[namespace] = _create_cache(namespace, maxsize, ttl, codec, stale)
+        return cache
+
+
+def stats():
+    """全名前空間の統計"""
+    with _registry_lock:
+        caches = list(_registry.values())
+    return {cache.namespace: cache.stats() for cache in caches}
+
+
+# ==== スナップショット ====
+
+_snapshot_status = {"state": "idle", "path": None, "loaded": {}, "saved": None, "error": None}
+_snapshot_lock = threading.Lock()
+
+
+def _encode_value(value):
+    """保持している値をJSONにする（bytes は base64。JSONにできない値は None）"""
+    if isinstance(value, bytes):
+        return {"b": base64.b64encode(value).decode("ascii")}
+    if isinstance(value, str):
+        return {"s": value}
+    try:
+        json.dumps(value)
+    except (TypeError, ValueError):
+        return None
+    return {"j": value}
+
+
+def _decode_value(data):
+    if "b" in data:
+        return base64.b64decode(data["b"])
+    if "s" in data:
+        return data["s"]
+    return data["j"]
+
+
+def _selected(namespaces):
+    with _registry_lock:
+        caches = list(_registry.values())
+    return [c for c in caches if namespaces is None or c.namespace in namespaces]
+
+
+def dump_snapshot(fileobj, namespaces=None):
+    """期限内のエントリをファイルオブジェクト（バイナリ）にgzip圧縮のJSON Linesで書き、件数を返す"""
+    caches = _selected(namespaces)
+    count = 0
+    with gzip.GzipFile(fileobj=fileobj, mode="wb", compresslevel=6) as f:
+        header = {
+            "version": SNAPSHOT_VERSION,
+            "created_at": time.time(),
+            "namespaces": [c.namespace for c in caches],
+        }
+        f.write(json.dumps(header).encode("utf-8") + b"\n")
+        for c in caches:
+            for key, remaining, value in c.snapshot():
+                encoded = _encode_value(value)
+                if encoded is None:
+                    continue
+                # 残りTTLは壁時計の期限にして書く（読み込むまでの時間も差し引かれる）
+                line = dict(encoded, ns=c.namespace, k=key, e=time.time() + remaining)
+                f.write(json.dumps(line, ensure_ascii=False).encode("utf-8") + b"\n")
+                count += 1
+    return count
+
+
+def save_snapshot(path, namespaces=None):
+    """スナップショットをファイルに書き（一時ファイルから置き換えるので読み手は壊れたファイルを見ない）"""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_path, "wb") as f:
+            count = dump_snapshot(f, namespaces)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    with _snapshot_lock:
+        _snapshot_status.update(saved=time.time(), saved_entries=count)
+    return count
+
+
+def load_snapshot(path, namespaces=None):
+    """スナップショットを読み込み、名前空間ごとの読み込んだ件数を返す
+
+    登録されていない名前空間と期限切れのエントリは飛ばす
+    """
+    caches = {c.namespace: c for c in _selected(namespaces)}
+    now = time.time()
+    entries = {}
+    with gzip.open(path, "rb") as f:
+        header = json.loads(f.readline())
+        if header.get("version") != SNAPSHOT_VERSION:
+            raise ValueError(f"unsupported cache snapshot version: {header.get('version')}")
+        for line in f:
+            data = json.loads(line)
+            if data["ns"] in caches and data["e"] > now:
+                entries.setdefault(data["ns"], []).append(
+                    (data["k"], data["e"] - now, _decode_value(data))
+                )
+    return {ns: caches[ns].restore(items) for ns, items in entries.items()}
+
+
+def load_snapshot_async(path, namespaces=None):
+    """スナップショットをバックグラウンドのスレッドで読み込む（起動とヘルスチェックを待たせない）"""
+
+    def run():
+        started = time.monotonic()
+        try:
+            loaded = load_snapshot(path, namespaces)
+        except FileNotFoundError:
+            with _snapshot_lock:
+                _snapshot_status.update(state="missing")
+            logger.info(f"No cache snapshot at {path}")
+            return
+        except Exception as e:
+            with _snapshot_lock:
+                _snapshot_status.update(state="failed", error=str(e))
+            logger.warning(f"Failed to load cache snapshot {path}: {e}")
+            return
+        with _snapshot_lock:
+            _snapshot_status.update(
+                state="loaded", loaded=loaded, load_seconds=round(time.monotonic() - started, 3)
+            )
+        logger.info(f"Loaded cache snapshot {path}: {loaded}")
+
+    with _snapshot_lock:
+        _snapshot_status.update(state="loading", path=path)
+    thread = threading.Thread(target=run, name="cache-snapshot-loader", daemon=True)
+    thread.start()
+    return thread
+
+
+def start_snapshot_writer(path, interval, namespaces=None):
+    """interval 秒ごとにスナップショットを書くスレッドを起動する（interval <= 0 なら何もしない）"""
+    if interval <= 0:
+        return None
+    stop = threading.Event()
+
+    def run():
+        while not stop.wait(interval):
+            try:
+                count = save_snapshot(path, namespaces)
+                logger.info(f"Wrote cache snapshot {path} ({count} entries)")
+            except Exception as e:
+                logger.warning(f"Failed to write cache snapshot {path}: {e}")
+
+    thread = threading.Thread(target=run, name="cache-snapshot-writer", daemon=True)
+    thread.stop = stop
+    thread.start()
+    return thread
+
+
+def snapshot_status():
+    """スナップショットの読み込み・書き込みの状況（/metrics 用）"""
+    with _snapshot_lock:
+        return dict(_snapshot_status)
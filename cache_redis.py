@@ -0,0 +1,341 @@
+"""
+Redisプロトコルの分散キャッシュ
+複数のインスタンス（Cloud Run）で字幕・メタデータ・Geminiの結果を共有する。
+cache.TTLCache と同じインターフェースで、CACHE_BACKEND=redis のとき cache.get_cache が返す
+
+- 値は圧縮して保存する（codec があればそれで、なければJSONを transcript_codec で圧縮する）
+- キーの期限は名前空間の ttl + stale（Redis が消す）。値の先頭に期限を書き、猶予期間かどうかを判定する
+- get_many / set_many はまとめて1回の往復（MGET / パイプライン）で読み書きする
+- Redis に接続できない間はプロセス内のキャッシュ（TTLCache の本体）で動き、RETRY_SECONDS ごとに再接続を試す
+- 件数の上限（maxsize）は使わない。Redis の maxmemory と maxmemory-policy（allkeys-lru など）で設定する
+
+    summaries = cache_redis.RedisCache("gemini", ttl=86400, client=redis.Redis.from_url(url))
+"""
+
+import json
+import logging
+import os
+import struct
+import threading
+import time
+
+import cache
+import transcript_codec
+
+try:
+    import redis
+except ImportError:  # redis 未インストール時は CACHE_BACKEND=redis でもプロセス内キャッシュ
+    redis = None
+
+logger = logging.getLogger(__name__)
+
+# 接続先（redis:// / rediss:// / unix://）
+URL = os.environ.get("REDIS_URL", "redis://localhost:6379/0")
+
+# キーの接頭辞（同じサーバーを他の用途と共有するとき用）
+PREFIX = os.environ.get("REDIS_CACHE_PREFIX", "ytcache:")
+
+# 1回の操作のタイムアウト（秒）。キャッシュなので待つよりプロセス内キャッシュに切り替える
+SOCKET_TIMEOUT = float(os.environ.get("REDIS_SOCKET_TIMEOUT", 0.5))
+
+# 接続できなかったあと、プロセス内キャッシュで動く時間（秒）
+RETRY_SECONDS = float(os.environ.get("REDIS_RETRY_SECONDS", 30))
+
+# 取り直しを引き受けたインスタンスに任せる時間（秒）
+REFRESH_CLAIM_SECONDS = 60
+
+# 値の先頭（形式のバージョン1バイトと期限の壁時計8バイト）
+_VALUE_HEADER = struct.Struct(">Bd")
+_VALUE_VERSION = 1
+
+# SCAN と MGET の1回あたりのキー数
+_BATCH = 500
+
+_ERRORS = (redis.RedisError, OSError) if redis is not None else (OSError,)
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def get_client(url=None):
+    """URLごとに共有するクライアント（接続プールを持ち、スレッド間で共有できる）"""
+    url = url or URL
+    with _clients_lock:
+        client = _clients.get(url)
+        if client is None:
+            client = _clients[url] = redis.Redis.from_url(
+                url, socket_timeout=SOCKET_TIMEOUT, socket_connect_timeout=SOCKET_TIMEOUT
+            )
+        return client
+
+
+class RedisCache(cache.TTLCache):
+    """Redisに保持するTTL付きキャッシュ（接続できない間はプロセス内のLRUキャッシュで動く）
+
+    ヒット・ミスなどの件数はプロセスごと。期限はインスタンス間で比べられるように壁時計で持つ
+    """
+
+    backend = "redis"
+
+    def __init__(
+        self, namespace, maxsize=1024, ttl=3600, codec=None, stale=0, client=None, prefix=None
+    ):
+        super().__init__(namespace, maxsize, ttl, codec, stale)
+        self.client = client if client is not None else get_client()
+        prefix = PREFIX if prefix is None else prefix
+        self.prefix = f"{prefix}{namespace}:"
+        self.claim_prefix = f"{prefix}refresh:{namespace}:"
+        self._compressor = transcript_codec.default_codec()
+        self._down_until = 0.0
+        self.errors = 0
+
+    def _now(self):
+        return time.time()
+
+    # ==== 接続できないときの切り替え ====
+
+    def _available(self):
+        return time.monotonic() >= self._down_until
+
+    def _failed(self, e):
+        with self._lock:
+            self.errors += 1
+            self._down_until = time.monotonic() + RETRY_SECONDS
+        logger.warning(
+            f"Redis unavailable for '{self.namespace}', using local cache for {RETRY_SECONDS}s: {e}"
+        )
+
+    # ==== 値の形式 ====
+
+    def _pack(self, value, expires):
+        """保存するバイト列（JSONにできない値は None）"""
+        if self.codec is not None:
+            payload = self.codec.encode(value)
+        else:
+            try:
+                data = json.dumps(value, ensure_ascii=False).encode("utf-8")
+            except (TypeError, ValueError) as e:
+                logger.warning(f"Not caching non-JSON value in '{self.namespace}': {e}")
+                return None
+            payload = self._compressor.compress(data)
+        return _VALUE_HEADER.pack(_VALUE_VERSION, expires) + payload
+
+    def _unpack(self, blob):
+        """(期限, TTLCache が保持する形の値) にする（読めなければ ValueError）"""
+        if len(blob) < _VALUE_HEADER.size:
+            raise ValueError("truncated cache value")
+        version, expires = _VALUE_HEADER.unpack_from(blob)
+        if version != _VALUE_VERSION:
+            raise ValueError(f"unknown cache value version {version}")
+        payload = blob[_VALUE_HEADER.size:]
+        if self.codec is not None:
+            return expires, payload
+        return expires, json.loads(self._compressor.decompress(payload))
+
+    def _parse(self, key, blob, now):
+        """Redisの値を猶予期間も含めて有効なら (期限, 値)、なければ _MISSING"""
+        if blob is None:
+            return cache._MISSING
+        try:
+            expires, value = self._unpack(blob)
+        except ValueError as e:
+            logger.warning(f"Dropping unreadable cache entry in '{self.namespace}': {e}")
+            self.delete(key)
+            return cache._MISSING
+        if expires + self.stale <= now:
+            return cache._MISSING
+        return expires, value
+
+    # ==== TTLCache の読み書きの置き換え ====
+
+    def _read(self, key, now):
+        if not self._available():
+            return super()._read(key, now)
+        try:
+            blob = self.client.get(self.prefix + key)
+        except _ERRORS as e:
+            self._failed(e)
+            return super()._read(key, now)
+        return self._parse(key, blob, now)
+
+    def _claim_refresh(self, key, now):
+        if not self._available():
+            return True
+        try:
+            return bool(
+                self.client.set(
+                    self.claim_prefix + key, b"1", nx=True, px=REFRESH_CLAIM_SECONDS * 1000
+                )
+            )
+        except _ERRORS as e:
+            self._failed(e)
+            return True
+
+    def _px(self, ttl):
+        """Redisのキーの期限（ミリ秒。猶予期間の分だけ長く残す）"""
+        return max(1, int((ttl + self.stale) * 1000))
+
+    def set(self, key, value, ttl=None):
+        ttl = self.ttl if ttl is None else ttl
+        if not self._available():
+            return super().set(key, value, ttl)
+        blob = self._pack(value, self._now() + ttl)
+        if blob is None:
+            return
+        try:
+            if self.stale:
+                # 取り直しの引き受けも外す（次の猶予期間に他のインスタンスが取り直せる）
+                pipe = self.client.pipeline(transaction=False)
+                pipe.set(self.prefix + key, blob, px=self._px(ttl))
+                pipe.delete(self.claim_prefix + key)
+                pipe.execute()
+            else:
+                self.client.set(self.prefix + key, blob, px=self._px(ttl))
+        except _ERRORS as e:
+            self._failed(e)
+            super().set(key, value, ttl)
+
+    def get_many(self, keys):
+        """期限内の値を1回の MGET で読み、{キー: 値} で返す"""
+        keys = list(keys)
+        if not keys:
+            return {}
+        if not self._available():
+            return super().get_many(keys)
+        try:
+            blobs = self.client.mget([self.prefix + key for key in keys])
+        except _ERRORS as e:
+            self._failed(e)
+            return super().get_many(keys)
+
+        now = self._now()
+        values = {}
+        for key, blob in zip(keys, blobs):
+            entry = self._parse(key, blob, now)
+            if entry is cache._MISSING or entry[0] <= now:
+                continue
+            value = self._decode(key, entry[1], cache._MISSING)
+            if value is not cache._MISSING:
+                values[key] = value
+        with self._lock:
+            self.hits += len(values)
+            self.misses += len(keys) - len(values)
+        return values
+
+    def set_many(self, items, ttl=None):
+        """{キー: 値} を1回の往復（パイプライン）で入れる"""
+        ttl = self.ttl if ttl is None else ttl
+        if not self._available():
+            return super().set_many(items, ttl)
+        expires = self._now() + ttl
+        try:
+            pipe = self.client.pipeline(transaction=False)
+            for key, value in items.items():
+                blob = self._pack(value, expires)
+                if blob is not None:
+                    pipe.set(self.prefix + key, blob, px=self._px(ttl))
+            pipe.execute()
+        except _ERRORS as e:
+            self._failed(e)
+            super().set_many(items, ttl)
+
+    def delete(self, key):
+        super().delete(key)
+        if self._available():
+            try:
+                self.client.delete(self.prefix + key)
+            except _ERRORS as e:
+                self._failed(e)
+
+    def clear(self):
+        """この名前空間のキーをすべて消す（SCAN で少しずつ消すのでサーバーを止めない）"""
+        super().clear()
+        if not self._available():
+            return
+        try:
+            batch = []
+            for name in self.client.scan_iter(match=self.prefix + "*", count=_BATCH):
+                batch.append(name)
+                if len(batch) >= _BATCH:
+                    self.client.delete(*batch)
+                    batch = []
+            if batch:
+                self.client.delete(*batch)
+        except _ERRORS as e:
+            self._failed(e)
+
+    def __contains__(self, key):
+        """期限内の値があるか（ヒット・ミスには数えない）"""
+        if not self._available():
+            return super().__contains__(key)
+        now = self._now()
+        try:
+            entry = self._parse(key, self.client.get(self.prefix + key), now)
+        except _ERRORS as e:
+            self._failed(e)
+            return super().__contains__(key)
+        return entry is not cache._MISSING and entry[0] > now
+
+    def expires_at(self, key):
+        """期限内の値の期限（値の先頭だけ GETRANGE で読む。なければ None）"""
+        if not self._available():
+            return super().expires_at(key)
+        try:
+            header = self.client.getrange(self.prefix + key, 0, _VALUE_HEADER.size - 1)
+        except _ERRORS as e:
+            self._failed(e)
+            return super().expires_at(key)
+        if len(header) < _VALUE_HEADER.size:
+            return None
+        version, expires = _VALUE_HEADER.unpack(header)
+        if version != _VALUE_VERSION or expires <= self._now():
+            return None
+        return expires
+
+    def snapshot(self):
+        """期限内のエントリ（Redisに接続できなければプロセス内の分）"""
+        if not self._available():
+            return super().snapshot()
+        now = self._now()
+        entries = []
+        try:
+            names = list(self.client.scan_iter(match=self.prefix + "*", count=_BATCH))
+            for start in range(0, len(names), _BATCH):
+                batch = names[start:start + _BATCH]
+                for name, blob in zip(batch, self.client.mget(batch)):
+                    key = name.decode("utf-8")[len(self.prefix):]
+                    entry = self._parse(key, blob, now)
+                    if entry is not cache._MISSING and entry[0] > now:
+                        entries.append((key, entry[0] - now, entry[1]))
+        except _ERRORS as e:
+            self._failed(e)
+            return super().snapshot()
+        return entries
+
+    def restore(self, entries):
+        """snapshot() のエントリを入れ、入れた件数を返す（既存のキーは上書きしない）"""
+        if not self._available():
+            return super().restore(entries)
+        now = self._now()
+        entries = [entry for entry in entries if entry[1] > 0]
+        try:
+            pipe = self.client.pipeline(transaction=False)
+            for key, remaining, value in entries:
+                if self.codec is not None:
+                    blob = _VALUE_HEADER.pack(_VALUE_VERSION, now + remaining) + value
+                else:
+                    blob = self._pack(value, now + remaining)
+                if blob is not None:
+                    pipe.set(self.prefix + key, blob, px=self._px(remaining), nx=True)
+            return sum(1 for result in pipe.execute() if result)
+        except _ERRORS as e:
+            self._failed(e)
+            return super().restore(entries)
+
+    def stats(self):
+        stats = super().stats()
+        # Redis 上の件数・バイト数は数えない（SCAN が必要になる）。size 等はプロセス内の分
+        stats.update(
+            size=None, bytes=None, local_size=len(self), available=self._available(), errors=self.errors
+        )
+        return stats
@@ -0,0 +1,269 @@
+"""
+プロセス間で共有するキャッシュ（SQLite、WALモード）
+gunicorn のワーカーを増やしても、同じホストの全プロセスが1つのキャッシュファイルを使う。
+cache.TTLCache と同じインターフェースで、CACHE_BACKEND=sqlite のとき cache.get_cache が返す
+
+- 1回の読み書きは1つのトランザクション（WALなので読み手は書き手を待たない）
+- 名前空間ごとに maxsize 件まで。超えたら最後に使われたのが古いものから消す
+- 期限はプロセス間で比べられるように壁時計（time.time）で持つ
+- 猶予期間中の取り直しは行の refresh_until で引き受け、全プロセスで1つだけ走らせる
+
+    transcripts = cache_sqlite.SQLiteCache("transcripts", path="/tmp/cache.sqlite3")
+"""
+
+import json
+import logging
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+import cache
+
+logger = logging.getLogger(__name__)
+
+# キャッシュファイル（同じホストのワーカーで共有する。既定は一時ディレクトリ）
+PATH = os.environ.get("CACHE_SQLITE_PATH") or os.path.join(
+    tempfile.gettempdir(), "yt_transcript_cache.sqlite3"
+)
+
+# 他のプロセスの書き込みを待つ時間（ミリ秒）
+BUSY_TIMEOUT_MS = int(os.environ.get("CACHE_SQLITE_BUSY_TIMEOUT_MS", 5000))
+
+# 最終アクセス時刻を書き直す間隔（秒）。ヒットのたびには書かないので、読み取りはほぼ書き込みにならない
+TOUCH_INTERVAL = 1.0
+
+# 取り直しを引き受けたプロセスに任せる時間（秒。失敗しても過ぎれば他のプロセスが引き受ける）
+REFRESH_CLAIM_SECONDS = 60
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    namespace TEXT NOT NULL,
+    key TEXT NOT NULL,
+    value BLOB NOT NULL,
+    expires REAL NOT NULL,
+    accessed REAL NOT NULL,
+    refresh_until REAL NOT NULL DEFAULT 0,
+    size INTEGER NOT NULL,
+    PRIMARY KEY (namespace, key)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS entries_lru ON entries (namespace, accessed);
+"""
+
+
+class SQLiteCache(cache.TTLCache):
+    """SQLiteファイルに保持するTTL付きLRUキャッシュ（プロセス間・スレッド間で共有できる）
+
+    codec があれば圧縮したバイト列、なければJSONで保存する（JSONにできない値はキャッシュしない）。
+    ヒット・ミスなどの件数はプロセスごと、size / bytes はファイル全体（名前空間ごと）の値
+    """
+
+    backend = "sqlite"
+
+    def __init__(self, namespace, maxsize=1024, ttl=3600, codec=None, stale=0, path=None):
+        super().__init__(namespace, maxsize, ttl, codec, stale)
+        self.path = path or PATH
+        self._local = threading.local()
+        self._connect().executescript(_SCHEMA)
+
+    def _connect(self):
+        """スレッドごとの接続（fork したワーカーでは親の接続を使わず開き直す）"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(
+                self.path, timeout=BUSY_TIMEOUT_MS / 1000, isolation_level=None
+            )
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def close(self):
+        """このスレッドの接続を閉じる"""
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+    @contextmanager
+    def _transaction(self):
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    def _now(self):
+        return time.time()
+
+    def _dump(self, value):
+        """値を保存するバイト列にする（JSONにできなければ None）"""
+        if self.codec is not None:
+            return self.codec.encode(value)
+        try:
+            return json.dumps(value, ensure_ascii=False).encode("utf-8")
+        except (TypeError, ValueError) as e:
+            logger.warning(f"Not caching non-JSON value in '{self.namespace}': {e}")
+            return None
+
+    def _decode(self, key, value, default):
+        if self.codec is not None:
+            return super()._decode(key, value, default)
+        try:
+            return json.loads(value)
+        except ValueError as e:
+            logger.warning(f"Dropping undecodable cache entry in '{self.namespace}': {e}")
+            self.delete(key)
+            return default
+
+    def _read(self, key, now):
+        conn = self._connect()
+        row = conn.execute(
+            "SELECT expires, value, accessed FROM entries WHERE namespace = ? AND key = ?",
+            (self.namespace, key),
+        ).fetchone()
+        if row is None:
+            return cache._MISSING
+        expires, value, accessed = row
+        if expires + self.stale <= now:
+            # 同じ期限の行だけ消す（その間に他のプロセスが入れ直した値は残す）
+            conn.execute(
+                "DELETE FROM entries WHERE namespace = ? AND key = ? AND expires = ?",
+                (self.namespace, key, expires),
+            )
+            return cache._MISSING
+        if now - accessed >= TOUCH_INTERVAL:
+            try:
+                conn.execute(
+                    "UPDATE entries SET accessed = ? WHERE namespace = ? AND key = ?",
+                    (now, self.namespace, key),
+                )
+            except sqlite3.OperationalError:
+                pass  # 書き込みが混んでいれば LRU の順序の更新は諦める
+        return (expires, value)
+
+    def expires_at(self, key):
+        """期限内の値の期限（値は読まない。なければ None）"""
+        row = self._connect().execute(
+            "SELECT expires FROM entries WHERE namespace = ? AND key = ?", (self.namespace, key)
+        ).fetchone()
+        if row is None or row[0] <= self._now():
+            return None
+        return row[0]
+
+    def _claim_refresh(self, key, now):
+        cursor = self._connect().execute(
+            "UPDATE entries SET refresh_until = ? "
+            "WHERE namespace = ? AND key = ? AND refresh_until <= ?",
+            (now + REFRESH_CLAIM_SECONDS, self.namespace, key, now),
+        )
+        return cursor.rowcount == 1
+
+    def _evict(self, conn, now):
+        """上限を超えた分を消し、LRUで追い出した件数を返す（トランザクションは呼び出し元）"""
+        count = conn.execute(
+            "SELECT COUNT(*) FROM entries WHERE namespace = ?", (self.namespace,)
+        ).fetchone()[0]
+        if count <= self.maxsize:
+            return 0
+        # 猶予も過ぎたエントリを先に消す（追い出しには数えない）
+        count -= conn.execute(
+            "DELETE FROM entries WHERE namespace = ? AND expires + ? <= ?",
+            (self.namespace, self.stale, now),
+        ).rowcount
+        if count <= self.maxsize:
+            return 0
+        return conn.execute(
+            "DELETE FROM entries WHERE namespace = ? AND key IN ("
+            "SELECT key FROM entries WHERE namespace = ? ORDER BY accessed LIMIT ?)",
+            (self.namespace, self.namespace, count - self.maxsize),
+        ).rowcount
+
+    def set(self, key, value, ttl=None):
+        blob = self._dump(value)
+        if blob is None:
+            return
+        now = time.time()
+        expires = now + (self.ttl if ttl is None else ttl)
+        with self._transaction() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO entries "
+                "(namespace, key, value, expires, accessed, size) VALUES (?, ?, ?, ?, ?, ?)",
+                (self.namespace, key, blob, expires, now, len(blob)),
+            )
+            evicted = self._evict(conn, now)
+        if evicted:
+            with self._lock:
+                self.evictions += evicted
+
+    def delete(self, key):
+        self._connect().execute(
+            "DELETE FROM entries WHERE namespace = ? AND key = ?", (self.namespace, key)
+        )
+
+    def clear(self):
+        self._connect().execute("DELETE FROM entries WHERE namespace = ?", (self.namespace,))
+
+    def __len__(self):
+        return self._connect().execute(
+            "SELECT COUNT(*) FROM entries WHERE namespace = ?", (self.namespace,)
+        ).fetchone()[0]
+
+    def __contains__(self, key):
+        """期限内の値があるか（ヒット・ミスには数えない）"""
+        row = self._connect().execute(
+            "SELECT 1 FROM entries WHERE namespace = ? AND key = ? AND expires > ?",
+            (self.namespace, key, time.time()),
+        ).fetchone()
+        return row is not None
+
+    def _stored_bytes(self):
+        return self._connect().execute(
+            "SELECT COALESCE(SUM(size), 0) FROM entries WHERE namespace = ?", (self.namespace,)
+        ).fetchone()[0]
+
+    def _stored_value(self, blob):
+        """保存したバイト列を TTLCache が保持する形（codec ならバイト列、なければ値）にする"""
+        return bytes(blob) if self.codec is not None else json.loads(blob)
+
+    def snapshot(self):
+        now = time.time()
+        rows = self._connect().execute(
+            "SELECT key, expires, value FROM entries "
+            "WHERE namespace = ? AND expires > ? ORDER BY accessed",
+            (self.namespace, now),
+        ).fetchall()
+        return [(key, expires - now, self._stored_value(value)) for key, expires, value in rows]
+
+    def restore(self, entries):
+        """snapshot() のエントリを読み込み、入れた件数を返す（既存のキーは上書きしない）"""
+        now = time.time()
+        restored = 0
+        with self._transaction() as conn:
+            # 読み込んだエントリは最も古い側に置く（古い順に、現在より前のアクセス時刻を振る）
+            entries = [entry for entry in entries if entry[1] > 0]
+            for i, (key, remaining, value) in enumerate(entries):
+                blob = value if self.codec is not None else self._dump(value)
+                if blob is None:
+                    continue
+                restored += conn.execute(
+                    "INSERT OR IGNORE INTO entries "
+                    "(namespace, key, value, expires, accessed, size) VALUES (?, ?, ?, ?, ?, ?)",
+                    (self.namespace, key, blob, now + remaining, i - len(entries), len(blob)),
+                ).rowcount
+            restored -= self._evict(conn, now)
+        return max(0, restored)
+
+    def stats(self):
+        stats = super().stats()
+        stats["path"] = self.path
+        return stats
@@ -0,0 +1,100 @@
+"""
+リクエストの期限（時間予算）
+/extract などの処理全体に期限を設け、各段階（字幕取得・整形・要約）が残り時間を見て動く
+
+- レート制限対策の待機は残り時間に合わせて短くし、足りなければ省く
+- 残り時間がなくなったら次の戦略・次のGemini呼び出しを始めずに DeadlineExceeded を送出する
+- Gemini呼び出しのタイムアウトと再試行の打ち切りには残り時間を使う
+
+期限はヘッダー X-Request-Deadline（秒）か環境変数 REQUEST_DEADLINE_SECONDS で指定する
+
+    budget = deadline.from_header(request.headers.get(deadline.HEADER))
+    budget.sleep(random.uniform(3, 8))
+    timeout = budget.timeout(GEMINI_TIMEOUT)
+"""
+
+import asyncio
+import os
+import time
+
+# 期限を指定するリクエストヘッダー（このリクエストに使える秒数）
+HEADER = "X-Request-Deadline"
+
+# ヘッダーがないときの期限（秒。0なら期限なし）
+DEFAULT_SECONDS = float(os.environ.get("REQUEST_DEADLINE_SECONDS", 120))
+
+# ヘッダーで指定できる期限の上限（秒）
+MAX_SECONDS = float(os.environ.get("REQUEST_DEADLINE_MAX_SECONDS", 300))
+
+# 待機に使ってよい残り時間の割合（残りの大半は実際の処理に回す）
+SLEEP_SHARE = 0.25
+
+
+class DeadlineExceeded(Exception):
+    """リクエストの期限を過ぎた"""
+
+
+class Deadline:
+    """1リクエストの期限（time.monotonic() の絶対時刻。None なら期限なし）"""
+
+    def __init__(self, seconds=None):
+        self.started = time.monotonic()
+        self.budget = seconds if seconds and seconds > 0 else None
+        self.at = self.started + self.budget if self.budget else None
+
+    def remaining(self):
+        """残り秒数（期限なしなら無限大）"""
+        if self.at is None:
+            return float("inf")
+        return max(0.0, self.at - time.monotonic())
+
+    def elapsed(self):
+        return time.monotonic() - self.started
+
+    def expired(self):
+        return self.at is not None and time.monotonic() >= self.at
+
+    def check(self, stage=""):
+        """期限を過ぎていれば DeadlineExceeded を送出"""
+        if self.expired():
+            where = f" before {stage}" if stage else ""
+            raise DeadlineExceeded(
+                f"request deadline of {self.budget:.1f}s exceeded{where} "
+                f"(elapsed {self.elapsed():.1f}s)"
+            )
+
+    def timeout(self, default):
+        """1回の呼び出しのタイムアウト（既定値と残り時間の短い方）"""
+        return min(default, self.remaining())
+
+    def sleep_for(self, seconds):
+        """待機秒数を残り時間に合わせて縮める（残り時間の SLEEP_SHARE まで）"""
+        return max(0.0, min(seconds, self.remaining() * SLEEP_SHARE))
+
+    def sleep(self, seconds):
+        time.sleep(self.sleep_for(seconds))
+
+    async def sleep_async(self, seconds):
+        await asyncio.sleep(self.sleep_for(seconds))
+
+    def to_dict(self):
+        return {
+            "budget": self.budget,
+            "elapsed": round(self.elapsed(), 3),
+            "remaining": round(self.remaining(), 3) if self.at is not None else None,
+        }
+
+
+def from_header(value, default=None):
+    """ヘッダーの値（秒）から期限を作る。不正な値は ValueError、上限は MAX_SECONDS"""
+    seconds = DEFAULT_SECONDS if default is None else default
+    if value not in (None, ""):
+        try:
+            seconds = float(value)
+        except ValueError:
+            raise ValueError(f"{HEADER}ヘッダーは秒数で指定してください: {value}")
+        if seconds <= 0:
+            raise ValueError(f"{HEADER}ヘッダーは正の秒数で指定してください: {value}")
+    if seconds and MAX_SECONDS > 0:
+        seconds = min(seconds, MAX_SECONDS)
+    return Deadline(seconds)
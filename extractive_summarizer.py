@@ -0,0 +1,210 @@
+"""
+NumPyによる抽出型要約
+Geminiが使えないとき（APIキー未設定・エラー・オフライン）の即時フォールバック要約
+
+- 文を文字n-gram（2〜3文字）のTF-IDFベクトルで表すので、日本語でも形態素解析器が不要
+- 文同士のコサイン類似度グラフにTextRank（べき乗法）をかけて重要度を求める
+- MMR（Maximal Marginal Relevance）で重要度と既選択文との重複をバランスさせて選ぶ
+- 選んだ文は元の順序で「・」付きの箇条書きとして返す
+"""
+
+import re
+
+import numpy as np
+
+# 文字n-gramの長さ
+NGRAM_SIZES = (2, 3)
+
+# 特徴量として使うn-gramの最大数（文書頻度の高い順）
+MAX_FEATURES = 4096
+
+# これより多くの文書に出現するn-gramは特徴量から外す（割合）
+MAX_DOC_FREQ = 0.5
+
+# 文がこれより多いときは隣接する文をまとめてから計算する（類似度行列の大きさを抑える）
+MAX_UNITS = 3000
+
+# 文として扱う最小・最大文字数
+MIN_SENTENCE_CHARS = 10
+MAX_SENTENCE_CHARS = 200
+
+DAMPING = 0.85
+MMR_LAMBDA = 0.7
+DEFAULT_MAX_SENTENCES = 7
+DEFAULT_MAX_CHARS = 800
+
+_SENTENCE_END = re.compile(r"(?<=[。！？!?])\s*|(?<=[.])\s+|\n+")
+
+
+def split_sentences(text):
+    """テキストを文に分割
+
+    句読点のない自動生成字幕は空白区切りの断片を MIN_SENTENCE_CHARS 以上になるまでつなぎ、
+    長すぎる文は MAX_SENTENCE_CHARS ごとに区切る
+    """
+    sentences = []
+    for raw in _SENTENCE_END.split(text or ""):
+        raw = raw.strip()
+        if not raw:
+            continue
+        if len(raw) <= MAX_SENTENCE_CHARS:
+            sentences.append(raw)
+            continue
+        current = ""
+        for piece in raw.split():
+            if current and len(current) + len(piece) + 1 > MAX_SENTENCE_CHARS:
+                sentences.append(current)
+                current = piece
+            else:
+                current = f"{current} {piece}" if current else piece
+        # 空白もない長い文は文字数で区切る
+        while len(current) > MAX_SENTENCE_CHARS:
+            sentences.append(current[:MAX_SENTENCE_CHARS])
+            current = current[MAX_SENTENCE_CHARS:]
+        if current:
+            sentences.append(current)
+
+    merged, buffer = [], ""
+    for sentence in sentences:
+        buffer = f"{buffer} {sentence}" if buffer else sentence
+        if len(buffer) >= MIN_SENTENCE_CHARS:
+            merged.append(buffer)
+            buffer = ""
+    if buffer:
+        if merged:
+            merged[-1] = f"{merged[-1]} {buffer}"
+        else:
+            merged.append(buffer)
+    return merged
+
+
+def _ngram_keys(sentences):
+    """全文の文字n-gramを整数キーに変換し、(文番号, キー)の配列を返す
+
+    コードポイント（21bit）をつなげて64bitに詰めるので、Pythonのループなしで数えられる。
+    文の境界（区切り文字 \\0）をまたぐn-gramは除外する
+    """
+    joined = "\0".join(re.sub(r"\s+", " ", s.lower()) for s in sentences)
+    codes = np.frombuffer(joined.encode("utf-32-le"), dtype=np.uint32).astype(np.uint64)
+    separator = codes == 0
+    sentence_ids = np.cumsum(separator)
+
+    ids, keys = [], []
+    for size in NGRAM_SIZES:
+        count = len(codes) - size + 1
+        if count <= 0:
+            continue
+        key = np.zeros(count, dtype=np.uint64)
+        crosses = np.zeros(count, dtype=bool)
+        for offset in range(size):
+            key = (key << np.uint64(21)) | codes[offset:offset + count]
+            crosses |= separator[offset:offset + count]
+        ids.append(sentence_ids[:count][~crosses])
+        keys.append(key[~crosses])
+    if not keys:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.uint64)
+    return np.concatenate(ids), np.concatenate(keys)
+
+
+def tfidf_matrix(sentences):
+    """文 × 文字n-gram のTF-IDF行列（行はL2正規化済み、float32）"""
+    n = len(sentences)
+    ids, keys = _ngram_keys(sentences)
+    grams, gram_index = np.unique(keys, return_inverse=True)
+
+    # (文, n-gram) ごとの出現回数と、各n-gramの文書頻度
+    pairs, tf = np.unique(ids * len(grams) + gram_index, return_counts=True)
+    pair_rows, pair_grams = np.divmod(pairs, len(grams))
+    df = np.bincount(pair_grams, minlength=len(grams))
+
+    # 1文にしか出ないn-gramは文同士の類似度に寄与しないので除外する
+    max_df = max(2, int(MAX_DOC_FREQ * n))
+    candidates = np.flatnonzero((df > 1) & (df <= max_df))
+    if len(candidates) == 0:
+        candidates = np.arange(len(grams))
+    order = np.argsort(-df[candidates], kind="stable")
+    vocab = candidates[order[:MAX_FEATURES]]
+
+    column = np.full(len(grams), -1, dtype=np.int64)
+    column[vocab] = np.arange(len(vocab))
+    keep = column[pair_grams] >= 0
+
+    matrix = np.zeros((n, len(vocab)), dtype=np.float32)
+    matrix[pair_rows[keep], column[pair_grams[keep]]] = 1.0 + np.log(tf[keep].astype(np.float32))
+    matrix *= (np.log((1.0 + n) / (1.0 + df[vocab])) + 1.0).astype(np.float32)
+
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def textrank(similarity, damping=DAMPING, max_iter=100, tol=1e-6):
+    """類似度行列からTextRankスコアを計算（べき乗法）"""
+    n = similarity.shape[0]
+    weights = similarity.astype(np.float64, copy=True)
+    np.fill_diagonal(weights, 0.0)
+    row_sums = weights.sum(axis=1, keepdims=True)
+    # 孤立した文は全体へ均等に遷移させる
+    transition = np.where(row_sums > 0, weights / np.where(row_sums > 0, row_sums, 1.0), 1.0 / n)
+
+    scores = np.full(n, 1.0 / n)
+    for _ in range(max_iter):
+        updated = (1.0 - damping) / n + damping * (transition.T @ scores)
+        if np.abs(updated - scores).sum() < tol:
+            scores = updated
+            break
+        scores = updated
+    return scores
+
+
+def mmr_select(scores, similarity, max_sentences, lengths=None, max_chars=None,
+               diversity_lambda=MMR_LAMBDA):
+    """MMRで文を選び、選んだ文のインデックスを元の順序で返す"""
+    n = len(scores)
+    relevance = scores / scores.max() if scores.max() > 0 else scores
+    max_sim = np.zeros(n)
+    available = np.ones(n, dtype=bool)
+    selected, total_chars = [], 0
+
+    while len(selected) < max_sentences and available.any():
+        mmr = diversity_lambda * relevance - (1.0 - diversity_lambda) * max_sim
+        mmr[~available] = -np.inf
+        best = int(np.argmax(mmr))
+        available[best] = False
+        selected.append(best)
+        max_sim = np.maximum(max_sim, similarity[best])
+        if max_chars and lengths is not None:
+            # 残りの文字数に収まらない文は候補から外す
+            total_chars += lengths[best]
+            available &= lengths <= max_chars - total_chars
+    return sorted(selected)
+
+
+def _group_units(sentences, max_units):
+    """文が多すぎるときは隣接する文をまとめて max_units 以下にする"""
+    if len(sentences) <= max_units:
+        return sentences
+    size = -(-len(sentences) // max_units)
+    return [" ".join(sentences[i:i + size]) for i in range(0, len(sentences), size)]
+
+
+def extract_sentences(text, max_sentences=DEFAULT_MAX_SENTENCES, max_chars=DEFAULT_MAX_CHARS,
+                      diversity_lambda=MMR_LAMBDA):
+    """重要文を元の順序で返す"""
+    sentences = _group_units(split_sentences(text), MAX_UNITS)
+    if len(sentences) <= max_sentences:
+        return sentences
+
+    matrix = tfidf_matrix(sentences)
+    similarity = matrix @ matrix.T
+    scores = textrank(similarity)
+    lengths = np.array([len(s) for s in sentences])
+    chosen = mmr_select(scores, similarity, max_sentences, lengths, max_chars, diversity_lambda)
+    return [sentences[i] for i in chosen]
+
+
+def summarize(text, max_sentences=DEFAULT_MAX_SENTENCES, max_chars=DEFAULT_MAX_CHARS,
+              diversity_lambda=MMR_LAMBDA):
+    """抽出型要約（「・」付きの箇条書き）"""
+    sentences = extract_sentences(text, max_sentences, max_chars, diversity_lambda)
+    return "\n".join(f"・{s}" for s in sentences)
@@ -0,0 +1,244 @@
+"""
+Gemini呼び出しの再試行
+一時的なエラー（429 / 500 / 503 / タイムアウト）だけを指数バックオフ（フルジッター）で再試行し、
+それ以外（400 / 403 など）はすぐに呼び出し元へ返す。Retry-After があればそれに従う
+
+再試行の待機はリクエストの期限（time.monotonic() の絶対時刻）を超えない。
+期限までに次の試行を始められない場合は最後のエラーをそのまま送出する
+
+    text = gemini_retry.call_with_retry(lambda: model.generate_content(prompt).text)
+"""
+
+import asyncio
+import logging
+import os
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+
+import deadline
+
+logger = logging.getLogger(__name__)
+
+# 再試行するHTTPステータス
+RETRYABLE_STATUS = frozenset({408, 429, 500, 502, 503, 504})
+
+# 最大試行回数（初回を含む）
+MAX_ATTEMPTS = int(os.environ.get("GEMINI_MAX_ATTEMPTS", 4))
+
+# バックオフの基準秒数と上限秒数（attempt 回目の待機は 0〜min(上限, 基準 * 2^attempt) の一様乱数）
+BACKOFF_BASE = float(os.environ.get("GEMINI_RETRY_BASE", 0.5))
+BACKOFF_CAP = float(os.environ.get("GEMINI_RETRY_CAP", 8))
+
+# 期限が渡されなかったときの再試行を含めた持ち時間（秒）
+DEFAULT_BUDGET = float(os.environ.get("GEMINI_RETRY_BUDGET", 60))
+
+# 再試行しない例外の型名（ネットワーク系でも設定ミスなど結果が変わらないもの）
+_FATAL_NAMES = frozenset({"InvalidArgument", "PermissionDenied", "Unauthenticated", "NotFound"})
+
+# 一時的なエラーとみなす例外の型名（google.api_core / httpx / 標準ライブラリ）
+# DeadlineExceeded は google.api_core の 504。同名の deadline.DeadlineExceeded は classify で除く
+_TRANSIENT_NAMES = frozenset(
+    {
+        "ResourceExhausted",
+        "TooManyRequests",
+        "ServiceUnavailable",
+        "InternalServerError",
+        "DeadlineExceeded",
+        "GatewayTimeout",
+        "BadGateway",
+        "TransportError",
+        "TimeoutException",
+        "ConnectError",
+        "ReadTimeout",
+        "RemoteProtocolError",
+    }
+)
+
+
+def _status_code(error):
+    """例外からHTTPステータスを取り出す（httpx は response、google.api_core は code）"""
+    response = getattr(error, "response", None)
+    status = getattr(response, "status_code", None)
+    if isinstance(status, int):
+        return status
+    code = getattr(error, "code", None)
+    return code if isinstance(code, int) else None
+
+
+def parse_retry_after(value, now=None):
+    """Retry-After（秒数またはHTTP日付）を待機秒数にする。解釈できなければ None"""
+    if not value:
+        return None
+    value = str(value).strip()
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    now = now if now is not None else time.time()
+    return max(0.0, when.timestamp() - now)
+
+
+def retry_after(error):
+    """例外のレスポンスヘッダーの Retry-After（秒）"""
+    headers = getattr(getattr(error, "response", None), "headers", None)
+    if not headers:
+        return None
+    try:
+        return parse_retry_after(headers.get("Retry-After"))
+    except AttributeError:
+        return None
+
+
+def classify(error):
+    """例外を分類して (再試行するか, 理由) を返す"""
+    # リクエストの期限切れは上流のエラーではない（型名が google.api_core と同じなので先に判定する）
+    if isinstance(error, deadline.DeadlineExceeded):
+        return False, "request deadline"
+    status = _status_code(error)
+    if status is not None:
+        return status in RETRYABLE_STATUS, str(status)
+
+    names = {cls.__name__ for cls in type(error).__mro__}
+    if names & _FATAL_NAMES:
+        return False, type(error).__name__
+    if names & _TRANSIENT_NAMES or isinstance(error, (ConnectionError, TimeoutError)):
+        return True, type(error).__name__
+    return False, type(error).__name__
+
+
+def backoff_delay(attempt, base=None, cap=None):
+    """attempt 回目（0始まり）の再試行前の待機秒数（フルジッター）"""
+    base = BACKOFF_BASE if base is None else base
+    cap = BACKOFF_CAP if cap is None else cap
+    return random.uniform(0, min(cap, base * 2**attempt))
+
+
+class RetryStats:
+    """再試行の統計（/metrics 用）"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.attempts = 0
+        self.retries = 0
+        self.succeeded_after_retry = 0
+        self.fatal = 0
+        self.exhausted = 0
+        self.deadline_exceeded = 0
+        self.retry_wait = 0.0
+        self.reasons = {}
+
+    def add(self, **counts):
+        with self._lock:
+            for name, value in counts.items():
+                setattr(self, name, getattr(self, name) + value)
+
+    def add_retry(self, reason, delay):
+        with self._lock:
+            self.retries += 1
+            self.retry_wait += delay
+            self.reasons[reason] = self.reasons.get(reason, 0) + 1
+
+    def to_dict(self):
+        with self._lock:
+            return {
+                "calls": self.calls,
+                "attempts": self.attempts,
+                "retries": self.retries,
+                "succeeded_after_retry": self.succeeded_after_retry,
+                "fatal": self.fatal,
+                "exhausted": self.exhausted,
+                "deadline_exceeded": self.deadline_exceeded,
+                "retry_wait": round(self.retry_wait, 3),
+                "reasons": dict(self.reasons),
+            }
+
+
+retry_stats = RetryStats()
+
+
+def stats():
+    """再試行の統計"""
+    return retry_stats.to_dict()
+
+
+def _next_delay(error, attempt, max_attempts, deadline):
+    """次の試行までの待機秒数。再試行しない場合は None（統計もここで数える）"""
+    retryable, reason = classify(error)
+    if not retryable:
+        retry_stats.add(fatal=1)
+        logger.error(f"Gemini call failed with non-retryable error ({reason}): {error}")
+        return None
+    if attempt + 1 >= max_attempts:
+        retry_stats.add(exhausted=1)
+        logger.error(f"Gemini call failed after {max_attempts} attempts ({reason}): {error}")
+        return None
+
+    delay = retry_after(error)
+    if delay is None:
+        delay = backoff_delay(attempt)
+    if time.monotonic() + delay >= deadline:
+        retry_stats.add(deadline_exceeded=1)
+        logger.error(
+            f"Gemini call failed ({reason}); retry in {delay:.2f}s would exceed the deadline"
+        )
+        return None
+
+    retry_stats.add_retry(reason, delay)
+    logger.warning(
+        f"Gemini call failed ({reason}), retrying in {delay:.2f}s "
+        f"(attempt {attempt + 2}/{max_attempts})"
+    )
+    return delay
+
+
+def call_with_retry(fn, deadline=None, max_attempts=None, sleep=time.sleep):
+    """fn() を一時的なエラーのときだけ再試行して結果を返す
+
+    Args:
+        fn: 引数なしで1回呼び出す関数
+        deadline: 再試行を打ち切る time.monotonic() の絶対時刻（省略時は DEFAULT_BUDGET 秒後）
+        max_attempts: 最大試行回数（省略時は GEMINI_MAX_ATTEMPTS）
+    """
+    deadline = deadline if deadline is not None else time.monotonic() + DEFAULT_BUDGET
+    max_attempts = max(1, max_attempts or MAX_ATTEMPTS)
+    retry_stats.add(calls=1)
+    for attempt in range(max_attempts):
+        retry_stats.add(attempts=1)
+        try:
+            result = fn()
+        except Exception as e:
+            delay = _next_delay(e, attempt, max_attempts, deadline)
+            if delay is None:
+                raise
+            sleep(delay)
+            continue
+        if attempt:
+            retry_stats.add(succeeded_after_retry=1)
+        return result
+
+
+async def call_with_retry_async(fn, deadline=None, max_attempts=None):
+    """call_with_retry のasync版（fn はコルーチン関数。待機は asyncio.sleep）"""
+    deadline = deadline if deadline is not None else time.monotonic() + DEFAULT_BUDGET
+    max_attempts = max(1, max_attempts or MAX_ATTEMPTS)
+    retry_stats.add(calls=1)
+    for attempt in range(max_attempts):
+        retry_stats.add(attempts=1)
+        try:
+            result = await fn()
+        except Exception as e:
+            delay = _next_delay(e, attempt, max_attempts, deadline)
+            if delay is None:
+                raise
+            await asyncio.sleep(delay)
+            continue
+        if attempt:
+            retry_stats.add(succeeded_after_retry=1)
+        return result
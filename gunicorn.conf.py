@@ -0,0 +1,10 @@
+"""
+gunicorn の設定（起動ディレクトリにあれば gunicorn が自動で読む）
+JOB_WORKERS が1以上なら、各ワーカープロセスでアプリを読み込んだあとにジョブのワーカーを起動する
+"""
+
+
+def post_worker_init(worker):
+    import app
+
+    app.start_job_workers()
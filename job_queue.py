@@ -0,0 +1,660 @@
+"""
+永続ジョブキュー（字幕抽出などの長い処理用）
+ジョブをSQLite（ローカル・同じホストのプロセス間）またはRedis（複数のマシン間）に保存し、
+ワーカーが取り出して実行する。インスタンスが止まっても実行中のジョブは失われず、
+可視性タイムアウトが切れたら他のワーカーに再配信される
+
+- claim したジョブは visibility_timeout 秒だけ他のワーカーから見えない（実行中は延長し続ける）
+- 失敗したジョブは指数バックオフで再試行し、max_attempts 回失敗したら dead（デッドレター）にする
+- ワーカーは app.py の中のスレッドとしても、別プロセス（job_worker.py など）としても動かせる
+
+    queue = job_queue.open_queue("jobs.sqlite3")      # または "redis://host:6379/0"
+    job_id = queue.enqueue("extract", {"url": url})
+    job_queue.Worker(queue, {"extract": handle_extract}).run()
+"""
+
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+try:
+    import redis
+except ImportError:  # redis 未インストール時はSQLiteのキューだけ使える
+    redis = None
+
+logger = logging.getLogger(__name__)
+
+# ジョブの状態
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+DEAD = "dead"
+STATUSES = (QUEUED, RUNNING, DONE, DEAD)
+
+# 取り出したジョブを他のワーカーから隠す時間（秒）
+VISIBILITY_TIMEOUT = float(os.environ.get("JOB_VISIBILITY_TIMEOUT", 300))
+
+# 1つのジョブを試す回数の上限（超えたらデッドレター）
+MAX_ATTEMPTS = int(os.environ.get("JOB_MAX_ATTEMPTS", 3))
+
+# 再試行の待ち時間（秒。1回目の失敗で RETRY_BASE_DELAY、以後2倍ずつ RETRY_MAX_DELAY まで）
+RETRY_BASE_DELAY = float(os.environ.get("JOB_RETRY_BASE_DELAY", 10))
+RETRY_MAX_DELAY = float(os.environ.get("JOB_RETRY_MAX_DELAY", 600))
+
+# 完了したジョブ（結果）を残す時間（秒）
+RESULT_TTL = int(os.environ.get("JOB_RESULT_TTL", 7 * 86400))
+
+# 他のプロセスの書き込みを待つ時間（ミリ秒、SQLite）
+BUSY_TIMEOUT_MS = 5000
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    queue TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    status TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL,
+    visible_at REAL NOT NULL,
+    lease TEXT,
+    result TEXT,
+    error TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_due ON jobs (queue, visible_at)
+    WHERE status IN ('queued', 'running');
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs (queue, status, updated_at);
+"""
+
+
+def retry_delay(attempts):
+    """attempts 回目の失敗のあとに待つ秒数"""
+    return min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * 2 ** max(0, attempts - 1))
+
+
+class Job:
+    """キューのジョブ（lease は claim したワーカーだけが持つ。完了・失敗の報告に使う）"""
+
+    def __init__(self, id, kind, payload, status=QUEUED, attempts=0, max_attempts=MAX_ATTEMPTS,
+                 visible_at=0.0, lease=None, result=None, error=None, created_at=None,
+                 updated_at=None):
+        self.id = str(id)
+        self.kind = kind
+        self.payload = payload
+        self.status = status
+        self.attempts = attempts
+        self.max_attempts = max_attempts
+        self.visible_at = visible_at
+        self.lease = lease
+        self.result = result
+        self.error = error
+        self.created_at = created_at
+        self.updated_at = updated_at
+
+    def to_dict(self):
+        """APIで返す形（lease は含めない）"""
+        return {
+            "id": self.id,
+            "kind": self.kind,
+            "payload": self.payload,
+            "status": self.status,
+            "attempts": self.attempts,
+            "max_attempts": self.max_attempts,
+            "result": self.result,
+            "error": self.error,
+            "created_at": self.created_at,
+            "updated_at": self.updated_at,
+        }
+
+    def _to_record(self):
+        record = self.to_dict()
+        record.update(visible_at=self.visible_at, lease=self.lease)
+        return record
+
+    @classmethod
+    def _from_record(cls, record):
+        return cls(**record)
+
+
+class SQLiteQueue:
+    """SQLite（WALモード）のジョブキュー（同じファイルを開いた全プロセス・スレッドで共有できる）"""
+
+    backend = "sqlite"
+
+    def __init__(self, path, name="default"):
+        self.path = path
+        self.name = name
+        self._local = threading.local()
+        self._connect().executescript(_SCHEMA)
+
+    def _connect(self):
+        """スレッドごとの接続（fork したプロセスでは開き直す）"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=BUSY_TIMEOUT_MS / 1000, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def close(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+    def _transaction(self):
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        return conn
+
+    def _row_to_job(self, row):
+        (id, kind, payload, status, attempts, max_attempts, visible_at, lease, result, error,
+         created_at, updated_at) = row
+        return Job(
+            id, kind, json.loads(payload), status, attempts, max_attempts, visible_at, lease,
+            json.loads(result) if result is not None else None, error, created_at, updated_at,
+        )
+
+    _COLUMNS = (
+        "id, kind, payload, status, attempts, max_attempts, visible_at, lease, result, error, "
+        "created_at, updated_at"
+    )
+
+    def enqueue(self, kind, payload, max_attempts=None, delay=0):
+        """ジョブを追加してIDを返す（payload はJSONにできる値）"""
+        now = time.time()
+        cursor = self._connect().execute(
+            "INSERT INTO jobs (queue, kind, payload, status, max_attempts, visible_at, "
+            "created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (self.name, kind, json.dumps(payload, ensure_ascii=False), QUEUED,
+             max_attempts or MAX_ATTEMPTS, now + delay, now, now),
+        )
+        return str(cursor.lastrowid)
+
+    def claim(self, visibility_timeout=None):
+        """実行できるジョブを1つ取り出して返す（なければ None）
+
+        待機中のジョブと、可視性タイムアウトが切れた実行中のジョブ（ワーカーが止まった）が対象。
+        最後の試行で止まったジョブは再配信せずデッドレターにする
+        """
+        visibility_timeout = visibility_timeout or VISIBILITY_TIMEOUT
+        while True:
+            now = time.time()
+            conn = self._transaction()
+            try:
+                row = conn.execute(
+                    f"SELECT {self._COLUMNS} FROM jobs WHERE queue = ? "
+                    "AND status IN ('queued', 'running') AND visible_at <= ? "
+                    "ORDER BY visible_at LIMIT 1",
+                    (self.name, now),
+                ).fetchone()
+                if row is None:
+                    conn.execute("COMMIT")
+                    return None
+                job = self._row_to_job(row)
+                if job.status == RUNNING and job.attempts >= job.max_attempts:
+                    conn.execute(
+                        "UPDATE jobs SET status = ?, lease = NULL, error = ?, updated_at = ? "
+                        "WHERE id = ?",
+                        (DEAD, job.error or "visibility timeout expired", now, job.id),
+                    )
+                    conn.execute("COMMIT")
+                    logger.warning(f"Job {job.id} ({job.kind}) timed out on its last attempt")
+                    continue
+                job.status = RUNNING
+                job.attempts += 1
+                job.lease = uuid.uuid4().hex
+                job.visible_at = now + visibility_timeout
+                job.updated_at = now
+                conn.execute(
+                    "UPDATE jobs SET status = ?, attempts = ?, lease = ?, visible_at = ?, "
+                    "updated_at = ? WHERE id = ?",
+                    (RUNNING, job.attempts, job.lease, job.visible_at, now, job.id),
+                )
+                conn.execute("COMMIT")
+                return job
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+
+    def _update_leased(self, job, sql, params):
+        """claim したワーカーのまま（lease が同じ）なら更新して True"""
+        cursor = self._connect().execute(
+            f"UPDATE jobs SET {sql} WHERE id = ? AND lease = ? AND status = ?",
+            params + (job.id, job.lease, RUNNING),
+        )
+        return cursor.rowcount == 1
+
+    def extend(self, job, seconds=None):
+        """実行中のジョブの可視性タイムアウトを延ばす（他のワーカーに渡っていたら False）"""
+        job.visible_at = time.time() + (seconds or VISIBILITY_TIMEOUT)
+        return self._update_leased(job, "visible_at = ?", (job.visible_at,))
+
+    def complete(self, job, result=None):
+        """ジョブを完了にする（他のワーカーに渡っていたら False）"""
+        now = time.time()
+        done = self._update_leased(
+            job,
+            "status = ?, result = ?, error = NULL, lease = NULL, updated_at = ?",
+            (DONE, json.dumps(result, ensure_ascii=False), now),
+        )
+        if done:
+            job.status, job.result, job.updated_at = DONE, result, now
+        return done
+
+    def fail(self, job, error, retry=True):
+        """ジョブの失敗を記録し、新しい状態（queued / dead。他のワーカーに渡っていたら None）を返す"""
+        now = time.time()
+        status = QUEUED if retry and job.attempts < job.max_attempts else DEAD
+        visible_at = now + retry_delay(job.attempts) if status == QUEUED else now
+        if not self._update_leased(
+            job,
+            "status = ?, error = ?, lease = NULL, visible_at = ?, updated_at = ?",
+            (status, str(error), visible_at, now),
+        ):
+            return None
+        job.status, job.error, job.updated_at = status, str(error), now
+        return status
+
+    def get(self, job_id):
+        try:
+            job_id = int(job_id)
+        except (TypeError, ValueError):
+            return None
+        row = self._connect().execute(
+            f"SELECT {self._COLUMNS} FROM jobs WHERE id = ? AND queue = ?", (job_id, self.name)
+        ).fetchone()
+        return self._row_to_job(row) if row else None
+
+    def dead_letters(self, limit=100):
+        """デッドレターのジョブ（新しい順）"""
+        rows = self._connect().execute(
+            f"SELECT {self._COLUMNS} FROM jobs WHERE queue = ? AND status = ? "
+            "ORDER BY updated_at DESC LIMIT ?",
+            (self.name, DEAD, limit),
+        ).fetchall()
+        return [self._row_to_job(row) for row in rows]
+
+    def requeue(self, job_id):
+        """デッドレターのジョブを試行回数0から待機に戻す"""
+        now = time.time()
+        cursor = self._connect().execute(
+            "UPDATE jobs SET status = ?, attempts = 0, visible_at = ?, updated_at = ? "
+            "WHERE id = ? AND queue = ? AND status = ?",
+            (QUEUED, now, now, job_id, self.name, DEAD),
+        )
+        return cursor.rowcount == 1
+
+    def prune(self, older_than=None):
+        """RESULT_TTL より前に完了したジョブを消し、消した件数を返す"""
+        cutoff = time.time() - (RESULT_TTL if older_than is None else older_than)
+        return self._connect().execute(
+            "DELETE FROM jobs WHERE queue = ? AND status = ? AND updated_at < ?",
+            (self.name, DONE, cutoff),
+        ).rowcount
+
+    def stats(self):
+        rows = self._connect().execute(
+            "SELECT status, COUNT(*) FROM jobs WHERE queue = ? GROUP BY status", (self.name,)
+        ).fetchall()
+        counts = dict.fromkeys(STATUSES, 0)
+        counts.update(rows)
+        return {"backend": self.backend, "queue": self.name, **counts}
+
+
+class RedisQueue:
+    """Redisのジョブキュー（複数のマシンのワーカーで共有できる）
+
+    ジョブはJSONの文字列キー、待機中・実行中のジョブIDは実行できる時刻をスコアにした
+    ZSET に入れる。状態の変更は WATCH / MULTI で他のワーカーと競合しないようにする。
+    完了したジョブは完了時刻をスコアにした ZSET にも入れ、done の件数は RESULT_TTL 以内の分を数える
+    （ジョブのキーは RESULT_TTL で Redis が消す）
+    """
+
+    backend = "redis"
+
+    def __init__(self, client, name="default", prefix="ytjobs:"):
+        self.client = client
+        self.name = name
+        self.prefix = f"{prefix}{name}:"
+        self._due = self.prefix + "due"
+        self._dead = self.prefix + "dead"
+        self._done = self.prefix + "done"
+        self._counts = self.prefix + "counts"
+
+    def close(self):
+        self.client.close()
+
+    def _job_key(self, job_id):
+        return f"{self.prefix}job:{job_id}"
+
+    def _load(self, data):
+        return Job._from_record(json.loads(data)) if data is not None else None
+
+    def _dump(self, job):
+        return json.dumps(job._to_record(), ensure_ascii=False)
+
+    def enqueue(self, kind, payload, max_attempts=None, delay=0):
+        now = time.time()
+        job_id = str(self.client.incr(self.prefix + "seq"))
+        job = Job(job_id, kind, payload, QUEUED, 0, max_attempts or MAX_ATTEMPTS, now + delay,
+                  created_at=now, updated_at=now)
+        pipe = self.client.pipeline()
+        pipe.set(self._job_key(job_id), self._dump(job))
+        pipe.zadd(self._due, {job_id: job.visible_at})
+        pipe.hincrby(self._counts, QUEUED, 1)
+        pipe.execute()
+        return job_id
+
+    def claim(self, visibility_timeout=None):
+        visibility_timeout = visibility_timeout or VISIBILITY_TIMEOUT
+        with self.client.pipeline() as pipe:
+            while True:
+                now = time.time()
+                try:
+                    pipe.watch(self._due)
+                    ids = pipe.zrangebyscore(self._due, "-inf", now, start=0, num=1)
+                    if not ids:
+                        pipe.reset()
+                        return None
+                    job_id = ids[0].decode("utf-8")
+                    job = self._load(pipe.get(self._job_key(job_id)))
+                    pipe.multi()
+                    if job is None:  # 消されたジョブ
+                        pipe.zrem(self._due, job_id)
+                        pipe.execute()
+                        continue
+                    previous = job.status
+                    if previous == RUNNING and job.attempts >= job.max_attempts:
+                        job.status, job.lease, job.updated_at = DEAD, None, now
+                        job.error = job.error or "visibility timeout expired"
+                        pipe.zrem(self._due, job_id)
+                        pipe.zadd(self._dead, {job_id: now})
+                        pipe.set(self._job_key(job_id), self._dump(job))
+                        pipe.hincrby(self._counts, RUNNING, -1)
+                        pipe.hincrby(self._counts, DEAD, 1)
+                        pipe.execute()
+                        logger.warning(f"Job {job_id} ({job.kind}) timed out on its last attempt")
+                        continue
+                    job.status = RUNNING
+                    job.attempts += 1
+                    job.lease = uuid.uuid4().hex
+                    job.visible_at = now + visibility_timeout
+                    job.updated_at = now
+                    pipe.zadd(self._due, {job_id: job.visible_at})
+                    pipe.set(self._job_key(job_id), self._dump(job))
+                    if previous == QUEUED:
+                        pipe.hincrby(self._counts, QUEUED, -1)
+                        pipe.hincrby(self._counts, RUNNING, 1)
+                    pipe.execute()
+                    return job
+                except redis.WatchError:
+                    continue
+
+    def _transition(self, job, update):
+        """lease が同じなら update(保存されているジョブ, pipe) で状態を変え、変えたジョブを返す"""
+        key = self._job_key(job.id)
+        with self.client.pipeline() as pipe:
+            while True:
+                try:
+                    pipe.watch(key, self._due)
+                    stored = self._load(pipe.get(key))
+                    if stored is None or stored.status != RUNNING or stored.lease != job.lease:
+                        pipe.reset()
+                        return None
+                    pipe.multi()
+                    update(stored, pipe)
+                    pipe.execute()
+                    return stored
+                except redis.WatchError:
+                    continue
+
+    def extend(self, job, seconds=None):
+        visible_at = time.time() + (seconds or VISIBILITY_TIMEOUT)
+
+        def update(stored, pipe):
+            stored.visible_at = visible_at
+            pipe.zadd(self._due, {stored.id: visible_at})
+            pipe.set(self._job_key(stored.id), self._dump(stored))
+
+        if self._transition(job, update) is None:
+            return False
+        job.visible_at = visible_at
+        return True
+
+    def complete(self, job, result=None):
+        now = time.time()
+
+        def update(stored, pipe):
+            stored.status, stored.result, stored.error = DONE, result, None
+            stored.lease, stored.updated_at = None, now
+            pipe.zrem(self._due, stored.id)
+            # 完了したジョブは RESULT_TTL で Redis が消す
+            pipe.set(self._job_key(stored.id), self._dump(stored), ex=RESULT_TTL)
+            pipe.zadd(self._done, {stored.id: now})
+            pipe.hincrby(self._counts, RUNNING, -1)
+
+        if self._transition(job, update) is None:
+            return False
+        job.status, job.result, job.updated_at = DONE, result, now
+        return True
+
+    def fail(self, job, error, retry=True):
+        now = time.time()
+        status = QUEUED if retry and job.attempts < job.max_attempts else DEAD
+
+        def update(stored, pipe):
+            stored.status, stored.error, stored.lease, stored.updated_at = status, str(error), None, now
+            if status == QUEUED:
+                stored.visible_at = now + retry_delay(stored.attempts)
+                pipe.zadd(self._due, {stored.id: stored.visible_at})
+            else:
+                pipe.zrem(self._due, stored.id)
+                pipe.zadd(self._dead, {stored.id: now})
+            pipe.set(self._job_key(stored.id), self._dump(stored))
+            pipe.hincrby(self._counts, RUNNING, -1)
+            pipe.hincrby(self._counts, status, 1)
+
+        if self._transition(job, update) is None:
+            return None
+        job.status, job.error, job.updated_at = status, str(error), now
+        return status
+
+    def get(self, job_id):
+        return self._load(self.client.get(self._job_key(job_id)))
+
+    def dead_letters(self, limit=100):
+        ids = self.client.zrevrange(self._dead, 0, limit - 1)
+        if not ids:
+            return []
+        jobs = self.client.mget([self._job_key(i.decode("utf-8")) for i in ids])
+        return [self._load(data) for data in jobs if data is not None]
+
+    def requeue(self, job_id):
+        key = self._job_key(job_id)
+        with self.client.pipeline() as pipe:
+            while True:
+                try:
+                    pipe.watch(key)
+                    job = self._load(pipe.get(key))
+                    if job is None or job.status != DEAD:
+                        pipe.reset()
+                        return False
+                    now = time.time()
+                    job.status, job.attempts, job.visible_at, job.updated_at = QUEUED, 0, now, now
+                    pipe.multi()
+                    pipe.set(key, self._dump(job))
+                    pipe.zrem(self._dead, job.id)
+                    pipe.zadd(self._due, {job.id: now})
+                    pipe.hincrby(self._counts, DEAD, -1)
+                    pipe.hincrby(self._counts, QUEUED, 1)
+                    pipe.execute()
+                    return True
+                except redis.WatchError:
+                    continue
+
+    def prune(self, older_than=None):
+        """RESULT_TTL より前に完了したジョブを消し、消した件数を返す（期限で消えたキーの分も数える）"""
+        cutoff = time.time() - (RESULT_TTL if older_than is None else older_than)
+        ids = self.client.zrangebyscore(self._done, "-inf", cutoff)
+        if not ids:
+            return 0
+        pipe = self.client.pipeline()
+        pipe.delete(*[self._job_key(i.decode("utf-8")) for i in ids])
+        pipe.zrem(self._done, *ids)
+        pipe.execute()
+        return len(ids)
+
+    def stats(self):
+        counts = dict.fromkeys(STATUSES, 0)
+        for status, count in self.client.hgetall(self._counts).items():
+            counts[status.decode("utf-8")] = int(count)
+        # done は件数を持たず、結果が残っている（RESULT_TTL 以内に完了した）ジョブを数える
+        counts[DONE] = self.client.zcount(self._done, time.time() - RESULT_TTL, "+inf")
+        return {"backend": self.backend, "queue": self.name, **counts}
+
+
+def open_queue(url, name="default"):
+    """URL（redis:// / rediss:// / unix://）ならRedis、それ以外はSQLiteのファイルのキューを開く"""
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        if redis is None:
+            raise ImportError("Redisのジョブキューには redis が必要です（pip install redis）")
+        return RedisQueue(redis.Redis.from_url(url), name)
+    if url.startswith("sqlite:///"):
+        url = url[len("sqlite:///"):]
+    return SQLiteQueue(url, name)
+
+
+class Worker:
+    """キューからジョブを取り出して種類ごとのハンドラーで実行する
+
+    handlers は {種類: handler(payload) -> 結果（JSONにできる値）}。実行中は可視性タイムアウトを
+    定期的に延ばすので、長いジョブでも他のワーカーに渡らない。permanent_errors の例外と
+    未知の種類のジョブは再試行せずデッドレターにする
+    """
+
+    def __init__(self, queue, handlers, visibility_timeout=None, poll_interval=1.0,
+                 permanent_errors=(ValueError,), name=None):
+        self.queue = queue
+        self.handlers = handlers
+        self.visibility_timeout = visibility_timeout or VISIBILITY_TIMEOUT
+        self.poll_interval = poll_interval
+        self.permanent_errors = permanent_errors
+        self.name = name or f"worker-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+        self.processed = 0
+        self.succeeded = 0
+        self.retried = 0
+        self.dead = 0
+        self._last_prune = 0.0
+
+    def _heartbeat(self, job, done):
+        """ジョブの実行中、可視性タイムアウトの1/3ごとに延ばす"""
+        interval = self.visibility_timeout / 3
+        while not done.wait(interval):
+            try:
+                if not self.queue.extend(job, self.visibility_timeout):
+                    logger.warning(f"{self.name}: lost the lease on job {job.id}")
+                    return
+            except Exception as e:
+                logger.warning(f"{self.name}: failed to extend job {job.id}: {e}")
+
+    def run_once(self):
+        """ジョブを1つ実行する（なければ False）"""
+        job = self.queue.claim(self.visibility_timeout)
+        if job is None:
+            return False
+        self.processed += 1
+        handler = self.handlers.get(job.kind)
+        if handler is None:
+            self.queue.fail(job, f"unknown job kind: {job.kind}", retry=False)
+            self.dead += 1
+            return True
+
+        done = threading.Event()
+        heartbeat = threading.Thread(target=self._heartbeat, args=(job, done), daemon=True)
+        heartbeat.start()
+        started = time.perf_counter()
+        try:
+            result = handler(job.payload)
+        except Exception as e:
+            status = self.queue.fail(job, e, retry=not isinstance(e, self.permanent_errors))
+            if status == QUEUED:
+                self.retried += 1
+            elif status == DEAD:
+                self.dead += 1
+            logger.warning(
+                f"{self.name}: job {job.id} ({job.kind}) failed on attempt "
+                f"{job.attempts}/{job.max_attempts} -> {status}: {e}"
+            )
+        else:
+            if self.queue.complete(job, result):
+                self.succeeded += 1
+                logger.info(
+                    f"{self.name}: job {job.id} ({job.kind}) done in "
+                    f"{time.perf_counter() - started:.1f}s"
+                )
+            else:
+                logger.warning(f"{self.name}: job {job.id} finished after its lease expired")
+        finally:
+            done.set()
+        return True
+
+    def run(self, stop=None, max_jobs=None, exit_when_empty=False):
+        """stop（threading.Event）がセットされるまでジョブを実行し続け、実行した件数を返す"""
+        stop = stop or threading.Event()
+        count = 0
+        while not stop.is_set() and (max_jobs is None or count < max_jobs):
+            try:
+                worked = self.run_once()
+            except Exception as e:
+                # キューに接続できないなど。少し待って続ける
+                logger.warning(f"{self.name}: queue error: {e}")
+                worked = False
+            if worked:
+                count += 1
+                continue
+            if exit_when_empty:
+                break
+            if time.time() - self._last_prune > 600:
+                self._last_prune = time.time()
+                try:
+                    self.queue.prune()
+                except Exception as e:
+                    logger.warning(f"{self.name}: failed to prune finished jobs: {e}")
+            stop.wait(self.poll_interval)
+        return count
+
+    def stats(self):
+        return {
+            "name": self.name,
+            "processed": self.processed,
+            "succeeded": self.succeeded,
+            "retried": self.retried,
+            "dead": self.dead,
+        }
+
+
+def start_workers(queue, handlers, count, stop=None, **options):
+    """count 個のワーカーをデーモンスレッドで起動し、Worker のリストを返す（stop.set() で止まる）"""
+    stop = stop or threading.Event()
+    workers = []
+    for i in range(count):
+        worker = Worker(queue, handlers, **options)
+        worker.stop = stop
+        worker.thread = threading.Thread(
+            target=worker.run, args=(stop,), name=f"job-worker-{i}", daemon=True
+        )
+        worker.thread.start()
+        workers.append(worker)
+    return workers
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+抽出ジョブのワーカー（app.py の /jobs に登録されたジョブを別プロセスで実行する）
+
+app.py と同じ環境変数（JOB_QUEUE_URL・GEMINI_API_KEY など）で起動する。
+JOB_QUEUE_URL に redis:// のURLを指定すれば、複数のマシンで起動して処理を分担できる。
+SIGTERM / Ctrl+C で新しいジョブの取り出しをやめ、実行中のジョブが終わってから終了する
+
+    JOB_QUEUE_URL=redis://host:6379/0 python job_worker.py --concurrency 4
+"""
+
+import argparse
+import logging
+import os
+import signal
+import sys
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import app  # noqa: E402
+import job_queue  # noqa: E402
+
+logger = logging.getLogger(__name__)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="抽出ジョブのワーカー")
+    parser.add_argument("-c", "--concurrency", type=int, default=2, help="同時に実行するジョブの数")
+    parser.add_argument("--poll-interval", type=float, default=1.0, help="キューが空のときの確認間隔（秒）")
+    parser.add_argument("--drain", action="store_true", help="キューが空になったら終了する")
+    args = parser.parse_args()
+
+    if app.job_queue_backend is None:
+        logger.error("Job queue is not configured (set JOB_QUEUE_URL)")
+        return 1
+
+    stop = threading.Event()
+
+    def shutdown(signum, frame):
+        # 実行中のジョブは終わるまで待つ（終わらなければ可視性タイムアウト後に再配信される）
+        logger.info(f"Received signal {signum}, finishing running jobs")
+        stop.set()
+
+    signal.signal(signal.SIGTERM, shutdown)
+    signal.signal(signal.SIGINT, shutdown)
+
+    workers = [
+        job_queue.Worker(app.job_queue_backend, app.JOB_HANDLERS, poll_interval=args.poll_interval)
+        for _ in range(max(1, args.concurrency))
+    ]
+    threads = [
+        threading.Thread(target=worker.run, args=(stop,), kwargs={"exit_when_empty": args.drain})
+        for worker in workers
+    ]
+    logger.info(
+        f"Starting {len(workers)} job workers on {app.job_queue_backend.backend} queue"
+    )
+    for thread in threads:
+        thread.start()
+    while any(thread.is_alive() for thread in threads):
+        for thread in threads:
+            thread.join(0.5)
+
+    for worker in workers:
+        logger.info(f"Worker stats: {worker.stats()}")
+    logger.info(f"Queue stats: {app.job_queue_backend.stats()}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
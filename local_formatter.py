@@ -0,0 +1,160 @@
+"""
+ルールベースの字幕整形
+format_text_with_gemini のプロンプト（transcript_common.build_format_prompt）と同じ規則を
+ローカルで適用し、LLM呼び出しなしで数ミリ秒で整形する
+
+規則:
+    1. 文末（。！？）の後に空行を入れる
+    2. 「で、」「それで、」「そして、」などの接続詞の前に空行を入れる
+    3. 長い文は読点（、）の位置で改行する（読点がなければ空白で改行）
+    4. セグメントの時間差が大きい箇所（話題の切れ目）ではさらに空行を追加する
+
+文字の変更・追加・削除は行わず、改行の挿入と改行まわりの空白の除去だけを行う
+"""
+
+import os
+import re
+
+MODES = ("local", "gemini", "auto")
+
+DEFAULT_MODE = os.environ.get("FORMATTER_MODE", "auto")
+
+# auto のときこの文字数を超えるテキストはローカルで整形する
+# （Geminiの max_output_tokens=2000 では長い字幕を出力しきれず途中で切れるため）
+AUTO_LOCAL_THRESHOLD = int(os.environ.get("FORMATTER_AUTO_THRESHOLD", "1500"))
+
+# 読点で改行する文の長さ（文字数）
+LONG_SENTENCE_CHARS = 40
+
+# 前のセグメント終了から次のセグメント開始までがこの秒数以上なら段落を分ける
+PARAGRAPH_GAP_SECONDS = 2.0
+
+CONNECTIVES = (
+    "それで、", "そして、", "それから、", "だから、", "なので、", "でも、",
+    "ただ、", "つまり、", "じゃあ、", "ところで、", "で、",
+)
+
+_SENTENCE_PATTERN = re.compile(r"[^。！？!?]*(?:[。！？!?]+[」』）)]*|$)")
+# 行頭・空白・句読点の直後にある接続詞だけを対象にする（「そこで、」の「で、」は分けない）
+_CONNECTIVE_PATTERN = re.compile(
+    r"(?<![^\s。、！？!?])(?=" + "|".join(re.escape(c) for c in CONNECTIVES) + ")"
+)
+_SPACES_AROUND_NEWLINE = re.compile(r"[ \t　]*\n[ \t　]*")
+_MANY_NEWLINES = re.compile(r"\n{4,}")
+
+
+def check_mode(mode):
+    """整形方式を検証（未指定ならデフォルト）"""
+    mode = mode or DEFAULT_MODE
+    if mode not in MODES:
+        raise ValueError(f"formatter は {', '.join(MODES)} のいずれかを指定してください: {mode}")
+    return mode
+
+
+def check_segments(segments):
+    """リクエストで受け取ったセグメントを検証して返す（不正な形式は ValueError）
+
+    各要素は文字列の text を持つ辞書で、start / duration は省略するか数値で指定する
+    """
+    if segments is None:
+        return None
+    if not isinstance(segments, list):
+        raise ValueError("segments はセグメント（text/start/duration）のリストで指定してください")
+    for i, segment in enumerate(segments):
+        if not isinstance(segment, dict) or not isinstance(segment.get("text"), str):
+            raise ValueError(f"segments[{i}] は文字列の text を持つオブジェクトで指定してください")
+        for key in ("start", "duration"):
+            value = segment.get(key, 0.0)
+            if isinstance(value, bool) or not isinstance(value, (int, float)):
+                raise ValueError(f"segments[{i}].{key} は数値で指定してください: {value!r}")
+    return segments
+
+
+def resolve_mode(mode, text, gemini_available):
+    """リクエストの整形方式を "local" か "gemini" に解決する"""
+    mode = check_mode(mode)
+    if mode == "auto":
+        if not gemini_available or len(text) > AUTO_LOCAL_THRESHOLD:
+            return "local"
+        return "gemini"
+    return mode
+
+
+def _wrap_long(sentence, limit):
+    """長い文を読点（なければ空白）の位置で改行"""
+    if len(sentence) <= limit:
+        return [sentence]
+
+    separator = "、" if "、" in sentence else (" " if " " in sentence else None)
+    if separator is None:
+        return [sentence]
+
+    lines, current = [], ""
+    for piece in sentence.split(separator):
+        if current and len(current) + len(piece) + 1 > limit:
+            lines.append(current + separator if separator == "、" else current)
+            current = piece
+        else:
+            current = f"{current}{separator}{piece}" if current else piece
+    if current:
+        lines.append(current)
+    return [line.strip() for line in lines if line.strip()]
+
+
+def _format_sentence(sentence, limit):
+    """1文を接続詞で区切り、長い部分を折り返す"""
+    blocks = []
+    for part in _CONNECTIVE_PATTERN.split(sentence):
+        part = part.strip()
+        if part:
+            blocks.append("\n".join(_wrap_long(part, limit)))
+    return "\n\n".join(blocks)
+
+
+def format_text(text, long_sentence_chars=LONG_SENTENCE_CHARS):
+    """プレーンテキストを整形"""
+    if not text or not text.strip():
+        return text or ""
+
+    paragraphs = []
+    for paragraph in re.split(r"\n\s*\n", text):
+        sentences = []
+        for sentence in _SENTENCE_PATTERN.findall(paragraph.replace("\n", " ")):
+            formatted = _format_sentence(sentence, long_sentence_chars)
+            if formatted:
+                sentences.append(formatted)
+        if sentences:
+            paragraphs.append("\n\n".join(sentences))
+
+    formatted = "\n\n\n".join(paragraphs)
+    formatted = _SPACES_AROUND_NEWLINE.sub("\n", formatted)
+    return _MANY_NEWLINES.sub("\n\n\n", formatted).strip()
+
+
+def split_paragraphs(segments, gap_seconds=PARAGRAPH_GAP_SECONDS):
+    """セグメント（text/start/duration）を時間差で段落に分けたテキストのリストを返す"""
+    paragraphs, current = [], []
+    previous_end = None
+    for segment in segments:
+        text = segment.get("text", "").strip()
+        if not text:
+            continue
+        start = segment.get("start", 0.0)
+        if current and previous_end is not None and start - previous_end >= gap_seconds:
+            paragraphs.append(" ".join(current))
+            current = []
+        current.append(text)
+        previous_end = start + segment.get("duration", 0.0)
+    if current:
+        paragraphs.append(" ".join(current))
+    return paragraphs
+
+
+def format_segments(segments, gap_seconds=PARAGRAPH_GAP_SECONDS,
+                    long_sentence_chars=LONG_SENTENCE_CHARS):
+    """タイムスタンプ付きセグメントを整形（時間差の大きい箇所で段落を分ける）"""
+    paragraphs = [
+        format_text(paragraph, long_sentence_chars)
+        for paragraph in split_paragraphs(segments, gap_seconds)
+    ]
+    return "\n\n\n".join(p for p in paragraphs if p)
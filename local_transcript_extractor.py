@@ -2,15 +2,42 @@
 """
 YouTube字幕抽出ツール (ローカル版)
 GitHub Pages対応のシンプルな字幕抽出スクリプト
+
+使い方:
+    python local_transcript_extractor.py                  # 対話モード（1本ずつ）
+    python local_transcript_extractor.py batch URL_OR_ID ...
+    python local_transcript_extractor.py batch -i videos.txt -o out -w 8 --rate 2
+    cat videos.txt | python local_transcript_extractor.py batch -i - --lang en
+    python local_transcript_extractor.py enqueue -i videos.txt --queue redis://host:6379/0
+    python local_transcript_extractor.py worker --queue redis://host:6379/0 -w 8 --drain
 """
 
+import argparse
 import json
+import os
 import re
 import sys
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
 from urllib.parse import parse_qs, urlparse
 
+import job_queue
+import transcript_archive
+import transcript_codec
+import transcript_search
+
+try:
+    import extractive_summarizer
+except ImportError:  # NumPy未インストール
+    extractive_summarizer = None
+
+try:
+    import transcript_columns
+except ImportError:  # NumPy未インストール
+    transcript_columns = None
+
 try:
     from youtube_transcript_api import (NoTranscriptFound, TranscriptsDisabled,
                                         YouTubeTranscriptApi)
@@ -53,79 +80,160 @@ def extract_video_id(url):
         return None
 
 
-def get_available_languages(video_id):
-    """利用可能な字幕言語を取得"""
+# カタログの記録を信用する期間（秒）。過ぎたら字幕一覧を取り直す
+CATALOG_MAX_AGE = 7 * 24 * 3600
+
+_local = threading.local()
+
+
+def _api():
+    """スレッドごとの YouTubeTranscriptApi（HTTPセッションを使い回す）"""
+    api = getattr(_local, "api", None)
+    if api is None:
+        api = _local.api = YouTubeTranscriptApi()
+    return api
+
+
+class TranscriptCatalog:
+    """動画ごとの字幕トラック一覧のメモ（メモリ上 + 任意でJSONファイル）
+
+    字幕が無効・存在しない動画は記録を見るだけで飛ばせるので、
+    バッチを再実行しても同じ動画に何度も問い合わせない
+    """
+
+    def __init__(self, path=None, max_age=CATALOG_MAX_AGE):
+        self.path = path
+        self.max_age = max_age
+        self._entries = {}
+        self._lock = threading.Lock()
+        if path and os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                self._entries = json.load(f)
+
+    def get(self, video_id):
+        """記録（期限切れなら None）"""
+        with self._lock:
+            entry = self._entries.get(video_id)
+        if entry and time.time() - entry.get("updated", 0) < self.max_age:
+            return entry
+        return None
+
+    def put(self, video_id, status, languages=None):
+        """status: ok / disabled / none"""
+        with self._lock:
+            self._entries[video_id] = {
+                "status": status,
+                "languages": languages or [],
+                "updated": int(time.time()),
+            }
+
+    def save(self):
+        """JSONファイルに書き出す（一時ファイルに書いてから置き換える）"""
+        if not self.path:
+            return
+        with self._lock:
+            data = dict(self._entries)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+def describe_languages(transcript_list):
+    """TranscriptList から言語一覧を作る（追加の通信なし）"""
+    return [
+        {
+            "code": transcript.language_code,
+            "name": transcript.language,
+            "is_generated": transcript.is_generated,
+            "is_translatable": transcript.is_translatable,
+        }
+        for transcript in transcript_list
+    ]
+
+
+def get_available_languages(video_id, transcript_list=None):
+    """利用可能な字幕言語を取得（取得済みの TranscriptList があればそれを使う）"""
     try:
-        transcript_list = YouTubeTranscriptApi.list_transcripts(video_id)
-        languages = []
-        for transcript in transcript_list:
-            languages.append(
-                {
-                    "code": transcript.language_code,
-                    "name": transcript.language,
-                    "is_generated": transcript.is_generated,
-                    "is_translatable": transcript.is_translatable,
-                }
-            )
-        return languages
+        if transcript_list is None:
+            transcript_list = _api().list(video_id)
+        return describe_languages(transcript_list)
     except Exception as e:
         print(f"⚠️ 字幕言語の取得に失敗: {e}")
         return []
 
 
-def get_transcript(video_id, lang="ja"):
-    """字幕を取得"""
-    try:
-        print(f"🎬 動画 {video_id} の字幕を抽出中...")
+def select_transcript(transcript_list, lang, log=print):
+    """TranscriptList から取得するトラックを選ぶ（指定言語 → 英語 → 最初のトラック）"""
+    if lang == "auto":
+        # 手動作成の字幕を優先して最初のトラック
+        for transcript in transcript_list:
+            return transcript
+        raise NoTranscriptFound(transcript_list.video_id, [lang], transcript_list)
 
-        # 利用可能な言語をチェック
-        available_languages = get_available_languages(video_id)
+    try:
+        return transcript_list.find_transcript([lang])
+    except NoTranscriptFound:
+        log(f"⚠️ {lang} 字幕が見つかりません。英語を試します...")
+    try:
+        return transcript_list.find_transcript(["en"])
+    except NoTranscriptFound:
+        log("❌ 日本語・英語の字幕が見つかりません")
+    for transcript in transcript_list:
+        log(f"🔄 {transcript.language_code} 字幕を試します...")
+        return transcript
+    raise NoTranscriptFound(transcript_list.video_id, [lang, "en"], transcript_list)
+
+
+def get_transcript(video_id, lang="ja", log=print, catalog=None):
+    """字幕を取得（進捗は log に渡す。バッチ処理では表示せずに記録する）
+
+    字幕一覧（TranscriptList）は1回だけ取得し、言語の表示・トラックの選択・
+    フォールバックのすべてに使う。通信は一覧の取得とトラックの取得の2回だけ。
+    catalog があれば、字幕が無効・存在しないと記録済みの動画は問い合わせずに飛ばす
+    """
+    try:
+        log(f"🎬 動画 {video_id} の字幕を抽出中...")
+
+        known = catalog.get(video_id) if catalog is not None else None
+        if known and known["status"] == "disabled":
+            log("❌ この動画は字幕が無効になっています（カタログ）")
+            return None, None
+        if known and known["status"] == "none":
+            log("❌ この動画には字幕がありません（カタログ）")
+            return None, None
+
+        transcript_list = _api().list(video_id)
+        available_languages = describe_languages(transcript_list)
+        if catalog is not None:
+            catalog.put(video_id, "ok" if available_languages else "none", available_languages)
         if available_languages:
-            print("📋 利用可能な字幕言語:")
+            log("📋 利用可能な字幕言語:")
             for lang_info in available_languages:
                 status = "🤖自動生成" if lang_info["is_generated"] else "👤手動作成"
-                print(f"  - {lang_info['code']}: {lang_info['name']} ({status})")
+                log(f"  - {lang_info['code']}: {lang_info['name']} ({status})")
 
         try:
-            if lang == "auto":
-                # 最初に利用可能な字幕を取得
-                transcript = YouTubeTranscriptApi.get_transcript(video_id)
-                detected_lang = "auto"
-            else:
-                transcript = YouTubeTranscriptApi.get_transcript(
-                    video_id, languages=[lang]
-                )
-                detected_lang = lang
-
-            print(f"✅ {detected_lang} 字幕抽出成功: {len(transcript)} セグメント")
-            return transcript, detected_lang
-
+            transcript = select_transcript(transcript_list, lang, log)
         except NoTranscriptFound:
-            print(f"⚠️ {lang} 字幕が見つかりません。英語を試します...")
-            try:
-                transcript = YouTubeTranscriptApi.get_transcript(
-                    video_id, languages=["en"]
-                )
-                print(f"✅ 英語字幕抽出成功: {len(transcript)} セグメント")
-                return transcript, "en"
-            except NoTranscriptFound:
-                print("❌ 日本語・英語の字幕が見つかりません")
-                if available_languages:
-                    # 利用可能な最初の言語を試す
-                    first_lang = available_languages[0]["code"]
-                    print(f"🔄 {first_lang} 字幕を試します...")
-                    transcript = YouTubeTranscriptApi.get_transcript(
-                        video_id, languages=[first_lang]
-                    )
-                    print(f"✅ {first_lang} 字幕抽出成功: {len(transcript)} セグメント")
-                    return transcript, first_lang
-                return None, None
+            log("❌ 利用できる字幕が見つかりません")
+            return None, None
+
+        detected_lang = transcript.language_code
+        raw_transcript = transcript.fetch().to_raw_data()
+        log(f"✅ {detected_lang} 字幕抽出成功: {len(raw_transcript)} セグメント")
+        return raw_transcript, detected_lang
 
     except TranscriptsDisabled:
-        print("❌ この動画は字幕が無効になっています")
+        if catalog is not None:
+            catalog.put(video_id, "disabled")
+        log("❌ この動画は字幕が無効になっています")
         return None, None
     except Exception as e:
-        print(f"❌ 字幕抽出エラー: {e}")
+        log(f"❌ 字幕抽出エラー: {e}")
         return None, None
 
 
@@ -151,7 +259,13 @@ def format_transcript(transcript, output_format="text"):
 
 
 def create_simple_summary(text, max_sentences=5):
-    """シンプルな要約を作成"""
+    """シンプルな要約を作成
+
+    NumPyがあれば抽出型要約（TF-IDF + TextRank + MMR）、なければ長めの文を選ぶ
+    """
+    if extractive_summarizer is not None:
+        return extractive_summarizer.summarize(text, max_sentences=max_sentences)
+
     sentences = [s.strip() + "。" for s in text.split("。") if len(s.strip()) > 15]
 
     # 重要そうな文を選択（長めの文を優先）
@@ -164,13 +278,14 @@ def create_simple_summary(text, max_sentences=5):
 
 
 def save_results(
-    video_id, youtube_url, language, output_format, content, transcript_data
+    video_id, youtube_url, language, output_format, content, transcript_data,
+    output_dir=".",
 ):
-    """結果をファイルに保存"""
+    """結果をファイルに保存（output_dir に .txt と .json を書く）"""
     timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
 
     # テキストファイル保存
-    filename = f"transcript_{video_id}_{int(time.time())}.txt"
+    filename = os.path.join(output_dir, f"transcript_{video_id}_{int(time.time())}.txt")
     with open(filename, "w", encoding="utf-8") as f:
         f.write(f"YouTube字幕抽出結果\n")
         f.write(f"{'='*50}\n")
@@ -197,7 +312,7 @@ def save_results(
                 f.write(summary)
 
     # JSON形式でも保存
-    json_filename = f"transcript_{video_id}_{int(time.time())}.json"
+    json_filename = os.path.join(output_dir, f"transcript_{video_id}_{int(time.time())}.json")
     result_data = {
         "video_id": video_id,
         "youtube_url": youtube_url,
@@ -216,6 +331,549 @@ def save_results(
     return filename, json_filename
 
 
+# ==== バッチ処理 ====
+
+# 出力形式の選択肢（対話モードと同じ）
+OUTPUT_FORMATS = ("text", "srt", "vtt", "json", "raw")
+
+
+class RateLimiter:
+    """スレッド間で共有するレート制限（開始間隔を 1/rate 秒以上あける）"""
+
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate and rate > 0 else 0.0
+        self._next = 0.0
+        self._lock = threading.Lock()
+
+    def wait(self):
+        """次の開始時刻まで待つ"""
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next)
+            self._next = start + self.interval
+        if start > now:
+            time.sleep(start - now)
+
+
+def read_inputs(values, input_file=None):
+    """引数・ファイル・標準入力からURL/動画IDを読み、重複を除いて返す
+
+    Returns:
+        ([(入力文字列, 動画ID)], 無効な入力のリスト)
+    """
+    lines = list(values or [])
+    if input_file == "-":
+        lines.extend(sys.stdin.read().splitlines())
+    elif input_file:
+        with open(input_file, encoding="utf-8") as f:
+            lines.extend(f.read().splitlines())
+
+    videos, invalid, seen = [], [], set()
+    for line in lines:
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        video_id = extract_video_id(line)
+        if not video_id:
+            invalid.append(line)
+        elif video_id not in seen:
+            seen.add(video_id)
+            videos.append((line, video_id))
+    return videos, invalid
+
+
+def archive_record(video_id, source, language, output_format, content, transcript):
+    """アーカイブ用のレコード（要約は save_results と同じく summary_only 以外で作る）"""
+    summary = ""
+    if output_format != "summary_only":
+        summary = create_simple_summary(" ".join(item["text"] for item in transcript))
+    return transcript_archive.make_record(
+        video_id, source, language, output_format, content, transcript, summary=summary
+    )
+
+
+def process_video(source, video_id, lang, output_format, output_dir, limiter=None,
+                  catalog=None, archive=None):
+    """1本の動画の字幕を取得して保存し、結果の辞書を返す（例外は結果に記録する）
+
+    archive（TranscriptArchive）があればそこに追記し、なければ .txt と .json を書く
+    """
+    messages = []
+    started = time.perf_counter()
+    result = {"video_id": video_id, "source": source, "success": False}
+    try:
+        if limiter:
+            limiter.wait()
+        transcript, detected_lang = get_transcript(
+            video_id,
+            lang,
+            log=lambda *args: messages.append(" ".join(map(str, args))),
+            catalog=catalog,
+        )
+        if not transcript:
+            result["error"] = messages[-1] if messages else "字幕を取得できませんでした"
+        else:
+            content = format_transcript(transcript, output_format)
+            if archive is not None:
+                archive.append(
+                    archive_record(
+                        video_id, source, detected_lang, output_format, content, transcript
+                    )
+                )
+                files = [archive.path]
+            else:
+                files = list(
+                    save_results(
+                        video_id, source, detected_lang, output_format, content, transcript,
+                        output_dir=output_dir,
+                    )
+                )
+            result.update(
+                success=True,
+                language=detected_lang,
+                segments=len(transcript),
+                characters=len(content),
+                files=files,
+            )
+    except Exception as e:
+        result["error"] = str(e)
+    result["elapsed"] = round(time.perf_counter() - started, 3)
+    return result
+
+
+def run_batch(videos, lang="ja", output_format="text", output_dir=".", workers=4,
+              rate=1.0, progress=print, catalog=None, archive=None):
+    """動画リストの字幕をスレッドプールで並列に取得する
+
+    Args:
+        videos: [(入力文字列, 動画ID)]
+        workers: 同時に取得する数
+        rate: 1秒あたりに開始する取得の上限（0なら無制限）
+        progress: 進捗の表示先
+        catalog: 字幕トラック一覧のメモ（TranscriptCatalog）
+        archive: 保存先のアーカイブ（TranscriptArchive。None なら動画ごとのファイル）
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    limiter = RateLimiter(rate)
+    results = []
+    started = time.perf_counter()
+    total = len(videos)
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        futures = [
+            executor.submit(
+                process_video,
+                source,
+                video_id,
+                lang,
+                output_format,
+                output_dir,
+                limiter,
+                catalog,
+                archive,
+            )
+            for source, video_id in videos
+        ]
+        for done, future in enumerate(as_completed(futures), 1):
+            result = future.result()
+            results.append(result)
+            elapsed = time.perf_counter() - started
+            throughput = done / elapsed if elapsed else 0.0
+            eta = (total - done) / throughput if throughput else 0.0
+            status = (
+                f"✅ {result['video_id']} ({result['language']}, {result['segments']} セグメント)"
+                if result["success"]
+                else f"❌ {result['video_id']}: {result.get('error', '')}"
+            )
+            progress(
+                f"[{done}/{total}] {status} | {throughput:.2f} 本/秒, 残り約{eta:.0f}秒"
+            )
+    return results
+
+
+def batch_main(args):
+    """batch サブコマンド"""
+    input_file = args.input
+    if not input_file and not args.videos and not sys.stdin.isatty():
+        input_file = "-"  # パイプで渡された場合は標準入力から読む
+    videos, invalid = read_inputs(args.videos, input_file)
+    for line in invalid:
+        print(f"⚠️ 無効な入力をスキップ: {line}")
+    if not videos:
+        print("❌ 処理する動画がありません（URL・動画ID・-i ファイルを指定してください）")
+        return 1
+
+    print(
+        f"🚀 {len(videos)} 本の字幕を抽出します "
+        f"(並列数={args.workers}, レート={args.rate}/秒, 出力先={args.output_dir})"
+    )
+    os.makedirs(args.output_dir, exist_ok=True)
+    catalog = None
+    if not args.no_catalog:
+        catalog = TranscriptCatalog(
+            args.catalog or os.path.join(args.output_dir, "transcript_catalog.json"),
+            max_age=0 if args.refresh_catalog else CATALOG_MAX_AGE,
+        )
+
+    archive = None
+    if not args.legacy_files:
+        archive = transcript_archive.TranscriptArchive(
+            args.archive or os.path.join(args.output_dir, "transcripts.sqlite3")
+        )
+
+    started = time.perf_counter()
+    try:
+        results = run_batch(
+            videos, args.lang, args.format, args.output_dir, args.workers, args.rate,
+            catalog=catalog, archive=archive,
+        )
+    finally:
+        if catalog is not None:
+            catalog.save()
+        if archive is not None:
+            # 十分なレコードが貯まったら圧縮辞書を学習する（以後の追記が小さくなる）
+            try:
+                if archive.ensure_dictionary():
+                    print(f"🗜️ 圧縮辞書を学習しました ({len(archive.dictionary)} バイト)")
+            except Exception as e:
+                print(f"⚠️ 圧縮辞書の学習に失敗しました: {e}")
+            archive.close()
+    elapsed = time.perf_counter() - started
+
+    succeeded = sum(1 for r in results if r["success"])
+    report_file = os.path.join(args.output_dir, f"batch_report_{int(time.time())}.json")
+    with open(report_file, "w", encoding="utf-8") as f:
+        json.dump(
+            {
+                "total": len(results),
+                "succeeded": succeeded,
+                "failed": len(results) - succeeded,
+                "invalid": invalid,
+                "elapsed": round(elapsed, 3),
+                "results": results,
+            },
+            f,
+            ensure_ascii=False,
+            indent=2,
+        )
+
+    print(f"\n✅ 完了: 成功 {succeeded} / 失敗 {len(results) - succeeded} 本")
+    print(f"⏱️ {elapsed:.1f}秒 ({len(results) / elapsed if elapsed else 0:.2f} 本/秒)")
+    if archive is not None:
+        print(f"🗄️ アーカイブ: {archive.path}")
+    print(f"📄 レポート: {report_file}")
+    return 0 if succeeded == len(results) else 2
+
+
+# ==== ジョブキュー（複数のマシンでバッチを分担する） ====
+
+# 字幕抽出ジョブの種類
+TRANSCRIPT_JOB = "transcript"
+
+# 既定のキュー（SQLite。複数のマシンで分担するときは redis:// のURLを指定する）
+DEFAULT_QUEUE = os.path.join("transcripts", "jobs.sqlite3")
+
+# Ctrl+C のあと、実行中のジョブが終わるのを待つ時間（秒）
+WORKER_SHUTDOWN_TIMEOUT = 30
+
+
+def transcript_job_handler(output_dir, archive=None, limiter=None, catalog=None):
+    """字幕抽出ジョブのハンドラー（取得できなければ例外にして、キューに再試行させる）"""
+
+    def handle(payload):
+        result = process_video(
+            payload.get("source", payload["video_id"]),
+            payload["video_id"],
+            payload.get("lang", "ja"),
+            payload.get("format", "text"),
+            output_dir,
+            limiter,
+            catalog,
+            archive,
+        )
+        if not result["success"]:
+            raise RuntimeError(result.get("error") or "字幕を取得できませんでした")
+        return result
+
+    return handle
+
+
+def enqueue_main(args):
+    """enqueue サブコマンド（動画をジョブキューに登録する）"""
+    input_file = args.input
+    if not input_file and not args.videos and not sys.stdin.isatty():
+        input_file = "-"
+    videos, invalid = read_inputs(args.videos, input_file)
+    for line in invalid:
+        print(f"⚠️ 無効な入力をスキップ: {line}")
+    if not videos:
+        print("❌ 登録する動画がありません（URL・動画ID・-i ファイルを指定してください）")
+        return 1
+
+    queue = job_queue.open_queue(args.queue, name=TRANSCRIPT_JOB)
+    try:
+        for source, video_id in videos:
+            queue.enqueue(
+                TRANSCRIPT_JOB,
+                {"source": source, "video_id": video_id, "lang": args.lang, "format": args.format},
+                max_attempts=args.max_attempts,
+            )
+        stats = queue.stats()
+    finally:
+        queue.close()
+    print(f"✅ {len(videos)} 本をキューに登録しました ({args.queue}, 待ち {stats['queued']} 件)")
+    return 0
+
+
+def worker_main(args):
+    """worker サブコマンド（ジョブキューの字幕抽出ジョブを実行する。Ctrl+C で止まる）"""
+    queue = job_queue.open_queue(args.queue, name=TRANSCRIPT_JOB)
+    os.makedirs(args.output_dir, exist_ok=True)
+    archive = None
+    if not args.legacy_files:
+        archive = transcript_archive.TranscriptArchive(
+            args.archive or os.path.join(args.output_dir, "transcripts.sqlite3")
+        )
+    handler = transcript_job_handler(args.output_dir, archive, RateLimiter(args.rate))
+
+    print(
+        f"👷 ジョブキュー {args.queue} のワーカーを起動します "
+        f"(並列数={args.workers}, レート={args.rate}/秒)"
+    )
+    started = time.perf_counter()
+    stop = threading.Event()
+    workers = [job_queue.Worker(queue, {TRANSCRIPT_JOB: handler}) for _ in range(max(1, args.workers))]
+    threads = [
+        threading.Thread(
+            target=worker.run, args=(stop,), kwargs={"exit_when_empty": args.drain}, daemon=True
+        )
+        for worker in workers
+    ]
+    for thread in threads:
+        thread.start()
+    try:
+        while any(thread.is_alive() for thread in threads):
+            for thread in threads:
+                thread.join(0.5)
+    except KeyboardInterrupt:
+        print("\n⏹️ 停止します（実行中のジョブが終わるまで待ちます）")
+        stop.set()
+        # 実行中のジョブの書き込みが終わる前にアーカイブとキューを閉じない
+        # （待ちきれなかったジョブは可視性タイムアウト後に他のワーカーが実行し直す）
+        deadline_at = time.monotonic() + WORKER_SHUTDOWN_TIMEOUT
+        for thread in threads:
+            thread.join(max(0.0, deadline_at - time.monotonic()))
+    finally:
+        stats = queue.stats()
+        # 待ちきれなかったジョブがあれば閉じずに終了する（プロセスの終了とともに止まる）
+        if not any(thread.is_alive() for thread in threads):
+            if archive is not None:
+                archive.close()
+            queue.close()
+
+    succeeded = sum(worker.succeeded for worker in workers)
+    dead = sum(worker.dead for worker in workers)
+    print(f"\n✅ 成功 {succeeded} / 失敗 {dead} 本 ({time.perf_counter() - started:.1f}秒)")
+    print(f"📋 キュー: 待ち {stats['queued']} / 実行中 {stats['running']} / デッドレター {stats['dead']}")
+    return 0 if not dead else 2
+
+
+def export_main(args):
+    """export サブコマンド（アーカイブをJSONLに書き出す）"""
+    with transcript_archive.TranscriptArchive(args.archive) as archive:
+        started = time.perf_counter()
+        count = archive.export_jsonl(args.output, latest_only=not args.all)
+    print(f"✅ {count} 件を {args.output} に書き出しました ({time.perf_counter() - started:.1f}秒)")
+    return 0
+
+
+def train_dict_main(args):
+    """train-dict サブコマンド（アーカイブの字幕から圧縮辞書を学習する）"""
+    with transcript_archive.TranscriptArchive(args.archive) as archive:
+        try:
+            dictionary = archive.train_dictionary(samples=args.samples, size=args.size)
+        except ValueError as e:
+            print(f"❌ {e}")
+            return 1
+    print(f"✅ 圧縮辞書を学習しました ({len(dictionary)} バイト, ID {dictionary.id:08x})")
+    if args.output:
+        dictionary.save(args.output)
+        print(f"📄 辞書ファイル: {args.output}（TRANSCRIPT_DICT_PATH に指定するとキャッシュでも使われます）")
+    return 0
+
+
+def columns_main(args):
+    """columns サブコマンド（アーカイブまたは .json 出力から列指向ストアを作る）"""
+    if transcript_columns is None:
+        print("❌ 列指向ストアには NumPy が必要です（pip install numpy）")
+        return 1
+    started = time.perf_counter()
+    if len(args.sources) == 1 and args.sources[0].endswith(".sqlite3"):
+        with transcript_archive.TranscriptArchive(args.sources[0]) as archive:
+            count = transcript_columns.export_archive(archive, args.output)
+    else:
+        count = transcript_columns.export_json_files(args.sources, args.output)
+    with transcript_columns.ColumnarStore(args.output) as store:
+        segments = store.segment_count
+    print(
+        f"✅ {count} 本 / {segments} セグメントを {args.output} に書き出しました "
+        f"({time.perf_counter() - started:.1f}秒)"
+    )
+    return 0
+
+
+def search_main(args):
+    """search サブコマンド（アーカイブの追記分を索引してから全文検索する）"""
+    if not os.path.exists(args.archive):
+        print(f"❌ アーカイブが見つかりません: {args.archive}")
+        return 1
+    index_path = args.index or os.path.join(
+        os.path.dirname(args.archive) or ".", "transcript_search.sqlite3"
+    )
+    with transcript_search.TranscriptIndex(index_path) as index:
+        with transcript_archive.TranscriptArchive(args.archive) as archive:
+            added = index.sync_archive(archive)
+        if added:
+            print(f"🔎 {added} 件の字幕を索引しました")
+        try:
+            page = index.search(" ".join(args.query), args.page, args.per_page)
+        except ValueError as e:
+            print(f"❌ {e}")
+            return 1
+
+    if args.json:
+        print(json.dumps(page, ensure_ascii=False, indent=2))
+        return 0
+    for hit in page["results"]:
+        minutes, seconds = divmod(int(hit["start"]), 60)
+        print(f"{hit['video_id']} {minutes:02d}:{seconds:02d}  {hit['snippet']}")
+        print(f"    {hit['url']}")
+    more = "（続きは --page で）" if page["has_more"] else ""
+    print(
+        f"📄 {page['page']}ページ目 {len(page['results'])} 件 "
+        f"({page['method']}, {page['took_ms']:.1f}ms){more}"
+    )
+    return 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="YouTube字幕抽出ツール")
+    subparsers = parser.add_subparsers(dest="command")
+
+    batch = subparsers.add_parser("batch", help="複数の動画の字幕を並列に抽出して保存")
+    batch.add_argument("videos", nargs="*", help="YouTube URLまたは動画ID")
+    batch.add_argument(
+        "-i", "--input", help="URL/動画IDを1行ずつ書いたファイル（- で標準入力）"
+    )
+    batch.add_argument("-l", "--lang", default="ja", help="字幕言語（auto で自動検出）")
+    batch.add_argument(
+        "-f", "--format", default="text", choices=OUTPUT_FORMATS, help="出力形式"
+    )
+    batch.add_argument("-o", "--output-dir", default="transcripts", help="出力先ディレクトリ")
+    batch.add_argument("-w", "--workers", type=int, default=4, help="同時に取得する数")
+    batch.add_argument(
+        "--rate", type=float, default=1.0, help="1秒あたりに開始する取得の上限（0で無制限）"
+    )
+    batch.add_argument(
+        "--catalog", help="字幕トラック一覧のメモ（既定: 出力先/transcript_catalog.json）"
+    )
+    batch.add_argument("--no-catalog", action="store_true", help="カタログを使わない")
+    batch.add_argument(
+        "--refresh-catalog", action="store_true", help="カタログの記録を使わずに取り直す"
+    )
+    batch.add_argument(
+        "--archive", help="保存先のアーカイブ（既定: 出力先/transcripts.sqlite3）"
+    )
+    batch.add_argument(
+        "--legacy-files",
+        action="store_true",
+        help="アーカイブの代わりに動画ごとの .txt / .json を書く",
+    )
+
+    enqueue = subparsers.add_parser("enqueue", help="動画をジョブキューに登録する")
+    enqueue.add_argument("videos", nargs="*", help="YouTube URLまたは動画ID")
+    enqueue.add_argument(
+        "-i", "--input", help="URL/動画IDを1行ずつ書いたファイル（- で標準入力）"
+    )
+    enqueue.add_argument(
+        "--queue", default=DEFAULT_QUEUE,
+        help="ジョブキュー（SQLiteのファイルまたは redis:// のURL）",
+    )
+    enqueue.add_argument("-l", "--lang", default="ja", help="字幕言語（auto で自動検出）")
+    enqueue.add_argument(
+        "-f", "--format", default="text", choices=OUTPUT_FORMATS, help="出力形式"
+    )
+    enqueue.add_argument(
+        "--max-attempts", type=int, default=job_queue.MAX_ATTEMPTS, help="1本あたりの試行回数の上限"
+    )
+
+    worker = subparsers.add_parser(
+        "worker", help="ジョブキューの字幕抽出を実行する（複数のマシンで同時に動かせる）"
+    )
+    worker.add_argument(
+        "--queue", default=DEFAULT_QUEUE,
+        help="ジョブキュー（SQLiteのファイルまたは redis:// のURL）",
+    )
+    worker.add_argument("-o", "--output-dir", default="transcripts", help="出力先ディレクトリ")
+    worker.add_argument(
+        "--archive", help="保存先のアーカイブ（既定: 出力先/transcripts.sqlite3）"
+    )
+    worker.add_argument(
+        "--legacy-files",
+        action="store_true",
+        help="アーカイブの代わりに動画ごとの .txt / .json を書く",
+    )
+    worker.add_argument("-w", "--workers", type=int, default=4, help="同時に実行するジョブの数")
+    worker.add_argument(
+        "--rate", type=float, default=1.0, help="1秒あたりに開始する取得の上限（0で無制限）"
+    )
+    worker.add_argument(
+        "--drain", action="store_true", help="キューが空になったら終了する"
+    )
+
+    export = subparsers.add_parser("export", help="アーカイブをJSONLに書き出す")
+    export.add_argument("archive", help="アーカイブ（.sqlite3）")
+    export.add_argument("output", help="出力するJSONLファイル")
+    export.add_argument("--all", action="store_true", help="同じ動画の古い記録も含める")
+
+    train = subparsers.add_parser("train-dict", help="アーカイブの字幕から圧縮辞書を学習する")
+    train.add_argument("archive", help="アーカイブ（.sqlite3）")
+    train.add_argument("-o", "--output", help="辞書をファイルにも書き出す")
+    train.add_argument(
+        "--size", type=int, default=transcript_codec.DICT_SIZE, help="辞書のサイズ（バイト）"
+    )
+    train.add_argument(
+        "--samples", type=int, default=transcript_archive.TRAIN_SAMPLES,
+        help="学習に使う最近のレコード数",
+    )
+
+    columns = subparsers.add_parser(
+        "columns", help="集計用の列指向ストアを作る（アーカイブまたは .json 出力から）"
+    )
+    columns.add_argument(
+        "sources", nargs="+",
+        help="アーカイブ（.sqlite3）か、.json 出力のディレクトリ・glob",
+    )
+    columns.add_argument("-o", "--output", default="transcript_columns", help="出力ディレクトリ")
+
+    search = subparsers.add_parser("search", help="アーカイブの字幕を全文検索する")
+    search.add_argument("query", nargs="+", help="検索語（複数ならすべてを含むセグメント）")
+    search.add_argument(
+        "--archive",
+        default=os.path.join("transcripts", "transcripts.sqlite3"),
+        help="検索するアーカイブ（既定: transcripts/transcripts.sqlite3）",
+    )
+    search.add_argument("--index", help="検索インデックス（既定: アーカイブと同じ場所）")
+    search.add_argument("--page", type=int, default=1)
+    search.add_argument(
+        "--per-page", type=int, default=transcript_search.DEFAULT_PER_PAGE, help="1ページの件数"
+    )
+    search.add_argument("--json", action="store_true", help="結果をJSONで出力")
+    return parser
+
+
 def main():
     """メイン処理"""
     print("🎬 YouTube字幕抽出ツール")
@@ -331,7 +989,25 @@ def main():
 
 if __name__ == "__main__":
     try:
-        main()
+        if len(sys.argv) > 1:
+            cli_args = build_parser().parse_args()
+            if cli_args.command == "batch":
+                sys.exit(batch_main(cli_args))
+            if cli_args.command == "enqueue":
+                sys.exit(enqueue_main(cli_args))
+            if cli_args.command == "worker":
+                sys.exit(worker_main(cli_args))
+            if cli_args.command == "export":
+                sys.exit(export_main(cli_args))
+            if cli_args.command == "train-dict":
+                sys.exit(train_dict_main(cli_args))
+            if cli_args.command == "columns":
+                sys.exit(columns_main(cli_args))
+            if cli_args.command == "search":
+                sys.exit(search_main(cli_args))
+            build_parser().print_help()
+        else:
+            main()
     except KeyboardInterrupt:
         print("\n👋 処理を中断しました。")
     except Exception as e:
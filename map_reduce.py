@@ -0,0 +1,62 @@
+"""
+部分要約の階層的な統合（tree reduce）
+部分要約を fan_in 個ずつのグループにまとめて並列に統合し、1つになるまで段ごとに繰り返す。
+段数はチャンク数の対数になり、1回のプロンプトに入る部分要約は常に fan_in 個以下になる
+"""
+
+import asyncio
+import math
+from concurrent.futures import ThreadPoolExecutor
+
+
+def group(items, fan_in):
+    """items を fan_in 個ずつのグループ（(開始位置, グループ) のリスト）に分ける"""
+    return [(start, items[start:start + fan_in]) for start in range(0, len(items), fan_in)]
+
+
+def reduce_levels(count, fan_in):
+    """最終統合の前に必要な中間統合の段数"""
+    levels = 0
+    while count > fan_in:
+        count = math.ceil(count / fan_in)
+        levels += 1
+    return levels
+
+
+def tree_reduce(items, merge, finalize, fan_in, parallelism=1):
+    """items を段ごとに統合して1つの結果にする
+
+    Args:
+        items: 部分要約のリスト
+        merge: merge(group, start, total) -> 中間統合結果（fan_in 個以下のグループを1つに）
+        finalize: finalize(items) -> 最終結果（fan_in 個以下）
+        fan_in: 1回の統合に入れる最大数（2以上）
+        parallelism: 同じ段の統合を同時に実行する数
+    """
+    fan_in = max(2, fan_in)
+    level = list(items)
+    with ThreadPoolExecutor(max_workers=max(1, parallelism)) as executor:
+        while len(level) > fan_in:
+            total = len(level)
+            level = list(
+                executor.map(lambda g: merge(g[1], g[0], total), group(level, fan_in))
+            )
+    return finalize(level)
+
+
+async def tree_reduce_async(items, merge, finalize, fan_in, parallelism=1):
+    """tree_reduce のasync版（merge / finalize はコルーチン関数）"""
+    fan_in = max(2, fan_in)
+    semaphore = asyncio.Semaphore(max(1, parallelism))
+
+    async def limited(group_items, start, total):
+        async with semaphore:
+            return await merge(group_items, start, total)
+
+    level = list(items)
+    while len(level) > fan_in:
+        total = len(level)
+        level = await asyncio.gather(
+            *(limited(g, start, total) for start, g in group(level, fan_in))
+        )
+    return await finalize(list(level))
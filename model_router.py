@@ -0,0 +1,283 @@
+"""
+Geminiモデルのルーティング
+処理段階（整形・部分要約・中間統合・最終統合）ごとにモデルの階層（tier）を割り当てる。
+速いモデルをチャンクの要約と整形に、強いモデルを最終統合だけに使う
+
+    route = model_router.router.route("map", overrides)
+    text = model_router.router.call(route, prompt, lambda: generate(route.model, prompt))
+
+- リクエストごとの上書き: {"reduce": "fast"} / {"map": "gemini-1.5-flash"} / {"default": "strong"}
+- レイテンシSLO: 階層の直近の p95 が SLO を超えたら、クールダウンの間は代替の階層（strong → fast）に回す
+- 階層ごとの呼び出し数・エラー数・代替回数・推定トークン数・レイテンシを stats() で返す
+"""
+
+import logging
+import os
+import threading
+import time
+from collections import deque
+
+from token_planner import MODEL_PROFILES
+from transcript_cleaner import estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+# 処理段階（summary は1回で要約する場合。最終統合と同じく要約全体を書く）
+STAGES = ("format", "map", "merge", "reduce", "summary")
+
+# 階層ごとのモデル
+TIERS = {
+    "fast": os.environ.get("MODEL_TIER_FAST", "gemini-2.0-flash-001"),
+    "strong": os.environ.get("MODEL_TIER_STRONG", "gemini-1.5-pro"),
+}
+
+# 段階ごとの既定の階層（MODEL_ROUTES="map=fast,reduce=strong" で上書き）
+DEFAULT_ROUTES = {
+    "format": "fast",
+    "map": "fast",
+    "merge": "fast",
+    "reduce": "strong",
+    "summary": "strong",
+}
+
+# SLO違反時の代替の階層
+FALLBACKS = {"strong": "fast"}
+
+# 階層ごとのレイテンシSLO（秒、p95。0ならSLOなし）
+SLOS = {
+    "fast": float(os.environ.get("MODEL_SLO_FAST", 0)),
+    "strong": float(os.environ.get("MODEL_SLO_STRONG", 30)),
+}
+
+# SLO判定に使う直近の呼び出し数と、判定に必要な最小の呼び出し数
+SLO_WINDOW = int(os.environ.get("MODEL_SLO_WINDOW", 20))
+SLO_MIN_SAMPLES = int(os.environ.get("MODEL_SLO_MIN_SAMPLES", 5))
+
+# SLO違反後に代替の階層へ回し続ける秒数（過ぎたら元の階層を再び試す）
+SLO_COOLDOWN = float(os.environ.get("MODEL_SLO_COOLDOWN", 120))
+
+
+def parse_routes(value):
+    """"map=fast,reduce=strong" 形式の文字列を辞書にする"""
+    routes = {}
+    for item in (value or "").split(","):
+        if "=" in item:
+            stage, target = item.split("=", 1)
+            routes[stage.strip()] = target.strip()
+    return routes
+
+
+class Route:
+    """1回の呼び出しに使うモデル"""
+
+    def __init__(self, stage, tier, model, fallback_from=None):
+        self.stage = stage
+        self.tier = tier
+        self.model = model
+        self.fallback_from = fallback_from
+
+    def to_dict(self):
+        return {
+            "stage": self.stage,
+            "tier": self.tier,
+            "model": self.model,
+            "fallback_from": self.fallback_from,
+        }
+
+
+class TierStats:
+    """階層ごとの利用状況とレイテンシ"""
+
+    def __init__(self, window):
+        self.calls = 0
+        self.errors = 0
+        self.fallbacks = 0
+        self.input_tokens = 0
+        self.output_tokens = 0
+        self.total_latency = 0.0
+        self.latencies = deque(maxlen=window)
+        self.degraded_until = 0.0
+
+    def percentile(self, q):
+        """直近の呼び出しのレイテンシの q 分位点（0〜1）"""
+        if not self.latencies:
+            return 0.0
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    def to_dict(self):
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "fallbacks": self.fallbacks,
+            "input_tokens": self.input_tokens,
+            "output_tokens": self.output_tokens,
+            "avg_latency": round(self.total_latency / self.calls, 3) if self.calls else 0.0,
+            "p50_latency": round(self.percentile(0.5), 3),
+            "p95_latency": round(self.percentile(0.95), 3),
+            "degraded": self.degraded_until > time.monotonic(),
+        }
+
+
+class ModelRouter:
+    """段階ごとにモデルを選び、階層ごとのレイテンシを記録する"""
+
+    def __init__(self, tiers=None, routes=None, slos=None, fallbacks=None,
+                 window=None, min_samples=None, cooldown=None):
+        self.tiers = dict(tiers or TIERS)
+        self.routes = dict(DEFAULT_ROUTES)
+        self.routes.update(routes or {})
+        self.slos = dict(SLOS if slos is None else slos)
+        self.fallbacks = dict(FALLBACKS if fallbacks is None else fallbacks)
+        self.window = window or SLO_WINDOW
+        self.min_samples = min_samples or SLO_MIN_SAMPLES
+        self.cooldown = SLO_COOLDOWN if cooldown is None else cooldown
+        self._stats = {}
+        self._lock = threading.Lock()
+        self.check_overrides(self.routes)
+
+    @classmethod
+    def from_env(cls):
+        return cls(routes=parse_routes(os.environ.get("MODEL_ROUTES")))
+
+    def _target_tier(self, target):
+        """上書きの値（階層名またはモデル名）から階層名を返す。モデル名の階層はモデル名そのもの"""
+        if target in self.tiers:
+            return target
+        for tier, model in self.tiers.items():
+            if model == target:
+                return tier
+        return target
+
+    def check_overrides(self, overrides):
+        """上書き指定を検証して返す（未知の段階・モデルは ValueError）"""
+        if not overrides:
+            return {}
+        if not isinstance(overrides, dict):
+            raise ValueError("modelsは段階名からモデルへの辞書で指定してください")
+        for stage, target in overrides.items():
+            if stage != "default" and stage not in STAGES:
+                raise ValueError(
+                    f"不明な処理段階です: {stage}（{', '.join(STAGES)} のいずれか）"
+                )
+            # リストなどハッシュできない値で in を評価すると TypeError になるので、先に型を見る
+            if not isinstance(target, str) or not (
+                target in self.tiers or target in self.tiers.values() or target in MODEL_PROFILES
+            ):
+                raise ValueError(f"不明なモデルです: {target}")
+        return dict(overrides)
+
+    def _tier_stats(self, tier):
+        stats = self._stats.get(tier)
+        if stats is None:
+            stats = self._stats[tier] = TierStats(self.window)
+        return stats
+
+    def _degraded(self, tier, now):
+        """SLO違反でクールダウン中か（クールダウンが明けたら計測をやり直す）"""
+        stats = self._tier_stats(tier)
+        if not stats.degraded_until:
+            return False
+        if stats.degraded_until > now:
+            return True
+        stats.degraded_until = 0.0
+        stats.latencies.clear()
+        logger.info(f"Model tier '{tier}' cooldown ended, routing to it again")
+        return False
+
+    def route(self, stage, overrides=None):
+        """段階に使うモデルを選ぶ（上書き → 既定の順。SLO違反中の階層は代替の階層に回す）"""
+        if stage not in STAGES:
+            raise ValueError(f"不明な処理段階です: {stage}")
+        overrides = overrides or {}
+        target = overrides.get(stage) or overrides.get("default") or self.routes[stage]
+        tier = self._target_tier(target)
+
+        with self._lock:
+            fallback_from = None
+            fallback = self.fallbacks.get(tier)
+            if fallback and self._degraded(tier, time.monotonic()):
+                self._tier_stats(tier).fallbacks += 1
+                fallback_from, tier = tier, fallback
+
+        return Route(stage, tier, self.tiers.get(tier, tier), fallback_from)
+
+    def record(self, route, latency, input_tokens=0, output_tokens=0, error=False):
+        """呼び出し結果を記録し、SLOを超えていれば階層をクールダウンに入れる"""
+        with self._lock:
+            stats = self._tier_stats(route.tier)
+            stats.calls += 1
+            stats.input_tokens += input_tokens
+            stats.output_tokens += output_tokens
+            stats.total_latency += latency
+            stats.latencies.append(latency)
+            if error:
+                stats.errors += 1
+
+            slo = self.slos.get(route.tier)
+            if (
+                slo
+                and not stats.degraded_until
+                and len(stats.latencies) >= self.min_samples
+                and stats.percentile(0.95) > slo
+            ):
+                stats.degraded_until = time.monotonic() + self.cooldown
+                logger.warning(
+                    f"Model tier '{route.tier}' p95 latency {stats.percentile(0.95):.1f}s "
+                    f"exceeds SLO {slo:.1f}s, falling back for {self.cooldown:.0f}s"
+                )
+
+    def call(self, route, prompt, fn):
+        """fn() を実行して時間と推定トークン数を記録し、結果のテキストを返す"""
+        start = time.perf_counter()
+        try:
+            text = fn()
+        except Exception:
+            self.record(route, time.perf_counter() - start, estimate_tokens(prompt), error=True)
+            raise
+        self.record(
+            route, time.perf_counter() - start, estimate_tokens(prompt), estimate_tokens(text or "")
+        )
+        return text
+
+    async def call_async(self, route, prompt, fn):
+        """call のasync版（fn はコルーチン関数）"""
+        start = time.perf_counter()
+        try:
+            text = await fn()
+        except Exception:
+            self.record(route, time.perf_counter() - start, estimate_tokens(prompt), error=True)
+            raise
+        self.record(
+            route, time.perf_counter() - start, estimate_tokens(prompt), estimate_tokens(text or "")
+        )
+        return text
+
+    def models(self, overrides=None):
+        """段階ごとに現在選ばれるモデル（レスポンス・ログ用。代替の回数は数えない）"""
+        overrides = overrides or {}
+        result = {}
+        now = time.monotonic()
+        for stage in STAGES:
+            tier = self._target_tier(
+                overrides.get(stage) or overrides.get("default") or self.routes[stage]
+            )
+            stats = self._stats.get(tier)
+            if self.fallbacks.get(tier) and stats and stats.degraded_until > now:
+                tier = self.fallbacks[tier]
+            result[stage] = self.tiers.get(tier, tier)
+        return result
+
+    def stats(self):
+        """階層ごとの利用状況"""
+        with self._lock:
+            tiers = {tier: stats.to_dict() for tier, stats in self._stats.items()}
+        return {
+            "routes": {stage: self.tiers.get(self._target_tier(t), t) for stage, t in self.routes.items()},
+            "slos": self.slos,
+            "tiers": tiers,
+        }
+
+
+# アプリ全体で共有するルーター
+router = ModelRouter.from_env()
@@ -0,0 +1,469 @@
+"""
+レスポンス共通レイヤー
+Flask版（app.py）とFastAPI版（app_hybrid.py）で共有する
+JSONシリアライズ・レスポンス圧縮・圧縮リクエストボディの展開
+"""
+
+import gzip
+import json
+import logging
+import os
+import zlib
+from io import BytesIO
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+# これより小さいレスポンスは圧縮しない（ヘッダー分のオーバーヘッドの方が大きい）
+MIN_COMPRESS_SIZE = int(os.environ.get("COMPRESS_MIN_SIZE", 1024))
+
+# 展開後のリクエストボディ上限（圧縮爆弾対策）
+MAX_DECOMPRESSED_SIZE = int(
+    os.environ.get("MAX_DECOMPRESSED_SIZE", 16 * 1024 * 1024)
+)
+
+# 動的レスポンス向けの圧縮レベル（速度優先）
+GZIP_LEVEL = 5
+BROTLI_QUALITY = 4
+ZSTD_LEVEL = 3
+
+
+COMPRESSIBLE_TYPES = (
+    "application/json",
+    "application/javascript",
+    "application/xml",
+    "image/svg+xml",
+    "text/",
+)
+
+
+def supported_encodings():
+    """サーバー側の優先順で利用可能なContent-Encodingを返す"""
+    encodings = []
+    if zstandard is not None:
+        encodings.append("zstd")
+    if brotli is not None:
+        encodings.append("br")
+    encodings.append("gzip")
+    return encodings
+
+
+# ==== JSONエンコーダー ====
+
+
+def _orjson_dumps(obj, indent=None):
+    option = orjson.OPT_NON_STR_KEYS
+    if indent:
+        option |= orjson.OPT_INDENT_2
+    return orjson.dumps(obj, option=option)
+
+
+def _stdlib_dumps(obj, indent=None):
+    return json.dumps(
+        obj, ensure_ascii=False, indent=indent, separators=None if indent else (",", ":")
+    ).encode("utf-8")
+
+
+_dumps_bytes = _orjson_dumps if orjson is not None else _stdlib_dumps
+_loads = orjson.loads if orjson is not None else json.loads
+
+
+def set_json_encoder(dumps_bytes, loads=None):
+    """JSONエンコーダーを差し替える
+
+    dumps_bytes(obj, indent=None) -> bytes の形式の関数を渡す
+    """
+    global _dumps_bytes, _loads
+    _dumps_bytes = dumps_bytes
+    if loads is not None:
+        _loads = loads
+
+
+def dumps_bytes(obj, indent=None):
+    """オブジェクトをUTF-8のJSONバイト列に変換"""
+    return _dumps_bytes(obj, indent=indent)
+
+
+def dumps(obj, indent=None):
+    """オブジェクトをJSON文字列に変換（json.dumpsの代替）"""
+    return _dumps_bytes(obj, indent=indent).decode("utf-8")
+
+
+def loads(data):
+    """JSON文字列またはバイト列をパース"""
+    return _loads(data)
+
+
+# ==== 圧縮・展開 ====
+
+
+class DecompressionError(ValueError):
+    """リクエストボディの展開に失敗した場合の例外"""
+
+    def __init__(self, message, status_code=400):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def choose_encoding(accept_encoding):
+    """Accept-Encodingヘッダーから使用するエンコーディングを決定"""
+    if not accept_encoding:
+        return None
+
+    weights = {}
+    for part in accept_encoding.split(","):
+        token, _, params = part.strip().partition(";")
+        token = token.strip().lower()
+        if not token:
+            continue
+        q = 1.0
+        for param in params.split(";"):
+            name, _, value = param.strip().partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        weights[token] = q
+
+    best, best_q = None, 0.0
+    for encoding in supported_encodings():
+        q = weights.get(encoding, weights.get("*", 0.0))
+        if q > best_q:
+            best, best_q = encoding, q
+    return best
+
+
+def is_compressible(content_type):
+    """圧縮対象のContent-Typeかどうか"""
+    if not content_type:
+        return False
+    content_type = content_type.lower()
+    return any(content_type.startswith(t) for t in COMPRESSIBLE_TYPES)
+
+
+def compress(data, encoding):
+    """指定エンコーディングで圧縮"""
+    if encoding == "zstd":
+        return zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(data)
+    if encoding == "br":
+        return brotli.compress(data, quality=BROTLI_QUALITY)
+    if encoding == "gzip":
+        return gzip.compress(data, compresslevel=GZIP_LEVEL, mtime=0)
+    raise ValueError(f"Unsupported encoding: {encoding}")
+
+
+def _decompress_one(data, encoding, limit):
+    if encoding in ("gzip", "x-gzip", "deflate"):
+        # wbits=47: gzip/zlibヘッダーを自動判別
+        # deflateはヘッダーなし（raw）で送るクライアントもあるため両方試す
+        candidates = (47,) if encoding != "deflate" else (zlib.MAX_WBITS, -zlib.MAX_WBITS)
+        for wbits in candidates:
+            decompressor = zlib.decompressobj(wbits)
+            try:
+                result = decompressor.decompress(data, limit + 1)
+                break
+            except zlib.error as e:
+                error = e
+        else:
+            raise DecompressionError(f"Invalid {encoding} body: {error}")
+        # 途中で切れたボディは展開できた分だけを渡さずに拒否する（上限超えは下で 413）
+        if len(result) <= limit and not decompressor.eof:
+            raise DecompressionError(f"Invalid {encoding} body: truncated stream")
+    elif encoding == "br":
+        if brotli is None:
+            raise DecompressionError("brotli is not supported", status_code=415)
+        # 出力の大きさを上限+1バイトまでに抑えて少しずつ展開し、超えた時点で打ち切る
+        decompressor = brotli.Decompressor()
+        parts = []
+        size = 0
+        chunk = data
+        try:
+            while True:
+                part = decompressor.process(chunk, output_buffer_limit=limit + 1 - size)
+                chunk = b""
+                size += len(part)
+                if size > limit:
+                    raise DecompressionError("Decompressed body too large", status_code=413)
+                parts.append(part)
+                if decompressor.can_accept_more_data():
+                    break
+        except brotli.error as e:
+            raise DecompressionError(f"Invalid br body: {e}")
+        if not decompressor.is_finished():
+            raise DecompressionError("Invalid br body: truncated stream")
+        result = b"".join(parts)
+    elif encoding == "zstd":
+        if zstandard is None:
+            raise DecompressionError("zstd is not supported", status_code=415)
+        try:
+            reader = zstandard.ZstdDecompressor().stream_reader(data)
+            result = reader.read(limit + 1)
+            # stream_reader は途中で切れたフレームでもエラーにしないので、上限内なら終端まであるか確かめる
+            # （展開後の大きさは上限内と分かっているので、もう一度展開してもメモリは増えない）
+            if len(result) <= limit:
+                decompressor = zstandard.ZstdDecompressor().decompressobj()
+                decompressor.decompress(data)
+                if not decompressor.eof:
+                    raise DecompressionError("Invalid zstd body: truncated stream")
+        except zstandard.ZstdError as e:
+            raise DecompressionError(f"Invalid zstd body: {e}")
+    elif encoding == "identity":
+        result = data
+    else:
+        raise DecompressionError(
+            f"Unsupported Content-Encoding: {encoding}", status_code=415
+        )
+
+    if len(result) > limit:
+        raise DecompressionError("Decompressed body too large", status_code=413)
+    return result
+
+
+def decompress(data, content_encoding, limit=None):
+    """Content-Encodingヘッダーに従ってリクエストボディを展開
+
+    複数指定（例: "gzip, br"）の場合は逆順に展開する
+    """
+    limit = limit or MAX_DECOMPRESSED_SIZE
+    encodings = [e.strip().lower() for e in content_encoding.split(",") if e.strip()]
+    for encoding in reversed(encodings):
+        data = _decompress_one(data, encoding, limit)
+    return data
+
+
+# ==== Flask統合 ====
+
+try:
+    from flask import request as _flask_request
+    from flask.json.provider import JSONProvider as _FlaskJSONProvider
+    from werkzeug.wsgi import get_input_stream
+except ImportError:
+    _FlaskJSONProvider = None
+
+
+if _FlaskJSONProvider is not None:
+
+    class FastJSONProvider(_FlaskJSONProvider):
+        """jsonify / request.json を高速エンコーダーで処理するFlask用プロバイダー"""
+
+        mimetype = "application/json"
+
+        def dumps(self, obj, **kwargs):
+            return dumps(obj, indent=kwargs.get("indent"))
+
+        def loads(self, s, **kwargs):
+            return loads(s)
+
+        def response(self, *args, **kwargs):
+            obj = self._prepare_response_obj(args, kwargs)
+            return self._app.response_class(
+                dumps_bytes(obj), mimetype=self.mimetype
+            )
+
+
+def init_flask(app):
+    """Flaskアプリにレスポンス共通レイヤーを組み込む"""
+    app.json = FastJSONProvider(app)
+
+    @app.before_request
+    def _decompress_request_body():
+        environ = _flask_request.environ
+        content_encoding = environ.get("HTTP_CONTENT_ENCODING")
+        if not content_encoding:
+            return None
+
+        # request.streamに触れる前に生のボディを読み、展開結果に差し替える
+        try:
+            body = decompress(get_input_stream(environ).read(), content_encoding)
+        except DecompressionError as e:
+            logger.warning(f"Rejected compressed request body: {e}")
+            return app.json.response({"error": str(e)}), e.status_code
+
+        environ["wsgi.input"] = BytesIO(body)
+        environ["CONTENT_LENGTH"] = str(len(body))
+        del environ["HTTP_CONTENT_ENCODING"]
+        return None
+
+    @app.after_request
+    def _compress_response(response):
+        response.vary.add("Accept-Encoding")
+
+        if (
+            response.direct_passthrough
+            or response.is_streamed
+            or response.status_code < 200
+            or response.status_code in (204, 304)
+            or "Content-Encoding" in response.headers
+            or not is_compressible(response.mimetype)
+        ):
+            return response
+
+        encoding = choose_encoding(_flask_request.headers.get("Accept-Encoding"))
+        if not encoding:
+            return response
+
+        data = response.get_data()
+        if len(data) < MIN_COMPRESS_SIZE:
+            return response
+
+        response.set_data(compress(data, encoding))
+        response.headers["Content-Encoding"] = encoding
+        return response
+
+    return app
+
+
+# ==== ASGI（FastAPI/Starlette）統合 ====
+
+try:
+    from starlette.responses import JSONResponse as _StarletteJSONResponse
+except ImportError:
+    _StarletteJSONResponse = None
+
+
+if _StarletteJSONResponse is not None:
+
+    class FastJSONResponse(_StarletteJSONResponse):
+        """高速エンコーダーを使うJSONResponse（FastAPIのdefault_response_class用）"""
+
+        def render(self, content):
+            return dumps_bytes(content)
+
+
+class CompressionMiddleware:
+    """リクエストボディの展開とレスポンス圧縮を行うASGIミドルウェア"""
+
+    def __init__(self, app, minimum_size=None):
+        self.app = app
+        self.minimum_size = MIN_COMPRESS_SIZE if minimum_size is None else minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        headers = {k.decode("latin-1").lower(): v.decode("latin-1") for k, v in scope["headers"]}
+
+        content_encoding = headers.get("content-encoding")
+        if content_encoding:
+            receive = await self._decompressed_receive(
+                scope, receive, send, content_encoding
+            )
+            if receive is None:
+                return
+
+        encoding = choose_encoding(headers.get("accept-encoding"))
+        await self.app(scope, receive, self._compressing_send(send, encoding))
+
+    async def _decompressed_receive(self, scope, receive, send, content_encoding):
+        chunks = []
+        while True:
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                return None
+            chunks.append(message.get("body", b""))
+            if not message.get("more_body", False):
+                break
+
+        try:
+            body = decompress(b"".join(chunks), content_encoding)
+        except DecompressionError as e:
+            logger.warning(f"Rejected compressed request body: {e}")
+            payload = dumps_bytes({"detail": str(e)})
+            await send(
+                {
+                    "type": "http.response.start",
+                    "status": e.status_code,
+                    "headers": [
+                        (b"content-type", b"application/json"),
+                        (b"content-length", str(len(payload)).encode()),
+                    ],
+                }
+            )
+            await send({"type": "http.response.body", "body": payload})
+            return None
+
+        scope["headers"] = [
+            (k, v)
+            for k, v in scope["headers"]
+            if k.lower() not in (b"content-encoding", b"content-length")
+        ] + [(b"content-length", str(len(body)).encode())]
+
+        sent = False
+
+        async def replay():
+            nonlocal sent
+            if not sent:
+                sent = True
+                return {"type": "http.request", "body": body, "more_body": False}
+            return await receive()
+
+        return replay
+
+    def _compressing_send(self, send, encoding):
+        start_message = None
+        body_chunks = []
+        passthrough = False
+
+        async def wrapped(message):
+            nonlocal start_message, passthrough
+
+            if message["type"] == "http.response.start":
+                response_headers = {
+                    k.decode("latin-1").lower(): v.decode("latin-1")
+                    for k, v in message.get("headers", [])
+                }
+                passthrough = (
+                    encoding is None
+                    or "content-encoding" in response_headers
+                    or not is_compressible(response_headers.get("content-type"))
+                )
+                if passthrough:
+                    message = dict(message)
+                    message["headers"] = list(message.get("headers", [])) + [
+                        (b"vary", b"Accept-Encoding")
+                    ]
+                    await send(message)
+                else:
+                    start_message = message
+                return
+
+            if passthrough or message["type"] != "http.response.body":
+                await send(message)
+                return
+
+            body_chunks.append(message.get("body", b""))
+            if message.get("more_body", False):
+                return
+
+            body = b"".join(body_chunks)
+            headers = [
+                (k, v)
+                for k, v in start_message.get("headers", [])
+                if k.lower() != b"content-length"
+            ]
+            if len(body) >= self.minimum_size:
+                body = compress(body, encoding)
+                headers.append((b"content-encoding", encoding.encode()))
+            headers.append((b"content-length", str(len(body)).encode()))
+            headers.append((b"vary", b"Accept-Encoding"))
+
+            await send({**start_message, "headers": headers})
+            await send({"type": "http.response.body", "body": body})
+
+        return wrapped
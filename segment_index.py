@@ -0,0 +1,75 @@
+"""
+字幕セグメントの時間インデックス
+開始時刻の昇順配列と終了時刻の累積最大を持ち、指定した時間範囲に重なるセグメントを
+二分探索（bisect）で取り出す。取り出しのコストは動画の長さではなく範囲内の件数に比例する
+
+    index = SegmentIndex(transcript)
+    clip = index.range(parse_time("12:30"), parse_time("15:00"))
+    content = format_transcript(clip, "srt")
+"""
+
+from bisect import bisect_left, bisect_right
+from itertools import accumulate
+
+# 範囲の切り出しで指定できる形式（transcript_common.format_transcript の形式。json はリストのまま返す）
+FORMATS = ("txt", "srt", "json")
+
+
+def parse_time(value):
+    """時刻（秒数 "750.5" / "12:30" / "1:02:30"）を秒にする。不正な値は ValueError"""
+    if isinstance(value, (int, float)):
+        seconds = float(value)
+    else:
+        text = str(value or "").strip()
+        if not text:
+            raise ValueError("時刻を指定してください")
+        parts = text.split(":")
+        if len(parts) > 3:
+            raise ValueError(f"時刻は秒数か [時:]分:秒 で指定してください: {value}")
+        try:
+            numbers = [float(part) for part in parts]
+        except ValueError:
+            raise ValueError(f"時刻は秒数か [時:]分:秒 で指定してください: {value}")
+        seconds = 0.0
+        for number in numbers:
+            seconds = seconds * 60 + number
+    if seconds < 0 or seconds != seconds:
+        raise ValueError(f"時刻は0以上で指定してください: {value}")
+    return seconds
+
+
+class SegmentIndex:
+    """字幕セグメント（text / start / duration）の時間インデックス（作成後は変更しない）"""
+
+    def __init__(self, segments):
+        self.segments = sorted(segments, key=lambda item: item["start"])
+        self.starts = [item["start"] for item in self.segments]
+        # 終了時刻は開始順に並ばない（長いセグメントが後続と重なる）ので累積最大で二分探索する
+        self.max_ends = list(
+            accumulate((item["start"] + item.get("duration", 0.0) for item in self.segments), max)
+        )
+
+    def __len__(self):
+        return len(self.segments)
+
+    @property
+    def duration(self):
+        """最後のセグメントの終了時刻"""
+        return self.max_ends[-1] if self.max_ends else 0.0
+
+    def bounds(self, start, end):
+        """[start, end) に重なりうるセグメントの添字範囲 (lo, hi)"""
+        lo = bisect_right(self.max_ends, start)
+        hi = bisect_left(self.starts, end)
+        return lo, max(lo, hi)
+
+    def range(self, start, end):
+        """[start, end) に重なるセグメント（開始順）"""
+        if end <= start:
+            return []
+        lo, hi = self.bounds(start, end)
+        return [
+            item
+            for item in self.segments[lo:hi]
+            if item["start"] + item.get("duration", 0.0) > start
+        ]
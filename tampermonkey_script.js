@@ -346,7 +346,29 @@
     }
 
     // ==== Cloud Run API Communication ====
+    // Uploads smaller than this are sent uncompressed
+    const COMPRESS_MIN_BYTES = 1024;
+
+    async function encodeRequestBody(payload) {
+        const json = JSON.stringify(payload);
+        if (typeof CompressionStream === "undefined" || json.length < COMPRESS_MIN_BYTES) {
+            return { data: json, headers: {} };
+        }
+
+        try {
+            const stream = new Blob([json]).stream().pipeThrough(new CompressionStream("gzip"));
+            const compressed = await new Response(stream).blob();
+            log(`Request body gzip: ${json.length} -> ${compressed.size} bytes`);
+            return { data: compressed, headers: { "Content-Encoding": "gzip" }, binary: true };
+        } catch (e) {
+            logError("Compression failed, sending uncompressed:", e);
+            return { data: json, headers: {} };
+        }
+    }
+
     async function sendToCloudRun(payload) {
+        const body = await encodeRequestBody(payload);
+
         return new Promise((resolve, reject) => {
             GM_xmlhttpRequest({
                 method: "POST",
@@ -354,8 +376,10 @@
                 headers: {
                     "Content-Type": "application/json",
                     "Authorization": `Bearer ${API_TOKEN}`,
+                    ...body.headers,
                 },
-                data: JSON.stringify(payload),
+                data: body.data,
+                binary: body.binary || false,
                 timeout: 60000, // 60 seconds
                 onload: function(response) {
                     log("API Response:", response.status, response.statusText);
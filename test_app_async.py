@@ -0,0 +1,247 @@
+"""
+ASGI App Test
+app_async のエンドポイントのテスト（httpx.ASGITransport で呼び出し、外部通信は
+benchmarks/fake_upstreams の代替サーバーに向ける。ネットワーク不要）
+"""
+
+import asyncio
+import os
+import sys
+from pathlib import Path
+
+# パスを追加
+sys.path.insert(0, str(Path(__file__).parent))
+
+# app_async は読み込み時に環境変数を読むので、先に設定する（benchmarks/bench_app.py と同じ）
+os.environ.setdefault("YOUTUBE_API_KEY", "test-youtube-key")
+os.environ.setdefault("GEMINI_API_KEY", "test-gemini-key")
+os.environ.setdefault("TRANSCRIPT_API_TOKEN", "test-token")
+os.environ.pop("K_SERVICE", None)
+# テストごとに代替サーバーの応答を変えるので、Gemini結果はキャッシュしない
+os.environ["GEMINI_CACHE_SIZE"] = "0"
+
+import httpx  # noqa: E402
+
+import app_async  # noqa: E402
+from benchmarks.fake_upstreams import FakeUpstreamServer, build_config  # noqa: E402
+
+VIDEO_URL = "https://www.youtube.com/watch?v=dQw4w9WgXcQ"
+
+# 待ち時間なし・小さな字幕（テストごとに上書きする）
+FAST_UPSTREAMS = {
+    "latency": {endpoint: "fixed:0" for endpoint in ("watch", "player", "timedtext", "videos", "gemini")},
+    "segments": "fixed:30",
+    "gemini_output_chars": "fixed:80",
+    "seed": 0,
+}
+
+
+def _auth():
+    return {"Authorization": f"Bearer {app_async.TRANSCRIPT_API_TOKEN}"}
+
+
+def _run(scenario, upstreams=None):
+    """代替サーバーを起動してアプリを向け、scenario(client) の結果と代替サーバーのリクエスト数を返す
+
+    upstreams は FAST_UPSTREAMS の項目ごとの上書き（例: {"latency": {"gemini": "fixed:2000"}}）
+    """
+    config = build_config(FAST_UPSTREAMS)
+    for key, value in (upstreams or {}).items():
+        config[key].update(value)
+
+    with FakeUpstreamServer(config=config) as server:
+        app_async.YOUTUBE_BASE_URL = server.url
+        app_async.YOUTUBE_DATA_API_URL = f"{server.url}/youtube/v3"
+        app_async.GEMINI_API_BASE = server.url
+        # 戦略ごとのレート制限待機はしない
+        app_async.STRATEGIES = [(name, description, (0, 0)) for name, description, _ in app_async.STRATEGIES]
+
+        async def main():
+            async with app_async.lifespan(app_async.app):
+                transport = httpx.ASGITransport(app=app_async.app)
+                async with httpx.AsyncClient(transport=transport, base_url="http://testserver") as client:
+                    return await scenario(client)
+
+        return asyncio.run(main()), server.stats()["requests"]
+
+
+def test_health_and_errors():
+    """/health と、未定義のパス・認証エラー・CORSの応答"""
+    print("\n[TEST] app_async through ASGITransport...")
+
+    async def scenario(client):
+        return (
+            await client.get("/health"),
+            await client.get("/no_such_endpoint"),
+            await client.post("/extract", json={"url": VIDEO_URL}),
+            await client.options(
+                "/health",
+                headers={"Origin": "https://example-abc.a.run.app", "Access-Control-Request-Method": "GET"},
+            ),
+            await client.options(
+                "/health",
+                headers={"Origin": "https://evil.example.com", "Access-Control-Request-Method": "GET"},
+            ),
+        )
+
+    (health, missing, unauthorized, allowed, denied), _ = _run(scenario)
+    assert health.status_code == 200
+    assert set(health.json()) == {"status", "timestamp", "youtube_api", "gemini_api"}
+    assert health.json()["status"] == "healthy"
+    assert missing.status_code == 404 and set(missing.json()) == {"error"}
+    assert unauthorized.status_code == 401 and "error" in unauthorized.json()
+    # 既定の CORS_ORIGINS（https://*.run.app）はサブドメインに一致する
+    assert allowed.headers.get("access-control-allow-origin") == "https://example-abc.a.run.app"
+    assert "access-control-allow-origin" not in denied.headers
+
+
+def test_extract_url():
+    """URLから字幕・タイトルを取得し、整形・要約した結果を返す"""
+
+    async def scenario(client):
+        return await client.post(
+            "/extract", json={"url": VIDEO_URL, "formatter": "local"}, headers=_auth()
+        )
+
+    response, requests = _run(scenario)
+    assert response.status_code == 200, response.text
+    body = response.json()
+    assert {"success", "video_id", "title", "formatted_transcript", "summary", "formatter",
+            "plan", "partial", "deadline", "stats"} <= set(body)
+    assert body["success"] is True and body["partial"] is False
+    assert body["video_id"] == "dQw4w9WgXcQ"
+    assert body["title"] == "Fake video dQw4w9WgXcQ"
+    assert body["formatter"] == "local" and body["formatted_transcript"]
+    assert body["summary"] and body["plan"]["strategy"] == "single"
+    assert body["stats"]["total_segments"] == 30 and body["stats"]["language"] == "ja"
+    assert requests["watch"] == 1 and requests["timedtext"] == 1 and requests["videos"] == 1
+    assert requests["gemini"] == 1
+
+
+def test_extract_user_errors():
+    """入力の誤りは 400（{"success": false, "error": ...}）"""
+
+    async def scenario(client):
+        return [
+            await client.post("/extract", json=body, headers=_auth())
+            for body in (
+                {},
+                {"url": "https://example.com/watch?v=dQw4w9WgXcQ"},
+                {"url": VIDEO_URL, "formatter": "fancy"},
+                {"url": VIDEO_URL, "models": {"reduce": ["fast"]}},
+            )
+        ] + [
+            await client.post(
+                "/extract", json={"transcript_text": "字幕"}, headers={**_auth(), "X-Request-Deadline": "soon"}
+            )
+        ]
+
+    responses, requests = _run(scenario)
+    for response in responses:
+        assert response.status_code == 400, response.text
+        assert "error" in response.json()
+    assert requests["watch"] == 0
+
+
+def test_extract_deadline():
+    """字幕の取得中に期限を過ぎたら 504、整形・要約中なら partial で返す"""
+
+    async def fetch(client):
+        return await client.post(
+            "/extract", json={"url": VIDEO_URL}, headers={**_auth(), "X-Request-Deadline": "0.3"}
+        )
+
+    response, _ = _run(fetch, {"latency": {"watch": "fixed:1000"}})
+    assert response.status_code == 504, response.text
+    assert response.json()["success"] is False and response.json()["partial"] is True
+    assert "error" in response.json()
+
+    async def summarize(client):
+        return await client.post(
+            "/extract",
+            json={"transcript_text": "今日は字幕のテストです。" * 20, "formatter": "local"},
+            headers={**_auth(), "X-Request-Deadline": "0.5"},
+        )
+
+    response, requests = _run(summarize, {"latency": {"gemini": "fixed:2000"}})
+    assert response.status_code == 200, response.text
+    body = response.json()
+    assert body["success"] is True and body["partial"] is True
+    assert body["formatter"] == "local" and body["formatted_transcript"]
+    assert body["summary"] == ""
+    assert requests["gemini"] >= 1
+
+
+def test_supported_languages():
+    """字幕トラックの一覧を返し、取得できなければ 400"""
+
+    async def scenario(client):
+        return await client.get("/supported_languages/dQw4w9WgXcQ")
+
+    response, _ = _run(scenario)
+    assert response.status_code == 200, response.text
+    languages = response.json()["languages"]
+    assert [language["code"] for language in languages] == ["ja", "en"]
+    assert set(languages[0]) == {"code", "name", "is_generated", "is_translatable"}
+    assert languages[0]["is_generated"] is True
+
+    response, _ = _run(
+        scenario, {"error_rate": {"watch": 1.0}, "error_status": {"watch": 404}}
+    )
+    assert response.status_code == 400
+    assert response.json()["success"] is False and "error" in response.json()
+
+
+def test_format_text():
+    """ローカル整形（セグメント付き）と Gemini 整形、テキストなしは 400"""
+    segments = [
+        {"text": "今日は", "start": 0.0, "duration": 1.0},
+        {"text": "字幕のテストです", "start": 1.0, "duration": 2.0},
+    ]
+
+    async def scenario(client):
+        return (
+            await client.post(
+                "/format_text",
+                json={"text": "今日は 字幕のテストです", "segments": segments, "formatter": "local"},
+            ),
+            await client.post("/format_text", json={"text": "今日は 字幕のテストです", "formatter": "gemini"}),
+            await client.post("/format_text", json={"formatter": "local"}),
+            await client.post(
+                "/format_text", json={"text": "字幕", "segments": [{"text": "字幕", "start": "5"}]}
+            ),
+        )
+
+    (local, gemini, empty, malformed), requests = _run(scenario)
+    assert local.status_code == 200, local.text
+    assert set(local.json()) == {"success", "original_text", "formatted_text", "formatter"}
+    assert local.json()["formatter"] == "local" and "字幕のテストです" in local.json()["formatted_text"]
+    assert gemini.status_code == 200 and gemini.json()["formatter"] == "gemini"
+    assert empty.status_code == 400 and "error" in empty.json()
+    assert malformed.status_code == 400 and malformed.json()["success"] is False
+    assert requests["gemini"] == 1
+
+
+if __name__ == "__main__":
+    print("=" * 60)
+    print("ASGI App Test")
+    print("=" * 60)
+
+    success = True
+    for test in (
+        test_health_and_errors,
+        test_extract_url,
+        test_extract_user_errors,
+        test_extract_deadline,
+        test_supported_languages,
+        test_format_text,
+    ):
+        try:
+            test()
+            print(f"[PASSED] {test.__name__}")
+        except AssertionError as e:
+            success = False
+            print(f"[FAILED] {test.__name__}: {e}")
+
+    print("=" * 60)
+    sys.exit(0 if success else 1)
@@ -0,0 +1,220 @@
+"""
+Cache Test
+プロセス内キャッシュ（cache）のテスト（ネットワーク不要）
+"""
+
+import io
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+# パスを追加
+sys.path.insert(0, str(Path(__file__).parent))
+
+import cache  # noqa: E402
+import transcript_codec  # noqa: E402
+
+
+def test_ttl_and_lru():
+    """TTLで期限切れになり、上限を超えると古いものから追い出される"""
+    print("\n[TEST] TTL and LRU eviction...")
+    c = cache.TTLCache("test", maxsize=2, ttl=0.05)
+    c.set("a", 1)
+    c.set("b", 2)
+    assert c.get("a") == 1  # a が最近使われたので b が追い出される
+    c.set("c", 3)
+    assert c.get("b") is None and c.get("a") == 1 and c.get("c") == 3
+    assert c.evictions == 1
+
+    time.sleep(0.06)
+    assert c.get("a") is None
+    assert c.get("a", "default") == "default"
+    c.set("d", 4, ttl=10)
+    assert c.get("d") == 4
+
+
+def test_disabled_cache():
+    """maxsize=0 なら何も保持しない"""
+    c = cache.TTLCache("off", maxsize=0)
+    c.set("a", 1)
+    assert c.get("a") is None and len(c) == 0
+
+
+def test_make_key_and_registry():
+    """キーは内容で決まり、名前空間ごとに同じキャッシュが返る"""
+    assert cache.make_key("model", "長い字幕") == cache.make_key("model", "長い字幕")
+    assert cache.make_key("a", "bc") != cache.make_key("ab", "c")
+    first = cache.get_cache("test-registry", maxsize=4)
+    assert cache.get_cache("test-registry") is first
+    first.set("k", "v")
+    first.get("k")
+    first.get("missing")
+    stats = cache.stats()["test-registry"]
+    assert stats["hits"] == 1 and stats["misses"] == 1 and stats["size"] == 1
+
+
+def test_snapshot_round_trip():
+    """スナップショットから圧縮した値も含めて復元でき、残りTTLも引き継ぐ"""
+    print("\n[TEST] Snapshot round trip...")
+    codec = transcript_codec.Codec()
+    segments = [{"text": f"字幕{i}", "start": i * 1.5, "duration": 1.5} for i in range(50)]
+    titles = cache.get_cache("test-snap-titles", maxsize=8, ttl=60)
+    transcripts = cache.get_cache("test-snap-transcripts", maxsize=8, ttl=60, codec=codec)
+    titles.set("v1", "タイトル")
+    titles.set("meta", {"count": 3})
+    titles.set("short", "x", ttl=0.01)
+    transcripts.set("v1", segments)
+    time.sleep(0.02)
+
+    namespaces = ["test-snap-titles", "test-snap-transcripts"]
+    with tempfile.TemporaryDirectory() as tmp:
+        path = str(Path(tmp) / "snapshot.jsonl.gz")
+        assert cache.save_snapshot(path, namespaces) == 3  # 期限切れの short は書かない
+        for c in (titles, transcripts):
+            for key in ("v1", "meta", "short"):
+                c.delete(key)
+        loaded = cache.load_snapshot(path, namespaces)
+
+    assert loaded == {"test-snap-titles": 2, "test-snap-transcripts": 1}
+    assert titles.get("v1") == "タイトル" and titles.get("meta") == {"count": 3}
+    assert transcripts.get("v1") == segments
+    remaining = titles.snapshot()[0][1]
+    assert 0 < remaining <= 60
+
+
+def test_snapshot_skips_expired_and_keeps_fresh_values():
+    """期限切れのエントリと登録されていない名前空間は読まず、読み込み中に入った値は上書きしない"""
+    c = cache.get_cache("test-snap-fresh", maxsize=8, ttl=60)
+    c.set("a", "old")
+    c.set("b", "old")
+    c.set("gone", "old", ttl=0.05)
+    buffer = io.BytesIO()
+    cache.dump_snapshot(buffer, ["test-snap-fresh"])
+    time.sleep(0.06)
+
+    c.delete("a")
+    c.delete("gone")
+    c.set("b", "new")
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "snapshot.jsonl.gz"
+        path.write_bytes(buffer.getvalue())
+        assert cache.load_snapshot(str(path), ["test-snap-fresh"]) == {"test-snap-fresh": 1}
+        assert cache.load_snapshot(str(path), ["test-snap-other"]) == {}
+    assert c.get("a") == "old" and c.get("b") == "new" and c.get("gone") is None
+
+
+def test_snapshot_async_load():
+    """バックグラウンドで読み込み、状況は snapshot_status で見える（ファイルがなくても失敗しない）"""
+    c = cache.get_cache("test-snap-async", maxsize=8, ttl=60)
+    c.set("k", "v")
+    with tempfile.TemporaryDirectory() as tmp:
+        path = str(Path(tmp) / "snapshot.jsonl.gz")
+        cache.load_snapshot_async(path, ["test-snap-async"]).join(5)
+        assert cache.snapshot_status()["state"] == "missing"
+
+        cache.save_snapshot(path, ["test-snap-async"])
+        c.delete("k")
+        cache.load_snapshot_async(path, ["test-snap-async"]).join(5)
+    status = cache.snapshot_status()
+    assert status["state"] == "loaded" and status["loaded"] == {"test-snap-async": 1}
+    assert c.get("k") == "v"
+
+
+def test_stale_while_revalidate():
+    """猶予期間中は古い値をすぐ返し、取り直しはキーごとに1つだけバックグラウンドで走る"""
+    print("\n[TEST] Stale-while-revalidate...")
+    c = cache.TTLCache("test-swr", maxsize=8, ttl=0.05, stale=10)
+    release = threading.Event()
+    calls = []
+
+    def loader():
+        calls.append(1)
+        if len(calls) > 1:
+            release.wait(5)
+        return f"v{len(calls)}"
+
+    assert c.get_or_load("k", loader) == "v1"  # ミスは同期で取得
+    assert c.get_or_load("k", loader) == "v1" and c.hits == 1
+    time.sleep(0.06)
+    assert c.get("k") is None  # get は期限切れの値を返さない
+
+    # 取り直しが終わるまで古い値を返し続け、取り直しは1回だけ
+    assert c.get_or_load("k", loader) == "v1"
+    assert c.get_or_load("k", loader) == "v1"
+    assert c.stale_hits == 2 and c.refreshes == 1
+    release.set()
+    for _ in range(100):
+        if "k" in c:
+            break
+        time.sleep(0.01)
+    assert c.get_or_load("k", loader) == "v2" and len(calls) == 2
+
+    stats = c.stats()
+    assert stats["stale_hits"] == 2 and stats["refreshes"] == 1 and stats["refresh_errors"] == 0
+
+
+def test_stale_refresh_failure_and_grace_expiry():
+    """取り直しに失敗しても古い値を返し、猶予期間を過ぎたら同期で取り直す。None はキャッシュしない"""
+    c = cache.TTLCache("test-swr-fail", maxsize=8, ttl=0.02, stale=0.2)
+    c.set("k", "old")
+    time.sleep(0.03)
+
+    def failing():
+        raise RuntimeError("quota exceeded")
+
+    assert c.get_or_load("k", failing) == "old"
+    for _ in range(100):
+        if c.refresh_errors:
+            break
+        time.sleep(0.01)
+    assert c.refresh_errors == 1
+    assert c.get_or_load("k", failing) == "old"
+
+    time.sleep(0.2)
+    assert c.get_or_load("k", lambda: "new") == "new"
+    assert c.get_or_load("missing", lambda: None) is None and "missing" not in c
+
+
+def test_expires_at_versions_entries():
+    """expires_at は期限内の値の期限を返し、入れ直すと変わる（ヒット・ミスには数えない）"""
+    c = cache.TTLCache("test-version", maxsize=8, ttl=60, codec=transcript_codec.Codec())
+    assert c.expires_at("k") is None
+    c.set("k", [{"text": "字幕", "start": 0.0, "duration": 1.0}])
+    first = c.expires_at("k")
+    assert first is not None and c.hits == 0 and c.misses == 0
+    time.sleep(0.01)
+    c.set("k", [{"text": "新しい字幕", "start": 0.0, "duration": 1.0}])
+    assert c.expires_at("k") not in (None, first)
+    c.set("old", [{"text": "古い字幕", "start": 0.0, "duration": 1.0}], ttl=0.01)
+    time.sleep(0.02)
+    assert c.expires_at("old") is None
+
+
+if __name__ == "__main__":
+    print("=" * 60)
+    print("Cache Test")
+    print("=" * 60)
+
+    success = True
+    for test in (
+        test_ttl_and_lru,
+        test_disabled_cache,
+        test_make_key_and_registry,
+        test_snapshot_round_trip,
+        test_snapshot_skips_expired_and_keeps_fresh_values,
+        test_snapshot_async_load,
+        test_stale_while_revalidate,
+        test_stale_refresh_failure_and_grace_expiry,
+        test_expires_at_versions_entries,
+    ):
+        try:
+            test()
+            print(f"[PASSED] {test.__name__}")
+        except AssertionError as e:
+            success = False
+            print(f"[FAILED] {test.__name__}: {e}")
+
+    print("=" * 60)
+    sys.exit(0 if success else 1)
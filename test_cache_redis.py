@@ -0,0 +1,157 @@
+"""
+Redis Cache Test
+Redisプロトコルの分散キャッシュ（cache_redis）のテスト（fakeredis を使う。ネットワーク不要）
+fakeredis が未インストールならスキップする（pip install fakeredis）
+"""
+
+import sys
+import time
+from pathlib import Path
+
+# パスを追加
+sys.path.insert(0, str(Path(__file__).parent))
+
+import cache  # noqa: E402
+import cache_redis  # noqa: E402
+import transcript_codec  # noqa: E402
+
+try:
+    import fakeredis
+except ImportError:
+    fakeredis = None
+
+
+class _DownClient:
+    """接続できないRedis"""
+
+    def __getattr__(self, name):
+        def fail(*args, **kwargs):
+            raise ConnectionRefusedError("connection refused")
+
+        return fail
+
+
+def test_shared_between_instances():
+    """別インスタンスから値が見え、JSON・圧縮値とも読め、保存した値は圧縮されている"""
+    print("\n[TEST] Redis cache...")
+    if fakeredis is None:
+        print("[SKIP] fakeredis is not installed")
+        return
+    server = fakeredis.FakeServer()
+    codec = transcript_codec.Codec()
+    segments = [{"text": f"字幕{i}", "start": i * 1.5, "duration": 1.5} for i in range(50)]
+    first = cache_redis.RedisCache("gemini", ttl=60, client=fakeredis.FakeRedis(server=server))
+    second = cache_redis.RedisCache("gemini", ttl=60, client=fakeredis.FakeRedis(server=server))
+    summary = "要約の本文。" * 100
+    first.set("k", summary)
+    first.set("langs", [{"code": "ja"}])
+    assert second.get("k") == summary and second.get("langs") == [{"code": "ja"}]
+    assert "k" in second and "missing" not in second
+    assert second.expires_at("k") == first.expires_at("k") and second.expires_at("missing") is None
+    raw = first.client.get(first.prefix + "k")
+    assert len(raw) < len(summary.encode("utf-8")) / 5
+
+    transcripts = cache_redis.RedisCache(
+        "transcripts", ttl=60, codec=codec, client=fakeredis.FakeRedis(server=server)
+    )
+    transcripts.set("v1", segments)
+    assert transcripts.get("v1") == segments
+    assert second.get("v1") is None  # 名前空間ごとに別のキー
+
+    # 名前空間の ttl（と猶予期間）がRedisのキーの期限になる
+    assert 0 < first.client.pttl(first.prefix + "k") <= 60000
+    second.delete("k")
+    assert first.get("k") is None
+
+
+def test_get_many_and_set_many():
+    """まとめて読み書きでき、ないキーと期限切れは返さない"""
+    if fakeredis is None:
+        return
+    c = cache_redis.RedisCache("chunks", ttl=60, client=fakeredis.FakeRedis())
+    c.set_many({f"chunk-{i}": f"部分要約{i}" for i in range(5)})
+    c.set("old", "x", ttl=0.01)
+    time.sleep(0.02)
+    found = c.get_many([f"chunk-{i}" for i in range(7)] + ["old"])
+    assert found == {f"chunk-{i}": f"部分要約{i}" for i in range(5)}
+    assert c.hits == 5 and c.misses == 3
+    assert c.get_many([]) == {}
+
+
+def test_stale_refresh_claimed_once():
+    """猶予期間中の取り直しはインスタンスをまたいで1つだけ引き受け、値を入れ直すと外れる"""
+    if fakeredis is None:
+        return
+    server = fakeredis.FakeServer()
+    first = cache_redis.RedisCache(
+        "titles", ttl=0.01, stale=60, client=fakeredis.FakeRedis(server=server)
+    )
+    second = cache_redis.RedisCache(
+        "titles", ttl=0.01, stale=60, client=fakeredis.FakeRedis(server=server)
+    )
+    first.set("v1", "old")
+    time.sleep(0.02)
+    assert first._claim_refresh("v1", time.time())
+    assert second.get_or_load("v1", lambda: "new") == "old"
+    assert second.stale_hits == 1 and second.refreshes == 0
+
+    first.set("v1", "new", ttl=0.01)
+    time.sleep(0.02)
+    assert second._claim_refresh("v1", time.time())
+
+
+def test_fallback_to_local_cache():
+    """Redisに接続できなければプロセス内キャッシュで動き、しばらく再接続を試さない"""
+    c = cache_redis.RedisCache("fallback", maxsize=8, ttl=60, client=_DownClient())
+    c.set("k", "v")  # 失敗したのでローカルに入る
+    assert c.errors == 1 and not c.stats()["available"]
+    assert c.get("k") == "v" and c.get_many(["k", "x"]) == {"k": "v"}
+    assert c.get_or_load("x", lambda: "loaded") == "loaded"
+    assert c.errors == 1  # 再接続までは Redis を呼ばない
+    assert [key for key, _, _ in c.snapshot()] == ["k", "x"]
+
+
+def test_get_cache_backend_and_snapshot():
+    """CACHE_BACKEND=redis なら get_cache は RedisCache を返し、スナップショットも読み書きできる"""
+    if fakeredis is None:
+        return
+    original = cache.BACKEND, cache_redis.get_client
+    client = fakeredis.FakeRedis()
+    cache.BACKEND, cache_redis.get_client = "redis", lambda url=None: client
+    try:
+        c = cache.get_cache("test-redis-backend", ttl=60)
+        assert isinstance(c, cache_redis.RedisCache)
+        assert cache.stats()["test-redis-backend"]["backend"] == "redis"
+        c.set("k", {"v": 1})
+        entries = c.snapshot()
+        assert [(key, value) for key, _, value in entries] == [("k", {"v": 1})]
+        c.clear()
+        c.set("k", {"v": 2})
+        c.restore(entries + [("other", 30, "x")])
+        assert c.get("k") == {"v": 2} and c.get("other") == "x"
+    finally:
+        cache.BACKEND, cache_redis.get_client = original
+
+
+if __name__ == "__main__":
+    print("=" * 60)
+    print("Redis Cache Test")
+    print("=" * 60)
+
+    success = True
+    for test in (
+        test_shared_between_instances,
+        test_get_many_and_set_many,
+        test_stale_refresh_claimed_once,
+        test_fallback_to_local_cache,
+        test_get_cache_backend_and_snapshot,
+    ):
+        try:
+            test()
+            print(f"[PASSED] {test.__name__}")
+        except AssertionError as e:
+            success = False
+            print(f"[FAILED] {test.__name__}: {e}")
+
+    print("=" * 60)
+    sys.exit(0 if success else 1)
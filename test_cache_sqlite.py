@@ -0,0 +1,157 @@
+"""
+SQLite Cache Test
+プロセス間で共有するキャッシュ（cache_sqlite）のテスト（ネットワーク不要）
+"""
+
+import multiprocessing
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# パスを追加
+sys.path.insert(0, str(Path(__file__).parent))
+
+import cache  # noqa: E402
+import cache_sqlite  # noqa: E402
+import transcript_codec  # noqa: E402
+
+
+def _writer(path, worker, count):
+    """別プロセスから同じファイルに書き込む"""
+    c = cache_sqlite.SQLiteCache("shared", maxsize=10000, ttl=60, path=path)
+    for i in range(count):
+        c.set(f"{worker}-{i}", {"worker": worker, "i": i})
+        c.get(f"{(worker + 1) % 4}-{i}")
+
+
+def test_shared_between_instances():
+    """同じファイルを開いた別のインスタンス（別ワーカー）から値が見え、JSON・圧縮値とも復元できる"""
+    print("\n[TEST] Shared SQLite cache...")
+    codec = transcript_codec.Codec()
+    segments = [{"text": f"字幕{i}", "start": i * 1.5, "duration": 1.5} for i in range(50)]
+    with tempfile.TemporaryDirectory() as tmp:
+        path = str(Path(tmp) / "cache.sqlite3")
+        first = cache_sqlite.SQLiteCache("titles", maxsize=8, ttl=60, path=path)
+        second = cache_sqlite.SQLiteCache("titles", maxsize=8, ttl=60, path=path)
+        other = cache_sqlite.SQLiteCache("other", maxsize=8, ttl=60, path=path)
+        first.set("v1", "タイトル")
+        first.set("langs", [{"code": "ja"}])
+        assert second.get("v1") == "タイトル" and second.get("langs") == [{"code": "ja"}]
+        # 期限は値の版として他のインスタンスからも見え、入れ直すと変わる
+        version = second.expires_at("v1")
+        assert version == first.expires_at("v1") and second.expires_at("missing") is None
+        time.sleep(0.01)
+        first.set("v1", "新しいタイトル")
+        assert second.expires_at("v1") not in (None, version)
+        assert other.get("v1") is None and len(second) == 2
+
+        first.set("bad", object())  # JSONにできない値はキャッシュしない
+        assert "bad" not in second
+
+        compressed = cache_sqlite.SQLiteCache("segments", ttl=60, codec=codec, path=path)
+        compressed.set("v1", segments)
+        assert cache_sqlite.SQLiteCache("segments", codec=codec, path=path).get("v1") == segments
+        assert compressed.stats()["bytes"] > 0
+
+        second.delete("v1")
+        assert first.get("v1") is None
+        first.set("short", "x", ttl=0.01)
+        time.sleep(0.02)
+        assert "short" not in second and second.get("short") is None
+
+
+def test_lru_eviction():
+    """名前空間ごとに maxsize 件まで。最後に使われたのが古いものから消える"""
+    with tempfile.TemporaryDirectory() as tmp:
+        c = cache_sqlite.SQLiteCache("lru", maxsize=2, ttl=60, path=str(Path(tmp) / "c.sqlite3"))
+        c.set("a", 1)
+        time.sleep(cache_sqlite.TOUCH_INTERVAL)
+        c.set("b", 2)
+        assert c.get("a") == 1  # a が最近使われたので b が追い出される
+        c.set("c", 3)
+        assert c.get("b") is None and c.get("a") == 1 and c.get("c") == 3
+        assert c.evictions == 1 and len(c) == 2
+
+
+def test_refresh_claimed_once_across_instances():
+    """猶予期間中の取り直しはプロセスをまたいで1つだけ引き受ける"""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = str(Path(tmp) / "c.sqlite3")
+        first = cache_sqlite.SQLiteCache("swr", ttl=0.01, stale=60, path=path)
+        second = cache_sqlite.SQLiteCache("swr", ttl=0.01, stale=60, path=path)
+        first.set("k", "old")
+        time.sleep(0.02)
+        now = time.time()
+        assert first._claim_refresh("k", now)
+        assert not second._claim_refresh("k", now)
+
+        # 引き受けられなかった側は古い値を返すだけで取り直さない
+        assert second.get_or_load("k", lambda: "new") == "old"
+        assert second.stale_hits == 1 and second.refreshes == 0
+        first.set("k", "new")
+        assert second.get_or_load("k", lambda: "unused") == "new"
+
+
+def test_concurrent_processes():
+    """複数プロセスから同時に書いても壊れず、全件が残る"""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = str(Path(tmp) / "c.sqlite3")
+        processes = [
+            multiprocessing.Process(target=_writer, args=(path, worker, 100)) for worker in range(4)
+        ]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join(60)
+            assert process.exitcode == 0
+        c = cache_sqlite.SQLiteCache("shared", maxsize=10000, path=path)
+        assert len(c) == 400
+        assert c.get("3-99") == {"worker": 3, "i": 99}
+
+
+def test_get_cache_backend():
+    """CACHE_BACKEND=sqlite なら get_cache は共有キャッシュを返し、スナップショットも使える"""
+    original = cache.BACKEND, cache_sqlite.PATH
+    with tempfile.TemporaryDirectory() as tmp:
+        cache.BACKEND, cache_sqlite.PATH = "sqlite", str(Path(tmp) / "c.sqlite3")
+        try:
+            c = cache.get_cache("test-sqlite-backend", maxsize=4, ttl=60)
+            assert isinstance(c, cache_sqlite.SQLiteCache)
+            assert cache.stats()["test-sqlite-backend"]["backend"] == "sqlite"
+
+            c.set("k", {"v": 1})
+            snapshot_path = str(Path(tmp) / "snapshot.jsonl.gz")
+            assert cache.save_snapshot(snapshot_path, ["test-sqlite-backend"]) == 1
+            c.clear()
+            c.set("fresh", "x")
+            assert cache.load_snapshot(snapshot_path, ["test-sqlite-backend"]) == {
+                "test-sqlite-backend": 1
+            }
+            assert c.get("k") == {"v": 1} and c.get("fresh") == "x"
+        finally:
+            cache.BACKEND, cache_sqlite.PATH = original
+
+
+if __name__ == "__main__":
+    print("=" * 60)
+    print("SQLite Cache Test")
+    print("=" * 60)
+
+    success = True
+    for test in (
+        test_shared_between_instances,
+        test_lru_eviction,
+        test_refresh_claimed_once_across_instances,
+        test_concurrent_processes,
+        test_get_cache_backend,
+    ):
+        try:
+            test()
+            print(f"[PASSED] {test.__name__}")
+        except AssertionError as e:
+            success = False
+            print(f"[FAILED] {test.__name__}: {e}")
+
+    print("=" * 60)
+    sys.exit(0 if success else 1)
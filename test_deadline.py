@@ -0,0 +1,75 @@
+"""
+Deadline Test
+リクエストの期限（deadline）のテスト（ネットワーク不要）
+"""
+
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+# パスを追加
+sys.path.insert(0, str(Path(__file__).parent))
+
+import deadline  # noqa: E402
+
+
+def test_from_header():
+    """ヘッダーの秒数で期限を作り、上限で切り詰め、不正な値は拒否する"""
+    print("\n[TEST] Parsing deadline header...")
+    budget = deadline.from_header("10")
+    assert budget.budget == 10 and 9 < budget.remaining() <= 10
+    assert deadline.from_header(None, default=30).budget == 30
+    assert deadline.from_header("100000").budget == deadline.MAX_SECONDS
+    for bad in ("soon", "-1", "0"):
+        try:
+            deadline.from_header(bad)
+            assert False, f"{bad} should be rejected"
+        except ValueError:
+            pass
+
+    unbounded = deadline.Deadline()
+    assert unbounded.remaining() == float("inf") and not unbounded.expired()
+    assert unbounded.timeout(120) == 120
+    unbounded.check("anything")
+
+
+def test_sleep_and_timeout_shrink():
+    """待機は残り時間の一部に縮み、タイムアウトは残り時間を超えない"""
+    budget = deadline.Deadline(2)
+    assert budget.sleep_for(8) <= 2 * deadline.SLEEP_SHARE
+    assert budget.sleep_for(0.1) == 0.1
+    assert budget.timeout(120) <= 2
+    asyncio.run(budget.sleep_async(0.01))
+
+
+def test_expired_deadline_raises():
+    """期限を過ぎたら check が DeadlineExceeded を送出し、待機は省かれる"""
+    budget = deadline.Deadline(0.01)
+    time.sleep(0.02)
+    assert budget.expired() and budget.remaining() == 0
+    assert budget.sleep_for(5) == 0
+    try:
+        budget.check("Gemini summary")
+        assert False, "should raise"
+    except deadline.DeadlineExceeded as e:
+        assert "Gemini summary" in str(e)
+    assert budget.to_dict()["remaining"] == 0
+
+
+if __name__ == "__main__":
+    print("=" * 60)
+    print("Deadline Test")
+    print("=" * 60)
+
+    success = True
+    for test in (test_from_header, test_sleep_and_timeout_shrink, test_expired_deadline_raises):
+        try:
+            test()
+            print(f"[PASSED] {test.__name__}")
+        except AssertionError as e:
+            success = False
+            print(f"[FAILED] {test.__name__}: {e}")
+
+    print("=" * 60)
+    sys.exit(0 if success else 1)
@@ -0,0 +1,79 @@
+"""
+Extractive Summarizer Test
+NumPyによる抽出型要約（extractive_summarizer）のテスト（ネットワーク不要）
+"""
+
+import sys
+from pathlib import Path
+
+# パスを追加
+sys.path.insert(0, str(Path(__file__).parent))
+
+import extractive_summarizer  # noqa: E402
+
+SAMPLE_TEXT = (
+    "機械学習は大量のデータからパターンを学ぶ技術です。"
+    "深層学習はニューラルネットワークを使う機械学習の一種です。"
+    "今日の天気は晴れです。"
+    "ニューラルネットワークは多層の構造を持ちます。"
+    "データの前処理は機械学習で重要です。"
+    "お昼ご飯はカレーでした。"
+)
+
+
+def test_split_sentences():
+    """句点での分割と、句読点のない字幕の結合"""
+    print("\n[TEST] Splitting sentences...")
+    sentences = extractive_summarizer.split_sentences(SAMPLE_TEXT)
+    assert len(sentences) == 6
+    assert sentences[0] == "機械学習は大量のデータからパターンを学ぶ技術です。"
+
+    # 短い断片は MIN_SENTENCE_CHARS 以上になるまでつながる
+    merged = extractive_summarizer.split_sentences("はい\nそうです\nでは始めましょう今日は")
+    assert all(len(s) >= extractive_summarizer.MIN_SENTENCE_CHARS for s in merged)
+
+
+def test_summary_prefers_central_sentences():
+    """話題の中心の文が選ばれ、元の順序で返る"""
+    print("\n[TEST] Ranking sentences...")
+    chosen = extractive_summarizer.extract_sentences(SAMPLE_TEXT, max_sentences=3)
+    print(f"[INFO] Chosen: {chosen}")
+    assert len(chosen) == 3
+    assert "今日の天気は晴れです。" not in chosen
+    assert "お昼ご飯はカレーでした。" not in chosen
+    sentences = extractive_summarizer.split_sentences(SAMPLE_TEXT)
+    assert chosen == sorted(chosen, key=sentences.index)
+
+
+def test_mmr_skips_duplicates():
+    """MMRで同じ内容の文が重複して選ばれない"""
+    text = SAMPLE_TEXT + "機械学習は大量のデータからパターンを学ぶ技術です。" * 3
+    chosen = extractive_summarizer.extract_sentences(text, max_sentences=3)
+    assert chosen.count("機械学習は大量のデータからパターンを学ぶ技術です。") <= 1
+
+
+def test_summarize_format():
+    """箇条書き形式と空入力"""
+    summary = extractive_summarizer.summarize(SAMPLE_TEXT, max_sentences=2)
+    lines = summary.split("\n")
+    assert len(lines) == 2 and all(line.startswith("・") for line in lines)
+    assert extractive_summarizer.summarize("") == ""
+
+
+if __name__ == "__main__":
+    print("=" * 60)
+    print("Extractive Summarizer Test")
+    print("=" * 60)
+
+    success = True
+    for test in (test_split_sentences, test_summary_prefers_central_sentences,
+                 test_mmr_skips_duplicates, test_summarize_format):
+        try:
+            test()
+            print(f"[PASSED] {test.__name__}")
+        except AssertionError as e:
+            success = False
+            print(f"[FAILED] {test.__name__}: {e}")
+
+    print("=" * 60)
+    sys.exit(0 if success else 1)
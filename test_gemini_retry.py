@@ -0,0 +1,146 @@
+"""
+Gemini Retry Test
+Gemini呼び出しの再試行（gemini_retry）のテスト（ネットワーク不要）
+"""
+
+import asyncio
+import sys
+import time
+from email.utils import formatdate
+from pathlib import Path
+
+# パスを追加
+sys.path.insert(0, str(Path(__file__).parent))
+
+import deadline  # noqa: E402
+import gemini_retry  # noqa: E402
+
+
+class FakeResponse:
+    def __init__(self, status_code, headers=None):
+        self.status_code = status_code
+        self.headers = headers or {}
+
+
+class HTTPError(Exception):
+    """httpx.HTTPStatusError と同じく response を持つ例外"""
+
+    def __init__(self, status_code, headers=None):
+        super().__init__(f"HTTP {status_code}")
+        self.response = FakeResponse(status_code, headers)
+
+
+class ResourceExhausted(Exception):
+    """google.api_core の例外と同じく code にHTTPステータスを持つ"""
+
+    code = 429
+
+
+class InvalidArgument(Exception):
+    code = 400
+
+
+def flaky(errors, result="ok"):
+    """errors を順に送出してから result を返す関数"""
+    calls = []
+
+    def fn():
+        calls.append(1)
+        if len(calls) <= len(errors):
+            raise errors[len(calls) - 1]
+        return result
+
+    return fn, calls
+
+
+def test_classify_and_retry_after():
+    """一時的なエラーだけを再試行対象にし、Retry-After を秒数・日付の両方で読む"""
+    print("\n[TEST] Classifying errors...")
+    assert gemini_retry.classify(HTTPError(503))[0]
+    assert gemini_retry.classify(ResourceExhausted())[0]
+    assert gemini_retry.classify(TimeoutError())[0]
+    assert not gemini_retry.classify(InvalidArgument())[0]
+    assert not gemini_retry.classify(HTTPError(403))[0]
+    assert not gemini_retry.classify(ValueError("bad"))[0]
+    # リクエストの期限切れは google.api_core の DeadlineExceeded と同名でも再試行しない
+    assert not gemini_retry.classify(deadline.DeadlineExceeded("budget"))[0]
+
+    assert gemini_retry.retry_after(HTTPError(429, {"Retry-After": "3"})) == 3.0
+    now = time.time()
+    date = formatdate(now + 10, usegmt=True)
+    assert 8 <= gemini_retry.parse_retry_after(date, now) <= 11
+    assert gemini_retry.parse_retry_after("soon") is None
+
+    for attempt in range(6):
+        assert 0 <= gemini_retry.backoff_delay(attempt, 0.5, 4) <= 4
+
+
+def test_retries_transient_errors():
+    """429 / 503 は待機して再試行し、Retry-After の秒数だけ待つ"""
+    print("\n[TEST] Retrying transient errors...")
+    before = gemini_retry.stats()["retries"]
+    waits = []
+    fn, calls = flaky([HTTPError(429, {"Retry-After": "2"}), HTTPError(503)])
+    assert gemini_retry.call_with_retry(fn, max_attempts=4, sleep=waits.append) == "ok"
+    assert len(calls) == 3 and waits[0] == 2.0 and len(waits) == 2
+    assert gemini_retry.stats()["retries"] - before == 2
+
+
+def test_fatal_and_exhausted_errors_are_raised():
+    """再試行しないエラーはすぐに、回数を使い切ったら最後のエラーを送出する"""
+    fn, calls = flaky([InvalidArgument()])
+    try:
+        gemini_retry.call_with_retry(fn, sleep=lambda _: None)
+        assert False, "should raise"
+    except InvalidArgument:
+        assert len(calls) == 1
+
+    fn, calls = flaky([HTTPError(503)] * 5)
+    try:
+        gemini_retry.call_with_retry(fn, max_attempts=3, sleep=lambda _: None)
+        assert False, "should raise"
+    except HTTPError:
+        assert len(calls) == 3
+
+
+def test_deadline_stops_retries():
+    """待機すると期限を過ぎる場合は再試行せずに送出する"""
+    fn, calls = flaky([HTTPError(429, {"Retry-After": "30"})])
+    before = gemini_retry.stats()["deadline_exceeded"]
+    try:
+        gemini_retry.call_with_retry(fn, deadline=time.monotonic() + 5, sleep=lambda _: None)
+        assert False, "should raise"
+    except HTTPError:
+        assert len(calls) == 1
+    assert gemini_retry.stats()["deadline_exceeded"] == before + 1
+
+
+def test_async_retry():
+    """async版も同じく再試行する"""
+    fn, calls = flaky([HTTPError(500, {"Retry-After": "0"})])
+
+    async def call():
+        return fn()
+
+    assert asyncio.run(gemini_retry.call_with_retry_async(call)) == "ok"
+    assert len(calls) == 2
+
+
+if __name__ == "__main__":
+    print("=" * 60)
+    print("Gemini Retry Test")
+    print("=" * 60)
+
+    success = True
+    for test in (test_classify_and_retry_after, test_retries_transient_errors,
+                 test_fatal_and_exhausted_errors_are_raised, test_deadline_stops_retries,
+                 test_async_retry):
+        try:
+            test()
+            print(f"[PASSED] {test.__name__}")
+        except AssertionError as e:
+            success = False
+            print(f"[FAILED] {test.__name__}: {e}")
+
+    print("=" * 60)
+    sys.exit(0 if success else 1)
@@ -0,0 +1,202 @@
+"""
+Job Queue Test
+永続ジョブキュー（job_queue）のテスト（SQLite と fakeredis。ネットワーク不要）
+fakeredis が未インストールなら Redis のキューのテストはスキップする
+"""
+
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+# パスを追加
+sys.path.insert(0, str(Path(__file__).parent))
+
+import job_queue  # noqa: E402
+
+try:
+    import fakeredis
+except ImportError:
+    fakeredis = None
+
+
+def _queues(tmp):
+    """テストするキュー（SQLite と、あれば fakeredis の Redis）"""
+    queues = [job_queue.SQLiteQueue(str(Path(tmp) / "jobs.sqlite3"))]
+    if fakeredis is not None:
+        queues.append(job_queue.RedisQueue(fakeredis.FakeRedis()))
+    return queues
+
+
+def test_enqueue_claim_complete():
+    """取り出したジョブは他のワーカーから見えず、完了すると結果が残る"""
+    print("\n[TEST] Job queue lifecycle...")
+    with tempfile.TemporaryDirectory() as tmp:
+        for queue in _queues(tmp):
+            job_id = queue.enqueue("extract", {"url": "https://youtu.be/abc", "lang": "ja"})
+            queue.enqueue("extract", {"url": "later"}, delay=60)
+            job = queue.claim(visibility_timeout=30)
+            assert job.id == job_id and job.payload["lang"] == "ja" and job.attempts == 1
+            assert queue.claim() is None  # 実行中と遅延中のジョブは取り出せない
+            assert queue.stats()["running"] == 1 and queue.stats()["queued"] == 1
+
+            assert queue.complete(job, {"title": "タイトル"})
+            stored = queue.get(job_id)
+            assert stored.status == job_queue.DONE and stored.result == {"title": "タイトル"}
+            assert "lease" not in stored.to_dict()
+            assert queue.get("999") is None, queue.backend
+
+            # 完了したジョブを消すと done の件数も減る
+            assert queue.stats()["done"] == 1
+            assert queue.prune(older_than=-1) == 1
+            assert queue.get(job_id) is None and queue.stats()["done"] == 0, queue.backend
+
+
+def test_visibility_timeout_redelivers():
+    """ワーカーが止まったジョブは可視性タイムアウト後に再配信され、古いワーカーの報告は無視される"""
+    with tempfile.TemporaryDirectory() as tmp:
+        for queue in _queues(tmp):
+            queue.enqueue("extract", {}, max_attempts=2)
+            first = queue.claim(visibility_timeout=0.05)
+            time.sleep(0.06)
+            second = queue.claim(visibility_timeout=30)
+            assert second.id == first.id and second.attempts == 2
+            assert not queue.complete(first, "stale worker")
+            assert not queue.extend(first)
+            assert queue.complete(second, "ok")
+
+            # 最後の試行で止まったジョブは再配信せずデッドレターにする
+            queue.enqueue("extract", {}, max_attempts=1)
+            queue.claim(visibility_timeout=0.05)
+            time.sleep(0.06)
+            assert queue.claim() is None
+            assert queue.stats()["dead"] == 1, queue.backend
+
+
+def test_retry_and_dead_letter():
+    """失敗はバックオフして再試行し、上限でデッドレター。requeue で戻せる"""
+    original = job_queue.RETRY_BASE_DELAY
+    job_queue.RETRY_BASE_DELAY = 0.05
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            for queue in _queues(tmp):
+                job_id = queue.enqueue("extract", {}, max_attempts=2)
+                job = queue.claim()
+                assert queue.fail(job, RuntimeError("quota")) == job_queue.QUEUED
+                assert queue.claim() is None  # バックオフ中
+                time.sleep(0.06)
+                job = queue.claim()
+                assert job.attempts == 2
+                assert queue.fail(job, RuntimeError("quota")) == job_queue.DEAD
+                dead = queue.dead_letters()
+                assert [j.id for j in dead] == [job_id] and dead[0].error == "quota"
+
+                assert queue.requeue(job_id) and not queue.requeue(job_id)
+                job = queue.claim()
+                assert job.attempts == 1
+                assert queue.fail(job, ValueError("bad url"), retry=False) == job_queue.DEAD
+                assert queue.stats()["dead"] == 1 and queue.stats()["running"] == 0, queue.backend
+    finally:
+        job_queue.RETRY_BASE_DELAY = original
+
+
+def test_concurrent_claims_are_exclusive():
+    """複数のワーカーが同時に取り出しても同じジョブは1回しか渡らない"""
+    with tempfile.TemporaryDirectory() as tmp:
+        for queue in _queues(tmp):
+            ids = {queue.enqueue("extract", {"i": i}) for i in range(40)}
+            claimed = []
+            lock = threading.Lock()
+
+            def take():
+                while True:
+                    job = queue.claim(visibility_timeout=30)
+                    if job is None:
+                        return
+                    with lock:
+                        claimed.append(job.id)
+
+            threads = [threading.Thread(target=take) for _ in range(4)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join(30)
+            assert sorted(claimed) == sorted(ids), queue.backend
+
+
+def test_worker_runs_handlers():
+    """ワーカーは種類ごとのハンドラーで実行し、長いジョブは可視性タイムアウトを延ばし続ける"""
+    with tempfile.TemporaryDirectory() as tmp:
+        queue = job_queue.SQLiteQueue(str(Path(tmp) / "jobs.sqlite3"))
+        slow_id = queue.enqueue("slow", {"seconds": 0.4})
+
+        def slow(payload):
+            time.sleep(payload["seconds"])
+            # 実行中に他のワーカーが取り出せない（延長されている）
+            assert queue.claim() is None
+            return "slept"
+
+        def extract(payload):
+            raise ValueError("URLが必要です")
+
+        worker = job_queue.Worker(
+            queue, {"slow": slow, "extract": extract}, visibility_timeout=0.15, poll_interval=0.01
+        )
+        assert worker.run_once()
+        bad_id = queue.enqueue("extract", {"url": ""})
+        unknown_id = queue.enqueue("unknown", {})
+        assert worker.run(exit_when_empty=True) == 2
+        assert queue.get(slow_id).result == "slept"
+        assert queue.get(bad_id).status == job_queue.DEAD  # ValueError は再試行しない
+        assert queue.get(unknown_id).status == job_queue.DEAD
+        assert worker.stats()["succeeded"] == 1 and worker.stats()["dead"] == 2
+
+        stop = threading.Event()
+        workers = job_queue.start_workers(queue, {"slow": lambda p: "ok"}, 2, stop, poll_interval=0.01)
+        job_id = queue.enqueue("slow", {})
+        for _ in range(200):
+            if queue.get(job_id).status == job_queue.DONE:
+                break
+            time.sleep(0.01)
+        stop.set()
+        for w in workers:
+            w.thread.join(5)
+        assert queue.get(job_id).result == "ok"
+
+
+def test_open_queue():
+    """URLでSQLiteとRedisのキューを選ぶ"""
+    with tempfile.TemporaryDirectory() as tmp:
+        queue = job_queue.open_queue(f"sqlite:///{tmp}/jobs.sqlite3", name="batch")
+        assert isinstance(queue, job_queue.SQLiteQueue) and queue.name == "batch"
+        other = job_queue.open_queue(f"{tmp}/jobs.sqlite3")
+        queue.enqueue("extract", {})
+        assert other.claim() is None  # キュー名が違う
+        if job_queue.redis is not None:
+            assert isinstance(job_queue.open_queue("redis://localhost:6379/0"), job_queue.RedisQueue)
+
+
+if __name__ == "__main__":
+    print("=" * 60)
+    print("Job Queue Test")
+    print("=" * 60)
+
+    success = True
+    for test in (
+        test_enqueue_claim_complete,
+        test_visibility_timeout_redelivers,
+        test_retry_and_dead_letter,
+        test_concurrent_claims_are_exclusive,
+        test_worker_runs_handlers,
+        test_open_queue,
+    ):
+        try:
+            test()
+            print(f"[PASSED] {test.__name__}")
+        except AssertionError as e:
+            success = False
+            print(f"[FAILED] {test.__name__}: {e}")
+
+    print("=" * 60)
+    sys.exit(0 if success else 1)
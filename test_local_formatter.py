@@ -0,0 +1,104 @@
+"""
+Local Formatter Test
+ルールベースの字幕整形（local_formatter）のテスト（ネットワーク不要）
+"""
+
+import sys
+from pathlib import Path
+
+# パスを追加
+sys.path.insert(0, str(Path(__file__).parent))
+
+import local_formatter  # noqa: E402
+
+
+def test_sentence_and_connective_breaks():
+    """句点の後と接続詞の前に空行が入る"""
+    print("\n[TEST] Sentence and connective breaks...")
+    text = "今日はいい天気ですね。そこで、散歩に行きました。それで、公園に着きました。で、帰りました。"
+    formatted = local_formatter.format_text(text)
+    print(f"[INFO] Formatted:\n{formatted}")
+    assert formatted.split("\n\n") == [
+        "今日はいい天気ですね。",
+        "そこで、散歩に行きました。",
+        "それで、公園に着きました。",
+        "で、帰りました。",
+    ]
+
+
+def test_long_sentence_wraps_at_comma():
+    """長い文は読点で改行され、文字は変わらない"""
+    print("\n[TEST] Long sentence wrapping...")
+    text = (
+        "公園に着いたら、友達がいて、話をして、それからご飯を食べに行って、"
+        "最後に映画を見て帰ってきたんですけど、とても楽しかったです。"
+    )
+    formatted = local_formatter.format_text(text)
+    lines = formatted.split("\n")
+    assert len(lines) > 1
+    assert all(line.endswith(("、", "。")) for line in lines)
+    assert formatted.replace("\n", "") == text
+
+
+def test_timestamp_gap_paragraphs():
+    """セグメントの時間差で段落が分かれる"""
+    print("\n[TEST] Timestamp gap paragraphing...")
+    segments = [
+        {"text": "はい こんにちは", "start": 0.0, "duration": 2.0},
+        {"text": "今日は料理をします", "start": 2.0, "duration": 2.0},
+        {"text": "まず材料です", "start": 8.0, "duration": 2.0},
+    ]
+    assert local_formatter.split_paragraphs(segments) == [
+        "はい こんにちは 今日は料理をします",
+        "まず材料です",
+    ]
+    assert "\n\n\n" in local_formatter.format_segments(segments)
+
+
+def test_check_segments():
+    """リクエストのセグメントの形式が不正なら ValueError（APIでは400）"""
+    segments = [{"text": "こんにちは", "start": 0, "duration": 1.5}, {"text": "はい"}]
+    assert local_formatter.check_segments(segments) is segments
+    assert local_formatter.check_segments(None) is None
+    for bad in (["a"], [{"text": "a", "start": "5"}], [{"text": None}], [{"start": 1.0}],
+                [{"text": "a", "duration": True}], {"text": "a"}, "a"):
+        try:
+            local_formatter.check_segments(bad)
+        except ValueError:
+            pass
+        else:
+            raise AssertionError(f"{bad!r} should raise ValueError")
+
+
+def test_resolve_mode():
+    """整形方式の解決"""
+    short, long = "短い文です。", "あ" * (local_formatter.AUTO_LOCAL_THRESHOLD + 1)
+    assert local_formatter.resolve_mode("auto", short, True) == "gemini"
+    assert local_formatter.resolve_mode("auto", long, True) == "local"
+    assert local_formatter.resolve_mode("auto", short, False) == "local"
+    assert local_formatter.resolve_mode("gemini", long, True) == "gemini"
+    try:
+        local_formatter.check_mode("fancy")
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("unknown formatter should raise ValueError")
+
+
+if __name__ == "__main__":
+    print("=" * 60)
+    print("Local Formatter Test")
+    print("=" * 60)
+
+    success = True
+    for test in (test_sentence_and_connective_breaks, test_long_sentence_wraps_at_comma,
+                 test_timestamp_gap_paragraphs, test_check_segments, test_resolve_mode):
+        try:
+            test()
+            print(f"[PASSED] {test.__name__}")
+        except AssertionError as e:
+            success = False
+            print(f"[FAILED] {test.__name__}: {e}")
+
+    print("=" * 60)
+    sys.exit(0 if success else 1)
@@ -0,0 +1,265 @@
+"""
+Local Transcript Extractor Test
+ローカル字幕抽出ツールのバッチ処理（local_transcript_extractor）のテスト（ネットワーク不要）
+"""
+
+import json
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+# パスを追加
+sys.path.insert(0, str(Path(__file__).parent))
+
+import local_transcript_extractor as extractor  # noqa: E402
+
+SEGMENTS = [
+    {"text": "こんにちは。今日は字幕抽出のテストをします。", "start": 0.0, "duration": 2.0},
+    {"text": "バッチ処理で複数の動画を並列に処理します。", "start": 2.0, "duration": 2.0},
+]
+
+
+def test_read_inputs():
+    """引数とファイルからURL/動画IDを読み、重複・コメント・無効な行を除く"""
+    print("\n[TEST] Reading batch inputs...")
+    with tempfile.TemporaryDirectory() as tmp:
+        list_file = Path(tmp) / "videos.txt"
+        list_file.write_text(
+            "# 動画リスト\n"
+            "https://www.youtube.com/watch?v=dQw4w9WgXcQ\n"
+            "\n"
+            "https://youtu.be/abcdefghijk\n"
+            "not a url\n",
+            encoding="utf-8",
+        )
+        videos, invalid = extractor.read_inputs(["dQw4w9WgXcQ"], str(list_file))
+    assert [video_id for _, video_id in videos] == ["dQw4w9WgXcQ", "abcdefghijk"]
+    assert invalid == ["not a url"]
+
+
+def test_rate_limiter_spaces_starts():
+    """複数スレッドから呼んでも開始間隔が 1/rate 秒以上あく"""
+    limiter = extractor.RateLimiter(50)
+    starts = []
+
+    def worker():
+        limiter.wait()
+        starts.append(time.monotonic())
+
+    threads = [threading.Thread(target=worker) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    starts.sort()
+    assert starts[-1] - starts[0] >= 4 * 0.02 * 0.9
+
+
+def test_run_batch_writes_outputs():
+    """並列に取得して出力先に保存し、失敗した動画は結果に記録する"""
+    print("\n[TEST] Running batch...")
+    original = extractor.get_transcript
+
+    def fake_get_transcript(video_id, lang="ja", log=print, catalog=None):
+        if video_id == "bbbbbbbbbbb":
+            log("❌ この動画は字幕が無効になっています")
+            return None, None
+        return SEGMENTS, lang
+
+    extractor.get_transcript = fake_get_transcript
+    lines = []
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            videos = [("aaaaaaaaaaa", "aaaaaaaaaaa"), ("bbbbbbbbbbb", "bbbbbbbbbbb")]
+            results = extractor.run_batch(
+                videos, output_dir=tmp, workers=2, rate=0, progress=lines.append
+            )
+            by_id = {r["video_id"]: r for r in results}
+            assert by_id["aaaaaaaaaaa"]["success"]
+            assert by_id["aaaaaaaaaaa"]["segments"] == 2
+            saved = json.loads(Path(by_id["aaaaaaaaaaa"]["files"][1]).read_text(encoding="utf-8"))
+            assert saved["video_id"] == "aaaaaaaaaaa"
+            assert not by_id["bbbbbbbbbbb"]["success"]
+            assert "無効" in by_id["bbbbbbbbbbb"]["error"]
+    finally:
+        extractor.get_transcript = original
+
+    print(f"[INFO] {lines[-1]}")
+    assert len(lines) == 2 and lines[-1].startswith("[2/2]")
+
+
+def test_run_batch_appends_to_archive():
+    """アーカイブを渡すと動画ごとのファイルを書かずにアーカイブへ追記する"""
+    print("\n[TEST] Running batch into archive...")
+    original = extractor.get_transcript
+    extractor.get_transcript = lambda video_id, lang="ja", log=print, catalog=None: (SEGMENTS, lang)
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            path = str(Path(tmp) / "transcripts.sqlite3")
+            with extractor.transcript_archive.TranscriptArchive(path) as archive:
+                videos = [(f"video{i:06d}", f"video{i:06d}") for i in range(3)]
+                results = extractor.run_batch(
+                    videos, output_dir=tmp, workers=2, rate=0, progress=lambda *a: None,
+                    archive=archive,
+                )
+                assert all(r["success"] and r["files"] == [path] for r in results)
+                assert len(archive) == 3
+                assert archive.get("video000001")["summary"]
+            assert not [p for p in Path(tmp).iterdir() if p.suffix in (".txt", ".json")]
+    finally:
+        extractor.get_transcript = original
+
+
+def test_transcript_jobs_from_queue():
+    """キューの字幕抽出ジョブをワーカーが実行し、取得できない動画は再試行してデッドレターになる"""
+    original = extractor.get_transcript
+
+    def fake_get_transcript(video_id, lang="ja", log=print, catalog=None):
+        if video_id == "missing0000":
+            log("字幕が無効です")
+            return None, None
+        return SEGMENTS, lang
+
+    extractor.get_transcript = fake_get_transcript
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            queue = extractor.job_queue.SQLiteQueue(str(Path(tmp) / "jobs.sqlite3"))
+            for video_id in ("video000001", "missing0000"):
+                queue.enqueue(
+                    extractor.TRANSCRIPT_JOB, {"video_id": video_id, "lang": "en"}, max_attempts=1
+                )
+            path = str(Path(tmp) / "transcripts.sqlite3")
+            with extractor.transcript_archive.TranscriptArchive(path) as archive:
+                handler = extractor.transcript_job_handler(tmp, archive)
+                worker = extractor.job_queue.Worker(
+                    queue, {extractor.TRANSCRIPT_JOB: handler}, poll_interval=0.01
+                )
+                assert worker.run(exit_when_empty=True) == 2
+                assert archive.get("video000001")["language"] == "en"
+            dead = queue.dead_letters()
+            assert [job.payload["video_id"] for job in dead] == ["missing0000"]
+            assert dead[0].error == "字幕が無効です"
+    finally:
+        extractor.get_transcript = original
+
+
+class FakeTranscript:
+    def __init__(self, code, generated=False):
+        self.language_code = code
+        self.language = code
+        self.is_generated = generated
+        self.is_translatable = True
+        self.fetches = 0
+
+    def fetch(self):
+        self.fetches += 1
+        transcript = self
+
+        class Fetched:
+            def to_raw_data(self):
+                return [dict(item, text=f"[{transcript.language_code}] {item['text']}")
+                        for item in SEGMENTS]
+
+        return Fetched()
+
+
+class FakeTranscriptList:
+    """TranscriptList と同じく find_transcript と反復を持つ"""
+
+    def __init__(self, video_id, transcripts):
+        self.video_id = video_id
+        self.transcripts = transcripts
+
+    def __iter__(self):
+        return iter(self.transcripts)
+
+    def find_transcript(self, codes):
+        for code in codes:
+            for transcript in self.transcripts:
+                if transcript.language_code == code:
+                    return transcript
+        raise extractor.NoTranscriptFound(self.video_id, codes, self)
+
+
+class FakeApi:
+    def __init__(self, catalog):
+        self.catalog = catalog
+        self.list_calls = 0
+
+    def list(self, video_id):
+        self.list_calls += 1
+        if video_id not in self.catalog:
+            raise extractor.TranscriptsDisabled(video_id)
+        return FakeTranscriptList(video_id, self.catalog[video_id])
+
+
+def test_transcript_list_is_fetched_once():
+    """字幕一覧は1回だけ取得し、言語の選択とフォールバックにそのまま使う"""
+    print("\n[TEST] Reusing TranscriptList...")
+    ko, en = FakeTranscript("ko"), FakeTranscript("en", generated=True)
+    api = FakeApi({"aaaaaaaaaaa": [ko, en], "ccccccccccc": [ko]})
+    original = getattr(extractor._local, "api", None)
+    extractor._local.api = api
+    try:
+        transcript, lang = extractor.get_transcript("aaaaaaaaaaa", "ja", log=lambda *a: None)
+        assert lang == "en" and transcript[0]["text"].startswith("[en]")
+        assert api.list_calls == 1 and en.fetches == 1 and ko.fetches == 0
+
+        # 日本語・英語がなければ最初のトラック
+        transcript, lang = extractor.get_transcript("ccccccccccc", "ja", log=lambda *a: None)
+        assert lang == "ko" and api.list_calls == 2
+
+        languages = extractor.get_available_languages(
+            "aaaaaaaaaaa", FakeTranscriptList("aaaaaaaaaaa", [ko, en])
+        )
+        assert [item["code"] for item in languages] == ["ko", "en"]
+        assert api.list_calls == 2
+    finally:
+        extractor._local.api = original
+
+
+def test_catalog_skips_known_disabled_videos():
+    """字幕が無効と記録された動画はカタログを見るだけで飛ばし、カタログはファイルに残る"""
+    api = FakeApi({"aaaaaaaaaaa": [FakeTranscript("ja")]})
+    original = getattr(extractor._local, "api", None)
+    extractor._local.api = api
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            path = str(Path(tmp) / "catalog.json")
+            catalog = extractor.TranscriptCatalog(path)
+            for _ in range(2):
+                assert extractor.get_transcript(
+                    "bbbbbbbbbbb", log=lambda *a: None, catalog=catalog
+                ) == (None, None)
+            assert api.list_calls == 1
+            extractor.get_transcript("aaaaaaaaaaa", log=lambda *a: None, catalog=catalog)
+            catalog.save()
+
+            reloaded = extractor.TranscriptCatalog(path)
+            assert reloaded.get("bbbbbbbbbbb")["status"] == "disabled"
+            assert reloaded.get("aaaaaaaaaaa")["languages"][0]["code"] == "ja"
+            assert extractor.TranscriptCatalog(path, max_age=0).get("aaaaaaaaaaa") is None
+    finally:
+        extractor._local.api = original
+
+
+if __name__ == "__main__":
+    print("=" * 60)
+    print("Local Transcript Extractor Test")
+    print("=" * 60)
+
+    success = True
+    for test in (test_read_inputs, test_rate_limiter_spaces_starts, test_run_batch_writes_outputs,
+                 test_run_batch_appends_to_archive, test_transcript_jobs_from_queue,
+                 test_transcript_list_is_fetched_once, test_catalog_skips_known_disabled_videos):
+        try:
+            test()
+            print(f"[PASSED] {test.__name__}")
+        except AssertionError as e:
+            success = False
+            print(f"[FAILED] {test.__name__}: {e}")
+
+    print("=" * 60)
+    sys.exit(0 if success else 1)
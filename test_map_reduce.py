@@ -0,0 +1,95 @@
+"""
+Map Reduce Test
+部分要約の階層的な統合（map_reduce）のテスト（ネットワーク不要）
+"""
+
+import asyncio
+import sys
+import threading
+import time
+from pathlib import Path
+
+# パスを追加
+sys.path.insert(0, str(Path(__file__).parent))
+
+import map_reduce  # noqa: E402
+
+
+def test_tree_reduce_bounds_group_size():
+    """1回の統合は fan_in 個以下で、段数はチャンク数の対数"""
+    print("\n[TEST] Tree reduce with fan-in 4...")
+    calls = []
+
+    def merge(group, start, total):
+        calls.append(len(group))
+        return f"({'+'.join(group)})"
+
+    def finalize(group):
+        calls.append(len(group))
+        return "+".join(group)
+
+    items = [str(i) for i in range(100)]
+    result = map_reduce.tree_reduce(items, merge, finalize, fan_in=4, parallelism=4)
+    assert max(calls) <= 4
+    assert map_reduce.reduce_levels(100, 4) == 3
+    # 順序が保たれている
+    assert [int(x) for x in result.replace("(", "").replace(")", "").split("+")] == list(range(100))
+
+
+def test_tree_reduce_runs_groups_in_parallel():
+    """同じ段のグループは並列に統合される"""
+    print("\n[TEST] Parallel merges...")
+    active, peak = [0], [0]
+    lock = threading.Lock()
+
+    def merge(group, start, total):
+        with lock:
+            active[0] += 1
+            peak[0] = max(peak[0], active[0])
+        time.sleep(0.05)
+        with lock:
+            active[0] -= 1
+        return "m"
+
+    result = map_reduce.tree_reduce(["x"] * 16, merge, lambda g: "".join(g), fan_in=2, parallelism=4)
+    assert result == "mm"
+    assert peak[0] == 4
+
+
+def test_tree_reduce_async():
+    """async版も同じ結果になる"""
+
+    async def merge(group, start, total):
+        await asyncio.sleep(0)
+        return f"({'+'.join(group)})"
+
+    async def finalize(group):
+        return "+".join(group)
+
+    items = [str(i) for i in range(10)]
+    result = asyncio.run(map_reduce.tree_reduce_async(items, merge, finalize, fan_in=3, parallelism=2))
+    sync = map_reduce.tree_reduce(
+        items, lambda g, s, t: f"({'+'.join(g)})", lambda g: "+".join(g), fan_in=3
+    )
+    assert result == sync
+    # fan_in 以下ならそのまま最終統合
+    assert asyncio.run(map_reduce.tree_reduce_async(["a", "b"], merge, finalize, fan_in=3)) == "a+b"
+
+
+if __name__ == "__main__":
+    print("=" * 60)
+    print("Map Reduce Test")
+    print("=" * 60)
+
+    success = True
+    for test in (test_tree_reduce_bounds_group_size, test_tree_reduce_runs_groups_in_parallel,
+                 test_tree_reduce_async):
+        try:
+            test()
+            print(f"[PASSED] {test.__name__}")
+        except AssertionError as e:
+            success = False
+            print(f"[FAILED] {test.__name__}: {e}")
+
+    print("=" * 60)
+    sys.exit(0 if success else 1)
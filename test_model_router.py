@@ -0,0 +1,118 @@
+"""
+Model Router Test
+処理段階ごとのモデル選択（model_router）のテスト（ネットワーク不要）
+"""
+
+import sys
+import time
+from pathlib import Path
+
+# パスを追加
+sys.path.insert(0, str(Path(__file__).parent))
+
+import model_router  # noqa: E402
+import token_planner  # noqa: E402
+
+TIERS = {"fast": "gemini-2.0-flash-001", "strong": "gemini-1.5-pro"}
+
+
+def make_router(**kwargs):
+    options = {"tiers": TIERS, "slos": {"strong": 1.0}, "min_samples": 3, "cooldown": 60}
+    options.update(kwargs)
+    return model_router.ModelRouter(**options)
+
+
+def test_default_routes_and_overrides():
+    """部分要約と整形は速いモデル、最終統合は強いモデル。リクエストごとに上書きできる"""
+    print("\n[TEST] Routing stages to tiers...")
+    router = make_router()
+    assert router.route("map").model == "gemini-2.0-flash-001"
+    assert router.route("format").tier == "fast"
+    assert router.route("reduce").model == "gemini-1.5-pro"
+
+    overrides = router.check_overrides({"reduce": "fast", "map": "gemini-1.5-flash"})
+    assert router.route("reduce", overrides).model == "gemini-2.0-flash-001"
+    assert router.route("map", overrides).model == "gemini-1.5-flash"
+    assert router.route("merge", {"default": "strong"}).tier == "strong"
+
+    for bad in (
+        {"reduce": "gpt-4"},
+        {"unknown": "fast"},
+        ["fast"],
+        # 文字列以外のモデル指定も TypeError ではなく ValueError（400）にする
+        {"reduce": ["fast"]},
+        {"map": {"tier": "fast"}},
+        {"map": None},
+    ):
+        try:
+            router.check_overrides(bad)
+            assert False, f"{bad} should be rejected"
+        except ValueError:
+            pass
+
+
+def test_slo_fallback_and_recovery():
+    """強いモデルの p95 が SLO を超えたら速いモデルに回し、クールダウン後に戻す"""
+    print("\n[TEST] SLO-driven fallback...")
+    router = make_router()
+    route = router.route("reduce")
+    for _ in range(3):
+        router.record(route, 2.5, input_tokens=1000, output_tokens=200)
+
+    fallback = router.route("reduce")
+    assert fallback.tier == "fast" and fallback.fallback_from == "strong"
+    assert router.models()["reduce"] == "gemini-2.0-flash-001"
+
+    stats = router.stats()["tiers"]["strong"]
+    print(f"[INFO] strong tier: {stats}")
+    assert stats["calls"] == 3 and stats["fallbacks"] == 1 and stats["degraded"]
+    assert stats["input_tokens"] == 3000 and stats["p95_latency"] == 2.5
+
+    # クールダウンが明けたら再び強いモデルを試す
+    router._stats["strong"].degraded_until = time.monotonic() - 1
+    assert router.route("reduce").tier == "strong"
+    assert not router.stats()["tiers"]["strong"]["degraded"]
+
+
+def test_call_records_usage_and_errors():
+    """call は時間・推定トークン数・エラーを階層ごとに記録する"""
+    router = make_router()
+    route = router.route("map")
+    assert router.call(route, "あいうえお", lambda: "abcd") == "abcd"
+    try:
+        router.call(route, "prompt", lambda: 1 / 0)
+    except ZeroDivisionError:
+        pass
+    stats = router.stats()["tiers"]["fast"]
+    assert stats["calls"] == 2 and stats["errors"] == 1
+    assert stats["output_tokens"] == 1
+
+
+def test_planner_uses_reduce_model():
+    """最終統合のモデルが遅いほど見積もりレイテンシが大きくなる"""
+    text = "あ" * 10000
+    fast = token_planner.plan_summary(text, "gemini-2.0-flash-001", 1200)
+    mixed = token_planner.plan_summary(
+        text, "gemini-2.0-flash-001", 1200, reduce_model="gemini-1.5-pro"
+    )
+    assert mixed.reduce_model == "gemini-1.5-pro"
+    assert mixed.expected_latency > fast.expected_latency
+
+
+if __name__ == "__main__":
+    print("=" * 60)
+    print("Model Router Test")
+    print("=" * 60)
+
+    success = True
+    for test in (test_default_routes_and_overrides, test_slo_fallback_and_recovery,
+                 test_call_records_usage_and_errors, test_planner_uses_reduce_model):
+        try:
+            test()
+            print(f"[PASSED] {test.__name__}")
+        except AssertionError as e:
+            success = False
+            print(f"[FAILED] {test.__name__}: {e}")
+
+    print("=" * 60)
+    sys.exit(0 if success else 1)
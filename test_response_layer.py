@@ -0,0 +1,163 @@
+"""
+Response Layer Test
+レスポンス共通レイヤー（response_layer）のテスト（エンコーディングの選択・展開の上限と検証・JSON出力）
+brotli / zstandard / orjson が未インストールなら、その部分はスキップする
+"""
+
+import gzip
+import json
+import sys
+import zlib
+from pathlib import Path
+
+# パスを追加
+sys.path.insert(0, str(Path(__file__).parent))
+
+from flask import Flask, jsonify, request  # noqa: E402
+
+import response_layer  # noqa: E402
+
+
+def _encodings():
+    """このサーバーで展開できるエンコーディング"""
+    return ["gzip", "deflate"] + [e for e in ("br", "zstd") if e in response_layer.supported_encodings()]
+
+
+def _compress(data, encoding):
+    if encoding == "deflate":
+        return zlib.compress(data)
+    return response_layer.compress(data, encoding)
+
+
+def test_choose_encoding():
+    """サーバーの優先順（zstd → br → gzip）で選び、q=0 と identity は圧縮しない"""
+    print("\n[TEST] Negotiating Content-Encoding...")
+    supported = response_layer.supported_encodings()
+    choose = response_layer.choose_encoding
+    assert supported[-1] == "gzip"
+    assert choose("gzip, br, zstd") == supported[0]
+    assert choose("gzip") == "gzip"
+    assert choose("identity") is None and choose("") is None and choose(None) is None
+    assert choose("gzip;q=0") is None
+    assert choose("*;q=0.5, gzip;q=0") == (supported[0] if supported[0] != "gzip" else None)
+    assert choose("gzip;q=1, *;q=0") == "gzip"
+    if "zstd" in supported:
+        assert choose("zstd") == "zstd" and choose("zstd;q=0, gzip") == "gzip"
+    else:
+        print("[SKIP] zstandard is not installed")
+    if "br" in supported:
+        assert choose("br, gzip") == "br" and choose("br;q=0.1, gzip;q=0.9") == "gzip"
+    else:
+        print("[SKIP] brotli is not installed")
+
+
+def test_round_trip_and_size_limit():
+    """各エンコーディングで展開でき、展開後が上限を超えたら 413"""
+    body = json.dumps({"transcript_text": "字幕のテキスト。" * 50}, ensure_ascii=False).encode("utf-8")
+    for encoding in _encodings():
+        assert response_layer.decompress(_compress(body, encoding), encoding) == body, encoding
+        bomb = _compress(b"a" * 100_000, encoding)
+        try:
+            response_layer.decompress(bomb, encoding, limit=1000)
+            assert False, f"{encoding} bomb was accepted"
+        except response_layer.DecompressionError as e:
+            assert e.status_code == 413, encoding
+    assert response_layer.decompress(body, "identity") == body
+    # 複数指定は逆順に展開する
+    double = response_layer.compress(zlib.compress(body), "gzip")
+    assert response_layer.decompress(double, "deflate, gzip") == body
+
+
+def test_truncated_and_corrupt_bodies():
+    """途中で切れたボディと壊れたボディは展開できた分を返さずに 400、未対応は 415"""
+    body = b"a" * 1000
+    for encoding in _encodings():
+        compressed = _compress(body, encoding)
+        for bad in (compressed[: len(compressed) // 2], b"\x00not compressed\xff" * 4):
+            try:
+                response_layer.decompress(bad, encoding)
+                assert False, f"{encoding} accepted a bad body"
+            except response_layer.DecompressionError as e:
+                assert e.status_code == 400, (encoding, e)
+    # gzip の先頭20バイトだけ（以前は 1000 バイトの b"a" が返っていた）
+    try:
+        response_layer.decompress(gzip.compress(body)[:20], "gzip")
+        assert False, "truncated gzip was accepted"
+    except response_layer.DecompressionError as e:
+        assert e.status_code == 400 and "truncated" in str(e)
+    try:
+        response_layer.decompress(body, "compress")
+        assert False, "unknown encoding was accepted"
+    except response_layer.DecompressionError as e:
+        assert e.status_code == 415
+
+
+def test_json_matches_stdlib():
+    """dumps は json.dumps と同じJSONを返す（orjson でも標準ライブラリでも）"""
+    obj = {"success": True, "title": "タイトル", "stats": {"total_segments": 3, "language": "ja"},
+           "segments": [{"text": "こんにちは", "start": 0.5, "duration": 1.25}], "partial": None}
+    expected = json.dumps(obj, ensure_ascii=False, separators=(",", ":"))
+    assert response_layer.dumps(obj) == expected
+    assert json.loads(response_layer.dumps(obj, indent=2)) == obj
+    assert response_layer.loads(expected.encode("utf-8")) == obj
+    if response_layer.orjson is None:
+        print("[SKIP] orjson is not installed (stdlib encoder only)")
+
+
+def test_flask_integration():
+    """Flask では jsonify が同じJSONを返し、圧縮したリクエストを展開し、レスポンスを圧縮する"""
+    app = response_layer.init_flask(Flask(__name__))
+    obj = {"summary": "要約。" * 400, "stats": {"language": "ja"}}
+
+    @app.route("/echo", methods=["POST"])
+    def echo():
+        return jsonify(request.json)
+
+    @app.route("/data")
+    def data():
+        return jsonify(obj)
+
+    client = app.test_client()
+    response = client.get("/data", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert gzip.decompress(response.data).decode("utf-8") == json.dumps(
+        obj, ensure_ascii=False, separators=(",", ":")
+    )
+    plain = client.get("/data", headers={"Accept-Encoding": "gzip;q=0"})
+    assert "Content-Encoding" not in plain.headers and plain.json == obj
+
+    payload = json.dumps({"transcript_text": "字幕"}, ensure_ascii=False).encode("utf-8")
+    ok = client.post(
+        "/echo", data=gzip.compress(payload),
+        headers={"Content-Encoding": "gzip", "Content-Type": "application/json"},
+    )
+    assert ok.status_code == 200 and ok.json == {"transcript_text": "字幕"}
+    truncated = client.post(
+        "/echo", data=gzip.compress(payload)[:20],
+        headers={"Content-Encoding": "gzip", "Content-Type": "application/json"},
+    )
+    assert truncated.status_code == 400 and "error" in truncated.json
+
+
+if __name__ == "__main__":
+    print("=" * 60)
+    print("Response Layer Test")
+    print("=" * 60)
+
+    success = True
+    for test in (
+        test_choose_encoding,
+        test_round_trip_and_size_limit,
+        test_truncated_and_corrupt_bodies,
+        test_json_matches_stdlib,
+        test_flask_integration,
+    ):
+        try:
+            test()
+            print(f"[PASSED] {test.__name__}")
+        except AssertionError as e:
+            success = False
+            print(f"[FAILED] {test.__name__}: {e}")
+
+    print("=" * 60)
+    sys.exit(0 if success else 1)
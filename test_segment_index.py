@@ -0,0 +1,78 @@
+"""
+Segment Index Test
+字幕セグメントの時間インデックス（segment_index）のテスト（ネットワーク不要）
+"""
+
+import random
+import sys
+from pathlib import Path
+
+# パスを追加
+sys.path.insert(0, str(Path(__file__).parent))
+
+import segment_index  # noqa: E402
+
+
+def _segments(count, seed=0):
+    """重なりのある字幕セグメント（ときどき長いセグメントが後続と重なる）"""
+    rng = random.Random(seed)
+    segments, start = [], 0.0
+    for i in range(count):
+        duration = rng.uniform(20, 60) if rng.random() < 0.05 else rng.uniform(1, 4)
+        segments.append({"text": f"セグメント{i}", "start": round(start, 3), "duration": duration})
+        start += rng.uniform(0.5, 3.5)
+    rng.shuffle(segments)
+    return segments
+
+
+def test_range_matches_linear_scan():
+    """二分探索で取り出した範囲が全件走査の結果と一致する"""
+    print("\n[TEST] Comparing range lookup with linear scan...")
+    segments = _segments(3000)
+    index = segment_index.SegmentIndex(segments)
+    rng = random.Random(1)
+    for _ in range(200):
+        start = rng.uniform(0, index.duration)
+        end = start + rng.uniform(0.1, 300)
+        expected = sorted(
+            (s for s in segments if s["start"] < end and s["start"] + s["duration"] > start),
+            key=lambda s: s["start"],
+        )
+        assert index.range(start, end) == expected
+        lo, hi = index.bounds(start, end)
+        # 走査するのは範囲内の件数に近い（長いセグメントの分だけ多い）
+        assert hi - lo <= len(expected) + 60
+    assert index.range(10, 10) == []
+    assert index.range(index.duration + 1, index.duration + 100) == []
+
+
+def test_parse_time():
+    """秒数・分:秒・時:分:秒を受け付け、不正な値は ValueError"""
+    assert segment_index.parse_time("750") == 750.0
+    assert segment_index.parse_time("12:30") == 750.0
+    assert segment_index.parse_time("1:02:30.5") == 3750.5
+    assert segment_index.parse_time(90) == 90.0
+    for value in ("", "abc", "1:2:3:4", "-5", "nan"):
+        try:
+            segment_index.parse_time(value)
+        except ValueError:
+            continue
+        raise AssertionError(f"ValueError expected for {value!r}")
+
+
+if __name__ == "__main__":
+    print("=" * 60)
+    print("Segment Index Test")
+    print("=" * 60)
+
+    success = True
+    for test in (test_range_matches_linear_scan, test_parse_time):
+        try:
+            test()
+            print(f"[PASSED] {test.__name__}")
+        except AssertionError as e:
+            success = False
+            print(f"[FAILED] {test.__name__}: {e}")
+
+    print("=" * 60)
+    sys.exit(0 if success else 1)
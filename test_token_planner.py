@@ -0,0 +1,88 @@
+"""
+Token Planner Test
+要約のトークン予算と実行計画（token_planner）のテスト（ネットワーク不要）
+"""
+
+import sys
+from pathlib import Path
+
+# パスを追加
+sys.path.insert(0, str(Path(__file__).parent))
+
+import token_planner  # noqa: E402
+
+MODEL = "gemini-2.0-flash-001"
+
+
+def test_short_text_is_single_call():
+    """予算内の入力は1回で要約"""
+    print("\n[TEST] Planning short transcript...")
+    plan = token_planner.plan_summary("今日は晴れです。" * 100, MODEL, 1200)
+    print(f"[INFO] {plan.describe()}")
+    assert plan.strategy == "single"
+    assert plan.chunks == 1 and plan.stages == 1
+    assert plan.expected_latency > 0
+
+
+def test_long_text_is_split_within_budget():
+    """予算を超える入力は分割し、チャンクと統合プロンプトが予算内に収まる"""
+    print("\n[TEST] Planning long transcript...")
+    text = "今日は晴れです。" * 20000  # 16万文字 ≒ 16万トークン
+    plan = token_planner.plan_summary(text, MODEL, 1200, max_parallel=4)
+    print(f"[INFO] {plan.describe()}")
+    assert plan.strategy == "multi"
+    assert plan.chunk_tokens <= token_planner.MAX_CHUNK_TOKENS
+    assert plan.parallelism == 4
+    # 部分要約は fan_in 個ずつ統合されるので、統合プロンプトも予算内に収まる
+    assert plan.fan_in * plan.partial_output_tokens <= token_planner.MAX_SINGLE_PASS_TOKENS
+    assert plan.stages == 2 + plan.reduce_levels
+
+    chunks = token_planner.split_by_tokens(text, plan.chunk_tokens)
+    assert all(len(c) <= plan.chunk_tokens for c in chunks)
+    assert abs(len(chunks) - plan.chunks) <= 1
+
+
+def test_language_aware_estimate():
+    """英語は日本語より1トークンあたりの文字数が多い"""
+    ja = token_planner.plan_summary("あ" * 40000, MODEL, 1200)
+    en = token_planner.plan_summary("word " * 8000, MODEL, 1200)
+    assert ja.input_tokens == 40000 and ja.strategy == "multi"
+    assert en.input_tokens == 10000 and en.strategy == "single"
+    assert en.chars_per_token > ja.chars_per_token
+
+
+def test_split_text_is_stable_under_append():
+    """末尾に追記しても既存のチャンク境界は変わらない"""
+    text = "これは最初の文です。 This is a sentence. " * 200
+    chunks = token_planner.split_text(text, 500)
+    grown = token_planner.split_text(text + "追加された文です。" * 50, 500)
+    assert grown[: len(chunks) - 1] == chunks[:-1]
+
+    # トークン単位の分割も同様（計画のチャンクサイズは入力長に依存しない）
+    chunks = token_planner.split_by_tokens(text, 300)
+    grown = token_planner.split_by_tokens(text * 3, 300)
+    assert grown[: len(chunks) - 1] == chunks[:-1]
+    short = token_planner.plan_summary("あ" * 40000, MODEL, 1200)
+    long = token_planner.plan_summary("あ" * 90000, MODEL, 1200)
+    assert short.chunk_tokens == long.chunk_tokens
+    # 区切りのない長い文字列も max_chars で切られる
+    assert [len(c) for c in token_planner.split_text("a" * 1200, 500)] == [500, 500, 200]
+
+
+if __name__ == "__main__":
+    print("=" * 60)
+    print("Token Planner Test")
+    print("=" * 60)
+
+    success = True
+    for test in (test_short_text_is_single_call, test_long_text_is_split_within_budget,
+                 test_language_aware_estimate, test_split_text_is_stable_under_append):
+        try:
+            test()
+            print(f"[PASSED] {test.__name__}")
+        except AssertionError as e:
+            success = False
+            print(f"[FAILED] {test.__name__}: {e}")
+
+    print("=" * 60)
+    sys.exit(0 if success else 1)
@@ -0,0 +1,87 @@
+"""
+Transcript Archive Test
+字幕アーカイブ（transcript_archive）のテスト（ネットワーク不要）
+"""
+
+import json
+import sys
+import tempfile
+from pathlib import Path
+
+# パスを追加
+sys.path.insert(0, str(Path(__file__).parent))
+
+import transcript_archive  # noqa: E402
+
+SEGMENTS = [
+    {"text": "こんにちは。", "start": 0.0, "duration": 1.5},
+    {"text": "字幕アーカイブのテストです。", "start": 1.5, "duration": 2.0},
+]
+
+
+def _record(video_id, content="こんにちは。字幕アーカイブのテストです。", created_at=None):
+    return transcript_archive.make_record(
+        video_id, f"https://youtu.be/{video_id}", "ja", "text", content, SEGMENTS,
+        summary="要約", created_at=created_at,
+    )
+
+
+def test_append_and_get_latest():
+    """追記したレコードを動画IDで引け、取り直した動画は最新の行を返す"""
+    print("\n[TEST] Appending and reading records...")
+    with tempfile.TemporaryDirectory() as tmp:
+        with transcript_archive.TranscriptArchive(str(Path(tmp) / "a.sqlite3")) as archive:
+            archive.append(_record("aaaaaaaaaaa", "古い字幕", created_at=1.0))
+            archive.append(_record("bbbbbbbbbbb"))
+            archive.append(_record("aaaaaaaaaaa", "新しい字幕", created_at=2.0))
+
+            record = archive.get("aaaaaaaaaaa")
+            assert record["content"] == "新しい字幕"
+            assert record["segments"] == SEGMENTS and record["segment_count"] == 2
+            assert [r["content"] for r in archive.history("aaaaaaaaaaa")] == ["古い字幕", "新しい字幕"]
+            assert archive.get("ccccccccccc") is None
+
+            assert "bbbbbbbbbbb" in archive and "ccccccccccc" not in archive
+            assert len(archive) == 2
+            assert archive.video_ids() == ["aaaaaaaaaaa", "bbbbbbbbbbb"]
+
+
+def test_append_many_and_export():
+    """まとめて追記し、JSONLには最新の行だけ（--all なら全履歴）を書き出す"""
+    print("\n[TEST] Exporting archive to JSONL...")
+    with tempfile.TemporaryDirectory() as tmp:
+        path = str(Path(tmp) / "a.sqlite3")
+        with transcript_archive.TranscriptArchive(path) as archive:
+            count = archive.append_many(_record(f"video{i:06d}") for i in range(1200))
+            assert count == 1200
+            archive.append(_record("video000000", "取り直し"))
+
+            latest = Path(tmp) / "latest.jsonl"
+            assert archive.export_jsonl(str(latest)) == 1200
+            lines = [json.loads(line) for line in latest.read_text(encoding="utf-8").splitlines()]
+            assert lines[-1]["video_id"] == "video000000"
+            assert lines[-1]["content"] == "取り直し"
+
+            assert archive.export_jsonl(str(Path(tmp) / "all.jsonl"), latest_only=False) == 1201
+
+        # 開き直しても内容は残る
+        with transcript_archive.TranscriptArchive(path) as archive:
+            assert len(archive) == 1200
+
+
+if __name__ == "__main__":
+    print("=" * 60)
+    print("Transcript Archive Test")
+    print("=" * 60)
+
+    success = True
+    for test in (test_append_and_get_latest, test_append_many_and_export):
+        try:
+            test()
+            print(f"[PASSED] {test.__name__}")
+        except AssertionError as e:
+            success = False
+            print(f"[FAILED] {test.__name__}: {e}")
+
+    print("=" * 60)
+    sys.exit(0 if success else 1)
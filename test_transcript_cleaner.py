@@ -0,0 +1,84 @@
+"""
+Transcript Cleaner Test
+Gemini送信前のプリクリーニング（transcript_cleaner）のテスト（ネットワーク不要）
+"""
+
+import sys
+from pathlib import Path
+
+# パスを追加
+sys.path.insert(0, str(Path(__file__).parent))
+
+from transcript_cleaner import clean_segments, clean_text, estimate_tokens  # noqa: E402
+
+
+def test_noise_tags_and_fillers():
+    """ノイズタグとフィラーの除去"""
+    print("\n[TEST] Removing noise tags and fillers...")
+    result = clean_text("[音楽] えーと、今日は えっと 天気の話です。 [拍手] um so we start")
+    print(f"[INFO] Cleaned: {result.text}")
+    assert "[音楽]" not in result.text and "[拍手]" not in result.text
+    assert "えーと" not in result.text and "えっと" not in result.text
+    assert "um " not in result.text
+    assert "天気の話です。" in result.text
+    assert result.removed["noise_tags"] == 2
+    assert result.bytes_saved > 0 and result.tokens_saved > 0
+
+
+def test_adjacent_duplicates():
+    """隣接セグメントの重複除去"""
+    print("\n[TEST] Removing rolling duplicates...")
+    result = clean_text("今日はいい天気 今日はいい天気ですね we will we will go")
+    print(f"[INFO] Cleaned: {result.text}")
+    assert result.text.count("今日はいい天気") == 1
+    assert result.text.count("we will") == 1
+
+    segments = [
+        {"text": "これから説明します", "start": 0.0, "duration": 2.0},
+        {"text": "これから説明します", "start": 2.0, "duration": 2.0},
+        {"text": "説明します まず最初に", "start": 4.0, "duration": 2.0},
+    ]
+    cleaned = clean_segments(segments)
+    assert len(cleaned) == 2
+    assert cleaned[1]["start"] == 4.0
+
+
+def test_levels():
+    """レベルごとの挙動"""
+    print("\n[TEST] Checking cleaning levels...")
+    text = "[音楽] まあ、あの、そういうことです"
+    assert clean_text(text, "off").text == text
+    assert "まあ" in clean_text(text, "standard").text
+    assert "まあ" not in clean_text(text, "aggressive").text
+    try:
+        clean_text(text, "unknown")
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("unknown level should raise ValueError")
+
+
+def test_estimate_tokens():
+    """トークン数の概算"""
+    assert estimate_tokens("") == 0
+    assert estimate_tokens("日本語") == 3
+    assert estimate_tokens("abcdefgh") == 2
+
+
+if __name__ == "__main__":
+    print("=" * 60)
+    print("Transcript Cleaner Test")
+    print("=" * 60)
+
+    success = True
+    for test in (test_noise_tags_and_fillers, test_adjacent_duplicates, test_levels,
+                 test_estimate_tokens):
+        try:
+            test()
+            print(f"[PASSED] {test.__name__}")
+        except AssertionError as e:
+            success = False
+            print(f"[FAILED] {test.__name__}: {e}")
+
+    print("=" * 60)
+    sys.exit(0 if success else 1)
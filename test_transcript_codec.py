@@ -0,0 +1,131 @@
+"""
+Transcript Codec Test
+字幕の保存形式（transcript_codec）と、キャッシュ・アーカイブでの利用のテスト（ネットワーク不要）
+"""
+
+import random
+import sqlite3
+import sys
+import tempfile
+from pathlib import Path
+
+# パスを追加
+sys.path.insert(0, str(Path(__file__).parent))
+
+import cache  # noqa: E402
+import transcript_archive  # noqa: E402
+import transcript_codec  # noqa: E402
+
+PHRASES = ["今日は", "皆さん", "こんにちは", "ということで", "やっていきたいと思います", "[音楽]", "はい"]
+
+
+def _segments(rng, count):
+    segments, start = [], 0.0
+    for _ in range(count):
+        duration = round(rng.uniform(0.5, 5.0), 3)
+        text = "".join(rng.choice(PHRASES) for _ in range(rng.randint(1, 5)))
+        segments.append({"text": text, "start": round(start, 3), "duration": duration})
+        start += round(rng.uniform(0.5, 4.0), 3)
+    return segments
+
+
+def test_segment_encoding_round_trip():
+    """ミリ秒精度の時刻と本文がそのまま戻り、順不同・空・絵文字も扱える"""
+    print("\n[TEST] Segment encoding round trip...")
+    rng = random.Random(0)
+    segments = _segments(rng, 500)
+    data = transcript_codec.encode_segments(segments)
+    assert transcript_codec.decode_segments(data) == segments
+    print(f"[INFO] binary {len(data)} bytes")
+
+    shuffled = segments[:50]
+    rng.shuffle(shuffled)
+    shuffled.append({"text": "絵文字😀", "start": 0.0, "duration": 0.0})
+    assert transcript_codec.decode_segments(transcript_codec.encode_segments(shuffled)) == shuffled
+    assert transcript_codec.decode_segments(transcript_codec.encode_segments([])) == []
+
+
+def test_dictionary_codecs():
+    """zstd / zlib とも辞書付きで往復でき、辞書を入れ替えても古いデータを読める"""
+    rng = random.Random(1)
+    corpus = [transcript_codec.encode_segments(_segments(rng, 40)) for _ in range(300)]
+    dictionary = transcript_codec.train_dictionary(corpus, size=16 * 1024)
+    segments = _segments(rng, 40)
+
+    methods = [transcript_codec.ZLIB]
+    if transcript_codec.zstandard is not None:
+        methods.append(transcript_codec.ZSTD)
+    for method in methods:
+        plain = transcript_codec.Codec(method=method)
+        codec = transcript_codec.Codec([dictionary], method=method)
+        blob = codec.encode(segments)
+        assert codec.decode(blob) == segments
+        print(f"[INFO] method={method} plain={len(plain.encode(segments))} dict={len(blob)}")
+        assert len(blob) < len(plain.encode(segments))
+
+        # 辞書のないコーデックでは読めない
+        try:
+            plain.decode(blob)
+        except transcript_codec.CodecError:
+            pass
+        else:
+            raise AssertionError("CodecError expected without the dictionary")
+
+        codec.add_dictionary(transcript_codec.train_dictionary(corpus[:100], size=8 * 1024))
+        assert codec.decode(blob) == segments
+
+    # 短いデータは圧縮しない
+    assert transcript_codec.Codec().compress(b"abc")[5:] == b"abc"
+
+
+def test_cache_and_archive_use_codec():
+    """キャッシュは圧縮して保持し、アーカイブは圧縮した行とJSONの行を両方読める"""
+    rng = random.Random(2)
+    segments = _segments(rng, 200)
+    c = cache.TTLCache("codec-test", maxsize=2, codec=transcript_codec.Codec())
+    c.set("a", segments)
+    assert c.get("a") == segments and "a" in c and "b" not in c
+    assert 0 < c.stats()["bytes"] < len(str(segments).encode("utf-8")) / 3
+    c.set("b", segments)
+    c.set("c", segments)
+    assert c.stats()["bytes"] == 2 * len(c._data["b"][1])
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = str(Path(tmp) / "a.sqlite3")
+        with transcript_archive.TranscriptArchive(path, compress=False) as archive:
+            archive.append(transcript_archive.make_record("old", "", "ja", "text", "古い", segments))
+        with transcript_archive.TranscriptArchive(path) as archive:
+            for i in range(5):
+                archive.append(transcript_archive.make_record(
+                    f"video{i}", "", "ja", "text", "本文" * 100, _segments(rng, 50)))
+            assert archive.ensure_dictionary(min_records=100) is None
+            assert archive.ensure_dictionary(min_records=3) is not None
+            archive.append(transcript_archive.make_record("new", "", "ja", "text", "新しい", segments))
+        with transcript_archive.TranscriptArchive(path) as archive:
+            assert archive.dictionary is not None
+            assert archive.get("old")["segments"] == segments
+            assert archive.get("new")["segments"] == segments
+            assert archive.get("video0")["content"] == "本文" * 100
+        types = sqlite3.connect(path).execute(
+            "SELECT typeof(segments) FROM transcripts ORDER BY id"
+        ).fetchall()
+        assert types[0] == ("text",) and types[-1] == ("blob",)
+
+
+if __name__ == "__main__":
+    print("=" * 60)
+    print("Transcript Codec Test")
+    print("=" * 60)
+
+    success = True
+    for test in (test_segment_encoding_round_trip, test_dictionary_codecs,
+                 test_cache_and_archive_use_codec):
+        try:
+            test()
+            print(f"[PASSED] {test.__name__}")
+        except AssertionError as e:
+            success = False
+            print(f"[FAILED] {test.__name__}: {e}")
+
+    print("=" * 60)
+    sys.exit(0 if success else 1)
@@ -0,0 +1,100 @@
+"""
+Transcript Columns Test
+字幕の列指向ストア（transcript_columns）のテスト（ネットワーク不要）
+"""
+
+import json
+import sys
+import tempfile
+from pathlib import Path
+
+# パスを追加
+sys.path.insert(0, str(Path(__file__).parent))
+
+import local_transcript_extractor as extractor  # noqa: E402
+import transcript_archive  # noqa: E402
+import transcript_columns  # noqa: E402
+
+VIDEOS = {
+    "aaaaaaaaaaa": [
+        {"text": "今日は字幕のテストです。", "start": 0.0, "duration": 3.0},
+        {"text": "", "start": 3.0, "duration": 1.0},
+        {"text": "字幕を集計します", "start": 4.0, "duration": 2.0},
+    ],
+    "bbbbbbbbbbb": [{"text": "English captions 字幕", "start": 1.5, "duration": 6.0}],
+    "ccccccccccc": [],
+}
+
+
+def _write_store(path):
+    with transcript_columns.ColumnarWriter(path) as writer:
+        for video_id, segments in VIDEOS.items():
+            writer.add(video_id, segments, language="ja")
+        assert not writer.add("aaaaaaaaaaa", [])  # 同じ動画は1回だけ
+
+
+def test_store_round_trip_and_stats():
+    """書いたセグメントを読み戻し、文字数・話速・キーワード頻度を列のまま集計できる"""
+    print("\n[TEST] Columnar store scan...")
+    with tempfile.TemporaryDirectory() as tmp:
+        _write_store(tmp)
+        with transcript_columns.ColumnarStore(tmp) as store:
+            assert len(store) == 3 and store.segment_count == 4
+            for video_id, segments in VIDEOS.items():
+                assert store.segments(video_id) == segments
+
+            assert store.char_counts().tolist() == [12, 0, 8, 19]
+            stats = store.video_stats()
+            assert stats["segments"].tolist() == [3, 1, 0]
+            assert stats["chars"].tolist() == [20, 19, 0]
+            assert stats["chars_per_minute"].tolist() == [200.0, 190.0, 0.0]
+
+            assert store.keyword_counts("字幕") == {"aaaaaaaaaaa": 2, "bbbbbbbbbbb": 1}
+            # セグメントをまたぐ一致は数えない
+            assert store.keyword_counts("。字幕") == {}
+            assert store.keyword_counts("存在しない") == {}
+
+
+def test_exporters():
+    """save_results の .json 出力とアーカイブから同じストアを作れる"""
+    with tempfile.TemporaryDirectory() as tmp:
+        outputs = Path(tmp) / "outputs"
+        outputs.mkdir()
+        with transcript_archive.TranscriptArchive(str(Path(tmp) / "a.sqlite3")) as archive:
+            for video_id, segments in VIDEOS.items():
+                extractor.save_results(
+                    video_id, video_id, "ja", "text", "本文", segments, output_dir=str(outputs)
+                )
+                archive.append(transcript_archive.make_record(
+                    video_id, video_id, "ja", "text", "本文", segments))
+            assert transcript_columns.export_archive(archive, str(Path(tmp) / "from_archive")) == 3
+
+        # 壊れたファイルと関係のないJSONは飛ばす
+        (outputs / "transcript_broken_1.json").write_text("{", encoding="utf-8")
+        (outputs / "transcript_other_1.json").write_text(json.dumps({"a": 1}), encoding="utf-8")
+        # 動画の一番新しいファイルが壊れていれば、その前のファイルを使う
+        (outputs / "transcript_aaaaaaaaaaa_9999999999.json").write_text("{", encoding="utf-8")
+        assert transcript_columns.export_json_files([str(outputs)], str(Path(tmp) / "from_json")) == 3
+
+        for name in ("from_archive", "from_json"):
+            with transcript_columns.ColumnarStore(str(Path(tmp) / name)) as store:
+                assert store.segments("aaaaaaaaaaa") == VIDEOS["aaaaaaaaaaa"]
+                assert store.keyword_counts("字幕")["aaaaaaaaaaa"] == 2
+
+
+if __name__ == "__main__":
+    print("=" * 60)
+    print("Transcript Columns Test")
+    print("=" * 60)
+
+    success = True
+    for test in (test_store_round_trip_and_stats, test_exporters):
+        try:
+            test()
+            print(f"[PASSED] {test.__name__}")
+        except AssertionError as e:
+            success = False
+            print(f"[FAILED] {test.__name__}: {e}")
+
+    print("=" * 60)
+    sys.exit(0 if success else 1)
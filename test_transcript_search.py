@@ -0,0 +1,108 @@
+"""
+Transcript Search Test
+字幕の全文検索（transcript_search）のテスト（ネットワーク不要）
+"""
+
+import sys
+import tempfile
+from pathlib import Path
+
+# パスを追加
+sys.path.insert(0, str(Path(__file__).parent))
+
+import transcript_archive  # noqa: E402
+import transcript_search  # noqa: E402
+
+SEGMENTS = [
+    {"text": "こんにちは。今日は字幕抽出のテストをします。", "start": 0.0, "duration": 2.0},
+    {"text": "全文検索で日本語の字幕を探します。", "start": 65.5, "duration": 2.0},
+    {"text": "Search works for English captions too.", "start": 130.0, "duration": 2.0},
+]
+
+
+def test_search_returns_timestamped_hits():
+    """trigramで日本語の部分一致を引き、開始時刻とスニペットを返す"""
+    print("\n[TEST] Searching transcripts...")
+    index = transcript_search.TranscriptIndex(":memory:")
+    index.index_video("aaaaaaaaaaa", SEGMENTS, title="テスト動画", language="ja")
+    index.index_video("bbbbbbbbbbb", [{"text": "字幕抽出ツールの紹介", "start": 12.0}])
+
+    page = index.search("字幕抽出")
+    print(f"[INFO] {page['results']}")
+    assert page["method"] == "fts"
+    assert {hit["video_id"] for hit in page["results"]} == {"aaaaaaaaaaa", "bbbbbbbbbbb"}
+    hit = next(h for h in page["results"] if h["video_id"] == "aaaaaaaaaaa")
+    assert hit["start"] == 0.0 and hit["title"] == "テスト動画"
+    assert "[字幕抽出]" in hit["snippet"]
+
+    hit = index.search("全文検索 日本語")["results"][0]
+    assert hit["start"] == 65.5 and hit["url"].endswith("&t=65s")
+    assert index.search("SEARCH works")["results"][0]["start"] == 130.0
+
+    # 3文字未満の語は LIKE で探す
+    page = index.search("字幕")
+    assert page["method"] == "like" and len(page["results"]) == 3
+    assert all("[字幕]" in hit["snippet"] for hit in page["results"])
+
+
+def test_pagination_and_reindex():
+    """ページ分割・再索引での置き換え・不正な検索条件"""
+    index = transcript_search.TranscriptIndex(":memory:")
+    for i in range(25):
+        index.index_video(f"video{i:06d}", [{"text": f"共通の話題 その{i}", "start": float(i)}])
+
+    first = index.search("共通の話題", page=1, per_page=10)
+    third = index.search("共通の話題", page=3, per_page=10)
+    assert len(first["results"]) == 10 and first["has_more"]
+    assert len(third["results"]) == 5 and not third["has_more"]
+
+    index.index_video("video000000", [{"text": "差し替えた字幕", "start": 0.0}])
+    assert len(index.search("共通の話題", per_page=100)["results"]) == 24
+    assert index.search("差し替え")["results"][0]["video_id"] == "video000000"
+    assert len(index) == 25
+
+    # 引用符や演算子を含む語もそのまま探す
+    assert index.search('"NEAR" OR')["results"] == []
+    for query, page in (("", 1), ("話題", 0), ("話題", "x")):
+        try:
+            index.search(query, page=page)
+        except ValueError:
+            continue
+        raise AssertionError(f"ValueError expected for {query!r}, page={page!r}")
+
+
+def test_sync_archive_imports_new_rows():
+    """アーカイブから差分だけを取り込み、取り直した動画は最新の字幕に置き換える"""
+    with tempfile.TemporaryDirectory() as tmp:
+        with transcript_archive.TranscriptArchive(str(Path(tmp) / "a.sqlite3")) as archive:
+            archive.append(transcript_archive.make_record(
+                "aaaaaaaaaaa", "", "ja", "text", "", SEGMENTS))
+            index = transcript_search.TranscriptIndex(str(Path(tmp) / "s.sqlite3"))
+            assert index.sync_archive(archive) == 1
+            assert index.sync_archive(archive) == 0
+
+            archive.append(transcript_archive.make_record(
+                "aaaaaaaaaaa", "", "ja", "text", "", [{"text": "新しい字幕です", "start": 5.0}]))
+            assert index.sync_archive(archive) == 1
+            assert index.search("字幕抽出")["results"] == []
+            assert index.search("新しい字幕")["results"][0]["start"] == 5.0
+            index.close()
+
+
+if __name__ == "__main__":
+    print("=" * 60)
+    print("Transcript Search Test")
+    print("=" * 60)
+
+    success = True
+    for test in (test_search_returns_timestamped_hits, test_pagination_and_reindex,
+                 test_sync_archive_imports_new_rows):
+        try:
+            test()
+            print(f"[PASSED] {test.__name__}")
+        except AssertionError as e:
+            success = False
+            print(f"[FAILED] {test.__name__}: {e}")
+
+    print("=" * 60)
+    sys.exit(0 if success else 1)
@@ -0,0 +1,281 @@
+"""
+要約のトークン予算と実行計画
+入力トークン数（言語ごとの概算）とモデルのコンテキスト長・出力上限から、
+1回で要約するか分割して要約するか（チャンクサイズ・段数・並列数）を決める
+分割する場合は部分要約を fan_in 個ずつ段階的に統合する（map_reduce.tree_reduce）前提で見積もる
+
+レイテンシは 1呼び出し ≒ 固定遅延 + 入力トークン/入力速度 + 出力トークン/出力速度 として見積もり、
+予算（1回の入力上限・コンテキスト長）を満たす候補の中から見積もりが最小の計画を選ぶ
+"""
+
+import math
+import os
+import re
+
+from map_reduce import reduce_levels
+from transcript_cleaner import estimate_tokens
+
+# モデルごとの上限と速度の目安（速度は秒あたりのトークン数）
+MODEL_PROFILES = {
+    "gemini-2.0-flash-001": {
+        "context_tokens": 1_048_576,
+        "max_output_tokens": 8192,
+        "base_latency": 0.5,
+        "input_tokens_per_s": 50_000,
+        "output_tokens_per_s": 200,
+    },
+    "gemini-1.5-flash": {
+        "context_tokens": 1_048_576,
+        "max_output_tokens": 8192,
+        "base_latency": 0.5,
+        "input_tokens_per_s": 40_000,
+        "output_tokens_per_s": 180,
+    },
+    "gemini-1.5-pro": {
+        "context_tokens": 2_097_152,
+        "max_output_tokens": 8192,
+        "base_latency": 1.0,
+        "input_tokens_per_s": 20_000,
+        "output_tokens_per_s": 60,
+    },
+}
+DEFAULT_PROFILE = MODEL_PROFILES["gemini-2.0-flash-001"]
+
+# 1回の呼び出しに入れる入力トークンの上限（長すぎると要約の質が落ちるため）
+MAX_SINGLE_PASS_TOKENS = int(os.environ.get("PLANNER_MAX_SINGLE_TOKENS", "32000"))
+
+# 分割するときのチャンクの最大トークン数
+MAX_CHUNK_TOKENS = int(os.environ.get("PLANNER_MAX_CHUNK_TOKENS", "8000"))
+
+# 同時に投げるGemini呼び出しの上限（レート制限対策）
+MAX_PARALLEL = int(os.environ.get("PLANNER_MAX_PARALLEL", "4"))
+
+# 1回の統合に入れる部分要約の最大数
+FAN_IN = int(os.environ.get("PLANNER_FAN_IN", "8"))
+
+# プロンプトの指示文ぶんのトークン
+PROMPT_OVERHEAD_TOKENS = 400
+
+# 部分要約の出力トークン数の下限
+MIN_PARTIAL_OUTPUT_TOKENS = 256
+
+# チャンクサイズの候補（トークン数）
+CHUNK_TOKEN_CANDIDATES = (1000, 2000, 4000, 8000, 16000, 32000)
+
+# 区切り文字（句点・改行・空白）までを1ピースとする。ピースをつなげると元のテキストに戻る
+_PIECE_PATTERN = re.compile(r".+?(?:[。！？!?]+\s*|\n+|\s+|$)", re.DOTALL)
+
+
+def model_profile(model):
+    """モデルの上限と速度の目安（未知のモデルは既定値）"""
+    return MODEL_PROFILES.get(model, DEFAULT_PROFILE)
+
+
+def estimate_call_latency(profile, input_tokens, output_tokens):
+    """1回の呼び出しの見積もりレイテンシ（秒）"""
+    return (
+        profile["base_latency"]
+        + input_tokens / profile["input_tokens_per_s"]
+        + output_tokens / profile["output_tokens_per_s"]
+    )
+
+
+class Plan:
+    """要約の実行計画"""
+
+    def __init__(self, model, input_chars, input_tokens, output_tokens):
+        self.model = model
+        self.reduce_model = model
+        self.input_chars = input_chars
+        self.input_tokens = input_tokens
+        self.output_tokens = output_tokens
+        self.strategy = "single"
+        self.chunks = 1
+        self.chunk_tokens = input_tokens
+        self.chunk_chars = input_chars
+        self.stages = 1
+        self.parallelism = 1
+        self.partial_output_tokens = 0
+        self.fan_in = 0
+        self.reduce_levels = 0
+        self.expected_latency = 0.0
+        self.reason = ""
+
+    @property
+    def chars_per_token(self):
+        return self.input_chars / self.input_tokens if self.input_tokens else 1.0
+
+    def to_dict(self):
+        return {
+            "model": self.model,
+            "reduce_model": self.reduce_model,
+            "strategy": self.strategy,
+            "input_chars": self.input_chars,
+            "input_tokens": self.input_tokens,
+            "chars_per_token": round(self.chars_per_token, 2),
+            "chunks": self.chunks,
+            "chunk_tokens": self.chunk_tokens,
+            "chunk_chars": self.chunk_chars,
+            "stages": self.stages,
+            "parallelism": self.parallelism,
+            "partial_output_tokens": self.partial_output_tokens,
+            "fan_in": self.fan_in,
+            "reduce_levels": self.reduce_levels,
+            "output_tokens": self.output_tokens,
+            "expected_latency": round(self.expected_latency, 2),
+            "reason": self.reason,
+        }
+
+    def describe(self):
+        """ログ用の1行表現"""
+        if self.strategy == "single":
+            return (
+                f"single call ({self.input_tokens} tokens, model={self.reduce_model}, "
+                f"~{self.expected_latency:.1f}s): {self.reason}"
+            )
+        return (
+            f"{self.chunks} chunks x {self.chunk_tokens} tokens, {self.stages} stages "
+            f"(fan-in {self.fan_in}), parallel={self.parallelism} "
+            f"(model={self.model}, reduce={self.reduce_model}, ~{self.expected_latency:.1f}s): "
+            f"{self.reason}"
+        )
+
+
+def _multi_stage_latency(profile, input_tokens, chunk_tokens, partial_output, output_tokens,
+                         max_parallel, fan_in, final_profile=None):
+    """分割要約（部分要約 → 段階的な統合 → 最終統合）の見積もり。(latency, chunks, parallelism)
+
+    final_profile は最終統合に使うモデル（省略時は profile と同じ）
+    """
+    chunks = math.ceil(input_tokens / chunk_tokens)
+    parallelism = min(chunks, max_parallel)
+
+    latency = math.ceil(chunks / parallelism) * estimate_call_latency(
+        profile, chunk_tokens + PROMPT_OVERHEAD_TOKENS, partial_output
+    )
+    # 中間統合：fan_in 個ずつ並列にまとめる段を、残りが fan_in 個以下になるまで繰り返す
+    count = chunks
+    while count > fan_in:
+        groups = math.ceil(count / fan_in)
+        latency += math.ceil(groups / max_parallel) * estimate_call_latency(
+            profile, fan_in * partial_output + PROMPT_OVERHEAD_TOKENS, partial_output
+        )
+        count = groups
+    latency += estimate_call_latency(
+        final_profile or profile, count * partial_output + PROMPT_OVERHEAD_TOKENS, output_tokens
+    )
+    return latency, chunks, parallelism
+
+
+def plan_summary(text, model, output_tokens, max_parallel=None,
+                 max_single_tokens=None, max_chunk_tokens=None, fan_in=None,
+                 reduce_model=None):
+    """要約の実行計画を作成
+
+    Args:
+        text: 要約する字幕テキスト
+        model: Geminiのモデル名（チャンクの部分要約・中間統合）
+        output_tokens: 最終要約の出力トークン数
+        fan_in: 1回の統合に入れる部分要約の最大数（省略時は PLANNER_FAN_IN）
+        reduce_model: 1回での要約と最終統合のモデル（省略時は model と同じ）
+    """
+    profile = model_profile(model)
+    final_profile = model_profile(reduce_model or model)
+    max_parallel = max(1, max_parallel or MAX_PARALLEL)
+    max_single_tokens = max_single_tokens or MAX_SINGLE_PASS_TOKENS
+    max_chunk_tokens = max_chunk_tokens or MAX_CHUNK_TOKENS
+    output_tokens = min(output_tokens, final_profile["max_output_tokens"])
+
+    input_tokens = estimate_tokens(text)
+    plan = Plan(model, len(text), input_tokens, output_tokens)
+    plan.reduce_model = reduce_model or model
+
+    # 1回で収まる場合
+    single_input = input_tokens + PROMPT_OVERHEAD_TOKENS
+    fits_context = single_input + output_tokens <= final_profile["context_tokens"]
+    if input_tokens <= max_single_tokens and fits_context:
+        plan.expected_latency = estimate_call_latency(final_profile, single_input, output_tokens)
+        plan.reason = f"input fits single-pass budget ({max_single_tokens} tokens)"
+        return plan
+
+    # 分割する場合：統合プロンプトが予算を超えないよう fan_in を抑え、
+    # チャンクサイズの候補から見積もりレイテンシ最小のものを選ぶ
+    partial_output = max(MIN_PARTIAL_OUTPUT_TOKENS, output_tokens // 2)
+    fan_in = max(2, min(fan_in or FAN_IN, max_single_tokens // partial_output))
+    best = None
+    for chunk_tokens in CHUNK_TOKEN_CANDIDATES:
+        if chunk_tokens > max_chunk_tokens and best is not None:
+            break
+        latency, chunks, parallelism = _multi_stage_latency(
+            profile, input_tokens, chunk_tokens, partial_output, output_tokens,
+            max_parallel, fan_in, final_profile,
+        )
+        if best is None or latency < best[0]:
+            best = (latency, chunks, parallelism, chunk_tokens)
+
+    latency, chunks, parallelism, chunk_tokens = best
+    plan.strategy = "multi"
+    plan.chunks = chunks
+    # チャンクサイズは入力長で均さず候補の値のまま使う（字幕が伸びても境界が変わらないように）
+    plan.chunk_tokens = chunk_tokens
+    plan.chunk_chars = max(1, int(plan.chunk_tokens * plan.chars_per_token))
+    plan.fan_in = fan_in
+    plan.reduce_levels = reduce_levels(chunks, fan_in)
+    plan.stages = 2 + plan.reduce_levels
+    plan.parallelism = parallelism
+    plan.partial_output_tokens = partial_output
+    plan.expected_latency = latency
+    plan.reason = (
+        f"input exceeds single-pass budget ({input_tokens} > {max_single_tokens} tokens)"
+        if input_tokens > max_single_tokens
+        else "input exceeds model context window"
+    )
+    return plan
+
+
+def _piece_tokens(piece):
+    """ピースのトークン数（端数を丸めない estimate_tokens）"""
+    cjk = (len(piece.encode("utf-8")) - len(piece)) // 2
+    return cjk + (len(piece) - cjk) / 4
+
+
+def _pack(text, limit, measure):
+    """区切りごとのピースを先頭から貪欲に詰め、measure の合計が limit 以下のチャンクにする
+
+    先頭から詰めるので、末尾に追記されても既存のチャンク境界は変わらない（最後のチャンクを除く）。
+    区切りのない長い部分は limit 文字ずつ切る（1文字は1トークン以下なのでトークン上限も守られる）
+    """
+    chunks, current, size = [], "", 0
+    for piece in _PIECE_PATTERN.findall(text):
+        piece_size = measure(piece)
+        if current and size + piece_size > limit:
+            chunks.append(current)
+            current, size = "", 0
+        while piece_size > limit:
+            chunks.append(piece[:limit])
+            piece = piece[limit:]
+            piece_size = measure(piece)
+        current += piece
+        size += piece_size
+    chunks.append(current)
+    return [c.strip() for c in chunks if c.strip()]
+
+
+def split_text(text, max_chars):
+    """文の区切り（句点・改行・空白）でテキストを max_chars 以下のチャンクに分ける"""
+    text = text.strip()
+    if len(text) <= max_chars:
+        return [text] if text else []
+    return _pack(text, max_chars, len)
+
+
+def split_by_tokens(text, max_tokens):
+    """文の区切りでテキストを推定 max_tokens トークン以下のチャンクに分ける
+
+    チャンク境界がテキストの先頭からの内容だけで決まるので、字幕が伸びても
+    既存チャンクの内容（とそのハッシュ）は変わらない
+    """
+    text = text.strip()
+    if not text:
+        return []
+    return _pack(text, max_tokens, _piece_tokens)
@@ -0,0 +1,263 @@
+"""
+字幕アーカイブ（SQLite、追記のみ）
+動画ごとに .txt と .json を書く代わりに、1つのSQLiteファイルへ字幕レコードを追記する
+
+- 追記のみ: 同じ動画を取り直したら新しい行を足し、参照時は最新の行を返す
+- 動画IDでの参照はインデックス1回（ファイル数に依存しない）
+- JSONLへの一括エクスポート（最新の行だけ、または全履歴）
+- 本文とセグメントは transcript_codec で圧縮して保存する（辞書はアーカイブ内に持つ）
+
+    with TranscriptArchive("transcripts.sqlite3") as archive:
+        archive.append(make_record(video_id, url, "ja", "text", content, segments))
+        record = archive.get(video_id)
+"""
+
+import json
+import sqlite3
+import threading
+import time
+
+import transcript_codec
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS transcripts (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    video_id TEXT NOT NULL,
+    source_url TEXT,
+    language TEXT,
+    format TEXT,
+    created_at REAL NOT NULL,
+    character_count INTEGER NOT NULL,
+    segment_count INTEGER NOT NULL,
+    content TEXT NOT NULL,
+    summary TEXT NOT NULL DEFAULT '',
+    segments TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS transcripts_video_id ON transcripts (video_id, id);
+CREATE TABLE IF NOT EXISTS dictionaries (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    created_at REAL NOT NULL,
+    data BLOB NOT NULL
+);
+"""
+
+# 辞書がないときに自動で学習を始めるレコード数と、学習に使うレコード数
+TRAIN_AFTER = 200
+TRAIN_SAMPLES = 2000
+
+_COLUMNS = (
+    "video_id",
+    "source_url",
+    "language",
+    "format",
+    "created_at",
+    "character_count",
+    "segment_count",
+    "content",
+    "summary",
+    "segments",
+)
+
+_INSERT = (
+    f"INSERT INTO transcripts ({', '.join(_COLUMNS)}) "
+    f"VALUES ({', '.join('?' for _ in _COLUMNS)})"
+)
+
+# 動画ごとの最新の行だけを残す条件（(video_id, id) インデックスで1行ごとに判定）
+_LATEST = (
+    "NOT EXISTS (SELECT 1 FROM transcripts AS newer "
+    "WHERE newer.video_id = transcripts.video_id AND newer.id > transcripts.id)"
+)
+
+
+def make_record(video_id, source_url, language, output_format, content, segments,
+                summary="", created_at=None):
+    """アーカイブに追記するレコード"""
+    return {
+        "video_id": video_id,
+        "source_url": source_url,
+        "language": language,
+        "format": output_format,
+        "created_at": created_at if created_at is not None else time.time(),
+        "character_count": len(content),
+        "segment_count": len(segments),
+        "content": content,
+        "summary": summary or "",
+        "segments": segments,
+    }
+
+
+class TranscriptArchive:
+    """追記のみの字幕アーカイブ（スレッドセーフ。書き込みは1本のロックで直列化）
+
+    compress=False なら本文とセグメントをJSONのまま保存する（読み込みはどちらの行も読める）
+    """
+
+    def __init__(self, path, compress=True):
+        self.path = path
+        self.compress = compress
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock:
+            # WAL: 追記中も読み取りを妨げず、コミットごとのfsyncを減らす
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.executescript(_SCHEMA)
+            rows = self._conn.execute("SELECT data FROM dictionaries ORDER BY id").fetchall()
+        self.codec = transcript_codec.Codec(transcript_codec.Dictionary(row[0]) for row in rows)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def append(self, record):
+        """1件追記して行IDを返す"""
+        with self._lock, self._conn:
+            cursor = self._conn.execute(_INSERT, self._values(record))
+            return cursor.lastrowid
+
+    def append_many(self, records):
+        """まとめて追記（1トランザクション）して件数を返す"""
+        rows = [self._values(record) for record in records]
+        with self._lock, self._conn:
+            self._conn.executemany(_INSERT, rows)
+        return len(rows)
+
+    def _values(self, record):
+        values = dict(record)
+        values.setdefault("summary", "")
+        if self.compress:
+            values["content"] = self.codec.compress_text(record["content"])
+            values["segments"] = self.codec.encode(record["segments"])
+        else:
+            values["segments"] = json.dumps(
+                record["segments"], ensure_ascii=False, separators=(",", ":")
+            )
+        return tuple(values[column] for column in _COLUMNS)
+
+    # 圧縮した行は bytes、JSONのまま保存した行は str で入っている
+    def _content(self, value):
+        return self.codec.decompress_text(value) if isinstance(value, bytes) else value
+
+    def _segments(self, value):
+        return self.codec.decode(value) if isinstance(value, bytes) else json.loads(value)
+
+    def _row_to_record(self, row):
+        record = dict(zip(_COLUMNS, row))
+        record["content"] = self._content(record["content"])
+        record["segments"] = self._segments(record["segments"])
+        return record
+
+    @property
+    def dictionary(self):
+        """圧縮に使っている辞書（なければ None）"""
+        return self.codec.dictionary
+
+    def train_dictionary(self, samples=TRAIN_SAMPLES, size=None):
+        """最近のレコードから圧縮辞書を学習して保存し、以後の追記に使う（既存の行はそのまま読める）"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT content, segments FROM transcripts ORDER BY id DESC LIMIT ?",
+                (samples,),
+            ).fetchall()
+        if not rows:
+            raise ValueError("辞書の学習にはレコードが必要です")
+        corpus = []
+        for content, segments in rows:
+            corpus.append(transcript_codec.encode_segments(self._segments(segments)))
+            corpus.append(self._content(content).encode("utf-8"))
+        dictionary = transcript_codec.train_dictionary(corpus, size)
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO dictionaries (created_at, data) VALUES (?, ?)",
+                (time.time(), dictionary.data),
+            )
+        self.codec.add_dictionary(dictionary)
+        return dictionary
+
+    def ensure_dictionary(self, min_records=TRAIN_AFTER):
+        """辞書がなく、レコードが min_records 件以上あれば辞書を学習する。学習したら辞書を返す"""
+        if not self.compress or self.dictionary is not None:
+            return None
+        with self._lock:
+            count = self._conn.execute("SELECT COUNT(*) FROM transcripts").fetchone()[0]
+        if count < min_records:
+            return None
+        return self.train_dictionary()
+
+    def get(self, video_id):
+        """動画の最新のレコード（なければ None）"""
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT {', '.join(_COLUMNS)} FROM transcripts "
+                "WHERE video_id = ? ORDER BY id DESC LIMIT 1",
+                (video_id,),
+            ).fetchone()
+        return self._row_to_record(row) if row else None
+
+    def history(self, video_id):
+        """動画のすべてのレコード（古い順）"""
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT {', '.join(_COLUMNS)} FROM transcripts WHERE video_id = ? ORDER BY id",
+                (video_id,),
+            ).fetchall()
+        return [self._row_to_record(row) for row in rows]
+
+    def __contains__(self, video_id):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT 1 FROM transcripts WHERE video_id = ? LIMIT 1", (video_id,)
+            ).fetchone()
+        return row is not None
+
+    def __len__(self):
+        """動画数（同じ動画の履歴は1件と数える）"""
+        with self._lock:
+            return self._conn.execute(
+                "SELECT COUNT(DISTINCT video_id) FROM transcripts"
+            ).fetchone()[0]
+
+    def video_ids(self):
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT DISTINCT video_id FROM transcripts ORDER BY video_id"
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def iter_records(self, latest_only=True, batch_size=500):
+        """レコードを行ID順に返す（batch_size 件ずつ読むので全件をメモリに載せない）"""
+        for _, record in self.iter_rows(latest_only=latest_only, batch_size=batch_size):
+            yield record
+
+    def iter_rows(self, after_id=0, latest_only=False, batch_size=500):
+        """行IDが after_id より大きい (行ID, レコード) を行ID順に返す（差分の取り込み用）"""
+        query = f"SELECT id, {', '.join(_COLUMNS)} FROM transcripts WHERE id > ?"
+        if latest_only:
+            query += f" AND {_LATEST}"
+        query += " ORDER BY id LIMIT ?"
+        last_id = after_id
+        while True:
+            with self._lock:
+                rows = self._conn.execute(query, (last_id, batch_size)).fetchall()
+            if not rows:
+                return
+            for row in rows:
+                yield row[0], self._row_to_record(row[1:])
+            last_id = rows[-1][0]
+
+    def export_jsonl(self, path, latest_only=True):
+        """JSONL（1行1レコード）に書き出して件数を返す"""
+        count = 0
+        with open(path, "w", encoding="utf-8") as f:
+            for record in self.iter_records(latest_only):
+                f.write(json.dumps(record, ensure_ascii=False, separators=(",", ":")))
+                f.write("\n")
+                count += 1
+        return count
@@ -0,0 +1,221 @@
+"""
+Gemini送信前の字幕プリクリーニング
+自動生成字幕のノイズタグ・フィラー・隣接セグメントの重複・余分な空白を取り除き、
+プロンプトの入力トークンとレイテンシを削減する
+
+クリーニングレベル:
+    off        何もしない
+    light      NFKC正規化・ノイズタグ除去・空白の正規化
+    standard   light + 区切られたフィラーの除去 + 隣接セグメントの重複除去
+    aggressive standard + 追加のフィラー・任意の短い[タグ]・単語の連続重複の除去
+"""
+
+import os
+import re
+import unicodedata
+
+LEVELS = ("off", "light", "standard", "aggressive")
+
+DEFAULT_LEVEL = os.environ.get("PRECLEAN_LEVEL", "standard")
+
+# 重複とみなす隣接セグメント間の最小文字数（CJK）
+MIN_OVERLAP_CHARS = 4
+
+# 連続重複を検出するn-gramの最大長（トークン数）
+MAX_REPEAT_NGRAM = 8
+
+_NOISE_TAG_PATTERN = re.compile(
+    r"\[\s*(?:音楽|拍手|笑い?|歓声|沈黙|music|applause|laughter|laughs|cheering|"
+    r"silence|inaudible|no audio|__)\s*\]|\(\s*(?:笑|拍手|音楽)\s*\)|♪+|♫+",
+    re.IGNORECASE,
+)
+_ANY_SHORT_TAG_PATTERN = re.compile(r"\[[^\[\]\n]{1,20}\]")
+
+# 前後が区切り（行頭・空白・句読点）のときだけ除去する
+_BOUNDARY_BEFORE = r"(?:(?<=^)|(?<=[\s、。,.!?！？]))"
+_BOUNDARY_AFTER = r"(?=$|[\s、。,.!?！？])"
+
+_JA_FILLERS_STANDARD = ["えー+と?", "えっと", "ええと", "あのー+", "あの", "うーん", "んー+", "えー+っと"]
+_JA_FILLERS_AGGRESSIVE = _JA_FILLERS_STANDARD + ["まあ", "まぁ", "なんか", "その", "こう", "ほら"]
+_EN_FILLERS_STANDARD = ["um+", "uh+", "umm+", "erm", "er", "hmm+", "mm+"]
+_EN_FILLERS_AGGRESSIVE = _EN_FILLERS_STANDARD + ["you know", "i mean", "like", "sort of", "kind of"]
+
+
+def _filler_pattern(ja_fillers, en_fillers):
+    ja = "|".join(ja_fillers)
+    en = "|".join(en_fillers)
+    return re.compile(
+        rf"{_BOUNDARY_BEFORE}(?:{ja}|(?i:\b(?:{en})\b))[、,]?{_BOUNDARY_AFTER}[、,]?"
+    )
+
+
+_FILLER_PATTERNS = {
+    "standard": _filler_pattern(_JA_FILLERS_STANDARD, _EN_FILLERS_STANDARD),
+    "aggressive": _filler_pattern(_JA_FILLERS_AGGRESSIVE, _EN_FILLERS_AGGRESSIVE),
+}
+
+_CJK_PATTERN = re.compile(r"[\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af]")
+_HORIZONTAL_SPACE = re.compile(r"[ \t\u3000]+")
+_SPACE_BEFORE_PUNCT = re.compile(r"\s+([、。,.!?！？])")
+_REPEATED_PUNCT = re.compile(r"([、。,])(?:\s*\1)+")
+_MANY_NEWLINES = re.compile(r"\n{3,}")
+
+
+def estimate_tokens(text):
+    """入力トークン数の概算
+
+    CJK文字は1文字≒1トークン、それ以外は4文字≒1トークンとして数える。
+    CJK文字はUTF-8で3バイトになることを利用し、正規表現を使わずに数える
+    """
+    if not text:
+        return 0
+    cjk = (len(text.encode("utf-8")) - len(text)) // 2
+    return cjk + (len(text) - cjk + 3) // 4
+
+
+class CleanResult:
+    """クリーニング結果と削減量"""
+
+    def __init__(self, original, text, level, removed):
+        self.text = text
+        self.level = level
+        self.removed = removed
+        self.original_bytes = len(original.encode("utf-8"))
+        self.cleaned_bytes = len(text.encode("utf-8"))
+        self.original_tokens = estimate_tokens(original)
+        self.cleaned_tokens = estimate_tokens(text)
+
+    @property
+    def bytes_saved(self):
+        return self.original_bytes - self.cleaned_bytes
+
+    @property
+    def tokens_saved(self):
+        return self.original_tokens - self.cleaned_tokens
+
+    def to_dict(self):
+        return {
+            "level": self.level,
+            "original_bytes": self.original_bytes,
+            "cleaned_bytes": self.cleaned_bytes,
+            "bytes_saved": self.bytes_saved,
+            "original_tokens": self.original_tokens,
+            "cleaned_tokens": self.cleaned_tokens,
+            "tokens_saved": self.tokens_saved,
+            "removed": dict(self.removed),
+        }
+
+
+def _has_cjk(text):
+    return _CJK_PATTERN.search(text) is not None
+
+
+def _trim_overlap(previous, current):
+    """前のセグメント末尾と重なる current の先頭部分を取り除く"""
+    limit = min(len(previous), len(current) - 1)
+    for size in range(limit, MIN_OVERLAP_CHARS - 1, -1):
+        if previous.endswith(current[:size]):
+            return current[size:], size
+    return current, 0
+
+
+def _dedupe_pieces(pieces, min_ngram):
+    """空白区切りのピース列から隣接する重複を除去
+
+    - 同じn-gram（min_ngram〜MAX_REPEAT_NGRAMトークン）が直後に繰り返される場合は2回目を削除
+    - CJKのピース同士で、前の末尾と次の先頭が重なっている場合は重なりを削除
+    """
+    removed = 0
+    result = []
+    for piece in pieces:
+        if result and _has_cjk(piece) and _has_cjk(result[-1]):
+            trimmed, size = _trim_overlap(result[-1], piece)
+            if size:
+                removed += 1
+                if not trimmed:
+                    continue
+                piece = trimmed
+        result.append(piece)
+
+        # 直前のn-gramと同じ並びが続いたら末尾側を取り除く
+        for n in range(min(MAX_REPEAT_NGRAM, len(result) // 2), min_ngram - 1, -1):
+            if result[-n:] == result[-2 * n:-n]:
+                del result[-n:]
+                removed += 1
+                break
+    return result, removed
+
+
+def _clean_line(line, level, removed):
+    if level in ("standard", "aggressive"):
+        line, count = _FILLER_PATTERNS[level].subn(" ", line)
+        removed["fillers"] += count
+
+    pieces = line.split()
+    if level in ("standard", "aggressive") and pieces:
+        pieces, count = _dedupe_pieces(pieces, 1 if level == "aggressive" else 2)
+        removed["duplicates"] += count
+    return " ".join(pieces)
+
+
+def clean_text(text, level=None):
+    """字幕テキストをクリーニングしてCleanResultを返す"""
+    level = level or DEFAULT_LEVEL
+    if level not in LEVELS:
+        raise ValueError(f"Unknown preclean level: {level}")
+
+    removed = {"noise_tags": 0, "fillers": 0, "duplicates": 0}
+    if level == "off" or not text:
+        return CleanResult(text or "", text or "", level, removed)
+
+    cleaned = unicodedata.normalize("NFKC", text)
+
+    cleaned, count = _NOISE_TAG_PATTERN.subn(" ", cleaned)
+    removed["noise_tags"] += count
+    if level == "aggressive":
+        cleaned, count = _ANY_SHORT_TAG_PATTERN.subn(" ", cleaned)
+        removed["noise_tags"] += count
+
+    lines = [_clean_line(line, level, removed) for line in cleaned.split("\n")]
+    cleaned = "\n".join(lines)
+
+    cleaned = _HORIZONTAL_SPACE.sub(" ", cleaned)
+    cleaned = _SPACE_BEFORE_PUNCT.sub(r"\1", cleaned)
+    if level == "aggressive":
+        cleaned = _REPEATED_PUNCT.sub(r"\1", cleaned)
+    cleaned = "\n".join(line.strip() for line in cleaned.split("\n"))
+    cleaned = _MANY_NEWLINES.sub("\n\n", cleaned).strip()
+
+    return CleanResult(text, cleaned, level, removed)
+
+
+def clean_segments(segments, level=None):
+    """セグメント（text/start/duration）単位でクリーニング
+
+    隣接セグメント間の重複は後ろのセグメントから取り除き、空になったセグメントは除外する
+    """
+    level = level or DEFAULT_LEVEL
+    if level == "off":
+        return list(segments)
+
+    cleaned = []
+    previous_text = ""
+    for segment in segments:
+        text = clean_text(segment["text"], level).text
+        if level in ("standard", "aggressive") and previous_text and text:
+            if text == previous_text:
+                continue
+            if _has_cjk(text) and _has_cjk(previous_text):
+                text, _ = _trim_overlap(previous_text, text)
+            else:
+                # 単語単位で前のセグメント末尾と重なる部分を除去
+                prev_words, words = previous_text.split(), text.split()
+                for size in range(min(len(prev_words), len(words) - 1), 1, -1):
+                    if prev_words[-size:] == words[:size]:
+                        text = " ".join(words[size:])
+                        break
+        if not text.strip():
+            continue
+        cleaned.append({**segment, "text": text.strip()})
+        previous_text = text
+    return cleaned
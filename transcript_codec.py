@@ -0,0 +1,294 @@
+"""
+字幕の保存形式（圧縮コーデック）
+字幕セグメントを列ごとのバイナリ（開始時刻はミリ秒差分、長さはミリ秒のvarint、本文はUTF-8の連結）に
+して、自前の字幕コーパスで学習した辞書付きのzstdで圧縮する。zstandard がなければzlib（zdict）で圧縮する
+
+- JSONのキー名（text / start / duration）をセグメントごとに繰り返さない
+- 自動字幕の決まり文句は辞書に入るので、短い字幕でも圧縮が効く
+- 圧縮したデータの先頭に方式と辞書IDを書くので、辞書を入れ替えても古いデータを読める
+
+    codec = transcript_codec.Codec([dictionary])
+    blob = codec.encode(segments)
+    segments = codec.decode(blob)
+"""
+
+import os
+import struct
+import threading
+import zlib
+
+try:
+    import zstandard
+except ImportError:  # zstandard 未インストール時はzlibで圧縮
+    zstandard = None
+
+# 圧縮方式（圧縮データの先頭1バイト）
+RAW = 0
+ZLIB = 1
+ZSTD = 2
+
+# 圧縮レベル
+ZSTD_LEVEL = int(os.environ.get("TRANSCRIPT_ZSTD_LEVEL", 6))
+ZLIB_LEVEL = int(os.environ.get("TRANSCRIPT_ZLIB_LEVEL", 6))
+
+# 学習する辞書のサイズ（バイト）
+DICT_SIZE = int(os.environ.get("TRANSCRIPT_DICT_SIZE", 64 * 1024))
+
+# 既定のコーデックが読み込む辞書ファイル（train-dict で作成）
+DICT_PATH = os.environ.get("TRANSCRIPT_DICT_PATH")
+
+# これより短いデータは圧縮しない（ヘッダーの方が大きくなる）
+MIN_COMPRESS_BYTES = 64
+
+# zlib の zdict に使える長さ（ウィンドウサイズ）
+_ZLIB_WINDOW = 32 * 1024
+
+# 方式（1バイト）と辞書ID（4バイト。0なら辞書なし）
+_HEADER = struct.Struct(">BI")
+
+# セグメントのバイナリ形式のバージョン
+_SEGMENTS_VERSION = 1
+
+
+class CodecError(ValueError):
+    """圧縮データを読めない（壊れている・辞書がない・zstandard がない）"""
+
+
+def _write_varint(out, value):
+    while value > 0x7F:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def _read_varint(data, pos):
+    result = shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        result |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return result, pos
+        shift += 7
+
+
+def encode_segments(segments):
+    """セグメント（text / start / duration）を列ごとのバイナリにする（時刻はミリ秒に丸める）
+
+    開始時刻は前のセグメントとの差分（zigzag、順不同でもよい）、長さと本文のバイト数はvarint、
+    本文は最後にまとめて連結する。text / start / duration 以外のキーは保存しない
+    """
+    out = bytearray((_SEGMENTS_VERSION,))
+    _write_varint(out, len(segments))
+    texts = []
+    previous = 0
+    for item in segments:
+        start = round(item["start"] * 1000)
+        delta = start - previous
+        previous = start
+        _write_varint(out, (delta << 1) ^ (delta >> 63))
+        _write_varint(out, max(0, round(item.get("duration", 0.0) * 1000)))
+        text = item["text"].encode("utf-8")
+        _write_varint(out, len(text))
+        texts.append(text)
+    out += b"".join(texts)
+    return bytes(out)
+
+
+def decode_segments(data):
+    """encode_segments の逆（start / duration は秒のfloat）"""
+    if not data or data[0] != _SEGMENTS_VERSION:
+        raise CodecError("unknown segment encoding")
+    count, pos = _read_varint(data, 1)
+    columns = []
+    start = 0
+    for _ in range(count):
+        delta, pos = _read_varint(data, pos)
+        start += (delta >> 1) ^ -(delta & 1)
+        duration, pos = _read_varint(data, pos)
+        length, pos = _read_varint(data, pos)
+        columns.append((start, duration, length))
+
+    segments = []
+    for start, duration, length in columns:
+        segments.append(
+            {
+                "text": data[pos:pos + length].decode("utf-8"),
+                "start": start / 1000,
+                "duration": duration / 1000,
+            }
+        )
+        pos += length
+    return segments
+
+
+class Dictionary:
+    """圧縮辞書（zstd の学習済み辞書。zlib では末尾を zdict に使う）"""
+
+    def __init__(self, data):
+        self.data = bytes(data)
+        self.id = zlib.crc32(self.data) or 1
+        self._zstd = None
+
+    def __len__(self):
+        return len(self.data)
+
+    @property
+    def zstd(self):
+        if self._zstd is None:
+            self._zstd = zstandard.ZstdCompressionDict(self.data)
+        return self._zstd
+
+    @property
+    def zdict(self):
+        return self.data[-_ZLIB_WINDOW:]
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "rb") as f:
+            return cls(f.read())
+
+    def save(self, path):
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(self.data)
+        os.replace(tmp_path, path)
+
+
+def train_dictionary(samples, size=None):
+    """サンプル（bytes のリスト）から辞書を学習する
+
+    zstandard があれば zstd の辞書学習、なければ（またはサンプルが少なく学習できなければ）
+    サンプルを連結した末尾をそのまま辞書にする
+    """
+    size = size or DICT_SIZE
+    samples = [sample for sample in samples if sample]
+    if not samples:
+        raise ValueError("辞書の学習にはサンプルが必要です")
+    if zstandard is not None:
+        try:
+            return Dictionary(zstandard.train_dictionary(size, samples).as_bytes())
+        except zstandard.ZstdError:
+            pass
+    return Dictionary(b"".join(samples)[-size:])
+
+
+class Codec:
+    """辞書付きの圧縮・展開（スレッドセーフ）
+
+    dictionaries の最後の辞書で圧縮し、展開はヘッダーの辞書IDでどの辞書でも読める
+    """
+
+    def __init__(self, dictionaries=(), method=None, level=None):
+        dictionaries = list(dictionaries)
+        self.dictionaries = {d.id: d for d in dictionaries}
+        self.dictionary = dictionaries[-1] if dictionaries else None
+        self.method = method if method is not None else (ZSTD if zstandard is not None else ZLIB)
+        if self.method == ZSTD and zstandard is None:
+            raise CodecError("zstandard is not installed")
+        self.level = level if level is not None else (
+            ZSTD_LEVEL if self.method == ZSTD else ZLIB_LEVEL
+        )
+        self._local = threading.local()
+
+    def add_dictionary(self, dictionary):
+        """辞書を追加して以後の圧縮に使う"""
+        self.dictionaries[dictionary.id] = dictionary
+        self.dictionary = dictionary
+
+    def _zstd_compressor(self):
+        # ZstdCompressor はスレッド間で共有できないのでスレッドごとに持つ
+        compressors = self._local.__dict__.setdefault("compressors", {})
+        key = self.dictionary.id if self.dictionary else 0
+        compressor = compressors.get(key)
+        if compressor is None:
+            compressor = compressors[key] = zstandard.ZstdCompressor(
+                level=self.level,
+                dict_data=self.dictionary.zstd if self.dictionary else None,
+            )
+        return compressor
+
+    def _zstd_decompressor(self, dict_id):
+        decompressors = self._local.__dict__.setdefault("decompressors", {})
+        decompressor = decompressors.get(dict_id)
+        if decompressor is None:
+            dictionary = self._dictionary(dict_id)
+            decompressor = decompressors[dict_id] = zstandard.ZstdDecompressor(
+                dict_data=dictionary.zstd if dictionary else None
+            )
+        return decompressor
+
+    def _dictionary(self, dict_id):
+        if not dict_id:
+            return None
+        dictionary = self.dictionaries.get(dict_id)
+        if dictionary is None:
+            raise CodecError(f"compression dictionary {dict_id:08x} is not loaded")
+        return dictionary
+
+    def compress(self, data):
+        """bytes を圧縮する（短いものは無圧縮のままヘッダーだけ付ける）"""
+        if len(data) < MIN_COMPRESS_BYTES or self.method == RAW:
+            return _HEADER.pack(RAW, 0) + data
+        dict_id = self.dictionary.id if self.dictionary else 0
+        if self.method == ZSTD:
+            body = self._zstd_compressor().compress(data)
+        else:
+            if self.dictionary:
+                compressor = zlib.compressobj(self.level, zdict=self.dictionary.zdict)
+            else:
+                compressor = zlib.compressobj(self.level)
+            body = compressor.compress(data) + compressor.flush()
+        return _HEADER.pack(self.method, dict_id) + body
+
+    def decompress(self, blob):
+        if len(blob) < _HEADER.size:
+            raise CodecError("truncated data")
+        method, dict_id = _HEADER.unpack_from(blob)
+        body = memoryview(blob)[_HEADER.size:]
+        try:
+            if method == RAW:
+                return bytes(body)
+            if method == ZLIB:
+                dictionary = self._dictionary(dict_id)
+                if dictionary:
+                    decompressor = zlib.decompressobj(zdict=dictionary.zdict)
+                else:
+                    decompressor = zlib.decompressobj()
+                return decompressor.decompress(body) + decompressor.flush()
+            if method == ZSTD:
+                if zstandard is None:
+                    raise CodecError("zstd data requires zstandard")
+                return self._zstd_decompressor(dict_id).decompress(body)
+        except (zlib.error, getattr(zstandard, "ZstdError", zlib.error)) as e:
+            raise CodecError(f"corrupt data: {e}")
+        raise CodecError(f"unknown compression method {method}")
+
+    def encode(self, segments):
+        """セグメントのリストを圧縮したバイナリにする"""
+        return self.compress(encode_segments(segments))
+
+    def decode(self, blob):
+        return decode_segments(self.decompress(blob))
+
+    def compress_text(self, text):
+        return self.compress(text.encode("utf-8"))
+
+    def decompress_text(self, blob):
+        return self.decompress(blob).decode("utf-8")
+
+
+_default = None
+_default_lock = threading.Lock()
+
+
+def default_codec():
+    """TRANSCRIPT_DICT_PATH の辞書（あれば）を使うプロセス共通のコーデック"""
+    global _default
+    with _default_lock:
+        if _default is None:
+            dictionaries = []
+            if DICT_PATH and os.path.exists(DICT_PATH):
+                dictionaries.append(Dictionary.load(DICT_PATH))
+            _default = Codec(dictionaries)
+        return _default
@@ -0,0 +1,288 @@
+"""
+字幕の列指向ストア（コーパス全体の集計用）
+抽出した全字幕を1つのディレクトリに列ごとのファイルとして書き、mmap / NumPy の memmap で開く。
+キーワード頻度や話速などの集計を、レコードごとのPythonオブジェクトを作らずにディスクの速度で回す
+
+ディレクトリの中身:
+    text.bin             全セグメントの本文（UTF-8）を連結したもの
+    offsets.npy          本文のバイト位置（int64、セグメント数+1）
+    starts.npy           開始時刻（int64、ミリ秒）
+    durations.npy        長さ（int64、ミリ秒）
+    video_offsets.npy    動画ごとの最初のセグメント番号（int64、動画数+1）
+    videos.json          動画IDと言語の一覧、件数
+
+    with ColumnarWriter("corpus") as writer:
+        writer.add(video_id, segments, language="ja")
+    store = ColumnarStore("corpus")
+    counts = store.keyword_counts("字幕")
+"""
+
+import glob
+import json
+import mmap
+import os
+import re
+from array import array
+
+import numpy as np
+
+# ストアの形式のバージョン
+FORMAT_VERSION = 1
+
+_COLUMNS = ("offsets", "starts", "durations", "video_offsets")
+
+
+class ColumnarWriter:
+    """列指向ストアを書く（本文は追記しながら書き、数値の列は close で .npy にする）"""
+
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+        self._text = open(os.path.join(path, "text.bin"), "wb")
+        self._offsets = array("q", [0])
+        self._starts = array("q")
+        self._durations = array("q")
+        self._video_offsets = array("q", [0])
+        self._videos = []
+        self._seen = set()
+        self._position = 0
+        self.closed = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __len__(self):
+        return len(self._videos)
+
+    def add(self, video_id, segments, language=None):
+        """動画1本分のセグメント（text / start / duration）を追加する。同じ動画IDは最初の1回だけ"""
+        if video_id in self._seen:
+            return False
+        self._seen.add(video_id)
+        chunks = []
+        for item in segments:
+            data = item["text"].encode("utf-8")
+            chunks.append(data)
+            self._position += len(data)
+            self._offsets.append(self._position)
+            self._starts.append(round(item["start"] * 1000))
+            self._durations.append(round(item.get("duration", 0.0) * 1000))
+        self._text.write(b"".join(chunks))
+        self._video_offsets.append(len(self._starts))
+        self._videos.append({"video_id": video_id, "language": language})
+        return True
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        self._text.close()
+        for name in _COLUMNS:
+            np.save(
+                os.path.join(self.path, f"{name}.npy"),
+                np.frombuffer(getattr(self, f"_{name}"), dtype=np.int64),
+            )
+        meta = {
+            "version": FORMAT_VERSION,
+            "videos": len(self._videos),
+            "segments": len(self._starts),
+            "text_bytes": self._position,
+            "video_ids": [v["video_id"] for v in self._videos],
+            "languages": [v["language"] for v in self._videos],
+        }
+        tmp_path = os.path.join(self.path, "videos.json.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(meta, f, ensure_ascii=False)
+        # videos.json は最後に置き換える（途中で止まったストアは開けない）
+        os.replace(tmp_path, os.path.join(self.path, "videos.json"))
+
+
+class ColumnarStore:
+    """列指向ストアを読む（列は memmap なので開くだけではほとんど読み込まない）"""
+
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, "videos.json"), encoding="utf-8") as f:
+            meta = json.load(f)
+        if meta.get("version") != FORMAT_VERSION:
+            raise ValueError(f"未対応のストア形式です: {meta.get('version')}")
+        self.video_ids = meta["video_ids"]
+        self.languages = meta["languages"]
+        self._index = {video_id: i for i, video_id in enumerate(self.video_ids)}
+        for name in _COLUMNS:
+            setattr(self, name, np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r"))
+
+        self._file = open(os.path.join(path, "text.bin"), "rb")
+        if meta["text_bytes"]:
+            self.text = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            self.text_array = np.frombuffer(self.text, dtype=np.uint8)
+        else:  # 空のファイルは mmap できない
+            self.text = b""
+            self.text_array = np.zeros(0, dtype=np.uint8)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        # text_array が mmap を参照している間は閉じられないので先に外す
+        self.text_array = None
+        if isinstance(self.text, mmap.mmap):
+            self.text.close()
+        self._file.close()
+
+    def __len__(self):
+        return len(self.video_ids)
+
+    def __contains__(self, video_id):
+        return video_id in self._index
+
+    @property
+    def segment_count(self):
+        return len(self.starts)
+
+    def segment_text(self, i):
+        return self.text[self.offsets[i]:self.offsets[i + 1]].decode("utf-8")
+
+    def segments(self, video_id):
+        """動画のセグメント（text / start / duration の辞書のリスト）"""
+        v = self._index[video_id]
+        first, last = int(self.video_offsets[v]), int(self.video_offsets[v + 1])
+        return [
+            {
+                "text": self.segment_text(i),
+                "start": int(self.starts[i]) / 1000,
+                "duration": int(self.durations[i]) / 1000,
+            }
+            for i in range(first, last)
+        ]
+
+    def _per_segment_sums(self, values):
+        """バイトごとの値をセグメントごとに合計する"""
+        sums = np.zeros(self.segment_count, dtype=np.int64)
+        nonempty = self.offsets[1:] > self.offsets[:-1]
+        if nonempty.any():
+            sums[nonempty] = np.add.reduceat(values, self.offsets[:-1][nonempty], dtype=np.int64)
+        return sums
+
+    def _per_video_sums(self, values):
+        """セグメントごとの値を動画ごとに合計する"""
+        cumulative = np.concatenate(([0], np.cumsum(values, dtype=np.int64)))
+        return cumulative[self.video_offsets[1:]] - cumulative[self.video_offsets[:-1]]
+
+    def char_counts(self):
+        """セグメントごとの文字数（UTF-8の先頭バイトを数える。デコードしない）"""
+        lead = (self.text_array & 0xC0) != 0x80
+        return self._per_segment_sums(lead)
+
+    def video_stats(self):
+        """動画ごとのセグメント数・文字数・発話時間（秒）・話速（文字/分）"""
+        chars = self._per_video_sums(self.char_counts())
+        spoken = self._per_video_sums(self.durations) / 1000
+        segments = np.diff(self.video_offsets)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            rate = np.where(spoken > 0, chars / spoken * 60, 0.0)
+        return {
+            "video_ids": self.video_ids,
+            "segments": segments,
+            "chars": chars,
+            "spoken_seconds": spoken,
+            "chars_per_minute": rate,
+        }
+
+    def find(self, keyword):
+        """キーワードが出現するバイト位置（mmap 上の検索なのでPythonのループは出現数だけ）"""
+        needle = keyword.encode("utf-8")
+        if not needle:
+            raise ValueError("キーワードを指定してください")
+        positions = array("q")
+        find = self.text.find
+        pos = find(needle)
+        while pos >= 0:
+            positions.append(pos)
+            pos = find(needle, pos + len(needle))
+        return np.frombuffer(positions, dtype=np.int64)
+
+    def keyword_segments(self, keyword):
+        """キーワードを含むセグメントの番号（セグメントをまたぐ一致は除く）"""
+        positions = self.find(keyword)
+        segment = np.searchsorted(self.offsets, positions, side="right") - 1
+        inside = positions + len(keyword.encode("utf-8")) <= self.offsets[segment + 1]
+        return segment[inside]
+
+    def keyword_counts(self, keyword):
+        """動画IDごとのキーワードの出現回数（出現した動画だけ）"""
+        segment = self.keyword_segments(keyword)
+        videos = np.searchsorted(self.video_offsets, segment, side="right") - 1
+        ids, counts = np.unique(videos, return_counts=True)
+        return {self.video_ids[i]: int(c) for i, c in zip(ids, counts)}
+
+
+# save_results の .json 出力のファイル名（transcript_<動画ID>_<時刻>.json）
+_OUTPUT_NAME = re.compile(r"^transcript_(.+)_\d+\.json$")
+
+
+def _load_output(file):
+    """.json 出力を読む（save_results の出力でなければ None）"""
+    with open(file, encoding="utf-8") as f:
+        try:
+            data = json.load(f)
+        except json.JSONDecodeError:
+            return None
+    if isinstance(data, dict) and "raw_transcript" in data and data.get("video_id"):
+        return data
+    return None
+
+
+def _json_outputs(paths):
+    """local_transcript_extractor の .json 出力を {動画ID: [ファイル（新しい順）]} にまとめる
+
+    中身は保持しない（書き出すときに1ファイルずつ読む）。動画IDはファイル名から取り、
+    名前が違うファイルだけ中身を読んで調べる
+    """
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(glob.glob(os.path.join(path, "transcript_*.json")))
+        else:
+            files.extend(glob.glob(path))
+    outputs = {}
+    for file in sorted(files, key=os.path.getmtime, reverse=True):
+        match = _OUTPUT_NAME.match(os.path.basename(file))
+        if match:
+            video_id = match.group(1)
+        else:
+            data = _load_output(file)
+            if data is None:
+                continue
+            video_id = data["video_id"]
+        outputs.setdefault(video_id, []).append(file)
+    return outputs
+
+
+def export_json_files(paths, output_dir):
+    """save_results の .json 出力（ディレクトリまたはglob）から列指向ストアを作り、動画数を返す
+
+    動画ごとに一番新しい読めるファイルを使う。メモリに持つのは書き出し中の1本分だけ
+    """
+    with ColumnarWriter(output_dir) as writer:
+        for video_id, files in _json_outputs(paths).items():
+            for file in files:
+                data = _load_output(file)
+                if data is not None and data["video_id"] == video_id:
+                    writer.add(video_id, data["raw_transcript"], data.get("language"))
+                    break
+        return len(writer)
+
+
+def export_archive(archive, output_dir):
+    """字幕アーカイブ（各動画の最新の行）から列指向ストアを作り、動画数を返す"""
+    with ColumnarWriter(output_dir) as writer:
+        for record in archive.iter_records(latest_only=True):
+            writer.add(record["video_id"], record["segments"], record.get("language"))
+        return len(writer)
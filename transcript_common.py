@@ -0,0 +1,155 @@
+"""
+字幕処理の共通関数
+Flask版（app.py）とASGI版（app_async.py）で同じ結果を返すための共有部分
+"""
+
+from urllib.parse import parse_qs, urlparse
+
+import response_layer
+
+# Geminiの生成パラメータ（モデルは model_router が処理段階ごとに選ぶ）
+FORMAT_GENERATION_CONFIG = {"temperature": 0.1, "max_output_tokens": 2000}
+SUMMARY_GENERATION_CONFIG = {"temperature": 0.3, "max_output_tokens": 1200}
+
+
+def get_video_id(url):
+    """YouTube URLから動画IDを抽出"""
+    parsed_url = urlparse(url)
+
+    # youtu.be形式
+    if parsed_url.hostname == "youtu.be":
+        return parsed_url.path[1:]
+
+    # youtube.com形式
+    if parsed_url.hostname in ("www.youtube.com", "youtube.com"):
+        if parsed_url.path == "/watch":
+            params = parse_qs(parsed_url.query)
+            return params.get("v", [None])[0]
+        if parsed_url.path.startswith("/embed/"):
+            return parsed_url.path.split("/")[2]
+        if parsed_url.path.startswith("/v/"):
+            return parsed_url.path.split("/")[2]
+
+    raise ValueError(f"無効なYouTube URLです: {url}")
+
+
+def format_transcript(transcript, format_type="txt"):
+    """字幕をフォーマット"""
+    if format_type == "json":
+        return response_layer.dumps(transcript, indent=2)
+    elif format_type == "srt":
+        # SRT形式（タイムスタンプ付き）
+        srt_content = []
+        for i, item in enumerate(transcript, 1):
+            start = format_timestamp(item["start"])
+            end = format_timestamp(item["start"] + item["duration"])
+            srt_content.append(f"{i}\n{start} --> {end}\n{item['text']}\n")
+        return "\n".join(srt_content)
+    else:
+        # デフォルト: プレーンテキスト（スペースで結合して自然な文章に）
+        return " ".join([item["text"] for item in transcript])
+
+
+def format_timestamp(seconds):
+    """秒数をSRTタイムスタンプ形式に変換"""
+    hours = int(seconds // 3600)
+    minutes = int((seconds % 3600) // 60)
+    seconds = seconds % 60
+    return f"{hours:02d}:{minutes:02d}:{seconds:06.3f}".replace(".", ",")
+
+
+def build_format_prompt(text):
+    """字幕整形用のプロンプトを作成"""
+    return f"""以下のYouTube字幕テキストを読みやすく整形してください。
+
+【重要な制約】:
+- 文字や単語を一切変更・追加・削除しないでください
+- 内容の要約や意訳は絶対に行わないでください
+- 元のテキストの文字をそのまま保持してください
+
+【整形作業】:
+1. 各文（。で終わる文）の後には必ず空行を入れてください（改行2回）
+2. つまり、句点の後は必ず空行で区切ってください
+3. 話題が変わる箇所ではさらに空行を追加してください
+4. 「で、」「それで、」「そして、」などの接続詞の前でも空行を入れてください
+5. 長い文は読点（、）の位置で改行してください
+6. 読みやすさを最優先に、空行を多めに使ってください
+
+元のテキスト:
+{text}
+
+整形されたテキスト:"""
+
+
+_SUMMARY_RULES = """【要約の要求】:
+1. 重要な情報は全て残してください
+2. 主要なトピックを5〜10個の要点に整理してください
+3. 固有名詞、数値、専門用語は必ず含めてください
+4. 具体的な例や説明も重要なものは残してください
+5. 500〜800文字程度でまとめてください
+
+【整形ルール】:
+1. 各要点は「・」や「◆」で始めてください
+2. 関連する内容は段落でグループ化してください
+3. 重要なキーワードは【】で囲んでください
+4. 各段落の間には空行を入れてください
+5. 読みやすさを重視して改行を使ってください"""
+
+
+def build_summary_prompt(text):
+    """要約用のプロンプトを作成"""
+    return f"""以下のYouTube動画の字幕テキストを詳細に要約してください。
+
+{_SUMMARY_RULES}
+
+字幕テキスト:
+{text}
+
+詳細な要約:"""
+
+
+def build_partial_summary_prompt(text, index):
+    """分割要約（map段階）用のプロンプトを作成
+
+    チャンク総数は含めない（字幕が伸びても既存チャンクのプロンプトが変わらず、結果を再利用できる）
+    """
+    return f"""以下はYouTube動画の字幕テキストの一部（{index}番目の部分）です。
+後で他の部分と統合するので、この部分の内容を箇条書きで要約してください。
+固有名詞、数値、専門用語、具体例は必ず残してください。
+
+字幕テキスト（{index}番目の部分）:
+{text}
+
+部分要約:"""
+
+
+def _numbered_parts(partial_summaries, start=0):
+    return "\n\n".join(
+        f"[部分 {i}]\n{summary}" for i, summary in enumerate(partial_summaries, start + 1)
+    )
+
+
+def build_merge_prompt(partial_summaries, start):
+    """連続した部分要約を1つの部分要約にまとめる（中間統合）プロンプトを作成"""
+    end = start + len(partial_summaries)
+    return f"""以下はYouTube動画の字幕を分割して要約した部分要約のうち、連続する {start + 1}〜{end} 番目です。
+後でさらに他の部分と統合するので、重複を除いて1つの部分要約に箇条書きでまとめてください。
+固有名詞、数値、専門用語、具体例は必ず残してください。
+
+部分要約:
+{_numbered_parts(partial_summaries, start)}
+
+統合した部分要約:"""
+
+
+def build_consolidation_prompt(partial_summaries):
+    """部分要約を統合する（reduce段階）プロンプトを作成"""
+    return f"""以下はYouTube動画の字幕を分割して要約した部分要約の一覧です。
+重複を除いて統合し、動画全体の詳細な要約を作成してください。
+
+{_SUMMARY_RULES}
+
+部分要約:
+{_numbered_parts(partial_summaries)}
+
+詳細な要約:"""
@@ -0,0 +1,276 @@
+"""
+字幕の全文検索（SQLite FTS5、trigramトークナイザー）
+保存した字幕をセグメント単位で索引し、動画ID・開始時刻・スニペット付きのヒットを返す
+
+- trigram（3文字単位）なので分かち書きなしで日本語も部分一致で引ける
+- bm25 で順位付けし、page / per_page でページ分割する（採点は新しい MAX_RANKED 件まで）
+- 3文字未満の語は trigram で引けないため LIKE で探す（新しい順、索引は使えない）
+- 字幕アーカイブ（transcript_archive）から行ID順に差分だけ取り込める
+
+    index = TranscriptIndex("transcript_search.sqlite3")
+    index.index_video(video_id, segments, title=title, language="ja")
+    page = index.search("字幕抽出", page=1, per_page=20)
+"""
+
+import os
+import sqlite3
+import threading
+import time
+
+# 1ページの既定件数と上限
+DEFAULT_PER_PAGE = 20
+MAX_PER_PAGE = 100
+
+# trigram で引ける最短の語の長さ
+MIN_TRIGRAM_CHARS = 3
+
+# bm25 で順位付けする候補の数（ヒットの多い語でも新しいセグメントからこの件数だけ採点する）
+MAX_RANKED = int(os.environ.get("SEARCH_MAX_RANKED", 2000))
+
+# スニペットのヒット箇所の囲み文字と、ヒット箇所の前後に残す文字数
+SNIPPET_OPEN = "["
+SNIPPET_CLOSE = "]"
+SNIPPET_CONTEXT = 16
+
+_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS segments USING fts5(
+    text, video_id UNINDEXED, start UNINDEXED, tokenize = 'trigram'
+);
+CREATE TABLE IF NOT EXISTS videos (
+    video_id TEXT PRIMARY KEY,
+    title TEXT,
+    language TEXT,
+    first_rowid INTEGER NOT NULL,
+    last_rowid INTEGER NOT NULL,
+    segment_count INTEGER NOT NULL,
+    indexed_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+"""
+
+
+def check_query(query, page=1, per_page=DEFAULT_PER_PAGE):
+    """検索条件を検証して (query, page, per_page) を返す（不正な値は ValueError）"""
+    query = (query or "").strip()
+    if not query:
+        raise ValueError("検索語（q）を指定してください")
+    try:
+        page = int(1 if page in (None, "") else page)
+        per_page = int(DEFAULT_PER_PAGE if per_page in (None, "") else per_page)
+    except (TypeError, ValueError):
+        raise ValueError("page と per_page は整数で指定してください")
+    if page < 1 or per_page < 1:
+        raise ValueError("page と per_page は1以上で指定してください")
+    return query, page, min(per_page, MAX_PER_PAGE)
+
+
+def match_expression(terms):
+    """語のリストを FTS5 の MATCH 式にする（各語をフレーズとして引用し、すべてを含む行）"""
+    return " ".join('"' + term.replace('"', '""') + '"' for term in terms)
+
+
+def _like_pattern(term):
+    escaped = term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return f"%{escaped}%"
+
+
+def _highlight(text, terms):
+    """スニペット（最初のヒット箇所の前後を切り出して囲む）
+
+    FTS5 の snippet() は並べ替える前に候補すべてで計算されるので、ページの行だけここで作る
+    """
+    lowered = text.lower()
+    for term in terms:
+        pos = lowered.find(term.lower())
+        if pos < 0:
+            continue
+        begin = max(0, pos - SNIPPET_CONTEXT)
+        end = min(len(text), pos + len(term) + SNIPPET_CONTEXT)
+        return (
+            ("…" if begin else "")
+            + text[begin:pos]
+            + SNIPPET_OPEN + text[pos:pos + len(term)] + SNIPPET_CLOSE
+            + text[pos + len(term):end]
+            + ("…" if end < len(text) else "")
+        )
+    return text[: SNIPPET_CONTEXT * 2]
+
+
+def watch_url(video_id, start):
+    """ヒット位置から再生するURL"""
+    return f"https://www.youtube.com/watch?v={video_id}&t={int(start)}s"
+
+
+class TranscriptIndex:
+    """字幕の全文検索インデックス（スレッドセーフ。読み書きは1本のロックで直列化）"""
+
+    def __init__(self, path):
+        self.path = path
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.executescript(_SCHEMA)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def __len__(self):
+        """索引済みの動画数"""
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM videos").fetchone()[0]
+
+    def __contains__(self, video_id):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT 1 FROM videos WHERE video_id = ?", (video_id,)
+            ).fetchone()
+        return row is not None
+
+    def _index_locked(self, video_id, segments, title, language):
+        """動画のセグメントを索引し直す（ロックとトランザクションは呼び出し元）"""
+        previous = self._conn.execute(
+            "SELECT first_rowid, last_rowid FROM videos WHERE video_id = ?", (video_id,)
+        ).fetchone()
+        if previous:
+            # 1動画のセグメントは連続した rowid で入れているので範囲で消せる（全件走査しない）
+            self._conn.execute("DELETE FROM segments WHERE rowid BETWEEN ? AND ?", previous)
+
+        first_rowid = last_rowid = 0
+        for segment in segments:
+            text = (segment.get("text") or "").strip()
+            if not text:
+                continue
+            cursor = self._conn.execute(
+                "INSERT INTO segments (text, video_id, start) VALUES (?, ?, ?)",
+                (text, video_id, float(segment.get("start", 0.0))),
+            )
+            first_rowid = first_rowid or cursor.lastrowid
+            last_rowid = cursor.lastrowid
+
+        self._conn.execute(
+            "INSERT OR REPLACE INTO videos VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (
+                video_id,
+                title,
+                language,
+                first_rowid,
+                last_rowid,
+                last_rowid - first_rowid + 1 if last_rowid else 0,
+                time.time(),
+            ),
+        )
+
+    def index_video(self, video_id, segments, title=None, language=None):
+        """動画の字幕（text / start を持つセグメントのリスト）を索引する。既存の索引は置き換える"""
+        with self._lock, self._conn:
+            self._index_locked(video_id, segments, title, language)
+
+    def remove_video(self, video_id):
+        with self._lock, self._conn:
+            row = self._conn.execute(
+                "SELECT first_rowid, last_rowid FROM videos WHERE video_id = ?", (video_id,)
+            ).fetchone()
+            if row:
+                self._conn.execute("DELETE FROM segments WHERE rowid BETWEEN ? AND ?", row)
+                self._conn.execute("DELETE FROM videos WHERE video_id = ?", (video_id,))
+
+    def sync_archive(self, archive, batch_size=500):
+        """字幕アーカイブのうち前回より後に追記された行を取り込み、取り込んだ件数を返す"""
+        key = f"archive:{archive.path}"
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        last_id = int(row[0]) if row else 0
+
+        count = 0
+        batch = []
+        for row_id, record in archive.iter_rows(after_id=last_id, batch_size=batch_size):
+            batch.append((row_id, record))
+            if len(batch) >= batch_size:
+                count += self._import_batch(key, batch)
+                batch = []
+        if batch:
+            count += self._import_batch(key, batch)
+        return count
+
+    def _import_batch(self, key, batch):
+        """アーカイブの行をまとめて索引し、取り込み位置を同じトランザクションで進める"""
+        with self._lock, self._conn:
+            for _, record in batch:
+                self._index_locked(
+                    record["video_id"], record["segments"], None, record.get("language")
+                )
+            self._conn.execute(
+                "INSERT OR REPLACE INTO meta VALUES (?, ?)", (key, str(batch[-1][0]))
+            )
+        return len(batch)
+
+    def search(self, query, page=1, per_page=DEFAULT_PER_PAGE):
+        """検索してヒット（動画ID・開始時刻・スニペット・スコア）のページを返す"""
+        query, page, per_page = check_query(query, page, per_page)
+        terms = query.split()
+        offset = (page - 1) * per_page
+        started = time.perf_counter()
+
+        if all(len(term) >= MIN_TRIGRAM_CHARS for term in terms):
+            method = "fts"
+            match = match_expression(terms)
+            # 採点する候補を新しい順に絞る（rowid の範囲指定は FTS5 が索引で処理する）
+            candidates = max(MAX_RANKED, offset + per_page + 1)
+            cutoff_sql = (
+                "SELECT rowid FROM segments WHERE segments MATCH ? "
+                "ORDER BY rowid DESC LIMIT 1 OFFSET ?"
+            )
+            sql = (
+                "SELECT s.video_id, s.start, s.text, bm25(segments), v.title, v.language "
+                "FROM segments AS s LEFT JOIN videos AS v ON v.video_id = s.video_id "
+                "WHERE segments MATCH ? AND s.rowid >= ? "
+                "ORDER BY bm25(segments) LIMIT ? OFFSET ?"
+            )
+        else:
+            method = "like"
+            where = " AND ".join("s.text LIKE ? ESCAPE '\\'" for _ in terms)
+            sql = (
+                "SELECT s.video_id, s.start, s.text, NULL, v.title, v.language "
+                "FROM segments AS s LEFT JOIN videos AS v ON v.video_id = s.video_id "
+                f"WHERE {where} ORDER BY s.rowid DESC LIMIT ? OFFSET ?"
+            )
+            params = tuple(_like_pattern(term) for term in terms) + (per_page + 1, offset)
+
+        with self._lock:
+            if method == "fts":
+                row = self._conn.execute(cutoff_sql, (match, candidates - 1)).fetchone()
+                params = (match, row[0] if row else 0, per_page + 1, offset)
+            rows = self._conn.execute(sql, params).fetchall()
+
+        results = []
+        for video_id, start, text, score, title, language in rows[:per_page]:
+            results.append(
+                {
+                    "video_id": video_id,
+                    "title": title,
+                    "language": language,
+                    "start": start,
+                    "url": watch_url(video_id, start),
+                    "snippet": _highlight(text, terms),
+                    # bm25 は小さいほど関連が高いので符号を反転する
+                    "score": round(-score, 4) if score is not None else None,
+                }
+            )
+        return {
+            "query": query,
+            "method": method,
+            "page": page,
+            "per_page": per_page,
+            "has_more": len(rows) > per_page,
+            "results": results,
+            "took_ms": round((time.perf_counter() - started) * 1000, 3),
+        }